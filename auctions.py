@@ -0,0 +1,489 @@
+# auctions.py
+"""
+Live auctions: bids go through an in-memory order book, and every
+auction settles the moment its timer runs out.
+
+Each live auction has an OrderBook (top bidder / amount, end time) and
+an asyncio.Lock. A /bid that can't win (too low, auction over) is
+answered from memory. The rest queue on the book; whoever finds the lock
+free drains the queue, sending everything queued as one writer job
+(apply_bids): debits, the refund of each outbid bidder, the bid rows and
+the new end_iso commit in one transaction, with the order book supplying
+the current top instead of an ORDER BY on auction_bids. Bids that
+arrive while a job is in flight go in the next one.
+
+The scheduler keeps a min-heap of (end time, auction id) plus the current
+deadline of each active auction. /auction schedules a new one and every
+/bid pushes its extended deadline (O(log n)); the entry it replaces is
+left in the heap and skipped when it surfaces. One task sleeps until the
+earliest deadline, or until an earlier one is pushed.
+
+Settling is a single writer job (settle_auction): it re-checks status and
+end_iso, so a bid that got in first just moves the deadline, and a card /
+crystal transfer can never happen twice. Bids go through the same
+writer, which serializes the two. On startup the heap is rebuilt from
+auctions WHERE status = 'active'; anything that expired while the bot was
+down settles right away.
+"""
+
+import asyncio
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from config import Config, app
+from database import get_db, give_card
+from ledger import credit, debit
+
+
+def deadline(end_iso):
+    """end_iso (local datetime.isoformat()) -> unix time; now if unreadable"""
+    try:
+        return datetime.fromisoformat(end_iso).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+# ---------------- Settlement ----------------
+def settle_auction(conn, auction_id, now_iso):
+    """Close one auction whose time is up, as one writer job.
+
+    Returns (result, details): result is "gone" (missing / already
+    finished), "later" (details = the newer end_iso), "unsold" or "sold";
+    for the last two details is (waifu_name, seller_id, winner_id, price).
+    """
+    row = conn.execute(
+        "SELECT waifu_id, seller_id, waifu_name, end_iso, status, transferred FROM auctions WHERE id = ?",
+        (auction_id,)
+    ).fetchone()
+    if not row or row[4] != "active":
+        return "gone", None
+    waifu_id, seller_id, waifu_name, end_iso, _, transferred = row
+    if deadline(end_iso) > deadline(now_iso):
+        return "later", end_iso
+
+    top = conn.execute(
+        "SELECT bidder_id, amount FROM auction_bids WHERE auction_id = ? ORDER BY amount DESC, bid_iso ASC LIMIT 1",
+        (auction_id,)
+    ).fetchone()
+
+    if not top:
+        # no bids -> the reserved copy goes back to the seller
+        if not transferred:
+            give_card(conn, seller_id, waifu_id)
+        conn.execute("UPDATE auctions SET status = 'finished', transferred = 1 WHERE id = ?", (auction_id,))
+        return "unsold", (waifu_name, seller_id, None, 0)
+
+    # winner's crystals were already taken at bid time
+    winner_id, price = top
+    if not transferred:
+        give_card(conn, winner_id, waifu_id)
+        credit(conn, seller_id, price, "auction_sale", f"auction={auction_id}")
+    conn.execute(
+        "UPDATE auctions SET status = 'finished', winner_id = ?, final_price = ?, transferred = 1 WHERE id = ?",
+        (winner_id, price, auction_id)
+    )
+    return "sold", (waifu_name, seller_id, winner_id, price)
+
+
+# ---------------- Bids ----------------
+def apply_bids(conn, auction_id, bids, top_bidder, top_amount, min_price, now_iso, end_iso):
+    """Apply queued (user_id, amount) bids in order, as one writer job.
+
+    top_bidder / top_amount are the order book's; each accepted bid takes
+    the bidder's crystals (only the raise if they already lead), refunds
+    the bidder it beats and moves end_iso. Returns ([(result,
+    previous bidder, previous amount)] per bid, (top bidder, top amount)),
+    result being "ok", "too_low" or "short"; ([], None) if the auction
+    closed first.
+    """
+    row = conn.execute("SELECT status, end_iso FROM auctions WHERE id = ?", (auction_id,)).fetchone()
+    if not row or row[0] != "active" or deadline(row[1]) <= deadline(now_iso):
+        return [], None
+
+    ref = f"auction={auction_id}"
+    results = []
+    for user_id, amount in bids:
+        previous = (top_bidder, top_amount)
+        if amount < min_price or (top_bidder is not None and amount <= top_amount):
+            results.append(("too_low", *previous))
+            continue
+        raise_only = user_id == top_bidder
+        if debit(conn, user_id, amount - top_amount if raise_only else amount, "auction_bid", ref) is None:
+            results.append(("short", *previous))
+            continue
+        if top_bidder is not None and not raise_only:
+            credit(conn, top_bidder, top_amount, "auction_refund", ref)
+        conn.execute("INSERT INTO auction_bids (auction_id, bidder_id, amount, bid_iso) VALUES (?, ?, ?, ?)",
+                     (auction_id, user_id, amount, now_iso))
+        top_bidder, top_amount = user_id, amount
+        results.append(("ok", *previous))
+
+    if any(result == "ok" for result, *_ in results):
+        conn.execute("UPDATE auctions SET end_iso = ? WHERE id = ?", (end_iso, auction_id))
+    return results, (top_bidder, top_amount)
+
+
+def _load_book(conn, auction_id):
+    row = conn.execute(
+        "SELECT seller_id, waifu_name, min_price, end_iso, status FROM auctions WHERE id = ?", (auction_id,)
+    ).fetchone()
+    if not row:
+        return None
+    top = conn.execute(
+        "SELECT bidder_id, amount FROM auction_bids WHERE auction_id = ? ORDER BY amount DESC, bid_iso ASC LIMIT 1",
+        (auction_id,)
+    ).fetchone()
+    return row, top
+
+
+class OrderBook:
+    """Live state of one auction; only BidEngine changes it"""
+
+    __slots__ = ("auction_id", "seller_id", "waifu_name", "min_price", "end", "top_bidder", "top_amount",
+                 "closed", "lock", "pending")
+
+    def __init__(self, auction_id, seller_id, waifu_name, min_price, end_iso, closed=False, top=None):
+        self.auction_id = auction_id
+        self.seller_id = seller_id
+        self.waifu_name = waifu_name
+        self.min_price = min_price or 0
+        self.end = deadline(end_iso)
+        self.top_bidder, self.top_amount = top or (None, 0)
+        self.closed = closed
+        self.lock = asyncio.Lock()  # held while this auction's bids are being written
+        self.pending = []           # (user_id, amount, future) waiting for the next write
+
+    def is_open(self):
+        return not self.closed and time.time() < self.end
+
+
+class BidEngine:
+    def __init__(self, db=None, scheduler=None):
+        self._db = db
+        self._scheduler = scheduler
+        self._books = {}  # auction id -> OrderBook, live auctions only
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    @property
+    def scheduler(self):
+        return self._scheduler or get_auction_scheduler()
+
+    async def book(self, auction_id):
+        """The auction's OrderBook (loaded on first use), or None if there is no such auction"""
+        book = self._books.get(auction_id)
+        if book is not None:
+            return book
+        loaded = await self.db.read(_load_book, auction_id)
+        if loaded is None:
+            return None
+        (seller_id, waifu_name, min_price, end_iso, status), top = loaded
+        book = OrderBook(auction_id, seller_id, waifu_name, min_price, end_iso, status != "active", top)
+        if book.closed:
+            return book  # finished auctions aren't kept
+        # a concurrent first bid may have loaded it too; the first one stays
+        return self._books.setdefault(auction_id, book)
+
+    def discard(self, auction_id):
+        """The auction was settled; later bids load it as closed"""
+        book = self._books.pop(auction_id, None)
+        if book is not None:
+            book.closed = True
+
+    async def bid(self, book, user_id, amount):
+        """(result, previous top bidder, previous top amount); result is "ok", "closed", "too_low" or "short" """
+        if not book.is_open():
+            return "closed", None, 0
+        if amount <= 0 or amount < book.min_price or (book.top_bidder is not None and amount <= book.top_amount):
+            return "too_low", book.top_bidder, book.top_amount
+
+        fut = asyncio.get_running_loop().create_future()
+        book.pending.append((user_id, amount, fut))
+        if not book.lock.locked():
+            async with book.lock:
+                while book.pending:
+                    batch, book.pending = book.pending, []
+                    await self._write(book, batch)
+        return await fut
+
+    async def _write(self, book, batch):
+        now = datetime.now()
+        end_iso = (now + timedelta(seconds=Config.AUCTION_BID_SECONDS)).isoformat()
+        try:
+            results, top = await self.db.run(
+                apply_bids, book.auction_id, [(user_id, amount) for user_id, amount, _ in batch],
+                book.top_bidder, book.top_amount, book.min_price, now.isoformat(), end_iso
+            )
+        except Exception as e:
+            for *_, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        if top is None:
+            book.closed = True
+            results = [("closed", None, 0)] * len(batch)
+        elif top != (book.top_bidder, book.top_amount):
+            book.top_bidder, book.top_amount = top
+            book.end = deadline(end_iso)
+            self.scheduler.schedule(book.auction_id, end_iso)
+        for (*_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+
+# ---------------- Scheduler ----------------
+class AuctionScheduler:
+    def __init__(self, db=None, client=None):
+        self._db = db
+        self._client = client
+        self._heap = []        # (end time, auction id); may hold superseded deadlines
+        self._deadlines = {}   # auction id -> current end time
+        self._wake = asyncio.Event()
+        self._task = None
+        self._notifying = set()  # DM tasks still running (a strong ref keeps them alive)
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    @property
+    def client(self):
+        return self._client or app
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, auction_id, end_iso):
+        """Settle auction_id at end_iso (new auction, or a bid moved its deadline)"""
+        end = deadline(end_iso)
+        if self._deadlines.get(auction_id) == end:
+            return
+        self._deadlines[auction_id] = end
+        heapq.heappush(self._heap, (end, auction_id))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            # mostly superseded entries: drop them
+            self._heap = [(end, aid) for aid, end in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        if self._heap[0] == (end, auction_id):
+            self._wake.set()  # earlier than what the loop is sleeping towards
+
+    def _next(self):
+        """(end time, auction id) due first, skipping superseded entries; None if empty"""
+        heap = self._heap
+        while heap:
+            end, auction_id = heap[0]
+            if self._deadlines.get(auction_id) == end:
+                return end, auction_id
+            heapq.heappop(heap)
+        return None
+
+    async def restore(self):
+        """Rebuild the heap from every active auction"""
+        rows = await self.db.fetchall("SELECT id, end_iso FROM auctions WHERE status = 'active'")
+        self._deadlines = {auction_id: deadline(end_iso) for auction_id, end_iso in rows}
+        self._heap = [(end, auction_id) for auction_id, end in self._deadlines.items()]
+        heapq.heapify(self._heap)
+        self._wake.set()
+        return len(rows)
+
+    async def _settle(self, auction_id):
+        result, details = await self.db.run(settle_auction, auction_id, datetime.now().isoformat())
+        if result == "later":
+            self.schedule(auction_id, details)
+            return
+        get_bid_engine().discard(auction_id)
+        if result == "gone":
+            return
+
+        waifu_name, seller_id, winner_id, price = details
+        if result == "unsold":
+            self.db.log_event("auction_unsold", user_id=seller_id, details=f"auction_id={auction_id}")
+            messages = [(seller_id, f"📦 Your auction #{auction_id} for **{waifu_name}** ended with no bids. "
+                                    "The card has been returned to your inventory.")]
+        else:
+            self.db.log_event("auction_sold", user_id=seller_id,
+                              details=f"auction_id={auction_id} winner={winner_id} earned={price}")
+            messages = [
+                (winner_id, f"🏷️ You won auction #{auction_id} for **{waifu_name}** with {price:,} 💎! "
+                            "The card has been added to your inventory."),
+                (seller_id, f"💰 Your auction #{auction_id} for **{waifu_name}** sold for {price:,} 💎. "
+                            "Crystals have been added to your balance."),
+            ]
+        # off the timer loop: a FloodWait inside send_message would hold up every auction due after this one
+        task = asyncio.create_task(self._notify(messages))
+        self._notifying.add(task)
+        task.add_done_callback(self._notifying.discard)
+
+    async def _notify(self, messages):
+        for user_id, text in messages:
+            try:
+                await self.client.send_message(user_id, text)
+            except Exception:
+                pass  # user blocked the bot / never started it
+
+    async def _loop(self):
+        while True:
+            self._wake.clear()
+            head = self._next()
+            if head is None:
+                await self._wake.wait()
+                continue
+            end, auction_id = head
+            delay = end - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            del self._deadlines[auction_id]
+            try:
+                await self._settle(auction_id)
+            except Exception as e:
+                print(f"❌ Auction #{auction_id} settle failed: {e}")
+                retry = time.time() + Config.AUCTION_RETRY_SECONDS
+                self.schedule(auction_id, datetime.fromtimestamp(retry).isoformat())
+
+    async def start(self):
+        loaded = await self.restore()
+        print(f"🔨 Auction scheduler: {loaded} active auctions")
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# ---------------- Shared Instance ----------------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_auction_scheduler():
+    """Return the process-wide AuctionScheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = AuctionScheduler()
+        return _scheduler
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_bid_engine():
+    """Return the process-wide BidEngine"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = BidEngine()
+        return _engine
+
+
+if __name__ == "__main__":
+    # Load test: concurrent bidders on one auction, order book vs. the old
+    # one-writer-job-per-bid path. python auctions.py [bidders]
+    import os
+    import random
+    import sys
+    import tempfile
+    from database import Database
+    from ledger import balance
+
+    N = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    FUNDS = 10_000_000
+
+    def one_job_per_bid(conn, auction_id, user_id, amount, min_price, now_iso, end_iso):
+        """The old _place_bid: re-read the auction and the top bid for every bid"""
+        row = conn.execute("SELECT status FROM auctions WHERE id = ?", (auction_id,)).fetchone()
+        if not row or row[0] != "active":
+            return "closed", None, 0
+        top = conn.execute("SELECT bidder_id, amount FROM auction_bids WHERE auction_id = ? "
+                           "ORDER BY amount DESC, bid_iso ASC LIMIT 1", (auction_id,)).fetchone()
+        [(result, *previous)], _ = apply_bids(conn, auction_id, [(user_id, amount)], *(top or (None, 0)),
+                                              min_price, now_iso, end_iso)
+        return (result, *previous)
+
+    async def load_test(label, use_book):
+        path = os.path.join(tempfile.mkdtemp(), "auction.db")
+        db = Database(path)
+        users = list(range(1, N + 1))
+        funds = {u: 0 if u % 20 == 0 else FUNDS for u in users}  # every 20th bidder can't pay
+        with db.conn:
+            db.conn.executemany("INSERT INTO crystal_balances (user_id, balance) VALUES (?, ?)", funds.items())
+            auction_id = db.conn.execute(
+                "INSERT INTO auctions (waifu_id, seller_id, start_iso, end_iso, min_price, waifu_name) "
+                "VALUES (1, 0, ?, ?, 100, 'Bench')",
+                (datetime.now().isoformat(), (datetime.now() + timedelta(hours=1)).isoformat())).lastrowid
+        await db.start_writer()
+        commits = 0
+        commit_batch = db.writer._commit_batch
+
+        def counted(jobs):
+            nonlocal commits
+            commits += 1
+            return commit_batch(jobs)
+
+        db.writer._commit_batch = counted
+        engine = BidEngine(db=db, scheduler=AuctionScheduler(db=db))
+        book = await engine.book(auction_id)
+        rng = random.Random(5)
+        latencies, outcomes = [], {}
+
+        async def place(user_id, amount):
+            start = time.perf_counter()
+            if use_book:
+                result, *_ = await engine.bid(book, user_id, amount)
+            else:
+                now = datetime.now()
+                result, *_ = await db.run(one_job_per_bid, auction_id, user_id, amount, 100, now.isoformat(),
+                                          (now + timedelta(hours=1)).isoformat())
+            latencies.append(time.perf_counter() - start)
+            outcomes[result] = outcomes.get(result, 0) + 1
+
+        start = time.perf_counter()
+        # wave 1: everyone at once with random amounts (most lose to a higher bid)
+        await asyncio.gather(*(place(u, 100 + rng.randrange(10 * N)) for u in users))
+        # wave 2: N rising bids from random bidders; each one outbids the last
+        # (a repeated bidder raises their own bid)
+        base = 100 + 10 * N
+        await asyncio.gather(*(place(rng.choice(users), base + i) for i in range(N)))
+        elapsed = time.perf_counter() - start
+        await db.stop_writer()
+
+        # No double or missing refunds: everyone but the winner has exactly
+        # their starting funds back; the winner paid the top bid once.
+        conn = db.conn
+        winner, top = conn.execute("SELECT bidder_id, amount FROM auction_bids WHERE auction_id = ? "
+                                   "ORDER BY amount DESC, bid_iso ASC LIMIT 1", (auction_id,)).fetchone()
+        wrong = [u for u in users if balance(conn, u) != funds[u] - (top if u == winner else 0)]
+        accepted = conn.execute("SELECT COUNT(*) FROM auction_bids").fetchone()[0]
+        refunds = conn.execute("SELECT COUNT(*) FROM crystal_ledger WHERE reason = 'auction_refund'").fetchone()[0]
+        assert not wrong, f"{len(wrong)} bidders with a wrong balance"
+        assert outcomes.get("ok", 0) == accepted
+
+        latencies.sort()
+        p50, p99 = (latencies[int(q * len(latencies))] * 1000 for q in (0.5, 0.99))
+        print(f"{label:18} {2 * N / elapsed:8.0f} bids/s  p50 {p50:6.1f} ms  p99 {p99:6.1f} ms  "
+              f"{commits:4} commits  {accepted} accepted / {refunds} refunds  {outcomes}")
+        db.close()
+        os.remove(path)
+
+    async def main():
+        await load_test("one job per bid", use_book=False)
+        await load_test("order book", use_book=True)
+
+    asyncio.run(main())
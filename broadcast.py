@@ -0,0 +1,395 @@
+# broadcast.py
+"""
+Rate-limited, resumable broadcasts for /announce.
+
+A broadcast is a row in `broadcasts` plus one row per recipient in
+`broadcast_recipients` (snapshotted when it starts). A few worker tasks
+send concurrently behind a global token bucket (BROADCAST_RATE msg/s)
+and a per-chat spacing (1s for users, 3s for groups). A FloodWait pauses
+every worker for the requested time and halves the rate, which then
+creeps back up one msg/s per second of clean sends.
+
+Delivery results are saved every BROADCAST_FLUSH_SECONDS together with a
+cursor (every seq <= cursor is finished), so after a crash run() resumes
+with the recipients that were still pending; at most one flush window
+can be re-sent. Chats that blocked the bot or no longer exist go to
+dead_chats and are skipped from then on; /start or re-adding the bot
+revives them. A group keeps its `groups` row meanwhile: a muted bot or
+an uncached peer fails the same way and may well come back.
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+from pyrogram.errors import (
+    FloodWait, UserIsBlocked, InputUserDeactivated, UserDeactivated,
+    PeerIdInvalid, ChatWriteForbidden, ChannelPrivate, ChatIdInvalid,
+)
+from config import Config, app
+from database import get_db
+
+# broadcast_recipients.status
+PENDING, SENT, FAILED, DEAD = 0, 1, 2, 3
+
+DEAD_ERRORS = (
+    UserIsBlocked, InputUserDeactivated, UserDeactivated,
+    PeerIdInvalid, ChatWriteForbidden, ChannelPrivate, ChatIdInvalid,
+)
+MAX_ATTEMPTS = 3
+USER_SPACING = 1.0   # Telegram: ~1 msg/s per private chat
+GROUP_SPACING = 3.0  # Telegram: ~20 msg/min per group
+
+
+# ---------------- Rate Limiting ----------------
+class TokenBucket:
+    """Global send rate with FloodWait pauses and AIMD rate control"""
+
+    def __init__(self, rate, burst=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._clean = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def flood(self, seconds):
+        """Telegram said wait: everyone pauses, rate halves"""
+        now = time.monotonic()
+        if now >= self._paused_until:
+            # in-flight sends of the same burst report the same flood: halve once
+            self.rate = max(1.0, self.rate / 2)
+            self._clean = 0
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+
+    def success(self):
+        """+1 msg/s after roughly a second's worth of clean sends"""
+        if self.rate >= self.max_rate:
+            return
+        self._clean += 1
+        if self._clean >= self.rate:
+            self._clean = 0
+            self.rate = min(self.max_rate, self.rate + 1)
+
+
+# ---------------- Storage ----------------
+def _create(conn, kind, text, file_id, created_by):
+    cur = conn.execute(
+        "INSERT INTO broadcasts (kind, text, file_id, created_by, created_at) VALUES (?, ?, ?, ?, ?)",
+        (kind, text, file_id, created_by, datetime.now().isoformat())
+    )
+    broadcast_id = cur.lastrowid
+    chats = conn.execute("""
+        SELECT user_id FROM users WHERE user_id NOT IN (SELECT chat_id FROM dead_chats)
+        UNION ALL
+        SELECT chat_id FROM groups WHERE chat_id NOT IN (SELECT chat_id FROM dead_chats)
+    """).fetchall()
+    conn.executemany(
+        "INSERT INTO broadcast_recipients (broadcast_id, seq, chat_id) VALUES (?, ?, ?)",
+        ((broadcast_id, seq, chat_id) for seq, (chat_id,) in enumerate(chats, start=1))
+    )
+    conn.execute("UPDATE broadcasts SET total=? WHERE id=?", (len(chats), broadcast_id))
+    return broadcast_id
+
+
+def _save_results(conn, broadcast_id, results, cursor):
+    conn.executemany(
+        "UPDATE broadcast_recipients SET status=?, attempts=? WHERE broadcast_id=? AND seq=?",
+        ((status, attempts, broadcast_id, seq) for seq, _, status, attempts, _ in results)
+    )
+    now = datetime.now().isoformat()
+    dead = [(chat_id, reason, now) for _, chat_id, status, _, reason in results if status == DEAD]
+    if dead:
+        conn.executemany("INSERT OR REPLACE INTO dead_chats (chat_id, reason, marked_at) VALUES (?, ?, ?)", dead)
+    counts = {SENT: 0, FAILED: 0, DEAD: 0}
+    for _, _, status, _, _ in results:
+        counts[status] += 1
+    conn.execute(
+        "UPDATE broadcasts SET cursor=?, sent=sent+?, failed=failed+?, dead=dead+? WHERE id=?",
+        (cursor, counts[SENT], counts[FAILED], counts[DEAD], broadcast_id)
+    )
+
+
+def _revive(conn, chat_id):
+    conn.execute("DELETE FROM dead_chats WHERE chat_id=?", (chat_id,))
+
+
+async def revive_chat(chat_id):
+    """The chat reached us again (/start, bot re-added): broadcast to it again"""
+    await get_db().run(_revive, chat_id)
+
+
+# ---------------- Broadcaster ----------------
+class Broadcaster:
+    def __init__(self, client=None, db=None, rate=None, concurrency=None, flush_seconds=None):
+        self._client = client
+        self._db = db
+        self.rate = Config.BROADCAST_RATE if rate is None else rate
+        self.concurrency = Config.BROADCAST_CONCURRENCY if concurrency is None else concurrency
+        self.flush_seconds = Config.BROADCAST_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self._running = {}  # broadcast_id -> asyncio.Task
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    @property
+    def client(self):
+        return self._client or app
+
+    async def create(self, kind, text, file_id=None, created_by=None):
+        """Snapshot the audience; returns the broadcast id"""
+        return await self.db.run(_create, kind, text, file_id, created_by)
+
+    def is_running(self, broadcast_id):
+        return broadcast_id in self._running
+
+    def cancel(self, broadcast_id):
+        task = self._running.get(broadcast_id)
+        if task:
+            task.cancel()
+        return task is not None
+
+    async def stats(self, broadcast_id):
+        row = await self.db.fetchone(
+            "SELECT status, total, sent, failed, dead FROM broadcasts WHERE id=?", (broadcast_id,)
+        )
+        if not row:
+            return None
+        return dict(zip(("status", "total", "sent", "failed", "dead"), row))
+
+    # ---------------- Sending ----------------
+    async def _send(self, chat_id, kind, text, file_id):
+        if kind == "photo":
+            await self.client.send_photo(chat_id, file_id, caption=text)
+        elif kind == "video":
+            await self.client.send_video(chat_id, file_id, caption=text)
+        else:
+            await self.client.send_message(chat_id, text)
+
+    async def _deliver(self, bucket, next_ok, chat_id, payload):
+        """-> (status, attempts, reason)"""
+        reason = None
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            wait = next_ok.get(chat_id, 0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await bucket.acquire()
+            next_ok[chat_id] = time.monotonic() + (GROUP_SPACING if chat_id < 0 else USER_SPACING)
+            try:
+                await self._send(chat_id, *payload)
+                bucket.success()
+                return SENT, attempt, None
+            except FloodWait as e:
+                bucket.flood(e.value)
+                reason = "FloodWait"
+            except DEAD_ERRORS as e:
+                return DEAD, attempt, type(e).__name__
+            except Exception as e:
+                reason = type(e).__name__
+        return FAILED, MAX_ATTEMPTS, reason
+
+    async def run(self, broadcast_id, progress=None):
+        """Send (or resume) a broadcast; returns its final stats"""
+        task = asyncio.current_task()
+        self._running[broadcast_id] = task
+        try:
+            await self._run(broadcast_id, progress)
+        except asyncio.CancelledError:
+            await self.db.execute("UPDATE broadcasts SET status='cancelled' WHERE id=?", (broadcast_id,))
+        finally:
+            self._running.pop(broadcast_id, None)
+        return await self.stats(broadcast_id)
+
+    async def _run(self, broadcast_id, progress):
+        row = await self.db.fetchone("SELECT kind, text, file_id, cursor FROM broadcasts WHERE id=?", (broadcast_id,))
+        if not row:
+            return
+        kind, text, file_id, cursor = row
+        payload = (kind, text, file_id)
+        pending = await self.db.fetchall(
+            "SELECT seq, chat_id FROM broadcast_recipients WHERE broadcast_id=? AND seq > ? AND status=0 ORDER BY seq",
+            (broadcast_id, cursor)
+        )
+
+        queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+        bucket = TokenBucket(self.rate)
+        next_ok = {}
+        results = []   # (seq, chat_id, status, attempts, reason) not yet saved
+        done = set()   # finished seqs above the cursor
+        state = {"cursor": cursor}
+
+        async def worker():
+            while True:
+                seq, chat_id = await queue.get()
+                try:
+                    status, attempts, reason = await self._deliver(bucket, next_ok, chat_id, payload)
+                    results.append((seq, chat_id, status, attempts, reason))
+                finally:
+                    queue.task_done()
+
+        async def flush():
+            batch = results[:]
+            del results[:]
+            if not batch:
+                return
+            done.update(r[0] for r in batch)
+            c = state["cursor"]
+            while c + 1 in done:
+                c += 1
+                done.discard(c)
+            state["cursor"] = c
+            await self.db.run(_save_results, broadcast_id, batch, c)
+
+        async def flusher():
+            last_progress = time.monotonic()
+            while True:
+                await asyncio.sleep(self.flush_seconds)
+                await flush()
+                if progress and time.monotonic() - last_progress >= Config.BROADCAST_PROGRESS_SECONDS:
+                    last_progress = time.monotonic()
+                    try:
+                        await progress(await self.stats(broadcast_id))
+                    except Exception as e:
+                        print(f"⚠️ Broadcast progress update failed: {e}")
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        saver = asyncio.create_task(flusher())
+        try:
+            await queue.join()
+        finally:
+            for t in workers + [saver]:
+                t.cancel()
+            await asyncio.gather(*workers, saver, return_exceptions=True)
+            await flush()
+
+        await self.db.execute(
+            "UPDATE broadcasts SET status='done', finished_at=? WHERE id=?",
+            (datetime.now().isoformat(), broadcast_id)
+        )
+
+    async def resume_all(self, on_done=None):
+        """Restart broadcasts a crash / restart left running (as background tasks)"""
+        rows = await self.db.fetchall("SELECT id FROM broadcasts WHERE status='running'")
+        for (broadcast_id,) in rows:
+            if broadcast_id in self._running:
+                continue
+            print(f"📢 Resuming broadcast #{broadcast_id}")
+
+            async def resume(bid=broadcast_id):
+                stats = await self.run(bid)
+                if on_done:
+                    await on_done(bid, stats)
+
+            asyncio.create_task(resume())
+        return len(rows)
+
+
+# ---------------- Shared Instance ----------------
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """Return the process-wide Broadcaster"""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            _broadcaster = Broadcaster()
+        return _broadcaster
+
+
+# ---------------- Benchmark ----------------
+if __name__ == "__main__":
+    # python broadcast.py [recipients]  -> fake-client throughput + resume check
+    import os
+    import random
+    import sys
+    import tempfile
+    from database import Database
+
+    class FakeClient:
+        """Pretends to be Telegram: small latency, rare FloodWait / blocked users"""
+
+        def __init__(self, latency=0.005, flood_every=20000, blocked_every=500):
+            self.latency = latency
+            self.flood_every = flood_every
+            self.blocked_every = blocked_every
+            self.delivered = {}
+            self.calls = 0
+
+        async def send_message(self, chat_id, text):
+            self.calls += 1
+            call = self.calls
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+            if self.flood_every and call % self.flood_every == 0:
+                raise FloodWait(value=1)
+            if chat_id % self.blocked_every == 0:
+                raise UserIsBlocked()
+            self.delivered[chat_id] = self.delivered.get(chat_id, 0) + 1
+
+    async def bench(n):
+        path = os.path.join(tempfile.mkdtemp(), "broadcast_bench.db")
+        db = Database(path)
+        await db.start_writer()
+        db.conn.executemany("INSERT INTO users (user_id) VALUES (?)", ((i,) for i in range(1, n + 1)))
+        db.conn.commit()
+
+        # 1) Throughput: engine + SQLite bookkeeping (limiter set far above Telegram's)
+        for concurrency in (8, 64):
+            client = FakeClient()
+            b = Broadcaster(client=client, db=db, rate=1_000_000, concurrency=concurrency)
+            bid = await b.create("text", "hello")
+            start = time.perf_counter()
+            stats = await b.run(bid)
+            took = time.perf_counter() - start
+            print(f"concurrency {concurrency:>3}: {n / took:8.0f} msg/s  {stats}")
+            db.conn.execute("DELETE FROM dead_chats")
+            db.conn.commit()
+
+        # 2) Limiter: configured rate is respected
+        client = FakeClient(latency=0, flood_every=0)
+        b = Broadcaster(client=client, db=db, rate=Config.BROADCAST_RATE, concurrency=8)
+        bid = await b.create("text", "hello")
+        task = asyncio.create_task(b.run(bid))
+        await asyncio.sleep(4)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        print(f"rate limit {Config.BROADCAST_RATE}/s: {len(client.delivered) / 4:.1f} msg/s observed (bucket starts full)")
+
+        # 3) Resume: crash mid-way, run again, nobody gets it twice
+        client = FakeClient(flood_every=0, blocked_every=10 ** 12)
+        b = Broadcaster(client=client, db=db, rate=1_000_000, concurrency=16, flush_seconds=0.05)
+        bid = await b.create("text", "hello")
+        task = asyncio.create_task(b.run(bid))
+        await asyncio.sleep(2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        first = len(client.delivered)
+        await db.execute("UPDATE broadcasts SET status='running' WHERE id=?", (bid,))
+        stats = await b.run(bid)
+        dupes = sum(1 for c in client.delivered.values() if c > 1)
+        print(f"resume: {first} sent before the crash, {len(client.delivered)} total, "
+              f"{dupes} duplicates, {n - len(client.delivered)} missed  {stats}")
+
+        await db.stop_writer()
+        db.close()
+
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
@@ -0,0 +1,269 @@
+# card_search.py
+"""
+Full-text card search on SQLite FTS5.
+
+Migration 9 adds waifu_cards_fts, an external-content FTS5 table over
+waifu_cards (name, anime, rarity, event) that triggers keep in sync, so
+/addwaifu, /edit and /delcard need nothing extra. Text is case-folded
+with accents removed, every query word is matched as a prefix ("vir"
+finds "Virat"), and hits are ranked by BM25 with the name weighted over
+the anime over rarity / event.
+
+ - search(query, limit, cursor): /search and inline. Pages continue from
+   a (score, id) cursor instead of an OFFSET, so a later page doesn't
+   re-rank the hits it skips and a card added in between can't shift
+   it. With no full-text hit, name_index's typo-tolerant ranking is
+   used instead ("kohly" -> Kohli)
+ - anime_counts(query): /sanime, cards per anime title
+ - anime_titles(letter): /animesearch, titles whose first word starts
+   with the letter
+"""
+
+import threading
+from catalog import get_catalog
+from database import get_db
+from name_index import get_name_index, normalize
+
+WEIGHTS = (10.0, 4.0, 1.0, 1.0)  # BM25 weight of name, anime, rarity, event
+MAX_TERMS = 8                     # query words beyond this are ignored
+
+_SCORE = f"bm25(waifu_cards_fts, {', '.join(map(str, WEIGHTS))})"
+_RANKED = f"""
+    SELECT rowid, {_SCORE} AS score FROM waifu_cards_fts
+     WHERE waifu_cards_fts MATCH ? {{after}}
+     ORDER BY score, rowid LIMIT ?
+"""
+_FIRST_PAGE = _RANKED.format(after="")
+_NEXT_PAGE = _RANKED.format(after="AND (score, rowid) > (?, ?)")
+
+
+def match_query(text, columns=None, first=False):
+    """FTS5 MATCH expression: every word quoted and prefix-matched, all required
+
+    columns limits it to those columns; first=True only matches a column
+    that starts with the (single) word. None if text has no words.
+    """
+    words = normalize(text).split()[:MAX_TERMS]
+    if not words:
+        return None
+    expr = " ".join(f'"{word}"*' for word in words)  # adjacent phrases = AND
+    if first:
+        expr = f"^{expr}"
+    if columns:
+        expr = f"{{{' '.join(columns)}}} : ({expr})"
+    return expr
+
+
+# ---------------- Cursors ----------------
+# "" first page; "r<score>:<id>" full-text keyset; "m<offset>" a page of an
+# in-memory listing (fuzzy fallback or browsing every card).
+def _encode(score, card_id):
+    return f"r{score!r}:{card_id}"
+
+
+def _decode(cursor):
+    """(kind, value) of a cursor; ValueError for anything we didn't hand out"""
+    kind, rest = cursor[:1], cursor[1:]
+    if kind == "r":
+        score, card_id = rest.split(":")
+        return kind, (float(score), int(card_id))
+    if kind == "m":
+        return kind, int(rest)
+    raise ValueError(cursor)
+
+
+# ---------------- Queries ----------------
+def ranked_ids(conn, match, limit, after=None):
+    """[(card id, score)] best first, continuing after a (score, id) pair"""
+    if after is None:
+        return conn.execute(_FIRST_PAGE, (match, limit)).fetchall()
+    return conn.execute(_NEXT_PAGE, (match, *after, limit)).fetchall()
+
+
+def anime_counts(conn, match=None):
+    """[(anime, cards)] most cards first; every title when match is None"""
+    if match is None:
+        return conn.execute(
+            "SELECT anime, COUNT(*) FROM waifu_cards GROUP BY anime ORDER BY COUNT(*) DESC"
+        ).fetchall()
+    return conn.execute(
+        "SELECT anime, COUNT(*) FROM waifu_cards_fts WHERE waifu_cards_fts MATCH ? "
+        "GROUP BY anime ORDER BY COUNT(*) DESC", (match,)
+    ).fetchall()
+
+
+def anime_titles(conn, match, limit=100):
+    """Distinct anime titles of the matching cards, alphabetical"""
+    rows = conn.execute(
+        "SELECT DISTINCT anime FROM waifu_cards_fts WHERE waifu_cards_fts MATCH ? "
+        "ORDER BY anime COLLATE NOCASE LIMIT ?", (match, limit)
+    ).fetchall()
+    return [anime for anime, in rows if anime]
+
+
+# ---------------- CardSearch ----------------
+class CardSearch:
+    def __init__(self, db=None, catalog=None, names=None):
+        self._db = db
+        self._catalog = catalog
+        self._names = names
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    @property
+    def catalog(self):
+        return self._catalog or get_catalog()
+
+    @property
+    def names(self):
+        return self._names or get_name_index()
+
+    async def search(self, query, limit=10, cursor=""):
+        """(cards, next cursor) for one page; the cursor is "" after the last page"""
+        try:
+            kind, value = _decode(cursor) if cursor else ("", None)
+        except ValueError:
+            return [], ""  # stale / foreign cursor: nothing more to show
+
+        match = match_query(query)
+        if kind == "m" or (match is None and kind == ""):
+            return self._memory_page(query if match else None, limit, value or 0)
+        if match is None:
+            return [], ""
+
+        rows = await self.db.read(ranked_ids, match, limit, value)
+        if not rows and kind == "":
+            return self._memory_page(query, limit, 0)
+
+        get = self.catalog.get
+        cards = [card for card in (get(card_id) for card_id, _ in rows) if card]
+        next_cursor = _encode(rows[-1][1], rows[-1][0]) if len(rows) == limit else ""
+        return cards, next_cursor
+
+    def _memory_page(self, query, limit, offset):
+        """Typo-tolerant matches for query, or every card by id when None"""
+        if query is None:
+            cards = self.catalog.page(offset, limit)
+        else:
+            cards = [card for _, card in self.names.search(query, limit=limit, offset=offset)]
+        return cards, (f"m{offset + limit}" if len(cards) == limit else "")
+
+    async def anime_counts(self, query=None):
+        """[(anime, cards)] for titles matching query (every title without one)"""
+        match = match_query(query, columns=["anime"]) if query else None
+        if query and match is None:
+            return []
+        return await self.db.read(anime_counts, match)
+
+    async def anime_titles(self, letter, limit=100):
+        """Anime titles whose first word starts with letter"""
+        match = match_query(letter, columns=["anime"], first=True)
+        if match is None:
+            return []
+        return await self.db.read(anime_titles, match, limit)
+
+
+# ---------------- Shared Instance ----------------
+_search = None
+_search_lock = threading.Lock()
+
+
+def get_card_search():
+    """Return the process-wide CardSearch"""
+    global _search
+    with _search_lock:
+        if _search is None:
+            _search = CardSearch()
+        return _search
+
+
+if __name__ == "__main__":
+    # Full-text vs. the LIKE scans it replaces, on a synthetic waifu_cards.
+    # python card_search.py [cards]
+    import os
+    import random
+    import sqlite3
+    import sys
+    import tempfile
+    import time
+    from migrations import migrate
+
+    N = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(7)
+    consonants, vowels = "bcdfghjklmnprstvwyz", "aeiou"
+    syllables = [c + v + e for c in consonants for v in vowels for e in ["", "", "", *consonants]]
+
+    def word(lo=2, hi=4):
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(lo, hi))).title()
+
+    first_names = [word(2, 3) for _ in range(3000)]
+    teams = [f"{word()} {rng.choice(['XI', 'Kings', 'Riders'])}" for _ in range(2000)]
+    rows = [(f"{rng.choice(first_names)} {word()}", rng.choice(teams),
+             rng.choice(["Common", "Rare", "Legendary"]), rng.choice([None, None, "Summer"]))
+            for _ in range(N)]
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    start = time.perf_counter()
+    with conn:
+        conn.executemany("INSERT INTO waifu_cards (name, anime, rarity, event) VALUES (?, ?, ?, ?)", rows)
+    print(f"insert: {N} cards through the FTS triggers in {time.perf_counter() - start:.2f} s, "
+          f"db {os.path.getsize(path) / 2**20:.1f} MB")
+
+    sample = rng.sample(rows, 100)
+    surnames = [name.split()[-1].lower() for name, *_ in sample]
+    prefixes = [name[:3].lower() for name, *_ in sample]  # typed so far, many hits
+    anime_words = [anime.split()[0].lower()[:4] for _, anime, *_ in sample]
+    letters = [rng.choice("ABCDFGHJKLMNPRSTVWYZ") for _ in range(20)]
+
+    def timed(label, fn, items):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        print(f"{label:44} {(time.perf_counter() - start) / len(items) * 1000:8.2f} ms")
+
+    def page(match, pages, limit=50):
+        after = None
+        for _ in range(pages):
+            found = ranked_ids(conn, match, limit, after)
+            if len(found) < limit:
+                return
+            after = (found[-1][1], found[-1][0])
+
+    q = conn.execute
+    timed("/search  LIKE '%q%' LIMIT 10",
+          lambda s: q("SELECT id FROM waifu_cards WHERE name LIKE ? LIMIT 10", (f"%{s}%",)).fetchall(), surnames)
+    timed("/search  fts, bm25 top 10", lambda s: ranked_ids(conn, match_query(s), 10), surnames)
+    timed("inline   LOWER() LIKE, page 1",
+          lambda s: q("SELECT id FROM waifu_cards WHERE LOWER(name) LIKE ? OR LOWER(anime) LIKE ? "
+                      "ORDER BY id LIMIT 50", (f"%{s}%", f"%{s}%")).fetchall(), prefixes)
+    timed("inline   fts, page 1", lambda s: page(match_query(s), 1), prefixes)
+    timed("inline   LOWER() LIKE, pages 1-5 (OFFSET)",
+          lambda s: [q("SELECT id FROM waifu_cards WHERE LOWER(name) LIKE ? OR LOWER(anime) LIKE ? "
+                       "ORDER BY id LIMIT 50 OFFSET ?", (f"%{s}%", f"%{s}%", p * 50)).fetchall()
+                     for p in range(5)], prefixes)
+    timed("inline   fts, pages 1-5 (cursor)", lambda s: page(match_query(s), 5), prefixes)
+    timed("/sanime  anime LIKE GROUP BY",
+          lambda s: q("SELECT anime, COUNT(*) FROM waifu_cards WHERE anime LIKE ? GROUP BY anime "
+                      "ORDER BY COUNT(*) DESC", (f"%{s}%",)).fetchall(), anime_words)
+    timed("/sanime  fts", lambda s: anime_counts(conn, match_query(s, columns=["anime"])), anime_words)
+    timed("/animesearch  UPPER(anime) LIKE 'X%'",
+          lambda s: q("SELECT DISTINCT anime FROM waifu_cards WHERE anime IS NOT NULL AND anime <> '' "
+                      "AND UPPER(anime) LIKE ? ORDER BY anime COLLATE NOCASE LIMIT 100", (f"{s}%",)).fetchall(),
+          letters)
+    timed("/animesearch  fts ^x*",
+          lambda s: anime_titles(conn, match_query(s, columns=["anime"], first=True)), letters)
+
+    # Same answers as the scans for the anime listings
+    for s in anime_words[:10]:
+        like = q("SELECT anime, COUNT(*) FROM waifu_cards WHERE anime LIKE ? GROUP BY anime", (f"{s}%",)).fetchall()
+        assert sorted(like) == sorted(anime_counts(conn, match_query(s, columns=["anime"])))
+    for s in letters[:5]:
+        like = [a for a, in q("SELECT DISTINCT anime FROM waifu_cards WHERE UPPER(anime) LIKE ? "
+                              "ORDER BY anime COLLATE NOCASE LIMIT 100", (f"{s}%",))]
+        assert like == anime_titles(conn, match_query(s, columns=["anime"], first=True))
+    conn.close()
+    os.remove(path)
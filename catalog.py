@@ -0,0 +1,157 @@
+# catalog.py
+"""
+Process-wide in-memory copy of waifu_cards.
+
+Cards are effectively read-only at runtime, so they are loaded once and
+served from memory: lookups by id and rarity / anime listings never
+touch the disk, and sampler.py draws random cards on top of it.
+addwaifu / delcard patch the catalog in place with add() / remove();
+edit awaits load() again. load() reads and indexes the table on a pooled
+read connection and swaps the result in, so the loop keeps serving the
+old cards meanwhile. Listeners registered with subscribe() (the sampler)
+are told about every change.
+"""
+
+import threading
+from array import array
+from collections import namedtuple
+from database import get_db
+
+Card = namedtuple("Card", "id name anime rarity event media_type media_file media_file_id")
+
+
+def _read_cards(conn):
+    """Every card plus the id / rarity / anime indexes, built off the loop"""
+    rows = conn.execute("""
+        SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id
+          FROM waifu_cards ORDER BY id
+    """).fetchall()
+
+    cards, ids, by_rarity, by_anime = {}, array("q"), {}, {}
+    for row in rows:
+        card = Card(*row)
+        cards[card.id] = card
+        ids.append(card.id)
+        by_rarity.setdefault(card.rarity, array("q")).append(card.id)
+        by_anime.setdefault((card.anime or "").lower(), array("q")).append(card.id)
+    return cards, ids, by_rarity, by_anime
+
+
+class CardCatalog:
+    def __init__(self, db=None):
+        self._db = db
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._cards = {}          # id -> Card
+        self._ids = array("q")    # every id, ascending
+        self._by_rarity = {}      # rarity -> array of ids
+        self._by_anime = {}       # anime.lower() -> array of ids
+        self._listeners = []      # fn(event, card) with event in add/remove/reload
+
+    # ---------------- Loading ----------------
+    async def load(self):
+        """(Re)load every card from the DB in one pass; call again after writing waifu_cards"""
+        db = self._db or get_db()
+        self._swap(*await db.read(_read_cards))
+
+    def ensure_loaded(self):
+        # only scripts / benchmarks get here: the bot awaits load() at startup
+        if not self._loaded:
+            self._swap(*_read_cards((self._db or get_db()).conn))
+
+    def _swap(self, cards, ids, by_rarity, by_anime):
+        with self._lock:
+            self._cards, self._ids = cards, ids
+            self._by_rarity, self._by_anime = by_rarity, by_anime
+            self._loaded = True
+        print(f"🃏 Card catalog loaded: {len(ids)} cards")
+        self._notify("reload", None)
+
+    # ---------------- Incremental Updates ----------------
+    def add(self, card):
+        """Add one freshly inserted card without reloading everything"""
+        if not self._loaded:
+            return  # next load() picks it up
+        with self._lock:
+            if card.id in self._cards:
+                return
+            self._cards[card.id] = card
+            self._ids.append(card.id)
+            self._by_rarity.setdefault(card.rarity, array("q")).append(card.id)
+            self._by_anime.setdefault((card.anime or "").lower(), array("q")).append(card.id)
+        self._notify("add", card)
+
+    def remove(self, card_id):
+        """Drop one deleted card without reloading everything"""
+        if not self._loaded:
+            return
+        with self._lock:
+            card = self._cards.pop(int(card_id), None)
+            if card is None:
+                return
+            self._ids.remove(card.id)
+            self._by_rarity[card.rarity].remove(card.id)
+            self._by_anime[(card.anime or "").lower()].remove(card.id)
+        self._notify("remove", card)
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, event, card):
+        for listener in self._listeners:
+            try:
+                listener(event, card)
+            except Exception as e:
+                print(f"❌ Catalog listener failed on {event}: {e}")
+
+    # ---------------- Lookups ----------------
+    def get(self, card_id):
+        self.ensure_loaded()
+        try:
+            return self._cards.get(int(card_id))
+        except (TypeError, ValueError):
+            return None
+
+    def __len__(self):
+        self.ensure_loaded()
+        return len(self._ids)
+
+    def ids_by_rarity(self, rarity):
+        self.ensure_loaded()
+        return self._by_rarity.get(rarity, array("q"))
+
+    def ids_by_anime(self, anime):
+        self.ensure_loaded()
+        return self._by_anime.get((anime or "").lower(), array("q"))
+
+    def cards_by_rarity(self, rarity):
+        cards = self._cards
+        return [cards[i] for i in self.ids_by_rarity(rarity)]
+
+    def all_cards(self):
+        self.ensure_loaded()
+        return list(self._cards.values())
+
+    def page(self, offset, limit):
+        """Cards in id order, like ORDER BY id LIMIT ? OFFSET ?"""
+        self.ensure_loaded()
+        cards = self._cards
+        return [cards[i] for i in self._ids[offset:offset + limit]]
+
+    def rarity_counts(self):
+        self.ensure_loaded()
+        return {r: len(ids) for r, ids in self._by_rarity.items()}
+
+
+# ---------------- Shared Instance ----------------
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Return the process-wide CardCatalog"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = CardCatalog()
+        return _catalog
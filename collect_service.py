@@ -0,0 +1,110 @@
+# collect_service.py
+"""
+/collect fast path.
+
+The active drop of each chat (its card id) is kept in memory when setdrop
+opens it, and guesses are checked against the in-memory name index, so a
+wrong guess is answered without touching the DB. A right guess is one write job: a conditional UPDATE that only
+succeeds while collected_by IS NULL, plus the inventory upsert in the
+same transaction. Two users racing on the same drop can't both win.
+"""
+
+import threading
+from catalog import get_catalog
+from name_index import get_name_index
+from database import get_db, give_card
+
+# collect() results
+NO_DROP = "no_drop"
+TAKEN = "taken"
+WRONG = "wrong"
+COLLECTED = "collected"
+
+
+def _claim_drop(conn, chat_id, waifu_id, user_id):
+    cur = conn.execute(
+        "UPDATE current_drops SET collected_by=? WHERE chat_id=? AND waifu_id=? AND collected_by IS NULL",
+        (user_id, chat_id, waifu_id)
+    )
+    if cur.rowcount != 1:
+        return False
+    give_card(conn, user_id, waifu_id)
+    return True
+
+
+class CollectService:
+    def __init__(self, db=None, catalog=None, names=None):
+        self._db = db
+        self._catalog = catalog
+        self._names = names
+        self._active = {}  # chat_id -> waifu_id, None once collected
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    @property
+    def catalog(self):
+        return self._catalog or get_catalog()
+
+    @property
+    def names(self):
+        return self._names or get_name_index()
+
+    async def open_drop(self, chat_id, card):
+        """Store a new drop for the chat (replaces any previous one)"""
+        await self.db.execute(
+            "INSERT OR REPLACE INTO current_drops (chat_id, waifu_id, collected_by) VALUES (?, ?, NULL)",
+            (chat_id, card.id)
+        )
+        self._active[chat_id] = card.id
+
+    async def _active_drop(self, chat_id):
+        if chat_id in self._active:
+            return self._active[chat_id]
+        # Not seen since startup: read it once and cache
+        row = await self.db.fetchone(
+            "SELECT waifu_id, collected_by FROM current_drops WHERE chat_id=?", (chat_id,)
+        )
+        if not row:
+            return False
+        waifu_id, collected_by = row
+        card = self.catalog.get(waifu_id)
+        drop = None if collected_by is not None or not card else card.id
+        self._active[chat_id] = drop
+        return drop
+
+    async def collect(self, chat_id, user_id, guess):
+        """(status, card) for a /collect guess; card is set only on COLLECTED"""
+        drop = await self._active_drop(chat_id)
+        if drop is False:
+            return NO_DROP, None
+        if drop is None:
+            return TAKEN, None
+
+        waifu_id = drop
+        if not self.names.matches(waifu_id, guess):
+            return WRONG, None
+
+        if not await self.db.run(_claim_drop, chat_id, waifu_id, user_id):
+            # Someone else's claim committed first (or the drop was replaced)
+            self._active.pop(chat_id, None)
+            return TAKEN, None
+
+        if self._active.get(chat_id) == drop:
+            self._active[chat_id] = None
+        return COLLECTED, self.catalog.get(waifu_id)
+
+
+# ---------------- Shared Instance ----------------
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_collect_service():
+    """Return the process-wide CollectService"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = CollectService()
+        return _service
@@ -10,6 +10,86 @@ class Config:
 
     # Database
     DB_PATH = "waifu_bot.db"
+    DB_POOL_SIZE = 4  # worker threads / pooled connections for async queries
+    DB_SYNCHRONOUS = "NORMAL"  # WAL + NORMAL: no fsync per commit, only at checkpoints
+    DB_CACHE_SIZE_KB = 16000  # page cache per connection
+    DB_MMAP_SIZE = 256 * 1024 * 1024  # bytes of the db file mapped into memory
+    DB_BUSY_TIMEOUT_MS = 30000
+    DB_FLUSH_INTERVAL_MS = 5  # how long the writer waits to group queued writes
+    DB_WRITE_BATCH_MAX = 256  # max queued writes committed in one transaction
+
+    # Drop rates (sampler.py)
+    # Relative chance of each rarity tier; cards inside a tier are equally likely
+    RARITY_WEIGHTS = {
+        "Common": 40, "Medium": 25, "Rare": 15, "Legendary": 8, "Limited edition": 5,
+        "Prime": 3, "Cosmic": 2, "Ultimate": 1.5, "God": 0.5,
+    }
+    RARITY_DEFAULT_WEIGHT = 1  # tiers missing from RARITY_WEIGHTS
+    EVENT_BOOSTS = {}  # e.g. {"Christmas": 3}: event cards 3x as likely within their tier
+
+    # Drop counters (drops.py)
+    DROP_FLUSH_SECONDS = 30  # how often changed counters are written to drop_state
+    DROP_SHARD_COUNT = 1  # bot processes splitting the groups
+    DROP_SHARD_INDEX = 0  # this process handles chats where chat_id % DROP_SHARD_COUNT == index
+
+    # Leaderboards (leaderboard.py)
+    LEADERBOARD_REBUILD_SECONDS = 900  # full recount from SQL; fixes drift from untracked writers
+
+    # Broadcasts (broadcast.py)
+    BROADCAST_RATE = 25  # messages/sec overall (Telegram allows ~30 for bots)
+    BROADCAST_CONCURRENCY = 8  # sends in flight at once
+    BROADCAST_FLUSH_SECONDS = 1  # how often delivery status is saved (resume point)
+    BROADCAST_PROGRESS_SECONDS = 10  # how often the status message is edited
+
+    # Profile photos (photo_cache.py)
+    PROFILE_PHOTO_CACHE_DIR = "cache/profile_photos"
+    PROFILE_PHOTO_CACHE_FILES = 256  # LRU size; oldest photo is deleted beyond this
+
+    # Inventory browser (inventory_view.py)
+    INVENTORY_VIEW_ENTRIES = 512  # cached per-user card lists / filter prefs (LRU)
+
+    # Startup (startup.py)
+    LAZY_HANDLERS = True  # import command-only handler modules on their first command / button
+    HANDLER_SCAN_CACHE = "cache/handler_scan.json"  # which handlers can be lazy, by file mtime
+
+    # Handler timings (perf.py, /perf)
+    PERF_SAMPLES = 1024  # latest latencies kept per command for p50/p95/p99
+    PERF_LOOP_LAG_SECONDS = 0.5  # how often event-loop lag is sampled
+    PERF_EXPORT_PATH = "cache/metrics.prom"  # Prometheus text snapshot
+    PERF_EXPORT_SECONDS = 60  # rewrite the snapshot this often (0 = only on /perf export)
+
+    # SQL profile (query_profiler.py, /queries)
+    SLOW_QUERY_MS = 100  # statements slower than this go to the slow query log
+    SLOW_QUERY_LOG = "logs/slow_queries.log"
+    SLOW_QUERY_LOG_BYTES = 1024 * 1024  # rotate the log at this size
+    SLOW_QUERY_LOG_FILES = 3  # rotated logs kept
+
+    # Auctions (auctions.py)
+    AUCTION_BID_SECONDS = 10  # an auction ends after this many seconds without a new bid
+    AUCTION_RETRY_SECONDS = 30  # a settle that failed (db error) is retried after this
+
+    # Scheduled jobs (jobs.py, /jobs)
+    JOB_RETRY_SECONDS = 60  # first retry of a failed job; doubles per attempt (max 1h)
+    JOB_MAX_ATTEMPTS = 5  # then the job is kept as dead for /jobs
+
+    # Rate limiting (ratelimit.py, /ratelimit)
+    # Token buckets as (refill per second, burst); updates over budget are dropped unanswered
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_USER = (0.5, 5)  # per user, shared by every command / button / inline query without an override
+    RATE_LIMIT_COMMANDS = {  # labels with their own per-user bucket instead of RATE_LIMIT_USER
+        "/collect": (1.0, 4),  # guesses
+        "/bet": (0.2, 3),
+        "cb:inv_pg": (2.0, 8),  # inventory ⬅️➡️
+        "msg": (1.0, 5),  # plain group messages (drop counting)
+        "inline": (3.0, 10),  # inline gallery: clients send a query on almost every keystroke
+    }
+    RATE_LIMIT_CHAT = (10.0, 40)  # per chat, every update in it
+    RATE_LIMIT_IDLE_SECONDS = 300  # buckets unused this long are dropped from memory
+
+    # Card name matching (name_index.py)
+    COLLECT_MIN_GUESS = 3  # letters a /collect guess needs, so "a" can't collect every drop
+    COLLECT_MIN_SIMILARITY = 0.5  # trigram similarity a misspelled guess word needs to a name word
+    SEARCH_MIN_SCORE = 0.3  # weaker /search and inline matches are not shown
 
     # Owner & Support details
     OWNER_ID = 7558715645
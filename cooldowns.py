@@ -0,0 +1,145 @@
+# cooldowns.py
+"""
+Per-user cooldowns (/claim, /daily, /weekly, /monthly, /bonus, /craft,
+/marry, /mymarket refresh) in one place.
+
+Every live cooldown is kept in a dict keyed by (user_id, action) holding
+(used_at, expires_at) in unix seconds, so "how long until this user can
+do X again" is a dict lookup with no DB read and no date parsing.
+try_start() checks and starts a cooldown in one synchronous step (no
+await in between), so of two concurrent taps exactly one gets through.
+
+Writes go through to the `cooldowns` table (migration 11) on the batched
+writer, or inside the caller's transaction with write(conn, ...) when the
+cooldown must commit together with what it guards. The dict is
+authoritative; a write made while the writer isn't running is skipped. load() reads the
+rows that haven't expired; expired entries are dropped on access and by
+a sweep every SWEEP_EVERY starts. Expired rows stay in the table, so
+last_used() can still answer "when did they last claim".
+"""
+
+import threading
+import time
+from database import get_db
+
+SWEEP_EVERY = 1000  # starts between sweeps of expired entries
+
+
+def _save(conn, user_id, action, used_at, expires_at):
+    conn.execute(
+        "INSERT OR REPLACE INTO cooldowns (user_id, action, used_at, expires_at) VALUES (?, ?, ?, ?)",
+        (user_id, action, used_at, expires_at)
+    )
+
+
+def _delete(conn, user_id, action):
+    conn.execute("DELETE FROM cooldowns WHERE user_id = ? AND action = ?", (user_id, action))
+
+
+class Cooldowns:
+    def __init__(self, db=None):
+        self._db = db
+        self._live = {}  # (user_id, action) -> (used_at, expires_at)
+        self._starts = 0
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    def __len__(self):
+        return len(self._live)
+
+    # ---------------- Hot Path ----------------
+    def remaining(self, user_id, action, now=None):
+        """Whole seconds until action is allowed again; 0 if it is now"""
+        key = (user_id, action)
+        entry = self._live.get(key)
+        if entry is None:
+            return 0
+        now = time.time() if now is None else now
+        if entry[1] <= now:
+            del self._live[key]
+            return 0
+        return int(entry[1] - now + 0.999)
+
+    def try_start(self, user_id, action, seconds, write=True):
+        """Start the cooldown if it isn't running; returns 0 if started, else the seconds left
+
+        write=False leaves persisting to the caller's transaction (write(conn, ...)).
+        """
+        now = time.time()
+        left = self.remaining(user_id, action, now)
+        if left:
+            return left
+        self._set(user_id, action, int(now), int(now + seconds), write)
+        return 0
+
+    def start(self, user_id, action, seconds):
+        """Start (or restart) the cooldown unconditionally"""
+        now = int(time.time())
+        self._set(user_id, action, now, now + int(seconds), True)
+
+    def clear(self, user_id, action):
+        """Cancel a running cooldown (e.g. the action it guarded failed)"""
+        self._live.pop((user_id, action), None)
+        self._persist(_delete, user_id, action)
+
+    def write(self, conn, user_id, action):
+        """Persist the running cooldown inside an open transaction"""
+        entry = self._live.get((user_id, action))
+        if entry:
+            _save(conn, user_id, action, *entry)
+
+    # ---------------- Persistence ----------------
+    def _set(self, user_id, action, used_at, expires_at, write):
+        self._live[(user_id, action)] = (used_at, expires_at)
+        if write:
+            self._persist(_save, user_id, action, used_at, expires_at)
+        self._starts += 1
+        if self._starts % SWEEP_EVERY == 0:
+            self.sweep()
+
+    def _persist(self, fn, *args):
+        # memory is authoritative: without the writer (startup, other threads) the row is skipped
+        # rather than committed on the shared connection from the loop
+        self.db.submit_nowait(fn, *args)
+
+    def sweep(self, now=None):
+        """Drop expired entries; returns how many"""
+        now = time.time() if now is None else now
+        expired = [key for key, (_, expires_at) in self._live.items() if expires_at <= now]
+        for key in expired:
+            del self._live[key]
+        return len(expired)
+
+    async def load(self):
+        """Load every cooldown that is still running"""
+        rows = await self.db.fetchall(
+            "SELECT user_id, action, used_at, expires_at FROM cooldowns WHERE expires_at > ?", (int(time.time()),)
+        )
+        for user_id, action, used_at, expires_at in rows:
+            self._live[(user_id, action)] = (used_at, expires_at)
+        print(f"⏳ Cooldowns: {len(rows)} running")
+        return len(rows)
+
+    async def last_used(self, user_id, actions):
+        """Latest used_at (unix) over actions, expired or not; None if never"""
+        marks = ",".join("?" * len(actions))
+        return await self.db.fetchval(
+            f"SELECT MAX(used_at) FROM cooldowns WHERE user_id = ? AND action IN ({marks})",
+            (user_id, *actions)
+        )
+
+
+# ---------------- Shared Instance ----------------
+_cooldowns = None
+_cooldowns_lock = threading.Lock()
+
+
+def get_cooldowns():
+    """Return the process-wide Cooldowns"""
+    global _cooldowns
+    with _cooldowns_lock:
+        if _cooldowns is None:
+            _cooldowns = Cooldowns()
+        return _cooldowns
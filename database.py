@@ -1,254 +1,458 @@
 # database.py
 
 import sqlite3
+import asyncio
+import queue
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from config import Config
+from migrations import migrate
+from perf import add_sqlite_time
+from query_profiler import record_query
 from datetime import datetime
 import os
 
 DEFAULT_WAIFU_IMAGE = "photo_2025-08-29_13-53-48.jpg"
 
-class Database:
-    def __init__(self, db_path=Config.DB_PATH):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.setup()
-        self.setup_profile_tables()
-        self.setup_additional_tables()
-        self.ensure_waifu_cards_schema()
-        self.ensure_default_waifu_image()
 
-    # ---------------- Setup ----------------
-    def setup(self):
-        """Create users, groups, logs tables and ensure columns exist"""
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                language TEXT DEFAULT 'en',
-                joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                daily_crystals INTEGER DEFAULT 0,
-                weekly_crystals INTEGER DEFAULT 0,
-                monthly_crystals INTEGER DEFAULT 0,
-                daily_claim TEXT,
-                weekly_claim TEXT,
-                monthly_claim TEXT,
-                first_logged INTEGER DEFAULT 0,
-                store_refresh_claim TEXT
-            )
-        """)
-        self.conn.commit()
+def apply_pragmas(conn):
+    """WAL journaling + tuned cache/mmap; applied to every connection we open"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={Config.DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{int(Config.DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA busy_timeout={int(Config.DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
 
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS groups (
-                chat_id INTEGER PRIMARY KEY,
-                title TEXT,
-                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        self.conn.commit()
 
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                event_type TEXT,
-                user_id INTEGER,
-                chat_id INTEGER,
-                details TEXT,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        self.conn.commit()
+# ---------------- Timing ----------------
+# Every connection we open is a TimedConnection: each statement's time,
+# fetches included, goes to query_profiler.py. The shared connection
+# (db.conn / db.cursor) runs on the event loop, so its time is also what
+# the running handler waits on SQLite (perf.py); awaited reads / writes
+# are charged by Database.read / run instead.
+def _timed(method, starts_statement=False):
+    def timed(self, *args, **kwargs):
+        if starts_statement:
+            self.sql = args[0] if args else kwargs.get("sql")
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.connection.record(self.sql, time.perf_counter() - start, starts_statement)
+    return timed
 
-        # Ensure legacy columns exist
-        for col in ["daily_claim", "weekly_claim", "monthly_claim", "first_logged", "store_refresh_claim"]:
-            self._add_missing_column(col)
 
-    def _add_missing_column(self, column_name):
-        self.cursor.execute("PRAGMA table_info(users)")
-        columns = [info[1] for info in self.cursor.fetchall()]
-        if column_name not in columns:
-            if column_name == "first_logged":
-                self.cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} INTEGER DEFAULT 0")
-            else:
-                self.cursor.execute(f"ALTER TABLE users ADD COLUMN {column_name} TEXT")
-            self.conn.commit()
-
-    # ---------------- Additional Tables ----------------
-    def setup_additional_tables(self):
-        """Create inventory table and given_crystals column"""
-        self.cursor.execute("PRAGMA table_info(users)")
-        cols = [c[1] for c in self.cursor.fetchall()]
-        if "given_crystals" not in cols:
-            self.cursor.execute("ALTER TABLE users ADD COLUMN given_crystals INTEGER DEFAULT 0")
-            self.conn.commit()
-
-        # User inventory table
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_waifus (
-                user_id INTEGER,
-                waifu_id INTEGER,
-                amount INTEGER DEFAULT 1,
-                PRIMARY KEY (user_id, waifu_id)
-            )
-        """)
-        
-        # ✅ FIX: User Fav table yahan add kiya hai
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_fav (
-                user_id INTEGER PRIMARY KEY,
-                waifu_id INTEGER
-            )
-        """)
-        self.conn.commit()
+class TimedCursor(sqlite3.Cursor):
+    sql = None  # statement the fetches belong to
 
-    # ---------------- User Management ----------------
-    def add_user(self, user_id, username=None, first_name=None):
-        self.cursor.execute("""
-            INSERT OR IGNORE INTO users (user_id, username, first_name)
-            VALUES (?, ?, ?)
-        """, (user_id, username, first_name))
-        self.conn.commit()
+    execute = _timed(sqlite3.Cursor.execute, starts_statement=True)
+    executemany = _timed(sqlite3.Cursor.executemany, starts_statement=True)
+    fetchone = _timed(sqlite3.Cursor.fetchone)
+    fetchmany = _timed(sqlite3.Cursor.fetchmany)
+    fetchall = _timed(sqlite3.Cursor.fetchall)
 
-    def is_first_logged(self, user_id):
-        self.cursor.execute("SELECT first_logged FROM users WHERE user_id = ?", (user_id,))
-        row = self.cursor.fetchone()
-        return row[0] == 1 if row else False
 
-    def set_first_logged(self, user_id):
-        self.cursor.execute("UPDATE users SET first_logged = 1 WHERE user_id = ?", (user_id,))
-        self.conn.commit()
+class TimedConnection(sqlite3.Connection):
+    on_loop = False  # db.conn: time is also charged to the running handler
 
-    # ---------------- Crystal Management ----------------
-    def add_crystals(self, user_id, daily=0, weekly=0, monthly=0, given=0):
-        self.add_user(user_id)
-        self.cursor.execute("""
-            UPDATE users SET
-                daily_crystals = daily_crystals + ?,
-                weekly_crystals = weekly_crystals + ?,
-                monthly_crystals = monthly_crystals + ?,
-                given_crystals = given_crystals + ?
-            WHERE user_id = ?
-        """, (int(daily), int(weekly), int(monthly), int(given), user_id))
-        self.conn.commit()
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
 
-    def get_crystals(self, user_id):
-        self.cursor.execute("""
-            SELECT daily_crystals, weekly_crystals, monthly_crystals,
-                   daily_claim, weekly_claim, monthly_claim, given_crystals
-            FROM users WHERE user_id=?
-        """, (user_id,))
-        row = self.cursor.fetchone()
-        if not row:
-            return (0, 0, 0, 0, None, 0)
-        daily, weekly, monthly, daily_c, weekly_c, monthly_c, given = row
-        total = daily + weekly + monthly + given
-        timestamps = [ts for ts in [daily_c, weekly_c, monthly_c] if ts]
-        last_claim = max(timestamps) if timestamps else None
-        return (daily, weekly, monthly, total, last_claim, given)
-
-    def get_last_claim(self, user_id, claim_type):
-        col = f"{claim_type}_claim"
-        self.cursor.execute(f"SELECT {col} FROM users WHERE user_id = ?", (user_id,))
-        result = self.cursor.fetchone()
-        return result[0] if result else None
-
-    def update_last_claim(self, user_id, claim_type, time_iso):
-        col = f"{claim_type}_claim"
-        self.cursor.execute(f"UPDATE users SET {col} = ? WHERE user_id = ?", (time_iso, user_id))
-        self.conn.commit()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            self.record("COMMIT", time.perf_counter() - start)
+
+    def record(self, sql, seconds, counts=True):
+        record_query(sql, seconds, counts)
+        if self.on_loop:
+            add_sqlite_time(seconds)
+
+
+def connect(db_path=None, **kwargs):
+    """sqlite3.connect() for code that keeps its own connection (profiled)"""
+    return sqlite3.connect(db_path or Config.DB_PATH, factory=TimedConnection, **kwargs)
+
+
+# ---------------- Change Hooks ----------------
+# Listeners get (user_id, delta) for every inventory / balance change; used
+# by leaderboard.py and inventory_view.py to keep their caches current.
+# Changes made inside a writer job are held until the batch commits and
+# then delivered on the event loop; a job that rolls back is never
+# reported. Writes made straight on a connection outside the writer
+# (scripts, startup) are reported as soon as the statement has run.
+_inventory_listeners = []
+_crystal_listeners = []
+
+
+def on_inventory_change(listener):
+    _inventory_listeners.append(listener)
+
+
+def on_crystals_change(listener):
+    _crystal_listeners.append(listener)
+
+
+_held = threading.local()  # .events: changes made by the writer batch running on this thread
 
-    # ---------------- Purchase / Inventory ----------------
-    def purchase_waifu(self, user_id, waifu_id, price=0):
-        """Deduct crystals proportionally and add waifu safely"""
-        self.add_user(user_id)
-        daily, weekly, monthly, total, last_claim, given = self.get_crystals(user_id)
-        if total < price:
-            return False
 
-        remaining = price
-        for col in ["daily_crystals", "weekly_crystals", "monthly_crystals", "given_crystals"]:
-            self.cursor.execute(f"SELECT {col} FROM users WHERE user_id=?", (user_id,))
-            value = int(self.cursor.fetchone()[0])
-            deduction = min(value, remaining)
-            self.cursor.execute(f"UPDATE users SET {col} = {col} - ? WHERE user_id=?", (deduction, user_id))
-            remaining -= deduction
-            if remaining <= 0:
+def _notify(listeners, user_id, delta):
+    for listener in listeners:
+        try:
+            listener(user_id, delta)
+        except Exception as e:
+            print(f"❌ Change listener failed: {e}")
+
+
+def _emit(listeners, user_id, delta):
+    events = getattr(_held, "events", None)
+    if events is None:
+        _notify(listeners, user_id, delta)
+    else:
+        # inside a writer job: hold it until the batch commits (BatchWriter._deliver)
+        events.append((listeners, user_id, delta))
+
+
+def inventory_changed(user_id, delta):
+    """Call after writing user_waifus without give_card / take_card"""
+    _emit(_inventory_listeners, user_id, delta)
+
+
+def crystals_changed(user_id, delta):
+    """Called by ledger.py for every balance change"""
+    _emit(_crystal_listeners, user_id, delta)
+
+
+# ---------------- Inventory Primitives ----------------
+# Single-statement card moves; call them inside db.run() jobs so they
+# share the caller's transaction. They rely on the unique
+# (user_id, waifu_id) index added by migration 2.
+def give_card(conn, user_id, waifu_id, amount=1):
+    """Credit cards to a user in one upsert"""
+    conn.execute("""
+        INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
+        VALUES (?, ?, ?, strftime('%s','now'))
+        ON CONFLICT(user_id, waifu_id) DO UPDATE
+           SET amount = COALESCE(amount, 0) + excluded.amount,
+               last_collected = excluded.last_collected
+    """, (user_id, waifu_id, amount))
+    inventory_changed(user_id, amount)
+
+
+def take_card(conn, user_id, waifu_id, amount=1):
+    """Debit cards only if the user still owns enough; False otherwise"""
+    cur = conn.execute(
+        "UPDATE user_waifus SET amount = amount - ? WHERE user_id=? AND waifu_id=? AND amount >= ?",
+        (amount, user_id, waifu_id, amount)
+    )
+    if cur.rowcount == 0:
+        return False
+    conn.execute("DELETE FROM user_waifus WHERE user_id=? AND waifu_id=? AND amount <= 0", (user_id, waifu_id))
+    inventory_changed(user_id, -amount)
+    return True
+
+
+def move_card(conn, from_user, to_user, waifu_id, amount=1):
+    """take_card + give_card; nothing moves if the sender is short"""
+    if not take_card(conn, from_user, waifu_id, amount):
+        return False
+    give_card(conn, to_user, waifu_id, amount)
+    return True
+
+
+# ---------------- Bulk Primitives ----------------
+# Admin grants / event payouts: rows are staged once with executemany into a
+# temp table, then applied with set-based statements, so N users cost a
+# handful of statements in one transaction instead of N round trips.
+def stage_rows(conn, table, columns, rows):
+    """(Re)fill a per-connection temp table with rows"""
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} ({columns})")
+    conn.execute(f"DELETE FROM {table}")
+    rows = list(rows)
+    if rows:
+        marks = ",".join("?" * len(rows[0]))
+        conn.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+
+
+def _merge(rows):
+    """Sum amounts of repeated (user_id, waifu_id) keys; drop non-positive ones"""
+    merged = {}
+    for user_id, waifu_id, amount in rows:
+        key = (int(user_id), int(waifu_id))
+        merged[key] = merged.get(key, 0) + int(amount)
+    return [(u, w, a) for (u, w), a in merged.items() if a > 0]
+
+
+def give_cards_many(conn, grants):
+    """[(user_id, waifu_id, amount)] credited in one executemany upsert; returns rows applied"""
+    grants = _merge(grants)
+    conn.executemany("""
+        INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
+        VALUES (?, ?, ?, strftime('%s','now'))
+        ON CONFLICT(user_id, waifu_id) DO UPDATE
+           SET amount = COALESCE(amount, 0) + excluded.amount,
+               last_collected = excluded.last_collected
+    """, grants)
+    per_user = {}
+    for user_id, _, amount in grants:
+        per_user[user_id] = per_user.get(user_id, 0) + amount
+    for user_id, delta in per_user.items():
+        inventory_changed(user_id, delta)
+    return len(grants)
+
+
+def take_cards_many(conn, revokes):
+    """Remove up to amount copies per (user_id, waifu_id); returns {user_id: cards removed}"""
+    stage_rows(conn, "bulk_cards", "user_id INTEGER, waifu_id INTEGER, amount INTEGER, PRIMARY KEY (user_id, waifu_id)",
+               _merge(revokes))
+    # clamp to what each user actually owns
+    conn.execute("""
+        UPDATE bulk_cards SET amount = MIN(amount, COALESCE((
+            SELECT uw.amount FROM user_waifus uw
+             WHERE uw.user_id = bulk_cards.user_id AND uw.waifu_id = bulk_cards.waifu_id), 0))
+    """)
+    conn.execute("DELETE FROM bulk_cards WHERE amount <= 0")
+    conn.execute("""
+        UPDATE user_waifus SET amount = amount - (
+            SELECT b.amount FROM bulk_cards b
+             WHERE b.user_id = user_waifus.user_id AND b.waifu_id = user_waifus.waifu_id)
+         WHERE (user_id, waifu_id) IN (SELECT user_id, waifu_id FROM bulk_cards)
+    """)
+    conn.execute("""
+        DELETE FROM user_waifus
+         WHERE amount <= 0 AND (user_id, waifu_id) IN (SELECT user_id, waifu_id FROM bulk_cards)
+    """)
+    removed = dict(conn.execute("SELECT user_id, SUM(amount) FROM bulk_cards GROUP BY user_id").fetchall())
+    for user_id, count in removed.items():
+        inventory_changed(user_id, -count)
+    return removed
+
+
+class ConnectionPool:
+    """Fixed set of SQLite connections handed out to the worker threads"""
+
+    def __init__(self, db_path, size):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.Queue(maxsize=size)
+        for _ in range(size):
+            self._idle.put(self._connect())
+
+    def _connect(self):
+        return apply_pragmas(connect(self.db_path, check_same_thread=False, timeout=30))
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
                 break
 
-        # Safe inventory addition
-        self.cursor.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, waifu_id))
-        row = self.cursor.fetchone()
-        if row:
-            self.cursor.execute("UPDATE user_waifus SET amount = amount + 1 WHERE user_id=? AND waifu_id=?", (user_id, waifu_id))
-        else:
-            self.cursor.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (user_id, waifu_id))
 
-        self.conn.commit()
-        return True
+class BatchWriter:
+    """Single writer: queued write jobs are grouped into one transaction per flush.
+
+    Each job runs inside its own SAVEPOINT, so a failing job is rolled back on
+    its own while the rest of the batch still commits. Change listeners hear
+    about a job's writes only after they are committed, on the event loop.
+    """
+
+    def __init__(self, db_path, flush_ms=Config.DB_FLUSH_INTERVAL_MS, batch_max=Config.DB_WRITE_BATCH_MAX):
+        # isolation_level=None -> we issue BEGIN / COMMIT ourselves
+        self.conn = apply_pragmas(connect(db_path, check_same_thread=False, isolation_level=None))
+        self.flush_delay = max(0, flush_ms) / 1000
+        self.batch_max = max(1, batch_max)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self.queue = None
+        self.task = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def _commit_batch(self, jobs):
+        """[(ok, value)] per job, plus the change events of the jobs that committed"""
+        results = []
+        events = _held.events = []
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            for fn, args in jobs:
+                held = len(events)
+                self.conn.execute("SAVEPOINT job")
+                try:
+                    value = fn(self.conn, *args)
+                    self.conn.execute("RELEASE job")
+                    results.append((True, value))
+                except Exception as e:
+                    self.conn.execute("ROLLBACK TO job")
+                    self.conn.execute("RELEASE job")
+                    del events[held:]
+                    results.append((False, e))
+            try:
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                self.conn.execute("ROLLBACK")
+                results = [(False, e)] * len(jobs)
+                events.clear()
+        finally:
+            _held.events = None
+        return results, events
+
+    @staticmethod
+    def _deliver(events):
+        for listeners, user_id, delta in events:
+            _notify(listeners, user_id, delta)
+
+    async def _flush(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results, events = await loop.run_in_executor(self.executor, self._commit_batch, [(fn, args) for fn, args, _ in batch])
+        except Exception as e:
+            results, events = [(False, e)] * len(batch), []
+        # before any job's caller resumes, so it reads its own write through the caches
+        self._deliver(events)
+        for (_, _, fut), (ok, value) in zip(batch, results):
+            if fut.done():
+                continue
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    async def _loop(self):
+        stopping = False
+        while not stopping:
+            job = await self.queue.get()
+            if job is None:
+                break
+            # Give concurrent handlers a moment to queue their writes too
+            if self.flush_delay and self.queue.qsize() < self.batch_max - 1:
+                await asyncio.sleep(self.flush_delay)
+            batch = [job]
+            while len(batch) < self.batch_max and not self.queue.empty():
+                job = self.queue.get_nowait()
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            await self._flush(batch)
+
+    def start(self):
+        if self.running:
+            return
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the writer task"""
+        if not self.running:
+            return
+        self.queue.put_nowait(None)
+        await self.task
+        self.task = None
+
+    def submit(self, fn, args=()):
+        """Queue fn(conn, *args); returns a future resolved after the batch commits"""
+        fut = asyncio.get_running_loop().create_future()
+        # the job runs in the caller's context, so the query profiler knows the handler
+        self.queue.put_nowait((partial(contextvars.copy_context().run, fn), args, fut))
+        return fut
+
+    async def run_now(self, fn, args=()):
+        """Writer not started (scripts, startup): commit this job on its own"""
+        loop = asyncio.get_running_loop()
+        job = (partial(contextvars.copy_context().run, fn), args)
+        [(ok, value)], events = await loop.run_in_executor(self.executor, self._commit_batch, [job])
+        self._deliver(events)
+        if not ok:
+            raise value
+        return value
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.conn.close()
+
+
+class Database:
+    def __init__(self, db_path=Config.DB_PATH, pool_size=Config.DB_POOL_SIZE):
+        self.db_path = db_path
+        self.conn = apply_pragmas(connect(db_path, check_same_thread=False))
+        self.conn.on_loop = True
+        self.cursor = self.conn.cursor()
+
+        # Worker pool: every awaitable read runs on one of these threads with
+        # its own pooled connection, so the event loop never blocks on SQLite.
+        self.pool = ConnectionPool(db_path, pool_size)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="db")
+        # All awaitable writes go through one writer and are group-committed
+        self.writer = BatchWriter(db_path)
+
+        # Schema lives in migrations.py; main.py has normally applied it already
+        migrate(self.conn)
+        self.ensure_default_waifu_image()
+
+    # ---------------- User Management ----------------
+    async def add_user(self, user_id, username=None, first_name=None):
+        await self.execute("""
+            INSERT OR IGNORE INTO users (user_id, username, first_name)
+            VALUES (?, ?, ?)
+        """, (user_id, username, first_name))
+
+    async def is_first_logged(self, user_id):
+        return await self.fetchval("SELECT first_logged FROM users WHERE user_id = ?", (user_id,)) == 1
+
+    async def set_first_logged(self, user_id):
+        await self.execute("UPDATE users SET first_logged = 1 WHERE user_id = ?", (user_id,))
 
     # ---------------- Groups / Logs ----------------
     def add_group(self, chat_id, title):
-        self.cursor.execute("""
+        sql = """
             INSERT OR IGNORE INTO groups (chat_id, title)
             VALUES (?, ?)
-        """, (chat_id, title))
+        """
+        if self.submit_nowait(lambda conn: conn.execute(sql, (chat_id, title))):
+            return
+        self.cursor.execute(sql, (chat_id, title))
         self.conn.commit()
 
-    def get_total_groups(self):
-        self.cursor.execute("SELECT COUNT(*) FROM groups")
-        return self.cursor.fetchone()[0]
+    async def get_total_groups(self):
+        return await self.fetchval("SELECT COUNT(*) FROM groups", default=0)
 
     def log_event(self, event_type, user_id=None, chat_id=None, details=None):
-        self.cursor.execute("""
+        sql = """
             INSERT INTO logs (event_type, user_id, chat_id, details)
             VALUES (?, ?, ?, ?)
-        """, (event_type, user_id, chat_id, details))
-        self.conn.commit()
-
-    # ---------------- Profile System ----------------
-    def setup_profile_tables(self):
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_profiles (
-                user_id INTEGER PRIMARY KEY,
-                level INTEGER DEFAULT 1,
-                rank TEXT DEFAULT 'Newbie',
-                badge TEXT DEFAULT 'None',
-                total_collected INTEGER DEFAULT 0,
-                progress INTEGER DEFAULT 0,
-                balance INTEGER DEFAULT 0,
-                global_position TEXT DEFAULT 'Unranked',
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        """)
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_rarities (
-                user_id INTEGER,
-                rarity TEXT,
-                count INTEGER DEFAULT 0,
-                PRIMARY KEY (user_id, rarity),
-                FOREIGN KEY (user_id) REFERENCES users (user_id)
-            )
-        """)
+        """
+        params = (event_type, user_id, chat_id, details)
+        # Logs are never read back immediately -> batch them with the writer
+        if self.submit_nowait(lambda conn: conn.execute(sql, params)):
+            return
+        self.cursor.execute(sql, params)
         self.conn.commit()
 
     # ---------------- WAIFU CARDS ----------------
-    def ensure_waifu_cards_schema(self):
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS waifu_cards (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                anime TEXT,
-                rarity TEXT,
-                event TEXT,
-                media_type TEXT,
-                media_file TEXT,
-                media_file_id TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        self.conn.commit()
-
     def ensure_default_waifu_image(self):
         """Set default image if media_file or media_file_id is empty"""
         self.cursor.execute("UPDATE waifu_cards SET media_file=? WHERE media_file IS NULL OR media_file=''", (DEFAULT_WAIFU_IMAGE,))
@@ -256,6 +460,104 @@ class Database:
         self.conn.commit()
 
 
+    # ---------------- Async Access ----------------
+    def _read_pooled(self, fn, args):
+        with self.pool.connection() as conn:
+            return fn(conn, *args)
+
+    async def read(self, fn, *args):
+        """Run fn(conn, *args) on a pooled read connection"""
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()  # slow-query log knows the handler
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self.executor, ctx.run, self._read_pooled, fn, args)
+        finally:
+            add_sqlite_time(time.perf_counter() - start)
+
+    async def run(self, fn, *args):
+        """Run fn(conn, *args) as one atomic write job; resolves after it is committed"""
+        start = time.perf_counter()
+        try:
+            if not self.writer.running:
+                return await self.writer.run_now(fn, args)
+            return await self.writer.submit(fn, args)
+        finally:
+            add_sqlite_time(time.perf_counter() - start)
+
+    async def fetchone(self, sql, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql, params=()):
+        return await self.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def fetchval(self, sql, params=(), default=None):
+        row = await self.fetchone(sql, params)
+        return row[0] if row and row[0] is not None else default
+
+    async def execute(self, sql, params=()):
+        """Run a single write statement; returns the cursor (rowcount / lastrowid)"""
+        return await self.run(lambda conn: conn.execute(sql, params))
+
+    async def executemany(self, sql, seq_of_params):
+        return await self.run(lambda conn: conn.executemany(sql, seq_of_params))
+
+    async def give_card(self, user_id, waifu_id, amount=1):
+        await self.run(give_card, user_id, waifu_id, amount)
+
+    async def take_card(self, user_id, waifu_id, amount=1):
+        return await self.run(take_card, user_id, waifu_id, amount)
+
+    async def move_card(self, from_user, to_user, waifu_id, amount=1):
+        return await self.run(move_card, from_user, to_user, waifu_id, amount)
+
+    async def give_cards_many(self, grants):
+        return await self.run(give_cards_many, list(grants))
+
+    async def take_cards_many(self, revokes):
+        return await self.run(take_cards_many, list(revokes))
+
+    def submit_nowait(self, fn, *args):
+        """Fire-and-forget write (logs etc.); False if the writer isn't running here"""
+        if not self.writer.running:
+            return False
+        try:
+            fut = self.writer.submit(fn, args)
+        except RuntimeError:
+            # called from a thread without the bot's event loop
+            return False
+        fut.add_done_callback(_report_write_error)
+        return True
+
+    # ---------------- Writer Lifecycle ----------------
+    async def start_writer(self):
+        self.writer.start()
+
+    async def stop_writer(self):
+        await self.writer.stop()
+
     # ---------------- Close ----------------
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+        self.writer.close()
+        self.conn.close()
+
+
+def _report_write_error(fut):
+    if not fut.cancelled() and fut.exception():
+        print(f"❌ Background write failed: {fut.exception()}")
+
+
+# ---------------- Shared Instance ----------------
+_shared_db = None
+_shared_lock = threading.Lock()
+
+
+def get_db():
+    """Return the process-wide Database (schema setup runs only once)"""
+    global _shared_db
+    with _shared_lock:
+        if _shared_db is None:
+            _shared_db = Database()
+        return _shared_db
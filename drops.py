@@ -0,0 +1,171 @@
+# drops.py
+"""
+Per-chat message counters behind /setdrop.
+
+Counters live in flat arrays indexed by a per-chat slot, so counting a
+message is a dict lookup and an in-place array update. tick() checks and
+resets the counter in one synchronous step (no await in between), so out
+of a burst of concurrent messages exactly one claims the drop.
+
+State is written to drop_state every Config.DROP_FLUSH_SECONDS (only the
+chats that changed) and restored on startup, so a restart no longer
+switches drops off. With Config.DROP_SHARD_COUNT > 1 each bot process
+only counts the chats where chat_id % count == DROP_SHARD_INDEX, so
+several workers can split the groups without double-dropping.
+"""
+
+import asyncio
+import threading
+import time
+from array import array
+from config import Config
+from database import get_db
+
+
+class DropEngine:
+    def __init__(self, db=None, shard_index=None, shard_count=None, flush_seconds=None):
+        self._db = db
+        self.shard_index = Config.DROP_SHARD_INDEX if shard_index is None else shard_index
+        self.shard_count = Config.DROP_SHARD_COUNT if shard_count is None else shard_count
+        self._flush_seconds = Config.DROP_FLUSH_SECONDS if flush_seconds is None else flush_seconds
+        self._slots = {}             # chat_id -> slot
+        self._chat_ids = array("q")  # slot -> chat_id
+        self._targets = array("l")   # slot -> messages per drop (0 = disabled)
+        self._counts = array("l")    # slot -> messages since last drop
+        self._dirty = bytearray()    # slot -> 1 if changed since last flush
+        self._task = None
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    def owns(self, chat_id):
+        return chat_id % self.shard_count == self.shard_index
+
+    def _slot(self, chat_id):
+        slot = self._slots.get(chat_id)
+        if slot is None:
+            slot = len(self._chat_ids)
+            self._slots[chat_id] = slot
+            self._chat_ids.append(chat_id)
+            self._targets.append(0)
+            self._counts.append(0)
+            self._dirty.append(0)
+        return slot
+
+    # ---------------- Hot Path ----------------
+    def tick(self, chat_id):
+        """Count one message; True for exactly the message that triggers a drop"""
+        slot = self._slots.get(chat_id)
+        if slot is None:
+            return False
+        target = self._targets[slot]
+        if target <= 0:
+            return False
+        count = self._counts[slot] + 1
+        self._dirty[slot] = 1
+        if count < target:
+            self._counts[slot] = count
+            return False
+        self._counts[slot] = 0
+        return True
+
+    # ---------------- Settings ----------------
+    async def set_target(self, chat_id, target):
+        """Enable drops every `target` messages and persist it right away"""
+        if self.owns(chat_id):
+            slot = self._slot(chat_id)
+            self._targets[slot] = target
+            self._counts[slot] = 0
+            self._dirty[slot] = 0
+        await self.db.execute(
+            "INSERT OR REPLACE INTO drop_state (chat_id, target, count, updated_at) VALUES (?, ?, 0, ?)",
+            (chat_id, target, int(time.time()))
+        )
+
+    async def remaining(self, chat_id):
+        """Messages left until the next drop, or None if drops are off here"""
+        slot = self._slots.get(chat_id)
+        if slot is not None:
+            target, count = self._targets[slot], self._counts[slot]
+        else:
+            row = await self.db.fetchone("SELECT target, count FROM drop_state WHERE chat_id=?", (chat_id,))
+            if not row:
+                return None
+            target, count = row
+        if target <= 0:
+            return None
+        return max(target - count, 0)
+
+    # ---------------- Persistence ----------------
+    async def restore(self):
+        """Load this shard's chats from drop_state"""
+        rows = await self.db.fetchall("SELECT chat_id, target, count FROM drop_state")
+        loaded = 0
+        for chat_id, target, count in rows:
+            if not self.owns(chat_id):
+                continue
+            slot = self._slot(chat_id)
+            # A newer /setdrop from another worker wins over our in-memory copy
+            if self._targets[slot] != target or not self._dirty[slot]:
+                self._targets[slot] = target
+                self._counts[slot] = count
+                self._dirty[slot] = 0
+            loaded += 1
+        return loaded
+
+    async def flush(self):
+        """Write every changed counter in one batched transaction"""
+        rows = []
+        now = int(time.time())
+        dirty = self._dirty
+        for slot in range(len(dirty)):
+            if dirty[slot]:
+                dirty[slot] = 0
+                rows.append((self._counts[slot], now, self._chat_ids[slot], self._targets[slot]))
+        if rows:
+            # target in the WHERE keeps a stale count from overwriting a fresh /setdrop
+            await self.db.executemany(
+                "UPDATE drop_state SET count=?, updated_at=? WHERE chat_id=? AND target=?", rows
+            )
+        return len(rows)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self._flush_seconds)
+            try:
+                await self.flush()
+                await self.restore()
+            except Exception as e:
+                print(f"❌ Drop state flush failed: {e}")
+
+    async def start(self):
+        loaded = await self.restore()
+        shard = f" (shard {self.shard_index}/{self.shard_count})" if self.shard_count > 1 else ""
+        print(f"🎴 Drop counters restored for {loaded} chats{shard}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# ---------------- Shared Instance ----------------
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_drop_engine():
+    """Return the process-wide DropEngine"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DropEngine()
+        return _engine
@@ -3,11 +3,13 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery
 from config import Config, app
-from database import Database
+from database import get_db
+from catalog import get_catalog, Card
+from router import get_router
 import os, uuid
 
-db = Database()
-db.ensure_waifu_cards_schema()  # make sure table/columns exist at import
+db = get_db()
+router = get_router()
 
 # Keep preview payloads here by a short token -> data
 PENDING_ADDS = {}
@@ -115,15 +117,16 @@ async def add_waifu_start(client, message: Message):
         await message.reply_video(media_file_id, caption=caption, reply_markup=buttons)
 
 # ------------- Callback handlers -------------
-@app.on_callback_query(filters.regex(r"^aw_(ok|no):"))
-async def add_waifu_callback(client, cq: CallbackQuery):
+@router.route("aw_ok", str)
+@router.route("aw_no", str)
+async def add_waifu_callback(client, cq: CallbackQuery, token):
     # Only allow owner/admins to press
     user_id = cq.from_user.id if cq.from_user else 0
     if not is_allowed(user_id):
         await cq.answer("⛔ Owner/Admin only.", show_alert=True)
         return
 
-    action, token = cq.data.split(":")
+    action = cq.data.split(":", 1)[0]
     payload = PENDING_ADDS.get(token)
 
     if not payload:
@@ -147,11 +150,8 @@ async def add_waifu_callback(client, cq: CallbackQuery):
 
     # Confirm
     try:
-        # Ensure schema again (safe)
-        db.ensure_waifu_cards_schema()
-
         # Insert; write both media_file and media_file_id for compatibility
-        db.cursor.execute("""
+        cur = await db.execute("""
             INSERT INTO waifu_cards (name, anime, rarity, event, media_type, media_file, media_file_id)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         """, (
@@ -163,8 +163,11 @@ async def add_waifu_callback(client, cq: CallbackQuery):
             payload["media_file_id"],   # media_file (compat) = file_id as well
             payload["media_file_id"]    # media_file_id
         ))
-        db.conn.commit()
-        new_id = db.cursor.lastrowid
+        new_id = cur.lastrowid
+        get_catalog().add(Card(
+            new_id, payload["name"], payload["anime"], payload["rarity"], payload["event"],
+            payload["media_type"], payload["media_file_id"], payload["media_file_id"]
+        ))
 
         # Clean state
         PENDING_ADDS.pop(token, None)
@@ -3,9 +3,11 @@ from main import app
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime, timedelta, date
-from database import Database
+from database import get_db
+from router import get_router
 
-db = Database()
+db = get_db()
+router = get_router()
 
 # Configuration
 ENERGY_PER_UPGRADE = 1000      # energy required to increase bond by 1
@@ -14,41 +16,20 @@ MAX_BOND_LEVEL = 10
 ADD_ENERGY_AMOUNT = 500        # amount added when user presses "Add Energy (+500)"
 
 
-# Ensure table exists
-def ensure_affection_table():
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_affection (
-            user_id INTEGER,
-            waifu_id INTEGER,
-            bond_level INTEGER DEFAULT 1,
-            energy_accum INTEGER DEFAULT 0,
-            last_upgrade_iso TEXT,
-            daily_added INTEGER DEFAULT 0,
-            daily_reset_date TEXT,
-            PRIMARY KEY (user_id, waifu_id)
-        )
-    """)
-    db.conn.commit()
-
-ensure_affection_table()
-
-
 # --- DB helpers for affection ---
-def get_affection_record(user_id: int, waifu_id: int):
-    db.cursor.execute("""
+async def get_affection_record(user_id: int, waifu_id: int):
+    row = await db.fetchone("""
         SELECT user_id, waifu_id, bond_level, energy_accum, last_upgrade_iso, daily_added, daily_reset_date
         FROM user_affection
         WHERE user_id = ? AND waifu_id = ?
     """, (user_id, waifu_id))
-    row = db.cursor.fetchone()
     if not row:
         # create default record
         today = date.today().isoformat()
-        db.cursor.execute("""
-            INSERT INTO user_affection (user_id, waifu_id, bond_level, energy_accum, last_upgrade_iso, daily_added, daily_reset_date)
+        await db.execute("""
+            INSERT OR IGNORE INTO user_affection (user_id, waifu_id, bond_level, energy_accum, last_upgrade_iso, daily_added, daily_reset_date)
             VALUES (?, ?, 1, 0, NULL, 0, ?)
         """, (user_id, waifu_id, today))
-        db.conn.commit()
         return {
             "user_id": user_id,
             "waifu_id": waifu_id,
@@ -69,7 +50,7 @@ def get_affection_record(user_id: int, waifu_id: int):
     }
 
 
-def update_affection_record(user_id: int, waifu_id: int, **kwargs):
+async def update_affection_record(user_id: int, waifu_id: int, **kwargs):
     # build dynamic update
     cols = []
     vals = []
@@ -80,8 +61,7 @@ def update_affection_record(user_id: int, waifu_id: int, **kwargs):
         return
     vals.extend([user_id, waifu_id])
     sql = f"UPDATE user_affection SET {', '.join(cols)} WHERE user_id = ? AND waifu_id = ?"
-    db.cursor.execute(sql, tuple(vals))
-    db.conn.commit()
+    await db.execute(sql, tuple(vals))
 
 
 # Utility: parse ISO timestamp string to datetime
@@ -98,7 +78,7 @@ def parse_iso(s):
 
 
 # Render the affection panel caption
-def build_affection_caption(waifu_row, affection):
+async def build_affection_caption(waifu_row, affection):
     # waifu_row columns: id, name, anime, rarity, event, media_type, media_file, media_file_id (common schema)
     wid = waifu_row[0]
     name = waifu_row[1]
@@ -106,9 +86,7 @@ def build_affection_caption(waifu_row, affection):
     rarity = waifu_row[3] if len(waifu_row) > 3 else ""
     event = waifu_row[4] if len(waifu_row) > 4 else ""
     # owned count
-    db.cursor.execute("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (affection["user_id"], wid))
-    r = db.cursor.fetchone()
-    owned = r[0] if r else 0
+    owned = await db.fetchval("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (affection["user_id"], wid), default=0)
 
     bond_level = affection["bond_level"]
     energy = affection["energy_accum"]
@@ -175,7 +153,6 @@ async def affection_handler(client, message):
     """
     user_id = message.from_user.id
     parts = (message.text or "").split(maxsplit=1)
-    ensure_affection_table()  # just to be safe
 
     # Determine waifu_id: either provided or user's favorite
     waifu_id = None
@@ -183,8 +160,7 @@ async def affection_handler(client, message):
         waifu_id = int(parts[1].strip())
     else:
         # try fetch from user_fav
-        db.cursor.execute("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
-        fav = db.cursor.fetchone()
+        fav = await db.fetchone("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
         if fav and fav[0]:
             waifu_id = fav[0]
 
@@ -192,20 +168,19 @@ async def affection_handler(client, message):
         return await message.reply_text("❌ No waifu specified and no favorite set. Use `/affection <waifu_id>` or set a favorite first.")
 
     # fetch waifu data
-    db.cursor.execute("""
+    waifu = await db.fetchone("""
         SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id
         FROM waifu_cards
         WHERE id = ?
     """, (waifu_id,))
-    waifu = db.cursor.fetchone()
     if not waifu:
         return await message.reply_text("❌ Waifu not found with that ID.")
 
     # ensure user exists and affection record
-    db.add_user(user_id, message.from_user.username if message.from_user.username else None)
-    affection = get_affection_record(user_id, waifu_id)
+    await db.add_user(user_id, message.from_user.username if message.from_user.username else None)
+    affection = await get_affection_record(user_id, waifu_id)
 
-    caption = build_affection_caption(waifu, affection)
+    caption = await build_affection_caption(waifu, affection)
 
     # buttons -- Add Energy, Increase Bond (if enough), Close
     buttons = []
@@ -234,17 +209,11 @@ async def affection_handler(client, message):
 
 
 # Callback: Add energy
-@app.on_callback_query(filters.regex(r"^aff_add:"))
-async def aff_add_cb(client, callback_query):
-    data = callback_query.data.split(":")
-    try:
-        waifu_id = int(data[1])
-    except Exception:
-        await callback_query.answer("Invalid data.", show_alert=True)
-        return
+@router.route("aff_add", int)
+async def aff_add_cb(client, callback_query, waifu_id):
 
     user_id = callback_query.from_user.id
-    affection = get_affection_record(user_id, waifu_id)
+    affection = await get_affection_record(user_id, waifu_id)
 
     # Reset daily_added if day changed
     today_iso = date.today().isoformat()
@@ -261,15 +230,14 @@ async def aff_add_cb(client, callback_query):
     new_energy = (affection["energy_accum"] or 0) + add_amount
     new_daily = (affection["daily_added"] or 0) + add_amount
 
-    update_affection_record(user_id, waifu_id, energy_accum=new_energy, daily_added=new_daily, daily_reset_date=today_iso)
+    await update_affection_record(user_id, waifu_id, energy_accum=new_energy, daily_added=new_daily, daily_reset_date=today_iso)
 
     # refresh affection dict
-    affection = get_affection_record(user_id, waifu_id)
+    affection = await get_affection_record(user_id, waifu_id)
 
     # fetch waifu to rebuild caption
-    db.cursor.execute("SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id FROM waifu_cards WHERE id = ?", (waifu_id,))
-    waifu = db.cursor.fetchone()
-    caption = build_affection_caption(waifu, affection)
+    waifu = await db.fetchone("SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id FROM waifu_cards WHERE id = ?", (waifu_id,))
+    caption = await build_affection_caption(waifu, affection)
 
     # Edit message (replace with updated preview)
     try:
@@ -285,17 +253,11 @@ async def aff_add_cb(client, callback_query):
 
 
 # Callback: Increase bond
-@app.on_callback_query(filters.regex(r"^aff_upgrade:"))
-async def aff_upgrade_cb(client, callback_query):
-    data = callback_query.data.split(":")
-    try:
-        waifu_id = int(data[1])
-    except Exception:
-        await callback_query.answer("Invalid data.", show_alert=True)
-        return
+@router.route("aff_upgrade", int)
+async def aff_upgrade_cb(client, callback_query, waifu_id):
 
     user_id = callback_query.from_user.id
-    affection = get_affection_record(user_id, waifu_id)
+    affection = await get_affection_record(user_id, waifu_id)
 
     # Check max level
     if affection["bond_level"] >= MAX_BOND_LEVEL:
@@ -318,16 +280,15 @@ async def aff_upgrade_cb(client, callback_query):
     new_level = min(MAX_BOND_LEVEL, (affection["bond_level"] or 1) + 1)
     now_iso = datetime.now().isoformat()
 
-    update_affection_record(user_id, waifu_id, energy_accum=new_energy, bond_level=new_level, last_upgrade_iso=now_iso)
+    await update_affection_record(user_id, waifu_id, energy_accum=new_energy, bond_level=new_level, last_upgrade_iso=now_iso)
 
     # log event (optional)
     db.log_event("affection_upgrade", user_id=user_id, details=f"waifu_id={waifu_id} new_level={new_level}")
 
     # fetch waifu for caption update
-    db.cursor.execute("SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id FROM waifu_cards WHERE id = ?", (waifu_id,))
-    waifu = db.cursor.fetchone()
-    affection = get_affection_record(user_id, waifu_id)
-    caption = build_affection_caption(waifu, affection)
+    waifu = await db.fetchone("SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id FROM waifu_cards WHERE id = ?", (waifu_id,))
+    affection = await get_affection_record(user_id, waifu_id)
+    caption = await build_affection_caption(waifu, affection)
 
     try:
         await callback_query.message.edit_caption(caption)
@@ -341,12 +302,12 @@ async def aff_upgrade_cb(client, callback_query):
 
 
 # Callback: disabled or close
-@app.on_callback_query(filters.regex(r"^aff_disabled"))
+@router.route("aff_disabled")
 async def aff_disabled_cb(client, callback_query):
     await callback_query.answer("You cannot upgrade yet. Make sure you have enough energy and cooldown expired.", show_alert=True)
 
 
-@app.on_callback_query(filters.regex(r"^aff_close"))
+@router.route("aff_close")
 async def aff_close_cb(client, callback_query):
     try:
         await callback_query.message.delete()
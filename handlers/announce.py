@@ -1,12 +1,22 @@
 from pyrogram import Client, filters
-import sqlite3
-import asyncio
 
 from config import app, OWNER_ID
+from broadcast import get_broadcaster
+
+# Shared broadcast engine (rate-limited, resumable)
+broadcaster = get_broadcaster()
+
+
+def _report(broadcast_id, stats, done=False):
+    head = "📢 Announcement complete!" if done else f"📢 Sending announcement #{broadcast_id}..."
+    if stats["status"] == "cancelled":
+        head = f"🛑 Announcement #{broadcast_id} cancelled"
+    return (
+        f"{head}\n\n"
+        f"✅ Sent: {stats['sent']}\n❌ Failed: {stats['failed']}\n"
+        f"🚫 Blocked/Gone: {stats['dead']}\n📊 Total: {stats['total']}"
+    )
 
-# Connect to your existing database
-conn = sqlite3.connect("waifu_bot.db", check_same_thread=False)
-cur = conn.cursor()
 
 @app.on_message(filters.command("announce") & filters.user(OWNER_ID))
 async def announce_cmd(client, message):
@@ -47,40 +57,50 @@ async def announce_cmd(client, message):
             return
         text = parts[1]
 
-    status = await message.reply("📢 Sending announcement...")
-
-    # --- Load users & groups from DB ---
-    try:
-        cur.execute("SELECT user_id FROM users")
-        users = [row[0] for row in cur.fetchall()]
-    except Exception:
-        users = []
-
-    try:
-        cur.execute("SELECT chat_id FROM groups")
-        groups = [row[0] for row in cur.fetchall()]
-    except Exception:
-        groups = []
-
-    total = len(users) + len(groups)
-    sent, failed = 0, 0
-
-    # --- Send to all ---
-    for uid in users + groups:
-        try:
-            if media:
-                if media[0] == "photo":
-                    await app.send_photo(uid, media[1], caption=media[2])
-                elif media[0] == "video":
-                    await app.send_video(uid, media[1], caption=media[2])
-            else:
-                await app.send_message(uid, text)
-            sent += 1
-        except Exception:
-            failed += 1
-        await asyncio.sleep(0.3)  # avoid flood limit
-
-    await status.edit_text(
-        f"📢 Announcement complete!\n\n"
-        f"✅ Sent: {sent}\n❌ Failed: {failed}\n📊 Total: {total}"
+    if not text and not media:
+        await message.reply("❌ Nothing to announce in that message.")
+        return
+
+    # --- Snapshot the audience (users + groups, minus dead chats) ---
+    if media:
+        broadcast_id = await broadcaster.create(media[0], media[2], media[1], message.from_user.id)
+    else:
+        broadcast_id = await broadcaster.create("text", text, None, message.from_user.id)
+
+    status = await message.reply(
+        f"📢 Sending announcement #{broadcast_id}...\n"
+        f"Use `/announcecancel {broadcast_id}` to stop it."
     )
+
+    async def progress(stats):
+        await status.edit_text(_report(broadcast_id, stats))
+
+    # --- Send to all (rate limited, survives restarts) ---
+    stats = await broadcaster.run(broadcast_id, progress=progress)
+    await status.edit_text(_report(broadcast_id, stats, done=True))
+
+
+@app.on_message(filters.command("announcestatus") & filters.user(OWNER_ID))
+async def announce_status_cmd(client, message):
+    parts = message.text.split() if message.text else []
+    if len(parts) > 1 and parts[1].isdigit():
+        broadcast_id = int(parts[1])
+    else:
+        broadcast_id = await broadcaster.db.fetchval("SELECT MAX(id) FROM broadcasts")
+    stats = await broadcaster.stats(broadcast_id) if broadcast_id else None
+    if not stats:
+        await message.reply("❌ No announcement found.")
+        return
+    await message.reply(_report(broadcast_id, stats, done=stats["status"] == "done"))
+
+
+@app.on_message(filters.command("announcecancel") & filters.user(OWNER_ID))
+async def announce_cancel_cmd(client, message):
+    parts = message.text.split() if message.text else []
+    if len(parts) < 2 or not parts[1].isdigit():
+        await message.reply("❌ Usage: `/announcecancel <id>`")
+        return
+    if broadcaster.cancel(int(parts[1])):
+        await message.reply(f"🛑 Stopping announcement #{parts[1]}...")
+    else:
+        await message.reply("❌ That announcement is not running.")
@@ -1,20 +1,36 @@
+from datetime import datetime
 from pyrogram import filters
-from config import app
-from database import Database
+from config import app, OWNER_ID
+from cooldowns import get_cooldowns
+from ledger import get_ledger
 
-db = Database()
+cooldowns = get_cooldowns()
+ledger = get_ledger()
 
 @app.on_message(filters.command("balance"))
 async def balance_cmd(client, message):
     user_id = message.from_user.id
-    daily, weekly, monthly, total, last_claim, given = db.get_crystals(user_id)
+    total = await ledger.balance(user_id)
+    used_at = await cooldowns.last_used(user_id, ("daily", "weekly", "monthly"))
+    last_claim = datetime.utcfromtimestamp(used_at).isoformat() if used_at else None
+
+    history = await ledger.history(user_id, limit=5)
+    recent = "\n".join(f"• {delta:+} ({reason})" for delta, _, reason, _ in history) or "• None"
 
     await message.reply_text(
-        f"💎 Your crystal balance:\n\n"
-        f"• Daily: {daily}\n"
-        f"• Weekly: {weekly}\n"
-        f"• Monthly: {monthly}\n"
-        f"• Given by owner: {given}\n"
-        f"• Total: {total}\n"
+        f"💎 Your crystal balance: {total}\n\n"
+        f"🧾 Recent:\n{recent}\n\n"
         f"⏰ Last claim: {last_claim if last_claim else 'Never'}"
     )
+
+@app.on_message(filters.command("ledgercheck") & filters.user(OWNER_ID))
+async def ledgercheck_cmd(client, message):
+    # /ledgercheck -> report drift, /ledgercheck fix -> rewrite balances from the ledger
+    fix = len(message.command) > 1 and message.command[1].lower() == "fix"
+    drift = await ledger.reconcile(fix=fix)
+    if not drift:
+        return await message.reply_text("✅ Every cached balance matches the ledger.")
+    lines = [f"• {uid}: cached {cached} / ledger {logged}" for uid, cached, logged in drift[:20]]
+    more = f"\n…and {len(drift) - 20} more" if len(drift) > 20 else ""
+    head = f"🔧 Fixed {len(drift)} balances" if fix else f"⚠️ {len(drift)} balances drifted (use /ledgercheck fix)"
+    await message.reply_text(head + ":\n" + "\n".join(lines) + more)
@@ -12,22 +12,24 @@ Notes:
  - Owner ID taken from Config.OWNER_ID or fallback 7558715645.
 """
 
-import sqlite3
 import time
 import io
 import os
 import random
 import traceback
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery
 from config import app, Config
+from database import get_db
+from jobs import get_jobs
+from router import get_router, choice, digits
 
-DB_PATH = "waifu_bot.db"
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
+db = get_db()
+router = get_router()
+jobs = get_jobs()
 
 # Bank owner config
 BANK_OWNER_ID = getattr(Config, "OWNER_ID", 7558715645)
@@ -48,144 +50,14 @@ ATM_WITHDRAW_FEE = {"normal": 50, "standard": 25, "platinum": 10}
 ATM_DAILY_LIMIT = {"normal": 15_000, "standard": 60_000, "platinum": 300_000}
 
 
-# ----------------- Safe DB schema creation + migrations -----------------
-def table_columns(table_name: str):
+# ----------------- Schema helpers (tables live in migrations.py) -----------------
+async def table_columns(table_name: str):
     try:
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        return [r[1] for r in cursor.fetchall()]
+        return [r[1] for r in await db.fetchall(f"PRAGMA table_info({table_name})")]
     except Exception:
         return []
 
 
-def add_column_if_missing(table: str, column_def: str):
-    """
-    column_def example: "card_number TEXT"
-    This will extract column name and add it if missing.
-    """
-    try:
-        colname = column_def.split()[0]
-        cols = table_columns(table)
-        if colname not in cols:
-            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_def}")
-            conn.commit()
-    except sqlite3.OperationalError as e:
-        # If ALTER TABLE not allowed or other error, just skip (avoid crash)
-        print(f"[bank migrations] Could not add column {column_def} to {table}: {e}")
-    except Exception as e:
-        print(f"[bank migrations] Unexpected error adding column {column_def} to {table}: {e}")
-
-
-# Create base tables (non-destructive)
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS bank_accounts (
-    user_id INTEGER PRIMARY KEY,
-    balance INTEGER DEFAULT 0,
-    created_at TEXT,
-    atm_tier TEXT DEFAULT 'normal'
-)
-""")
-
-# safe: add account_no column if missing
-add_column_if_missing("bank_accounts", "account_no TEXT")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS bank_transactions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    type TEXT,
-    amount INTEGER,
-    balance_after INTEGER,
-    note TEXT,
-    created_at TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS bank_loans (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    amount INTEGER,
-    interest REAL,
-    total_due INTEGER,
-    status TEXT DEFAULT 'pending',
-    created_at TEXT,
-    due_at TEXT,
-    approved_by INTEGER
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS bank_pending_ops (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    op_type TEXT,
-    from_user INTEGER,
-    to_user INTEGER,
-    amount INTEGER,
-    status TEXT DEFAULT 'pending',
-    created_at TEXT
-)
-""")
-
-# create atm table with minimal columns; we'll add extras with migrations
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS bank_atmcards (
-    user_id INTEGER,
-    tier TEXT,
-    purchased_at TEXT,
-    PRIMARY KEY (user_id, tier)
-)
-""")
-# Add missing atm columns (safe)
-add_column_if_missing("bank_atmcards", "card_number TEXT")
-add_column_if_missing("bank_atmcards", "cvv TEXT")
-add_column_if_missing("bank_atmcards", "expiry TEXT")
-add_column_if_missing("bank_atmcards", "holder_name TEXT")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS bank_atm_transactions (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    tier TEXT,
-    amount INTEGER,
-    fee INTEGER,
-    balance_after INTEGER,
-    created_at TEXT,
-    atm_card TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS bank_escrow (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    item_type TEXT,
-    item_id INTEGER,
-    description TEXT,
-    created_at TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS bank_settings (
-    key TEXT PRIMARY KEY,
-    value TEXT
-)
-""")
-
-# ensure user_waifus exists (many other handlers expect it)
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS user_waifus (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id INTEGER,
-    waifu_id INTEGER,
-    amount INTEGER DEFAULT 0,
-    UNIQUE(user_id, waifu_id)
-)
-""")
-
-conn.commit()
-
-
 # ----------------- Helpers -----------------
 def now_iso():
     return datetime.utcnow().replace(microsecond=0).isoformat()
@@ -226,72 +98,85 @@ def generate_account_number(user_id: int) -> str:
 
 
 # Account utilities
-def ensure_account(user_id: int):
-    cursor.execute("SELECT user_id, account_no FROM bank_accounts WHERE user_id = ?", (user_id,))
-    r = cursor.fetchone()
+# The _underscored variants take a pooled connection so several of them can be
+# composed into one transaction via db.run(); the async wrappers are what
+# handlers call.
+def _ensure_account(conn, user_id: int):
+    r = conn.execute("SELECT user_id, account_no FROM bank_accounts WHERE user_id = ?", (user_id,)).fetchone()
     if not r:
         account_no = generate_account_number(user_id)
-        cursor.execute("INSERT INTO bank_accounts (user_id, balance, created_at, account_no) VALUES (?, ?, ?, ?)",
-                       (user_id, 0, now_iso(), account_no))
-        conn.commit()
+        conn.execute("INSERT INTO bank_accounts (user_id, balance, created_at, account_no) VALUES (?, ?, ?, ?)",
+                     (user_id, 0, now_iso(), account_no))
     else:
         if not r[1]:
             acc = generate_account_number(user_id)
-            cursor.execute("UPDATE bank_accounts SET account_no = ? WHERE user_id = ?", (acc, user_id))
-            conn.commit()
+            conn.execute("UPDATE bank_accounts SET account_no = ? WHERE user_id = ?", (acc, user_id))
 
 
-def get_balance(user_id: int) -> int:
-    cursor.execute("SELECT balance FROM bank_accounts WHERE user_id = ?", (user_id,))
-    r = cursor.fetchone()
+def _get_balance(conn, user_id: int) -> int:
+    r = conn.execute("SELECT balance FROM bank_accounts WHERE user_id = ?", (user_id,)).fetchone()
     return int(r[0]) if r and r[0] is not None else 0
 
 
-def set_balance(user_id: int, new_balance: int, note: str = ""):
-    ensure_account(user_id)
-    cursor.execute("UPDATE bank_accounts SET balance = ? WHERE user_id = ?", (int(new_balance), user_id))
-    cursor.execute("INSERT INTO bank_transactions (user_id, type, amount, balance_after, note, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-                   (user_id, "admin_adjust", int(new_balance), int(new_balance), note or "Balance set by system", now_iso()))
-    conn.commit()
+def _set_balance(conn, user_id: int, new_balance: int, note: str = ""):
+    _ensure_account(conn, user_id)
+    conn.execute("UPDATE bank_accounts SET balance = ? WHERE user_id = ?", (int(new_balance), user_id))
+    conn.execute("INSERT INTO bank_transactions (user_id, type, amount, balance_after, note, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                 (user_id, "admin_adjust", int(new_balance), int(new_balance), note or "Balance set by system", now_iso()))
 
 
-def add_balance(user_id: int, delta: int, tx_type: str = "deposit", note: str = ""):
-    ensure_account(user_id)
-    bal = get_balance(user_id)
+def _add_balance(conn, user_id: int, delta: int, tx_type: str = "deposit", note: str = ""):
+    _ensure_account(conn, user_id)
+    bal = _get_balance(conn, user_id)
     new_bal = int(bal) + int(delta)
-    cursor.execute("UPDATE bank_accounts SET balance = ? WHERE user_id = ?", (new_bal, user_id))
-    cursor.execute("INSERT INTO bank_transactions (user_id, type, amount, balance_after, note, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-                   (user_id, tx_type, int(delta), new_bal, note or "", now_iso()))
-    conn.commit()
+    conn.execute("UPDATE bank_accounts SET balance = ? WHERE user_id = ?", (new_bal, user_id))
+    conn.execute("INSERT INTO bank_transactions (user_id, type, amount, balance_after, note, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                 (user_id, tx_type, int(delta), new_bal, note or "", now_iso()))
     return new_bal
 
 
-def bank_reserve_total() -> int:
-    cursor.execute("SELECT SUM(balance) FROM bank_accounts")
-    r = cursor.fetchone()
-    return int(r[0]) if r and r[0] is not None else 0
-
-
-def get_account_no(user_id: int) -> str:
-    cursor.execute("SELECT account_no FROM bank_accounts WHERE user_id = ?", (user_id,))
-    r = cursor.fetchone()
+def _get_account_no(conn, user_id: int) -> str:
+    r = conn.execute("SELECT account_no FROM bank_accounts WHERE user_id = ?", (user_id,)).fetchone()
     if r and r[0]:
         return r[0]
     acc = generate_account_number(user_id)
-    cursor.execute("UPDATE bank_accounts SET account_no = ? WHERE user_id = ?", (acc, user_id))
-    conn.commit()
+    conn.execute("UPDATE bank_accounts SET account_no = ? WHERE user_id = ?", (acc, user_id))
     return acc
 
 
+async def ensure_account(user_id: int):
+    await db.run(_ensure_account, user_id)
+
+
+async def get_balance(user_id: int) -> int:
+    return await db.run(_get_balance, user_id)
+
+
+async def set_balance(user_id: int, new_balance: int, note: str = ""):
+    await db.run(_set_balance, user_id, new_balance, note)
+
+
+async def add_balance(user_id: int, delta: int, tx_type: str = "deposit", note: str = ""):
+    return await db.run(_add_balance, user_id, delta, tx_type, note)
+
+
+async def bank_reserve_total() -> int:
+    return int(await db.fetchval("SELECT SUM(balance) FROM bank_accounts", default=0))
+
+
+async def get_account_no(user_id: int) -> str:
+    return await db.run(_get_account_no, user_id)
+
+
 # ----------------- Commands (keeps previous behavior) -----------------
 @app.on_message(filters.command("bank"))
 async def cmd_bank(client, message: Message):
-    total_accounts = cursor.execute("SELECT COUNT(*) FROM bank_accounts").fetchone()[0]
-    total_balance = bank_reserve_total()
-    atm_counts = cursor.execute("SELECT tier, COUNT(*) FROM bank_atmcards GROUP BY tier").fetchall()
+    total_accounts = await db.fetchval("SELECT COUNT(*) FROM bank_accounts", default=0)
+    total_balance = await bank_reserve_total()
+    atm_counts = await db.fetchall("SELECT tier, COUNT(*) FROM bank_atmcards GROUP BY tier")
     atm_info = "\n".join([f"  - {t}: {c}" for t, c in atm_counts]) if atm_counts else "  - None"
-    loan_pending = cursor.execute("SELECT COUNT(*) FROM bank_loans WHERE status = 'pending'").fetchone()[0]
-    loan_active = cursor.execute("SELECT COUNT(*) FROM bank_loans WHERE status = 'approved'").fetchone()[0]
+    loan_pending = await db.fetchval("SELECT COUNT(*) FROM bank_loans WHERE status = 'pending'", default=0)
+    loan_active = await db.fetchval("SELECT COUNT(*) FROM bank_loans WHERE status = 'approved'", default=0)
 
     text = (
         f"🏦 {BANK_NAME}\n"
@@ -316,14 +201,14 @@ async def cmd_bank(client, message: Message):
 @app.on_message(filters.command("openaccount"))
 async def cmd_openaccount(client, message: Message):
     user = message.from_user
-    ensure_account(user.id)
+    await ensure_account(user.id)
     await message.reply_text(f"✅ Account opened for {user.first_name}.\nUse /passbook to view history and /atmcard to get an ATM card.")
 
 
 @app.on_message(filters.command("atmcard"))
 async def cmd_atmcard(client, message: Message):
     user = message.from_user
-    ensure_account(user.id)
+    await ensure_account(user.id)
     parts = (message.text or "").strip().split()
     tier = None
     if len(parts) >= 2:
@@ -344,12 +229,12 @@ async def cmd_atmcard(client, message: Message):
         return
 
     price = ATM_PRICES[tier]
-    bal = get_balance(user.id)
+    bal = await get_balance(user.id)
     if bal < price:
         await message.reply_text(f"❌ You need {format_currency(price)} to buy the {tier} ATM card. Your balance: {format_currency(bal)}")
         return
 
-    new_bal = add_balance(user.id, -price, tx_type="atm_purchase", note=f"Bought {tier} ATM card")
+    new_bal = await add_balance(user.id, -price, tx_type="atm_purchase", note=f"Bought {tier} ATM card")
     card_number = generate_card_number()
     cvv = generate_cvv()
     expiry = generate_expiry_years(3)
@@ -358,35 +243,26 @@ async def cmd_atmcard(client, message: Message):
 
     # use INSERT OR REPLACE to keep table shape even if columns absent (migrations added them prior)
     try:
-        cursor.execute("""INSERT OR REPLACE INTO bank_atmcards
-                          (user_id, tier, purchased_at, card_number, cvv, expiry, holder_name)
-                          VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                       (user.id, tier, purchased_at, card_number, cvv, expiry, holder_name))
-        conn.commit()
+        await db.execute("""INSERT OR REPLACE INTO bank_atmcards
+                            (user_id, tier, purchased_at, card_number, cvv, expiry, holder_name)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                         (user.id, tier, purchased_at, card_number, cvv, expiry, holder_name))
     except Exception:
         # fallback if DB somehow doesn't accept new columns: insert into existing columns
         try:
-            cursor.execute("INSERT OR REPLACE INTO bank_atmcards (user_id, tier, purchased_at) VALUES (?, ?, ?)",
-                           (user.id, tier, purchased_at))
-            conn.commit()
+            await db.execute("INSERT OR REPLACE INTO bank_atmcards (user_id, tier, purchased_at) VALUES (?, ?, ?)",
+                             (user.id, tier, purchased_at))
         except Exception as e:
             print(f"[atmcard] fallback insert failed: {e}")
 
     await message.reply_text(
         f"✅ Purchased {tier} ATM card for {format_currency(price)}.\n"
-        f"Card: {mask_card_number(card_number)}\nExpiry: {expiry}\nCVV: {cvv}\nAccount no: {get_account_no(user.id)}\nNew balance: {format_currency(new_bal)}"
+        f"Card: {mask_card_number(card_number)}\nExpiry: {expiry}\nCVV: {cvv}\nAccount no: {await get_account_no(user.id)}\nNew balance: {format_currency(new_bal)}"
     )
 
 
-@app.on_callback_query(filters.regex(r"^bank_atm_buy:(\d+):(normal|standard|platinum)$"))
-async def cb_atm_buy(client, callback: CallbackQuery):
-    try:
-        user_id = int(callback.matches[0].group(1))
-        tier = callback.matches[0].group(2)
-    except Exception:
-        await callback.answer("Invalid data", show_alert=True)
-        return
-
+@router.route("bank_atm_buy", digits, choice("normal", "standard", "platinum"))
+async def cb_atm_buy(client, callback: CallbackQuery, user_id, tier):
     caller = callback.from_user
     if caller.id != user_id:
         await callback.answer("This selection is for the user who opened the menu.", show_alert=True)
@@ -397,12 +273,12 @@ async def cb_atm_buy(client, callback: CallbackQuery):
         await callback.answer("Invalid tier.", show_alert=True)
         return
 
-    bal = get_balance(user_id)
+    bal = await get_balance(user_id)
     if bal < price:
         await callback.answer(f"Not enough balance. You need {format_currency(price)}.", show_alert=True)
         return
 
-    new_bal = add_balance(user_id, -price, tx_type="atm_purchase", note=f"Bought {tier} ATM card")
+    new_bal = await add_balance(user_id, -price, tx_type="atm_purchase", note=f"Bought {tier} ATM card")
     card_number = generate_card_number()
     cvv = generate_cvv()
     expiry = generate_expiry_years(3)
@@ -410,23 +286,21 @@ async def cb_atm_buy(client, callback: CallbackQuery):
     purchased_at = now_iso()
 
     try:
-        cursor.execute("""INSERT OR REPLACE INTO bank_atmcards
-                          (user_id, tier, purchased_at, card_number, cvv, expiry, holder_name)
-                          VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                       (user_id, tier, purchased_at, card_number, cvv, expiry, holder_name))
-        conn.commit()
+        await db.execute("""INSERT OR REPLACE INTO bank_atmcards
+                            (user_id, tier, purchased_at, card_number, cvv, expiry, holder_name)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                         (user_id, tier, purchased_at, card_number, cvv, expiry, holder_name))
     except Exception:
         try:
-            cursor.execute("INSERT OR REPLACE INTO bank_atmcards (user_id, tier, purchased_at) VALUES (?, ?, ?)",
-                           (user_id, tier, purchased_at))
-            conn.commit()
+            await db.execute("INSERT OR REPLACE INTO bank_atmcards (user_id, tier, purchased_at) VALUES (?, ?, ?)",
+                             (user_id, tier, purchased_at))
         except Exception as e:
             print(f"[cb_atm_buy] fallback insert failed: {e}")
 
     try:
         await callback.message.edit_text(
             f"✅ Purchased {tier} ATM card for {format_currency(price)}.\n"
-            f"Card: {mask_card_number(card_number)}\nExpiry: {expiry}\nCVV: {cvv}\nAccount no: {get_account_no(user_id)}\nNew balance: {format_currency(new_bal)}"
+            f"Card: {mask_card_number(card_number)}\nExpiry: {expiry}\nCVV: {cvv}\nAccount no: {await get_account_no(user_id)}\nNew balance: {format_currency(new_bal)}"
         )
     except Exception:
         pass
@@ -455,7 +329,7 @@ async def cmd_atm_view(client, message: Message):
         return
 
     # Query columns safely; if new columns absent, fetch what exists
-    cols = table_columns("bank_atmcards")
+    cols = await table_columns("bank_atmcards")
     select_cols = ["tier", "purchased_at"]
     if "card_number" in cols:
         select_cols.append("card_number")
@@ -467,8 +341,7 @@ async def cmd_atm_view(client, message: Message):
         select_cols.append("holder_name")
 
     q = f"SELECT {', '.join(select_cols)} FROM bank_atmcards WHERE user_id = ?"
-    cursor.execute(q, (target_id,))
-    rows = cursor.fetchall()
+    rows = await db.fetchall(q, (target_id,))
     if not rows:
         await message.reply_text("ℹ️ No ATM card found for that user (they need to buy one with /atmcard).")
         return
@@ -485,7 +358,7 @@ async def cmd_atm_view(client, message: Message):
             f"CVV: {data.get('cvv','—')}\n"
             f"Expiry: {data.get('expiry','—')}\n"
             f"Created: {data.get('purchased_at','—')}\n"
-            f"Account No: {get_account_no(target_id)}\n"
+            f"Account No: {await get_account_no(target_id)}\n"
             "—"
         )
     text = f"ATM cards for user {target_id}:\n\n" + "\n\n".join(lines)
@@ -517,9 +390,8 @@ async def cmd_atmmachine(client, message: Message):
         await message.reply_text("Amount must be positive.")
         return
 
-    ensure_account(user.id)
-    cursor.execute("SELECT tier, card_number, cvv, expiry, purchased_at FROM bank_atmcards WHERE user_id = ? ORDER BY CASE tier WHEN 'platinum' THEN 3 WHEN 'standard' THEN 2 ELSE 1 END DESC LIMIT 1", (user.id,))
-    card = cursor.fetchone()
+    await ensure_account(user.id)
+    card = await db.fetchone("SELECT tier, card_number, cvv, expiry, purchased_at FROM bank_atmcards WHERE user_id = ? ORDER BY CASE tier WHEN 'platinum' THEN 3 WHEN 'standard' THEN 2 ELSE 1 END DESC LIMIT 1", (user.id,))
     if not card:
         await message.reply_text("❌ You don't own an ATM card. Buy one with /atmcard.")
         return
@@ -533,8 +405,7 @@ async def cmd_atmmachine(client, message: Message):
         return
 
     since = (datetime.utcnow() - timedelta(days=1)).replace(microsecond=0).isoformat()
-    cursor.execute("SELECT SUM(amount) FROM bank_atm_transactions WHERE user_id = ? AND created_at >= ?", (user.id, since))
-    today_sum = cursor.fetchone()[0] or 0
+    today_sum = await db.fetchval("SELECT SUM(amount) FROM bank_atm_transactions WHERE user_id = ? AND created_at >= ?", (user.id, since), default=0)
     daily_limit = ATM_DAILY_LIMIT.get(tier, ATM_DAILY_LIMIT["normal"])
     if (today_sum + amount) > daily_limit:
         await message.reply_text(f"❌ Daily withdrawal limit reached/exceeded for your {tier} card. Daily limit: {daily_limit:,} {CURRENCY}. Already withdrawn today: {today_sum:,}.")
@@ -542,18 +413,17 @@ async def cmd_atmmachine(client, message: Message):
 
     fee = ATM_WITHDRAW_FEE.get(tier, 0)
     total_debit = amount + fee
-    bal = get_balance(user.id)
+    bal = await get_balance(user.id)
     if bal < total_debit:
         await message.reply_text(f"❌ Insufficient balance. Withdrawal amount + fee = {total_debit:,}. Your balance: {bal:,}.")
         return
 
-    new_bal = add_balance(user.id, -total_debit, tx_type="atm_withdraw", note=f"ATM withdraw {amount} (fee {fee})")
+    new_bal = await add_balance(user.id, -total_debit, tx_type="atm_withdraw", note=f"ATM withdraw {amount} (fee {fee})")
     try:
-        cursor.execute("INSERT INTO bank_atm_transactions (user_id, tier, amount, fee, balance_after, created_at, atm_card) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                       (user.id, tier, amount, fee, new_bal, now_iso(), mask_card_number(card_number)))
-        conn.commit()
-    except Exception:
-        conn.commit()
+        await db.execute("INSERT INTO bank_atm_transactions (user_id, tier, amount, fee, balance_after, created_at, atm_card) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (user.id, tier, amount, fee, new_bal, now_iso(), mask_card_number(card_number)))
+    except Exception as e:
+        print(f"[atmmachine] could not log ATM transaction: {e}")
 
     try:
         await message.reply_text(f"✅ Withdrawal successful.\nDispensed: {amount:,} {CURRENCY}\nFee: {fee:,} {CURRENCY}\nNew balance: {new_bal:,} {CURRENCY}\nCard: {mask_card_number(card_number)} (tier: {tier})")
@@ -577,10 +447,9 @@ async def cmd_atmmachine(client, message: Message):
 @app.on_message(filters.command("passbook"))
 async def cmd_passbook(client, message: Message):
     user = message.from_user
-    ensure_account(user.id)
+    await ensure_account(user.id)
 
-    cursor.execute("SELECT id, type, amount, balance_after, note, created_at FROM bank_transactions WHERE user_id = ? ORDER BY id DESC LIMIT 200", (user.id,))
-    rows = cursor.fetchall()
+    rows = await db.fetchall("SELECT id, type, amount, balance_after, note, created_at FROM bank_transactions WHERE user_id = ? ORDER BY id DESC LIMIT 200", (user.id,))
 
     if not rows:
         await message.reply_text("ℹ️ No transactions found for your account.")
@@ -619,7 +488,7 @@ async def cmd_amount(client, message: Message):
         if user.id != BANK_OWNER_ID:
             await message.reply_text("❌ Only the bank owner can use /amount total.")
             return
-        total = bank_reserve_total()
+        total = await bank_reserve_total()
         await message.reply_text(f"🏦 Bank total reserves: {format_currency(total)}")
         return
 
@@ -632,12 +501,12 @@ async def cmd_amount(client, message: Message):
         if user.id != BANK_OWNER_ID:
             await message.reply_text("❌ Only bank owner may check other users' balances.")
             return
-        bal = get_balance(target_id)
+        bal = await get_balance(target_id)
         await message.reply_text(f"User {target_id} balance: {format_currency(bal)}")
         return
 
-    ensure_account(user.id)
-    bal = get_balance(user.id)
+    await ensure_account(user.id)
+    bal = await get_balance(user.id)
     await message.reply_text(f"💰 Your balance: {format_currency(bal)}")
 
 
@@ -663,10 +532,9 @@ async def cmd_loan(client, message: Message):
     created_at = now_iso()
     due_at = (datetime.utcnow() + timedelta(days=LOAN_DURATION_DAYS)).replace(microsecond=0).isoformat()
 
-    cursor.execute("INSERT INTO bank_loans (user_id, amount, interest, total_due, status, created_at, due_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                   (user.id, amount, interest, total_due, "pending", created_at, due_at))
-    loan_id = cursor.lastrowid
-    conn.commit()
+    cur = await db.execute("INSERT INTO bank_loans (user_id, amount, interest, total_due, status, created_at, due_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (user.id, amount, interest, total_due, "pending", created_at, due_at))
+    loan_id = cur.lastrowid
 
     caption = (
         f"💳 Loan Request #{loan_id}\n\n"
@@ -689,17 +557,15 @@ async def cmd_loan(client, message: Message):
     await message.reply_text(f"✅ Loan request #{loan_id} submitted. Owner will review it.")
 
 
-@app.on_callback_query(filters.regex(r"^bank_loan_approve:(\d+)$"))
-async def cb_loan_approve(client, callback: CallbackQuery):
-    loan_id = int(callback.matches[0].group(1))
+@router.route("bank_loan_approve", digits)
+async def cb_loan_approve(client, callback: CallbackQuery, loan_id):
     user = callback.from_user
 
     if user.id != BANK_OWNER_ID:
         await callback.answer("Only the bank owner may approve loans.", show_alert=True)
         return
 
-    cursor.execute("SELECT id, user_id, amount, total_due, status FROM bank_loans WHERE id = ?", (loan_id,))
-    row = cursor.fetchone()
+    row = await db.fetchone("SELECT id, user_id, amount, total_due, status FROM bank_loans WHERE id = ?", (loan_id,))
     if not row:
         await callback.answer("Loan not found.", show_alert=True)
         return
@@ -708,9 +574,17 @@ async def cb_loan_approve(client, callback: CallbackQuery):
         await callback.answer(f"Loan is already {status}.", show_alert=True)
         return
 
-    add_balance(borrower_id, int(amount), tx_type="loan_disburse", note=f"Loan #{loan_id} approved")
-    cursor.execute("UPDATE bank_loans SET status = ?, approved_by = ? WHERE id = ?", ("approved", user.id, loan_id))
-    conn.commit()
+    def approve(conn):
+        _add_balance(conn, borrower_id, int(amount), tx_type="loan_disburse", note=f"Loan #{loan_id} approved")
+        conn.execute("UPDATE bank_loans SET status = ?, approved_by = ? WHERE id = ?", ("approved", user.id, loan_id))
+
+    await db.run(approve)
+    due_at = await db.fetchval("SELECT due_at FROM bank_loans WHERE id = ?", (loan_id,))
+    try:
+        due_ts = datetime.fromisoformat(due_at).replace(tzinfo=timezone.utc).timestamp()
+    except Exception:
+        due_ts = time.time() + LOAN_DURATION_DAYS * 86400
+    await jobs.schedule("loan_due", loan_id, due_ts)
 
     try:
         await client.send_message(borrower_id, f"🎉 Your loan #{loan_id} for {format_currency(amount)} was approved by the bank owner. Total due: {format_currency(total_due)}")
@@ -725,16 +599,30 @@ async def cb_loan_approve(client, callback: CallbackQuery):
     await callback.answer("Loan approved.")
 
 
-@app.on_callback_query(filters.regex(r"^bank_loan_decline:(\d+)$"))
-async def cb_loan_decline(client, callback: CallbackQuery):
-    loan_id = int(callback.matches[0].group(1))
+@jobs.task("loan_due")
+async def loan_due_job(client, loan_id, payload):
+    """Loan reached its due time: remind the borrower and the bank owner (no automatic seizure)"""
+    row = await db.fetchone("SELECT user_id, total_due, status FROM bank_loans WHERE id = ?", (int(loan_id),))
+    if not row or row[2] != "approved":
+        return
+    borrower_id, total_due = row[0], row[1]
+    try:
+        await client.send_message(borrower_id, f"⏰ Your loan #{loan_id} is now due: {format_currency(total_due)}. "
+                                               f"The bank owner may collect it from your inventory.")
+    except Exception:
+        pass
+    await client.send_message(BANK_OWNER_ID, f"⏰ Loan #{loan_id} of `{borrower_id}` is overdue "
+                                             f"({format_currency(total_due)}).\nUse /collectloan {loan_id} to default it.")
+
+
+@router.route("bank_loan_decline", digits)
+async def cb_loan_decline(client, callback: CallbackQuery, loan_id):
     user = callback.from_user
     if user.id != BANK_OWNER_ID:
         await callback.answer("Only the bank owner may decline loans.", show_alert=True)
         return
 
-    cursor.execute("SELECT id, user_id, status FROM bank_loans WHERE id = ?", (loan_id,))
-    row = cursor.fetchone()
+    row = await db.fetchone("SELECT id, user_id, status FROM bank_loans WHERE id = ?", (loan_id,))
     if not row:
         await callback.answer("Loan not found.", show_alert=True)
         return
@@ -743,8 +631,7 @@ async def cb_loan_decline(client, callback: CallbackQuery):
         await callback.answer(f"Loan already {row[2]}.", show_alert=True)
         return
 
-    cursor.execute("UPDATE bank_loans SET status = ? WHERE id = ?", ("declined", loan_id))
-    conn.commit()
+    await db.execute("UPDATE bank_loans SET status = ? WHERE id = ?", ("declined", loan_id))
 
     borrower = row[1]
     try:
@@ -784,10 +671,9 @@ async def cmd_givealsia(client, message: Message):
 
     target = message.reply_to_message.from_user
     created_at = now_iso()
-    cursor.execute("INSERT INTO bank_pending_ops (op_type, from_user, to_user, amount, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-                   ("give", owner.id, target.id, amount, "pending", created_at))
-    op_id = cursor.lastrowid
-    conn.commit()
+    cur = await db.execute("INSERT INTO bank_pending_ops (op_type, from_user, to_user, amount, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                           ("give", owner.id, target.id, amount, "pending", created_at))
+    op_id = cur.lastrowid
 
     caption = f"🎁 Bank Give Proposal #{op_id}\nFrom: {owner.first_name}\nTo: {target.first_name} (ID: {target.id})\nAmount: {format_currency(amount)}\n\n{target.first_name}, do you accept?"
     kb = InlineKeyboardMarkup([
@@ -830,13 +716,13 @@ async def cmd_takealisa(client, message: Message):
         force = True
 
     target = message.reply_to_message.from_user
-    bal = get_balance(target.id)
+    bal = await get_balance(target.id)
     if force:
         take_amount = min(bal, amount)
         if take_amount <= 0:
             await message.reply_text("User has no balance to take.")
             return
-        new_bal = add_balance(target.id, -take_amount, tx_type="admin_withdraw", note=f"Force taken by owner")
+        new_bal = await add_balance(target.id, -take_amount, tx_type="admin_withdraw", note=f"Force taken by owner")
         await message.reply_text(f"✅ Force-taken {format_currency(take_amount)} from {target.first_name}. New balance: {format_currency(new_bal)}")
         try:
             await client.send_message(target.id, f"⚠️ {format_currency(take_amount)} was taken from your bank account by the owner.")
@@ -845,10 +731,9 @@ async def cmd_takealisa(client, message: Message):
         return
 
     created_at = now_iso()
-    cursor.execute("INSERT INTO bank_pending_ops (op_type, from_user, to_user, amount, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-                   ("take", owner.id, target.id, amount, "pending", created_at))
-    op_id = cursor.lastrowid
-    conn.commit()
+    cur = await db.execute("INSERT INTO bank_pending_ops (op_type, from_user, to_user, amount, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                           ("take", owner.id, target.id, amount, "pending", created_at))
+    op_id = cur.lastrowid
 
     caption = f"⚠️ Bank Take Proposal #{op_id}\nFrom: {owner.first_name}\nTo: {target.first_name} (ID: {target.id})\nAmount: {format_currency(amount)}\n\n{target.first_name}, do you accept giving this amount? (Decline to refuse)"
     kb = InlineKeyboardMarkup([
@@ -864,13 +749,11 @@ async def cmd_takealisa(client, message: Message):
     await message.reply_text(f"✅ Take proposal #{op_id} sent to the user.")
 
 
-@app.on_callback_query(filters.regex(r"^bank_op_accept:(\d+)$"))
-async def cb_bank_op_accept(client, callback: CallbackQuery):
-    op_id = int(callback.matches[0].group(1))
+@router.route("bank_op_accept", digits)
+async def cb_bank_op_accept(client, callback: CallbackQuery, op_id):
     caller = callback.from_user
 
-    cursor.execute("SELECT id, op_type, from_user, to_user, amount, status FROM bank_pending_ops WHERE id = ?", (op_id,))
-    row = cursor.fetchone()
+    row = await db.fetchone("SELECT id, op_type, from_user, to_user, amount, status FROM bank_pending_ops WHERE id = ?", (op_id,))
     if not row:
         await callback.answer("Operation not found.", show_alert=True)
         return
@@ -883,9 +766,12 @@ async def cb_bank_op_accept(client, callback: CallbackQuery):
         return
 
     if op_type == "give":
-        new_bal = add_balance(to_user, int(amount), tx_type="admin_deposit", note=f"Owner gave funds (op#{op_id})")
-        cursor.execute("UPDATE bank_pending_ops SET status = ? WHERE id = ?", ("accepted", op_id))
-        conn.commit()
+        def accept_give(conn):
+            new_bal = _add_balance(conn, to_user, int(amount), tx_type="admin_deposit", note=f"Owner gave funds (op#{op_id})")
+            conn.execute("UPDATE bank_pending_ops SET status = ? WHERE id = ?", ("accepted", op_id))
+            return new_bal
+
+        new_bal = await db.run(accept_give)
         try:
             await callback.message.edit_reply_markup(None)
         except Exception:
@@ -902,16 +788,18 @@ async def cb_bank_op_accept(client, callback: CallbackQuery):
         return
 
     if op_type == "take":
-        bal = get_balance(to_user)
+        bal = await get_balance(to_user)
         take_amount = min(int(amount), bal)
         if take_amount <= 0:
-            cursor.execute("UPDATE bank_pending_ops SET status = ? WHERE id = ?", ("cancelled", op_id))
-            conn.commit()
+            await db.execute("UPDATE bank_pending_ops SET status = ? WHERE id = ?", ("cancelled", op_id))
             await callback.answer("You have no balance to give.")
             return
-        new_bal = add_balance(to_user, -take_amount, tx_type="admin_withdraw", note=f"User accepted take (op#{op_id})")
-        cursor.execute("UPDATE bank_pending_ops SET status = ? WHERE id = ?", ("accepted", op_id))
-        conn.commit()
+        def accept_take(conn):
+            new_bal = _add_balance(conn, to_user, -take_amount, tx_type="admin_withdraw", note=f"User accepted take (op#{op_id})")
+            conn.execute("UPDATE bank_pending_ops SET status = ? WHERE id = ?", ("accepted", op_id))
+            return new_bal
+
+        new_bal = await db.run(accept_take)
         try:
             await callback.message.edit_reply_markup(None)
         except Exception:
@@ -930,13 +818,11 @@ async def cb_bank_op_accept(client, callback: CallbackQuery):
     await callback.answer("Unknown operation type.", show_alert=True)
 
 
-@app.on_callback_query(filters.regex(r"^bank_op_decline:(\d+)$"))
-async def cb_bank_op_decline(client, callback: CallbackQuery):
-    op_id = int(callback.matches[0].group(1))
+@router.route("bank_op_decline", digits)
+async def cb_bank_op_decline(client, callback: CallbackQuery, op_id):
     caller = callback.from_user
 
-    cursor.execute("SELECT id, op_type, from_user, to_user, amount, status FROM bank_pending_ops WHERE id = ?", (op_id,))
-    row = cursor.fetchone()
+    row = await db.fetchone("SELECT id, op_type, from_user, to_user, amount, status FROM bank_pending_ops WHERE id = ?", (op_id,))
     if not row:
         await callback.answer("Operation not found.", show_alert=True)
         return
@@ -948,8 +834,7 @@ async def cb_bank_op_decline(client, callback: CallbackQuery):
         await callback.answer(f"Operation already {status}.", show_alert=True)
         return
 
-    cursor.execute("UPDATE bank_pending_ops SET status = ? WHERE id = ?", ("declined", op_id))
-    conn.commit()
+    await db.execute("UPDATE bank_pending_ops SET status = ? WHERE id = ?", ("declined", op_id))
     try:
         await callback.message.edit_reply_markup(None)
     except Exception:
@@ -979,8 +864,7 @@ async def cmd_collectloan(client, message: Message):
         await message.reply_text("Invalid loan id.")
         return
 
-    cursor.execute("SELECT id, user_id, amount, total_due, status, due_at FROM bank_loans WHERE id = ?", (loan_id,))
-    row = cursor.fetchone()
+    row = await db.fetchone("SELECT id, user_id, amount, total_due, status, due_at FROM bank_loans WHERE id = ?", (loan_id,))
     if not row:
         await message.reply_text("Loan not found.")
         return
@@ -999,25 +883,27 @@ async def cmd_collectloan(client, message: Message):
         await message.reply_text(f"Loan #{loan_id} is not overdue yet. Due at: {due_at}")
         return
 
-    cursor.execute("UPDATE bank_loans SET status = ? WHERE id = ?", ("defaulted", loan_id))
-    try:
-        cursor.execute("SELECT cricketer_id, amount FROM user_cricketers WHERE user_id = ?", (user_id,))
-        waifus = cursor.fetchall()
+    await db.execute("UPDATE bank_loans SET status = ? WHERE id = ?", ("defaulted", loan_id))
+
+    def seize(conn):
+        waifus = conn.execute("SELECT cricketer_id, amount FROM user_cricketers WHERE user_id = ?", (user_id,)).fetchall()
         seized = 0
         if waifus:
             for wid, amt in waifus:
-                cursor.execute("INSERT INTO bank_escrow (user_id, item_type, item_id, description, created_at) VALUES (?, ?, ?, ?, ?)",
-                               (user_id, "cricketers", wid, f"Seized for loan #{loan_id}", now_iso()))
+                conn.execute("INSERT INTO bank_escrow (user_id, item_type, item_id, description, created_at) VALUES (?, ?, ?, ?, ?)",
+                             (user_id, "cricketers", wid, f"Seized for loan #{loan_id}", now_iso()))
                 seized += 1
-            cursor.execute("DELETE FROM user_cricketers WHERE user_id = ?", (user_id,))
-        conn.commit()
+            conn.execute("DELETE FROM user_cricketers WHERE user_id = ?", (user_id,))
+        return seized
+
+    try:
+        seized = await db.run(seize)
         await message.reply_text(f"Loan #{loan_id} marked DEFAULTED. Seized {seized} cricketer entries into escrow (if any).")
         try:
             await client.send_message(user_id, f"⚠️ Your loan #{loan_id} defaulted. The owner seized available inventory into escrow.")
         except Exception:
             pass
     except Exception:
-        conn.commit()
         await message.reply_text("Loan defaulted but failed to seize inventory (maybe user_cricketers table missing).")
 
 
@@ -1028,11 +914,11 @@ async def cmd_bankstats(client, message: Message):
         await message.reply_text("❌ Only the bank owner can view bank stats.")
         return
 
-    total_accounts = cursor.execute("SELECT COUNT(*) FROM bank_accounts").fetchone()[0]
-    total_reserves = bank_reserve_total()
-    loans_total = cursor.execute("SELECT SUM(amount) FROM bank_loans WHERE status = 'approved'").fetchone()[0] or 0
-    loans_pending = cursor.execute("SELECT COUNT(*) FROM bank_loans WHERE status = 'pending'").fetchone()[0]
-    escrow_count = cursor.execute("SELECT COUNT(*) FROM bank_escrow").fetchone()[0]
+    total_accounts = await db.fetchval("SELECT COUNT(*) FROM bank_accounts", default=0)
+    total_reserves = await bank_reserve_total()
+    loans_total = await db.fetchval("SELECT SUM(amount) FROM bank_loans WHERE status = 'approved'", default=0)
+    loans_pending = await db.fetchval("SELECT COUNT(*) FROM bank_loans WHERE status = 'pending'", default=0)
+    escrow_count = await db.fetchval("SELECT COUNT(*) FROM bank_escrow", default=0)
 
     text = (
         f"🏦 {BANK_NAME} — Detailed Stats\n\n"
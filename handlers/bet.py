@@ -9,17 +9,22 @@
 Flow:
 1) User types: /bet 1000
 2) Bot shows 4 inline buttons (only that user can press)
-3) On button press, bot checks balance, deducts bet (proportionally across
-   daily/weekly/monthly/given), then resolves outcome and credits winnings (if any).
+3) On button press, bot debits the bet from the crystal ledger (only if the
+   balance covers it), then resolves outcome and credits winnings (if any),
+   all in one transaction.
 """
 from datetime import datetime
 import random
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import app
-from database import Database
+from database import get_db
+from ledger import get_ledger, debit, credit
+from router import get_router, digits
 
-db = Database()
+db = get_db()
+ledger = get_ledger()
+router = get_router()
 
 # Difficulty config: (label, win_probability, multiplier)
 DIFFICULTIES = {
@@ -29,88 +34,18 @@ DIFFICULTIES = {
     "hell":   ("Hell",   0.01, 10)
 }
 
-# helper: get total crystals for display
-def get_total_balance(user_id: int) -> int:
-    try:
-        daily, weekly, monthly, total, last_claim, given = db.get_crystals(user_id)
-        return int(total)
-    except Exception:
-        # fallback: query directly
-        try:
-            db.cursor.execute("SELECT daily_crystals, weekly_crystals, monthly_crystals, given_crystals FROM users WHERE user_id = ?", (user_id,))
-            row = db.cursor.fetchone()
-            if not row:
-                return 0
-            vals = [int(v or 0) for v in row]
-            return sum(vals)
-        except Exception:
-            return 0
-
-# helper: deduct amount proportionally across columns (same logic as purchase_waifu)
-def deduct_user_balance(user_id: int, amount: int) -> bool:
-    """Return True if deduction succeeded (amount deducted); False if insufficient funds.
-    This function updates user rows and commits.
-    """
-    if amount <= 0:
-        return True
-    # check total first
-    try:
-        daily, weekly, monthly, total, last_claim, given = db.get_crystals(user_id)
-        if total < amount:
-            return False
-    except Exception:
-        # fallback to direct query
-        db.cursor.execute("SELECT daily_crystals, weekly_crystals, monthly_crystals, given_crystals FROM users WHERE user_id = ?", (user_id,))
-        row = db.cursor.fetchone()
-        if not row:
-            return False
-        vals = [int(r or 0) for r in row]
-        if sum(vals) < amount:
-            return False
-
-    remaining = int(amount)
-    cols = ["daily_crystals", "weekly_crystals", "monthly_crystals", "given_crystals"]
-    try:
-        # use a transaction
-        db.cursor.execute("BEGIN IMMEDIATE")
-        for col in cols:
-            db.cursor.execute(f"SELECT {col} FROM users WHERE user_id = ?", (user_id,))
-            r = db.cursor.fetchone()
-            value = int(r[0]) if r and r[0] is not None else 0
-            if value <= 0:
-                continue
-            deduction = min(value, remaining)
-            db.cursor.execute(f"UPDATE users SET {col} = {col} - ? WHERE user_id = ?", (deduction, user_id))
-            remaining -= deduction
-            if remaining <= 0:
-                break
-        if remaining > 0:
-            # something wrong (shouldn't happen if total checked), rollback
-            db.conn.rollback()
-            return False
-        db.conn.commit()
-        return True
-    except Exception:
-        try:
-            db.conn.rollback()
-        except Exception:
-            pass
-        return False
-
-# helper: credit winnings (adds to given_crystals column using add_crystals)
-def credit_user(user_id: int, amount: int):
-    if amount <= 0:
-        return
-    try:
-        # use given param so it increases given_crystals column
-        db.add_crystals(user_id, daily=0, weekly=0, monthly=0, given=int(amount))
-    except Exception:
-        # fallback direct update
-        try:
-            db.cursor.execute("UPDATE users SET given_crystals = COALESCE(given_crystals,0) + ? WHERE user_id = ?", (int(amount), user_id))
-            db.conn.commit()
-        except Exception:
-            pass
+# helper: debit the bet, roll, credit the payout -- one writer job
+def _settle_bet(conn, user_id: int, amount: int, prob: float, mult: int):
+    """Returns (roll, payout, new_balance); new_balance is None if the user was short"""
+    balance = debit(conn, user_id, amount, "bet")
+    if balance is None:
+        return None, 0, None
+    roll = random.random()  # 0.0 - 1.0
+    payout = amount * mult if roll < prob else 0
+    if payout:
+        # add payout back (this includes returning the bet + profit)
+        balance = credit(conn, user_id, payout, "bet_win")
+    return roll, payout, balance
 
 # ---------------- /bet command ----------------
 @app.on_message(filters.command("bet"))
@@ -130,7 +65,7 @@ async def bet_cmd(client, message):
         await message.reply_text("Invalid amount. Use a positive integer, e.g. /bet 1000")
         return
 
-    balance = get_total_balance(user.id)
+    balance = await ledger.balance(user.id)
     if balance < amount:
         await message.reply_text(f"❌ Insufficient balance. Your balance: {balance} 💎")
         return
@@ -158,15 +93,8 @@ async def bet_cmd(client, message):
     await message.reply_text(txt, reply_markup=kb)
 
 # ---------------- Cancel button ----------------
-@app.on_callback_query(filters.regex(r"^bet_cancel:(\d+):(\d+)$"))
-async def bet_cancel_cb(client, callback):
-    try:
-        uid = int(callback.matches[0].group(1))
-        amt = int(callback.matches[0].group(2))
-    except Exception:
-        await callback.answer("Invalid cancel data.", show_alert=True)
-        return
-
+@router.route("bet_cancel", digits, digits)
+async def bet_cancel_cb(client, callback, uid, amt):
     if callback.from_user.id != uid:
         await callback.answer("This button isn't for you.", show_alert=True)
         return
@@ -178,15 +106,8 @@ async def bet_cancel_cb(client, callback):
     await callback.answer("Bet cancelled.")
 
 # ---------------- Main bet button handler ----------------
-@app.on_callback_query(filters.regex(r"^bet:(\d+):(\d+):(\w+)$"))
-async def bet_callback(client, callback):
-    try:
-        uid = int(callback.matches[0].group(1))
-        amount = int(callback.matches[0].group(2))
-        level = callback.matches[0].group(3)
-    except Exception:
-        await callback.answer("Invalid data.", show_alert=True)
-        return
+@router.route("bet", digits, digits, str)
+async def bet_callback(client, callback, uid, amount, level):
 
     # only the original user may press their button
     if callback.from_user.id != uid:
@@ -199,41 +120,22 @@ async def bet_callback(client, callback):
 
     label, prob, mult = DIFFICULTIES[level]
 
-    # Re-check balance and attempt to deduct
-    balance_before = get_total_balance(uid)
-    if balance_before < amount:
-        await callback.answer(f"❌ You don't have enough crystals. Balance: {balance_before} 💎", show_alert=True)
+    # Debit + resolve + credit atomically (no separate balance check to race)
+    roll, payout, new_balance = await db.run(_settle_bet, uid, amount, prob, mult)
+    if new_balance is None:
+        balance_now = await ledger.balance(uid)
+        await callback.answer(f"❌ You don't have enough crystals. Balance: {balance_now} 💎", show_alert=True)
         try:
-            await callback.message.edit_text(f"❌ Bet failed: insufficient balance ({balance_before} 💎).")
+            await callback.message.edit_text(f"❌ Bet failed: insufficient balance ({balance_now} 💎).")
         except Exception:
             pass
         return
 
-    # Attempt to deduct bet (transactional)
-    ok = deduct_user_balance(uid, amount)
-    if not ok:
-        await callback.answer("❌ Failed to deduct bet (insufficient funds or DB error).", show_alert=True)
-        try:
-            await callback.message.edit_text("❌ Bet failed: could not deduct amount from your balance.")
-        except Exception:
-            pass
-        return
-
-    # Determine outcome
-    roll = random.random()  # 0.0 - 1.0
-    win = roll < prob
-    # compute payout: if win => user receives amount * multiplier
-    payout = amount * mult if win else 0
-
-    # If win, credit payout
-    if win and payout > 0:
-        # add payout back (this includes returning the bet + profit)
-        credit_user(uid, payout)
+    if payout:
         result_text = f"🎉 You WON!\nDifficulty: {label}\nBet: {amount} 💎\nPayout: {payout} 💎 (x{mult})"
     else:
         result_text = f"💀 You LOST.\nDifficulty: {label}\nBet: {amount} 💎\nPayout: 0 💎"
 
-    new_balance = get_total_balance(uid)
     result_text += f"\n\nYour new balance: {new_balance} 💎"
 
     # edit the message to show result (remove buttons)
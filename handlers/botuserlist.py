@@ -1,134 +1,133 @@
 # handlers/botuserlist.py
 """
-Owner-only command: /listuser
-Sends the owner a .txt file containing every user found in the DB and their waifu holdings.
+Owner-only command: /userlist (/listuser is the event registrations list in event.py)
+Sends the owner a .txt.gz file containing every user found in the DB and their waifu holdings.
 
 Requirements / behavior:
  - Only the owner (ID 7558715645) can run this command.
  - The handler collects user IDs from user_waifus and pending_offers (from_user, to_user).
- - For each user it fetches a best-effort Telegram name (via get_users) and then
-   fetches that user's waifu holdings (joined with waifu_cards for names/rarity).
- - Produces a readable text report and sends it to the owner as a .txt document.
+ - Holdings for everyone come from one JOIN cursor ordered by user, walked
+   alongside the sorted user ids, so memory stays flat however many users there are.
+ - Telegram names are fetched with one get_users call per 200 users.
+ - The report is written gzip-compressed to a temp file chunk by chunk,
+   with a progress message edited every few seconds, then sent as a document.
 """
 
-import io
+import asyncio
+import gzip
+import os
+import sqlite3
+import tempfile
+import time
 from datetime import datetime
 from pyrogram import filters
-from config import app
-from database import Database
+from pyrogram.errors import FloodWait
+from config import Config, app
+from database import apply_pragmas, connect
 
 OWNER_ID = 7558715645  # owner id from your config/context
 
-db = Database()
+NAME_BATCH = 200        # users.getUsers accepts up to 200 ids per call
+FETCH_ROWS = 1000       # holdings rows pulled from the cursor per step
+PROGRESS_SECONDS = 5    # how often the progress message is edited
 
+USER_IDS_SQL = """
+    SELECT user_id FROM user_waifus WHERE user_id IS NOT NULL
+    UNION SELECT from_user FROM pending_offers WHERE from_user IS NOT NULL
+    UNION SELECT to_user FROM pending_offers WHERE to_user IS NOT NULL
+    ORDER BY 1
+"""
 
-def get_all_user_ids_from_db():
-    """Collect distinct user ids from user_waifus and pending_offers"""
-    ids = set()
-    try:
-        db.cursor.execute("SELECT DISTINCT user_id FROM user_waifus")
-        for row in db.cursor.fetchall():
-            if row and row[0]:
-                ids.add(int(row[0]))
-    except Exception:
-        # table might not exist or query fail — ignore and continue
-        pass
+HOLDINGS_SQL = """
+    SELECT uw.user_id, uw.waifu_id, uw.amount, wc.name, wc.anime, wc.rarity
+    FROM user_waifus uw
+    LEFT JOIN waifu_cards wc ON uw.waifu_id = wc.id
+    ORDER BY uw.user_id, uw.waifu_id
+"""
 
-    try:
-        db.cursor.execute("SELECT DISTINCT from_user FROM pending_offers")
-        for row in db.cursor.fetchall():
-            if row and row[0]:
-                ids.add(int(row[0]))
-    except Exception:
-        pass
 
-    try:
-        db.cursor.execute("SELECT DISTINCT to_user FROM pending_offers")
-        for row in db.cursor.fetchall():
-            if row and row[0]:
-                ids.add(int(row[0]))
-    except Exception:
-        pass
-
-    return sorted(ids)
-
-
-def get_user_waifus(user_id: int):
-    """
-    Return list of tuples (waifu_id, amount, name, anime, rarity)
-    and total count (sum of amounts)
-    """
-    items = []
-    total = 0
-    try:
-        db.cursor.execute("""
-            SELECT uw.waifu_id, uw.amount, wc.name, wc.anime, wc.rarity
-            FROM user_waifus uw
-            LEFT JOIN waifu_cards wc ON uw.waifu_id = wc.id
-            WHERE uw.user_id = ?
-        """, (user_id,))
-        for row in db.cursor.fetchall():
-            wid = row[0]
-            amt = int(row[1]) if row[1] is not None else 0
-            name = row[2] or "Unknown"
-            anime = row[3] or "—"
-            rarity = row[4] or "—"
-            items.append((wid, amt, name, anime, rarity))
-            total += amt
-    except Exception:
-        # table might not exist or query fail — return empty
-        pass
-    return items, total
-
-
-@app.on_message(filters.command("listuser"))
-async def listuser_handler(client, message):
-    # Owner-only
-    if not message.from_user or message.from_user.id != OWNER_ID:
-        await message.reply_text("❌ This command is owner-only.")
-        return
+# ---------------- DB Side (runs in a worker thread) ----------------
+def _open_report_conn():
+    """Own connection: the report keeps one cursor open for its whole run"""
+    return apply_pragmas(connect(Config.DB_PATH, check_same_thread=False, timeout=30))
 
-    await message.reply_text("🔎 Generating user list... (this may take a few seconds)")
 
-    user_ids = get_all_user_ids_from_db()
-    # If DB has no users, return a small file indicating that
-    if not user_ids:
-        text = "No users found in the database (no rows in user_waifus or pending_offers).\n"
-        bio = io.BytesIO(text.encode("utf-8"))
-        bio.name = f"user_list_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt"
+def get_all_user_ids_from_db(conn):
+    """Distinct user ids from user_waifus and pending_offers, sorted"""
+    ids = []
+    for sql in (USER_IDS_SQL, "SELECT DISTINCT user_id FROM user_waifus ORDER BY 1"):
         try:
-            await client.send_document(OWNER_ID, bio, caption="User list (empty).")
-        except Exception as e:
-            await message.reply_text(f"Failed to send file to owner: {e}")
-        return
+            ids = [int(row[0]) for row in conn.execute(sql) if row[0]]
+            break
+        except sqlite3.Error:
+            # pending_offers might not exist -> holdings only
+            continue
+    return ids
 
-    # Build report
-    lines = []
-    header = f"User list generated: {datetime.utcnow().isoformat()} UTC\nTotal users found: {len(user_ids)}\n"
-    lines.append(header)
-    lines.append("=" * 60)
-    for uid in user_ids:
-        # Try to fetch Telegram user info (best-effort)
-        t_first = t_last = t_un = "Unknown"
+
+class HoldingsReader:
+    """Walks the ordered holdings cursor one user chunk at a time"""
+
+    def __init__(self, conn):
+        try:
+            self._cursor = conn.execute(HOLDINGS_SQL)
+        except sqlite3.Error:
+            self._cursor = None
+        self._buffer = []
+
+    def take_until(self, last_uid):
+        """{user_id: [(waifu_id, amount, name, anime, rarity)]} for every user <= last_uid"""
+        holdings = {}
+        while self._cursor is not None or self._buffer:
+            if not self._buffer:
+                self._buffer = self._cursor.fetchmany(FETCH_ROWS)
+                self._buffer.reverse()  # pop() from the end = next row in order
+                if not self._buffer:
+                    self._cursor = None
+                    break
+            if self._buffer[-1][0] > last_uid:
+                break
+            uid, wid, amt, name, anime, rarity = self._buffer.pop()
+            holdings.setdefault(uid, []).append(
+                (wid, int(amt) if amt is not None else 0, name or "Unknown", anime or "—", rarity or "—")
+            )
+        return holdings
+
+
+# ---------------- Report ----------------
+async def fetch_names(client, user_ids):
+    """{user_id: (first, last, @username)} for up to NAME_BATCH ids in one call"""
+    for _ in range(2):
         try:
-            tg = await client.get_users(uid)
-            if tg:
-                t_first = tg.first_name or ""
-                t_last = tg.last_name or ""
-                t_un = f"@{tg.username}" if getattr(tg, "username", None) else ""
+            users = await client.get_users(list(user_ids))
+            break
+        except FloodWait as e:
+            await asyncio.sleep(e.value)
         except Exception:
-            # ignore failures, leave Unknown
-            pass
-
+            # one bad id can fail the whole call; leave the chunk Unknown
+            return {}
+    else:
+        return {}
+    if not isinstance(users, list):
+        users = [users]
+    return {
+        u.id: (u.first_name or "", u.last_name or "", f"@{u.username}" if getattr(u, "username", None) else "")
+        for u in users if u
+    }
+
+
+def render_chunk(user_ids, names, holdings):
+    lines = []
+    for uid in user_ids:
+        t_first, t_last, t_un = names.get(uid, ("Unknown", "Unknown", "Unknown"))
         lines.append(f"\nUser ID: {uid}")
         name_line = f"Name: {t_first} {t_last}".strip()
         if t_un:
             name_line += f" ({t_un})"
         lines.append(name_line)
 
-        # fetch waifu holdings
-        waifus, total = get_user_waifus(uid)
-        lines.append(f"Total cards: {total}")
+        waifus = holdings.get(uid, [])
+        lines.append(f"Total cards: {sum(w[1] for w in waifus)}")
         if waifus:
             lines.append("Holdings:")
             for wid, amt, name, anime, rarity in waifus:
@@ -138,19 +137,78 @@ async def listuser_handler(client, message):
 
         # small separator between users
         lines.append("-" * 1)
+    return "\n".join(lines) + "\n"
 
-    content = "\n".join(lines)
-    bio = io.BytesIO(content.encode("utf-8"))
-    bio.name = f"user_list_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt"
 
-    # Send the file to owner (also confirm in chat)
+async def write_report(client, path, progress=None):
+    """Stream the whole report into a gzip file at path; returns the user count"""
+    loop = asyncio.get_running_loop()
+    conn = await loop.run_in_executor(None, _open_report_conn)
     try:
-        await client.send_document(OWNER_ID, bio, caption=f"Full user list ({len(user_ids)} users).")
-        await message.reply_text("✅ Sent the user list file to the owner (you). Check your DMs.")
+        user_ids = await loop.run_in_executor(None, get_all_user_ids_from_db, conn)
+        reader = await loop.run_in_executor(None, HoldingsReader, conn)
+        with gzip.open(path, "wt", encoding="utf-8") as out:
+            if not user_ids:
+                out.write("No users found in the database (no rows in user_waifus or pending_offers).\n")
+                return 0
+            out.write(f"User list generated: {datetime.utcnow().isoformat()} UTC\nTotal users found: {len(user_ids)}\n\n")
+            out.write("=" * 60 + "\n")
+
+            last_progress = time.monotonic()
+            for start in range(0, len(user_ids), NAME_BATCH):
+                chunk = user_ids[start:start + NAME_BATCH]
+                names, holdings = await asyncio.gather(
+                    fetch_names(client, chunk),
+                    loop.run_in_executor(None, reader.take_until, chunk[-1]),
+                )
+                text = render_chunk(chunk, names, holdings)
+                await loop.run_in_executor(None, out.write, text)
+
+                if progress and time.monotonic() - last_progress >= PROGRESS_SECONDS:
+                    last_progress = time.monotonic()
+                    try:
+                        await progress(start + len(chunk), len(user_ids))
+                    except Exception:
+                        pass
+        return len(user_ids)
+    finally:
+        conn.close()
+
+
+@app.on_message(filters.command("userlist"))
+async def userlist_handler(client, message):
+    # Owner-only
+    if not message.from_user or message.from_user.id != OWNER_ID:
+        await message.reply_text("❌ /userlist is owner-only.")
+        return
+
+    status = await message.reply_text("🔎 Generating user list... (this may take a few seconds)")
+
+    async def progress(done, total):
+        await status.edit_text(f"🔎 Generating user list... {done}/{total} users")
+
+    fd, path = tempfile.mkstemp(prefix="user_list_", suffix=".txt.gz")
+    os.close(fd)
+    file_name = f"user_list_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.txt.gz"
+    try:
+        count = await write_report(client, path, progress)
+        caption = f"Full user list ({count} users)." if count else "User list (empty)."
+
+        # Send the file to owner (also confirm in chat)
+        try:
+            await client.send_document(OWNER_ID, path, file_name=file_name, caption=caption)
+            await status.edit_text("✅ Sent the user list file to the owner (you). Check your DMs.")
+        except Exception as e:
+            # fallback: try to send in the same chat
+            try:
+                await client.send_document(message.chat.id, path, file_name=file_name,
+                                           caption=f"User list (failed DM to owner): {e}")
+            except Exception as e2:
+                await message.reply_text(f"Failed to send user list: {e}; fallback also failed: {e2}")
     except Exception as e:
-        # fallback: try to send in the same chat
+        await status.edit_text(f"❌ Failed to build user list: {e}")
+    finally:
         try:
-            bio.seek(0)
-            await client.send_document(message.chat.id, bio, caption=f"User list (failed DM to owner): {e}")
-        except Exception as e2:
-            await message.reply_text(f"Failed to send user list: {e}; fallback also failed: {e2}")
+            os.remove(path)
+        except OSError:
+            pass
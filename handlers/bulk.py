@@ -0,0 +1,169 @@
+# handlers/bulk.py
+"""
+Owner-only bulk economy operations from an uploaded CSV.
+
+Reply to a .csv document (or send it with the command as caption):
+ - /bulk crystals        rows: user_id,amount
+ - /bulk cards           rows: user_id,waifu_id[,amount]
+ - /bulk takecrystals    rows: user_id,amount          (never below 0)
+ - /bulk takecards       rows: user_id,waifu_id[,amount]
+
+The file is parsed and previewed first; ✅ Confirm applies the whole file
+in one transaction (ledger.credit_many / database.give_cards_many ...).
+"""
+
+import csv
+import io
+import secrets
+from pyrogram import filters
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from config import Config, app
+from database import get_db
+from ledger import get_ledger
+from catalog import get_catalog
+from router import get_router, choice
+
+db = get_db()
+ledger = get_ledger()
+catalog = get_catalog()
+router = get_router()
+
+MAX_ROWS = 200_000
+MAX_FILE_BYTES = 20 * 1024 * 1024
+
+# mode -> (columns, label)
+MODES = {
+    "crystals": ("user_id,amount", "💎 Grant crystals"),
+    "cards": ("user_id,waifu_id[,amount]", "🎴 Grant cards"),
+    "takecrystals": ("user_id,amount", "➖ Revoke crystals"),
+    "takecards": ("user_id,waifu_id[,amount]", "➖ Revoke cards"),
+}
+
+# token -> (owner_id, mode, rows); waits for the confirm button
+_pending = {}
+
+
+# ---------------- Parsing ----------------
+def parse_rows(text, mode):
+    """-> (rows, errors); header lines and blank lines are skipped"""
+    wants_card = mode in ("cards", "takecards")
+    rows, errors = [], []
+    for line_no, record in enumerate(csv.reader(io.StringIO(text)), start=1):
+        fields = [f.strip() for f in record]  # empty cells keep their column
+        if not any(fields):
+            continue
+        try:
+            values = [int(f.replace(",", "")) if f else None for f in fields]
+        except ValueError:
+            if line_no == 1:
+                continue  # header
+            errors.append(f"line {line_no}: not a number")
+            continue
+        if wants_card and len(values) == 3 and values[2] is None:
+            values.pop()  # amount left empty -> 1
+        if None in values:
+            errors.append(f"line {line_no}: empty field in column {values.index(None) + 1}")
+            continue
+
+        if wants_card:
+            if len(values) not in (2, 3):
+                errors.append(f"line {line_no}: expected user_id,waifu_id[,amount]")
+                continue
+            user_id, waifu_id, amount = values[0], values[1], values[2] if len(values) == 3 else 1
+            if mode == "cards" and catalog.get(waifu_id) is None:
+                errors.append(f"line {line_no}: unknown waifu id {waifu_id}")
+                continue
+            row = (user_id, waifu_id, amount)
+        else:
+            if len(values) != 2:
+                errors.append(f"line {line_no}: expected user_id,amount")
+                continue
+            user_id, amount = values
+            row = (user_id, amount)
+
+        if amount <= 0:
+            errors.append(f"line {line_no}: amount must be positive")
+            continue
+        rows.append(row)
+        if len(rows) > MAX_ROWS:
+            errors.append(f"more than {MAX_ROWS} rows; split the file")
+            return [], errors
+    return rows, errors
+
+
+async def apply_rows(mode, rows, owner_id):
+    """Run one bulk operation; returns a short summary line"""
+    ref = f"bulk_by={owner_id}"
+    if mode == "crystals":
+        users = await ledger.credit_many(rows, "bulk_grant", ref)
+        return f"💎 Credited {sum(a for _, a in rows):,} crystals to {users:,} users."
+    if mode == "cards":
+        applied = await db.give_cards_many(rows)
+        return f"🎴 Granted {sum(a for _, _, a in rows):,} cards ({applied:,} user/card pairs)."
+    if mode == "takecrystals":
+        taken = await ledger.debit_many(rows, "bulk_revoke", ref)
+        return f"➖ Removed {sum(taken.values()):,} crystals from {len(taken):,} users."
+    removed = await db.take_cards_many(rows)
+    return f"➖ Removed {sum(removed.values()):,} cards from {len(removed):,} users."
+
+
+# ---------------- /bulk ----------------
+@app.on_message(filters.command("bulk") & filters.user(Config.OWNER_ID))
+async def bulk_cmd(client, message):
+    parts = (message.text or message.caption or "").split()
+    mode = parts[1].lower() if len(parts) > 1 else ""
+    doc_msg = message if message.document else message.reply_to_message
+    if mode not in MODES or not doc_msg or not doc_msg.document:
+        usage = "\n".join(f"• `/bulk {m}` — {cols}" for m, (cols, _) in MODES.items())
+        return await message.reply_text(f"❌ Reply to a CSV file with:\n{usage}")
+
+    if (doc_msg.document.file_size or 0) > MAX_FILE_BYTES:
+        return await message.reply_text("❌ File too large.")
+
+    if mode == "cards":
+        catalog.ensure_loaded()
+    data = await client.download_media(doc_msg, in_memory=True)
+    text = bytes(data.getbuffer()).decode("utf-8-sig", errors="replace")
+    rows, errors = parse_rows(text, mode)
+
+    report = ""
+    if errors:
+        report = f"\n\n⚠️ {len(errors)} skipped:\n" + "\n".join(errors[:10])
+        if len(errors) > 10:
+            report += f"\n…and {len(errors) - 10} more"
+    if not rows:
+        return await message.reply_text("❌ No valid rows." + report)
+
+    token = secrets.token_hex(4)
+    _pending[token] = (message.from_user.id, mode, rows)
+    users = len({r[0] for r in rows})
+    buttons = InlineKeyboardMarkup([[
+        InlineKeyboardButton("✅ Confirm", callback_data=f"bulk:confirm:{token}"),
+        InlineKeyboardButton("❌ Cancel", callback_data=f"bulk:cancel:{token}"),
+    ]])
+    await message.reply_text(
+        f"{MODES[mode][1]}\n\n📄 Rows: {len(rows):,}\n👥 Users: {users:,}{report}",
+        reply_markup=buttons
+    )
+
+
+@router.route("bulk", choice("confirm", "cancel"), str)
+async def bulk_callback(client, callback_query, action, token):
+    pending = _pending.get(token)
+    if not pending:
+        return await callback_query.answer("This batch expired or was already handled.", show_alert=True)
+    owner_id, mode, rows = pending
+    if callback_query.from_user.id != owner_id:
+        return await callback_query.answer("Not your batch.", show_alert=True)
+    del _pending[token]
+
+    if action == "cancel":
+        await callback_query.message.edit_text("❌ Bulk operation cancelled.")
+        return await callback_query.answer()
+
+    await callback_query.answer("Applying…")
+    try:
+        summary = await apply_rows(mode, rows, owner_id)
+    except Exception as e:
+        return await callback_query.message.edit_text(f"❌ Bulk operation failed, nothing was applied: {e}")
+    await callback_query.message.edit_text(f"✅ Done.\n{summary}")
@@ -2,55 +2,45 @@
 from pyrogram import filters
 from pyrogram.types import Message
 from config import app
-from database import Database
+from database import get_db
+from name_index import get_name_index
 
-db = Database()
+db = get_db()
+names = get_name_index()
 
 # ---------------- /checkwaifu Command ----------------
 @app.on_message(filters.command("checkwaifu"))
 async def check_waifu(client, message: Message):
     """
-    Usage: /checkwaifu <waifu_id>
+    Usage: /checkwaifu <waifu_id | name>
     """
     try:
-        waifu_id = int(message.text.split(" ", 1)[1])
-    except (IndexError, ValueError):
-        await message.reply_text("❌ Usage: /checkwaifu <waifu_id>")
+        arg = message.text.split(" ", 1)[1].strip()
+    except IndexError:
+        arg = ""
+    if not arg:
+        await message.reply_text("❌ Usage: /checkwaifu <waifu_id | name>")
         return
 
-    # Ensure waifu_cards table exists
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS waifu_cards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            anime TEXT,
-            rarity TEXT,
-            event TEXT,
-            media_type TEXT,
-            media_file TEXT
-        )
-    """)
-    db.conn.commit()
+    if arg.isdigit():
+        waifu_id = int(arg)
+    else:
+        # Name given: closest card from the name index
+        card = names.best(arg)
+        if card is None:
+            await message.reply_text("❌ Waifu not found!")
+            return
+        waifu_id = card.id
 
     # Fetch waifu details
-    db.cursor.execute("SELECT * FROM waifu_cards WHERE id=?", (waifu_id,))
-    waifu = db.cursor.fetchone()
+    waifu = await db.fetchone("SELECT * FROM waifu_cards WHERE id=?", (waifu_id,))
 
     if not waifu:
         await message.reply_text("❌ Waifu not found!")
         return
 
     # Count how many times collected globally
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_waifus (
-            user_id INTEGER,
-            waifu_id INTEGER,
-            PRIMARY KEY(user_id, waifu_id)
-        )
-    """)
-    db.conn.commit()
-    db.cursor.execute("SELECT COUNT(*) FROM user_waifus WHERE waifu_id=?", (waifu_id,))
-    collected_count = db.cursor.fetchone()[0]
+    collected_count = await db.fetchval("SELECT COUNT(*) FROM user_waifus WHERE waifu_id=?", (waifu_id,), default=0)
 
     # Build caption
     caption = (
@@ -1,33 +1,19 @@
 # handlers/claim.py
 
-import sqlite3
-import random
-import time
 import asyncio
 from pyrogram import filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import app
+from cooldowns import get_cooldowns
+from database import get_db, give_card
+from sampler import get_sampler
+from router import get_router, digits
 
 # ---------------- Connect to DB ----------------
-db = sqlite3.connect("waifu_bot.db", check_same_thread=False)
-cursor = db.cursor()
-
-# ---------------- Ensure Tables Exist ----------------
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS user_claims (
-    user_id INTEGER PRIMARY KEY,
-    last_claim INTEGER DEFAULT 0
-)
-""")
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS user_waifus (
-    user_id INTEGER,
-    waifu_id INTEGER,
-    amount INTEGER DEFAULT 1,
-    PRIMARY KEY (user_id, waifu_id)
-)
-""")
-db.commit()
+db = get_db()
+cooldowns = get_cooldowns()
+sampler = get_sampler()
+router = get_router()
 
 # Settings
 SUPPORT_USERNAME = "suppofcollectyourcrickers"
@@ -53,47 +39,36 @@ async def is_member_of(client, chat_username: str, user_id: int) -> bool:
         return False
 
 def get_remaining_cooldown(user_id: int) -> int:
-    cursor.execute("SELECT last_claim FROM user_claims WHERE user_id=?", (user_id,))
-    row = cursor.fetchone()
-    current_time = int(time.time())
-    if row:
-        last_claim = row[0]
-        if current_time - last_claim < COOLDOWN:
-            return COOLDOWN - (current_time - last_claim)
-    return 0
+    return cooldowns.remaining(user_id, "claim")
 
 async def give_reward(client, chat_id: int, user_id: int, username: str, reply_to_message_id: int = None):
-    # Check cooldown
-    remaining = get_remaining_cooldown(user_id)
+    # Check + start cooldown in one step (a double tap can't claim twice)
+    remaining = cooldowns.try_start(user_id, "claim", COOLDOWN, write=False)
     if remaining > 0:
         hours = remaining // 3600
         minutes = (remaining % 3600) // 60
         return False, f"⏳ You already claimed a player! Come back in {hours}h {minutes}m."
 
     # Fetch random card
-    cursor.execute("SELECT id, name, anime, rarity, event, media_type, media_file FROM waifu_cards")
-    waifus = cursor.fetchall()
-    if not waifus:
+    waifu = sampler.sample()
+    if not waifu:
+        cooldowns.clear(user_id, "claim")
         return False, "❌ No players available in database yet."
 
-    waifu = random.choice(waifus)
-    waifu_id, name, anime, rarity, event, media_type, media_file = waifu
+    waifu_id, name, anime, rarity, event, media_type, media_file = waifu[:7]
 
     # --- [FIX START] SAVE TO INVENTORY ---
-    try:
-        cursor.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (user_id, waifu_id))
-        row = cursor.fetchone()
-        if row:
-            cursor.execute("UPDATE user_waifus SET amount = amount + 1 WHERE user_id=? AND waifu_id=?", (user_id, waifu_id))
-        else:
-            cursor.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (user_id, waifu_id))
-        
+    def save_claim(conn):
+        give_card(conn, user_id, waifu_id)
+
         # Update Cooldown
-        current_time = int(time.time())
-        cursor.execute("INSERT OR REPLACE INTO user_claims (user_id, last_claim) VALUES (?, ?)", (user_id, current_time))
-        db.commit()
+        cooldowns.write(conn, user_id, "claim")
+
+    try:
+        await db.run(save_claim)
     except Exception as e:
         print(f"Database Error in Claim: {e}")
+        cooldowns.clear(user_id, "claim")
         return False, "❌ Error saving to database."
     # --- [FIX END] ---
 
@@ -177,10 +152,9 @@ async def claim_waifu(client, message: Message):
     )
 
 # ---------------- Callback ----------------
-@app.on_callback_query(filters.regex(r"^claim_joined:(\d+)$"))
-async def claim_joined_cb(client, callback: CallbackQuery):
+@router.route("claim_joined", digits)
+async def claim_joined_cb(client, callback: CallbackQuery, expected_user_id):
     try:
-        expected_user_id = int(callback.data.split(":")[1])
         if callback.from_user.id != expected_user_id:
             await callback.answer("This button is not for you.", show_alert=True)
             return
@@ -3,68 +3,17 @@ from main import app
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime, timedelta, date
-from database import Database
+from database import get_db
+from jobs import get_jobs
+from leaderboard import get_leaderboards
+from ledger import credit, debit
+from router import get_router
 import random
 
-db = Database()
-
-# ----------------- DB tables creation (safe) -----------------
-db.cursor.execute("""
-CREATE TABLE IF NOT EXISTS clans (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    clan_id TEXT UNIQUE,
-    name TEXT,
-    owner_id INTEGER,
-    created_at TEXT,
-    points INTEGER DEFAULT 0,
-    wins INTEGER DEFAULT 0,
-    losses INTEGER DEFAULT 0,
-    bank INTEGER DEFAULT 0
-)
-""")
-db.cursor.execute("""
-CREATE TABLE IF NOT EXISTS clan_members (
-    clan_id INTEGER,
-    user_id INTEGER,
-    role TEXT DEFAULT 'member', -- 'owner' or 'member'
-    joined_at TEXT,
-    PRIMARY KEY (clan_id, user_id),
-    FOREIGN KEY (clan_id) REFERENCES clans(id)
-)
-""")
-db.cursor.execute("""
-CREATE TABLE IF NOT EXISTS clan_wars (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    challenger_clan INTEGER,
-    target_clan INTEGER,
-    start_iso TEXT,
-    end_iso TEXT,
-    status TEXT DEFAULT 'active', -- active, finished
-    challenger_points INTEGER DEFAULT 0,
-    target_points INTEGER DEFAULT 0
-)
-""")
-db.cursor.execute("""
-CREATE TABLE IF NOT EXISTS clan_war_contrib (
-    war_id INTEGER,
-    clan_id INTEGER,
-    user_id INTEGER,
-    points INTEGER DEFAULT 0,
-    PRIMARY KEY (war_id, user_id)
-)
-""")
-db.cursor.execute("""
-CREATE TABLE IF NOT EXISTS clan_withdrawals (
-    clan_id INTEGER,
-    user_id INTEGER,
-    last_withdraw_iso TEXT,
-    daily_withdraw_total INTEGER DEFAULT 0,
-    daily_reset_date TEXT,
-    PRIMARY KEY (clan_id, user_id)
-)
-""")
-db.conn.commit()
-
+db = get_db()
+boards = get_leaderboards()
+router = get_router()
+jobs = get_jobs()
 
 # ----------------- Utility: Rank / Level -----------------
 CLAN_LEVELS = [
@@ -91,20 +40,65 @@ def clan_rank_from_points(points: int):
     return level, rank_name
 
 
-def gen_clan_code():
+def gen_clan_code(conn):
     # generate short unique clan code, try a few times
     for _ in range(10):
         code = str(random.randint(100000, 999999))
-        db.cursor.execute("SELECT id FROM clans WHERE clan_id = ?", (code,))
-        if not db.cursor.fetchone():
+        if not conn.execute("SELECT id FROM clans WHERE clan_id = ?", (code,)).fetchone():
             return code
     # fallback to timestamp based
     return str(int(datetime.now().timestamp()))
 
 
-def get_user_clan(user_id):
-    db.cursor.execute("SELECT c.id, c.clan_id, c.name, c.owner_id, c.points, c.wins, c.losses, c.bank FROM clans c JOIN clan_members m ON c.id = m.clan_id WHERE m.user_id = ?", (user_id,))
-    return db.cursor.fetchone()
+async def get_user_clan(user_id):
+    return await db.fetchone("SELECT c.id, c.clan_id, c.name, c.owner_id, c.points, c.wins, c.losses, c.bank FROM clans c JOIN clan_members m ON c.id = m.clan_id WHERE m.user_id = ?", (user_id,))
+
+
+# ----------------- Write jobs (run on the DB writer) -----------------
+def _create_clan(conn, clan_name, user_id, now_iso):
+    """New clan with its owner as first member; returns (clan db id, clan code)"""
+    code = gen_clan_code(conn)
+    cur = conn.execute("INSERT INTO clans (clan_id, name, owner_id, created_at) VALUES (?, ?, ?, ?)",
+                       (code, clan_name, user_id, now_iso))
+    conn.execute("INSERT INTO clan_members (clan_id, user_id, role, joined_at) VALUES (?, ?, 'owner', ?)",
+                 (cur.lastrowid, user_id, now_iso))
+    return cur.lastrowid, code
+
+
+def _delete_clan(conn, cid):
+    conn.execute("DELETE FROM clan_members WHERE clan_id = ?", (cid,))
+    conn.execute("DELETE FROM clans WHERE id = ?", (cid,))
+
+
+def _join_clan(conn, cid, user_id, now_iso):
+    """Add a member unless the clan is full; returns the owner id, or None if full"""
+    if conn.execute("SELECT COUNT(*) FROM clan_members WHERE clan_id = ?", (cid,)).fetchone()[0] >= 20:
+        return None
+    conn.execute("INSERT INTO clan_members (clan_id, user_id, role, joined_at) VALUES (?, ?, 'member', ?)",
+                 (cid, user_id, now_iso))
+    return conn.execute("SELECT owner_id FROM clans WHERE id = ?", (cid,)).fetchone()[0]
+
+
+def _leave_clan(conn, cid, user_id, owner_id):
+    """Remove a member; an owner hands the clan to the earliest member.
+    Returns the new owner id, "deleted" if nobody was left, else None."""
+    conn.execute("DELETE FROM clan_members WHERE clan_id = ? AND user_id = ?", (cid, user_id))
+    if user_id != owner_id:
+        return None
+    nxt = conn.execute("SELECT user_id FROM clan_members WHERE clan_id = ? ORDER BY joined_at ASC LIMIT 1", (cid,)).fetchone()
+    if not nxt:
+        conn.execute("DELETE FROM clans WHERE id = ?", (cid,))
+        return "deleted"
+    conn.execute("UPDATE clans SET owner_id = ? WHERE id = ?", (nxt[0], cid))
+    conn.execute("UPDATE clan_members SET role = 'owner' WHERE clan_id = ? AND user_id = ?", (cid, nxt[0]))
+    return nxt[0]
+
+
+def _donate(conn, user_id, cid, amount):
+    if debit(conn, user_id, amount, "clan_donate", f"clan={cid}") is None:
+        return False
+    conn.execute("UPDATE clans SET bank = bank + ? WHERE id = ?", (amount, cid))
+    return True
 
 
 # ----------------- /createclan -----------------
@@ -118,21 +112,12 @@ async def create_clan_handler(client, message):
     clan_name = parts[1].strip()[:50]
 
     # check if user already in a clan
-    if get_user_clan(user_id):
+    if await get_user_clan(user_id):
         return await message.reply_text("❌ You are already in a clan. Leave it first to create a new one (/leaveclan).")
 
-    # create clan
-    clan_code = gen_clan_code()
-    now_iso = datetime.now().isoformat()
-    db.cursor.execute("INSERT INTO clans (clan_id, name, owner_id, created_at) VALUES (?, ?, ?, ?)",
-                      (clan_code, clan_name, user_id, now_iso))
-    db.conn.commit()
-    clan_db_id = db.cursor.lastrowid
-
-    # add owner as member
-    db.cursor.execute("INSERT INTO clan_members (clan_id, user_id, role, joined_at) VALUES (?, ?, 'owner', ?)",
-                      (clan_db_id, user_id, now_iso))
-    db.conn.commit()
+    # create clan + add owner as member
+    clan_db_id, clan_code = await db.run(_create_clan, clan_name, user_id, datetime.now().isoformat())
+    boards.set_clan(clan_db_id, 0)
 
     # response card
     level, rank_name = clan_rank_from_points(0)
@@ -153,14 +138,13 @@ async def create_clan_handler(client, message):
 @app.on_message(filters.command("myclan"))
 async def myclan_handler(client, message):
     user_id = message.from_user.id
-    clan = get_user_clan(user_id)
+    clan = await get_user_clan(user_id)
     if not clan:
         return await message.reply_text("You are not in any clan. Create one with /createclan or join with /joinclan [clan_id].")
 
     cid, clan_code, name, owner_id, points, wins, losses, bank = clan
     # members count
-    db.cursor.execute("SELECT COUNT(*) FROM clan_members WHERE clan_id = ?", (cid,))
-    members_count = db.cursor.fetchone()[0]
+    members_count = await db.fetchval("SELECT COUNT(*) FROM clan_members WHERE clan_id = ?", (cid,), default=0)
     level, rank_name = clan_rank_from_points(points or 0)
 
     text = (
@@ -185,12 +169,10 @@ async def myclan_handler(client, message):
 
 
 # ----------------- Delete clan (owner) -----------------
-@app.on_callback_query(filters.regex(r"^clan_delete:"))
-async def clan_delete_cb(client, callback):
-    cid = int(callback.data.split(":")[1])
+@router.route("clan_delete", int)
+async def clan_delete_cb(client, callback, cid):
     user_id = callback.from_user.id
-    db.cursor.execute("SELECT owner_id, name FROM clans WHERE id = ?", (cid,))
-    row = db.cursor.fetchone()
+    row = await db.fetchone("SELECT owner_id, name FROM clans WHERE id = ?", (cid,))
     if not row:
         await callback.answer("Clan not found.", show_alert=True)
         return
@@ -200,32 +182,27 @@ async def clan_delete_cb(client, callback):
         return
 
     # remove members & clan
-    db.cursor.execute("DELETE FROM clan_members WHERE clan_id = ?", (cid,))
-    db.cursor.execute("DELETE FROM clans WHERE id = ?", (cid,))
-    db.conn.commit()
+    await db.run(_delete_clan, cid)
+    boards.remove_clan(cid)
     await callback.message.edit_text(f"🗑️ Clan `{name}` deleted successfully.")
     await callback.answer()
 
 
 # ----------------- View members -----------------
-@app.on_callback_query(filters.regex(r"^clan_members:"))
-async def clan_members_cb(client, callback):
-    cid = int(callback.data.split(":")[1])
-    db.cursor.execute("SELECT user_id, role FROM clan_members WHERE clan_id = ? ORDER BY role DESC, joined_at ASC", (cid,))
-    rows = db.cursor.fetchall()
+@router.route("clan_members", int)
+async def clan_members_cb(client, callback, cid):
+    # members with their username / first_name in one query
+    rows = await db.fetchall("""
+        SELECT m.user_id, m.role, u.username, u.first_name
+          FROM clan_members m LEFT JOIN users u ON u.user_id = m.user_id
+         WHERE m.clan_id = ? ORDER BY m.role DESC, m.joined_at ASC
+    """, (cid,))
     if not rows:
         await callback.answer("No members found.", show_alert=True)
         return
     lines = []
-    for user_id, role in rows:
-        # fetch username or first_name
-        db.cursor.execute("SELECT username, first_name FROM users WHERE user_id = ?", (user_id,))
-        u = db.cursor.fetchone()
-        if u:
-            uname, fname = u
-            label = f"@{uname}" if uname else (fname or str(user_id))
-        else:
-            label = str(user_id)
+    for user_id, role, uname, fname in rows:
+        label = f"@{uname}" if uname else (fname or str(user_id))
         lines.append(f"{label} — {role}")
     await callback.message.reply_text("👥 Clan Members:\n\n" + "\n".join(lines))
     await callback.answer()
@@ -241,29 +218,20 @@ async def join_clan_handler(client, message):
 
     code = parts[1].strip()
     # check user already in clan
-    if get_user_clan(user_id):
+    if await get_user_clan(user_id):
         return await message.reply_text("You are already in a clan. Leave it first with /leaveclan.")
 
-    db.cursor.execute("SELECT id, name FROM clans WHERE clan_id = ?", (code,))
-    row = db.cursor.fetchone()
+    row = await db.fetchone("SELECT id, name FROM clans WHERE clan_id = ?", (code,))
     if not row:
         return await message.reply_text("Clan ID not found.")
 
     cid, name = row
-    # check capacity
-    db.cursor.execute("SELECT COUNT(*) FROM clan_members WHERE clan_id = ?", (cid,))
-    count = db.cursor.fetchone()[0]
-    if count >= 20:
+    # capacity check + insert in one write job
+    owner_id = await db.run(_join_clan, cid, user_id, datetime.now().isoformat())
+    if owner_id is None:
         return await message.reply_text("Clan is full (20 members).")
 
-    now_iso = datetime.now().isoformat()
-    db.cursor.execute("INSERT INTO clan_members (clan_id, user_id, role, joined_at) VALUES (?, ?, 'member', ?)",
-                      (cid, user_id, now_iso))
-    db.conn.commit()
-
     # notify owner
-    db.cursor.execute("SELECT owner_id FROM clans WHERE id = ?", (cid,))
-    owner_id = db.cursor.fetchone()[0]
     try:
         await client.send_message(owner_id, f"🔔 {message.from_user.first_name or message.from_user.username} has joined your clan `{name}`.")
     except Exception:
@@ -276,33 +244,23 @@ async def join_clan_handler(client, message):
 @app.on_message(filters.command("leaveclan"))
 async def leave_clan_handler(client, message):
     user_id = message.from_user.id
-    clan = get_user_clan(user_id)
+    clan = await get_user_clan(user_id)
     if not clan:
         return await message.reply_text("You are not in any clan.")
 
     cid, clan_code, name, owner_id, points, wins, losses, bank = clan
-    db.cursor.execute("DELETE FROM clan_members WHERE clan_id = ? AND user_id = ?", (cid, user_id))
-    db.conn.commit()
-
-    if user_id == owner_id:
-        # transfer ownership to earliest joined member if exists
-        db.cursor.execute("SELECT user_id FROM clan_members WHERE clan_id = ? ORDER BY joined_at ASC LIMIT 1", (cid,))
-        nxt = db.cursor.fetchone()
-        if nxt:
-            new_owner = nxt[0]
-            db.cursor.execute("UPDATE clans SET owner_id = ? WHERE id = ?", (new_owner, cid))
-            db.cursor.execute("UPDATE clan_members SET role = 'owner' WHERE clan_id = ? AND user_id = ?", (cid, new_owner))
-            db.conn.commit()
-            try:
-                await client.send_message(new_owner, f"👑 You are now the owner of clan `{name}` (transferred).")
-            except Exception:
-                pass
-        else:
-            # no members left → delete clan
-            db.cursor.execute("DELETE FROM clans WHERE id = ?", (cid,))
-            db.conn.commit()
-            await message.reply_text(f"Clan `{name}` had no members left and was deleted.")
-            return
+    # an owner transfers ownership to the earliest joined member, if any
+    new_owner = await db.run(_leave_clan, cid, user_id, owner_id)
+    if new_owner == "deleted":
+        # no members left → clan deleted
+        boards.remove_clan(cid)
+        await message.reply_text(f"Clan `{name}` had no members left and was deleted.")
+        return
+    if new_owner:
+        try:
+            await client.send_message(new_owner, f"👑 You are now the owner of clan `{name}` (transferred).")
+        except Exception:
+            pass
 
     await message.reply_text("You left the clan.")
 
@@ -317,14 +275,13 @@ async def clanwar_handler(client, message):
 
     target_code = parts[1].strip()
     # ensure user in a clan
-    myclan = get_user_clan(user_id)
+    myclan = await get_user_clan(user_id)
     if not myclan:
         return await message.reply_text("You must be in a clan to start a war.")
 
     my_cid = myclan[0]
     # find target clan
-    db.cursor.execute("SELECT id, name FROM clans WHERE clan_id = ?", (target_code,))
-    target = db.cursor.fetchone()
+    target = await db.fetchone("SELECT id, name FROM clans WHERE clan_id = ?", (target_code,))
     if not target:
         return await message.reply_text("Target clan not found.")
     target_cid, target_name = target
@@ -335,57 +292,51 @@ async def clanwar_handler(client, message):
     # create war (active for 24 hours)
     now = datetime.now()
     end = now + timedelta(hours=24)
-    db.cursor.execute("INSERT INTO clan_wars (challenger_clan, target_clan, start_iso, end_iso, status) VALUES (?, ?, ?, ?, 'active')",
-                      (my_cid, target_cid, now.isoformat(), end.isoformat()))
-    db.conn.commit()
-    war_id = db.cursor.lastrowid
+    cur = await db.execute("INSERT INTO clan_wars (challenger_clan, target_clan, start_iso, end_iso, status) VALUES (?, ?, ?, ?, 'active')",
+                           (my_cid, target_cid, now.isoformat(), end.isoformat()))
+    war_id = cur.lastrowid
+    await jobs.schedule("clan_war_end", war_id, end.timestamp())
 
     # initialize war_contrib rows maybe not necessary until contributions occur
     # notify both clans' members by DM
-    for clanid in (my_cid, target_cid):
-        db.cursor.execute("SELECT user_id FROM clan_members WHERE clan_id = ?", (clanid,))
-        for (uid,) in db.cursor.fetchall():
-            try:
-                await client.send_message(uid, f"⚔️ Clan War started (ID: {war_id})! Your clan was challenged. War runs until {end.isoformat()}. Contribute points to win!")
-            except Exception:
-                pass
+    members = await db.fetchall("SELECT user_id FROM clan_members WHERE clan_id IN (?, ?)", (my_cid, target_cid))
+    for (uid,) in members:
+        try:
+            await client.send_message(uid, f"⚔️ Clan War started (ID: {war_id})! Your clan was challenged. War runs until {end.isoformat()}. Contribute points to win!")
+        except Exception:
+            pass
 
     await message.reply_text(f"⚔️ Clan war started vs `{target_name}` (war_id: {war_id}). Members have 24 hours to contribute points.")
 
 
 # Helper to add contribution points during active war
-def add_war_points(war_id: int, clan_id: int, user_id: int, points: int):
-    # increase war_contrib row and clan_wars totals
-    db.cursor.execute("SELECT points FROM clan_wars WHERE id = ?", (war_id,))
-    war = db.cursor.fetchone()
-    if not war:
+def _add_war_points(conn, war_id, clan_id, user_id, points):
+    # determine whether clan is challenger or target
+    cw = conn.execute("SELECT challenger_clan, target_clan FROM clan_wars WHERE id = ?", (war_id,)).fetchone()
+    if not cw:
         return False
     # upsert war_contrib
-    db.cursor.execute("SELECT points FROM clan_war_contrib WHERE war_id = ? AND user_id = ?", (war_id, user_id))
-    row = db.cursor.fetchone()
+    row = conn.execute("SELECT points FROM clan_war_contrib WHERE war_id = ? AND user_id = ?", (war_id, user_id)).fetchone()
     if row:
-        db.cursor.execute("UPDATE clan_war_contrib SET points = points + ? WHERE war_id = ? AND user_id = ?", (points, war_id, user_id))
+        conn.execute("UPDATE clan_war_contrib SET points = points + ? WHERE war_id = ? AND user_id = ?", (points, war_id, user_id))
     else:
-        db.cursor.execute("INSERT INTO clan_war_contrib (war_id, clan_id, user_id, points) VALUES (?, ?, ?, ?)", (war_id, clan_id, user_id, points))
+        conn.execute("INSERT INTO clan_war_contrib (war_id, clan_id, user_id, points) VALUES (?, ?, ?, ?)", (war_id, clan_id, user_id, points))
     # increment clan total in clan_wars
-    # determine whether clan is challenger or target
-    db.cursor.execute("SELECT challenger_clan, target_clan FROM clan_wars WHERE id = ?", (war_id,))
-    cw = db.cursor.fetchone()
-    if not cw:
-        return False
     challenger_clan, target_clan = cw
     if clan_id == challenger_clan:
-        db.cursor.execute("UPDATE clan_wars SET challenger_points = challenger_points + ? WHERE id = ?", (points, war_id))
+        conn.execute("UPDATE clan_wars SET challenger_points = challenger_points + ? WHERE id = ?", (points, war_id))
     elif clan_id == target_clan:
-        db.cursor.execute("UPDATE clan_wars SET target_points = target_points + ? WHERE id = ?", (points, war_id))
-    db.conn.commit()
+        conn.execute("UPDATE clan_wars SET target_points = target_points + ? WHERE id = ?", (points, war_id))
     return True
 
 
+async def add_war_points(war_id: int, clan_id: int, user_id: int, points: int):
+    return await db.run(_add_war_points, war_id, clan_id, user_id, points)
+
+
 # ----------------- resolve war (helper + accessible command) -----------------
-def resolve_war_if_ended(war_id):
-    db.cursor.execute("SELECT id, challenger_clan, target_clan, end_iso, status, challenger_points, target_points FROM clan_wars WHERE id = ?", (war_id,))
-    row = db.cursor.fetchone()
+def _resolve_war(conn, war_id):
+    row = conn.execute("SELECT id, challenger_clan, target_clan, end_iso, status, challenger_points, target_points FROM clan_wars WHERE id = ?", (war_id,)).fetchone()
     if not row:
         return None
     wid, chal, targ, end_iso, status, cpts, tpts = row
@@ -412,14 +363,42 @@ def resolve_war_if_ended(war_id):
         if winner:
             # winner gets + total points to clan points (simple)
             awarded = (cpts + tpts)
-            db.cursor.execute("UPDATE clans SET points = points + ?, wins = wins + 1 WHERE id = ?", (awarded, winner))
-            db.cursor.execute("UPDATE clans SET losses = losses + 1 WHERE id = ?", (loser,))
-        db.cursor.execute("UPDATE clan_wars SET status = 'finished' WHERE id = ?", (wid,))
-        db.conn.commit()
+            conn.execute("UPDATE clans SET points = points + ?, wins = wins + 1 WHERE id = ?", (awarded, winner))
+            conn.execute("UPDATE clans SET losses = losses + 1 WHERE id = ?", (loser,))
+        conn.execute("UPDATE clan_wars SET status = 'finished' WHERE id = ?", (wid,))
         return {"war_id": wid, "winner": winner, "challenger_points": cpts, "target_points": tpts}
     return None
 
 
+async def resolve_war_if_ended(war_id):
+    res = await db.run(_resolve_war, war_id)
+    if res and res["winner"]:
+        boards.add_clan_points(res["winner"], res["challenger_points"] + res["target_points"])
+    return res
+
+
+async def notify_war_result(client, res):
+    """DM both clan owners the result of a resolved war"""
+    wid = res["war_id"]
+    owners = await db.fetchall("""
+        SELECT c.owner_id FROM clan_wars w JOIN clans c ON c.id IN (w.challenger_clan, w.target_clan)
+         WHERE w.id = ?
+    """, (wid,))
+    for (owner_id,) in owners:
+        try:
+            await client.send_message(owner_id, f"🏁 War {wid} finished. Result: {res}")
+        except:
+            pass
+
+
+@jobs.task("clan_war_end")
+async def clan_war_end_job(client, war_id, payload):
+    """Settle a war as soon as its 24 hours are up"""
+    res = await resolve_war_if_ended(int(war_id))
+    if res:
+        await notify_war_result(client, res)
+
+
 @app.on_message(filters.command("finishwar"))
 async def finish_war_cmd(client, message):
     parts = (message.text or "").split(maxsplit=1)
@@ -429,34 +408,27 @@ async def finish_war_cmd(client, message):
         war_id = int(parts[1].strip())
     except:
         return await message.reply_text("Invalid war id.")
-    res = resolve_war_if_ended(war_id)
+    res = await resolve_war_if_ended(war_id)
     if not res:
         return await message.reply_text("War not finished yet or invalid.")
-    # notify owners
-    wid = res["war_id"]
-    winner = res["winner"]
-    db.cursor.execute("SELECT challenger_clan, target_clan FROM clan_wars WHERE id = ?", (wid,))
-    cw = db.cursor.fetchone()
-    if cw:
-        ch, ta = cw
-        for clanid in (ch, ta):
-            db.cursor.execute("SELECT owner_id FROM clans WHERE id = ?", (clanid,))
-            orow = db.cursor.fetchone()
-            if orow:
-                try:
-                    await client.send_message(orow[0], f"🏁 War {wid} finished. Result: {res}")
-                except:
-                    pass
+    await notify_war_result(client, res)
     await message.reply_text("War resolved (if end time passed).")
 
 
 # ----------------- /clantop -----------------
 @app.on_message(filters.command("clantop"))
 async def clantop_handler(client, message):
-    db.cursor.execute("SELECT clan_id, name, points, wins, losses FROM clans ORDER BY points DESC LIMIT 10")
-    rows = db.cursor.fetchall()
-    if not rows:
+    await boards.ready()
+    top = boards.clans.top(10)
+    if not top:
         return await message.reply_text("No clans yet.")
+    # Board gives the order; one point lookup fills in the details
+    ids = [cid for cid, _ in top]
+    found = await db.fetchall(
+        f"SELECT id, clan_id, name, points, wins, losses FROM clans WHERE id IN ({','.join('?' * len(ids))})", ids
+    )
+    details = {r[0]: r[1:] for r in found}
+    rows = [details[cid] for cid in ids if cid in details]
     lines = []
     for i, (code, name, pts, wins, losses) in enumerate(rows, start=1):
         level, rank = clan_rank_from_points(pts or 0)
@@ -480,29 +452,55 @@ async def clandonate_handler(client, message):
     if amount <= 0:
         return await message.reply_text("Amount must be positive.")
 
-    clan = get_user_clan(user_id)
+    clan = await get_user_clan(user_id)
     if not clan:
         return await message.reply_text("You are not in a clan.")
 
     cid = clan[0]
 
-    # check user has enough crystals (use get_crystals total)
-    daily, weekly, monthly, total, last_claim, given = db.get_crystals(user_id)
-    if total < amount:
+    # deduct from user and add to clan bank in one transaction (fails if short)
+    if not await db.run(_donate, user_id, cid, amount):
         return await message.reply_text("You don't have enough crystals to donate.")
-
-    # deduct from user (use add_crystals with negative given)
-    db.add_crystals(user_id, given=-amount)
-
-    # add to clan bank
-    db.cursor.execute("UPDATE clans SET bank = bank + ? WHERE id = ?", (amount, cid))
-    db.conn.commit()
     db.log_event("clan_donate", user_id=user_id, details=f"donated {amount} to clan {cid}")
 
     await message.reply_text(f"✅ Donated {amount} 💎 to your clan bank.")
 
 
 # ----------------- /clanbankwithdraw -----------------
+def _withdraw(conn, cid, user_id, amount):
+    """Move amount from the clan bank to the owner; returns ok, cooldown or short"""
+    # check cooldown per owner in clan_withdrawals table (3 hours)
+    today_iso = date.today().isoformat()
+    row = conn.execute("SELECT last_withdraw_iso, daily_withdraw_total, daily_reset_date FROM clan_withdrawals WHERE clan_id = ? AND user_id = ?", (cid, user_id)).fetchone()
+    last_iso, daily_total, daily_reset = (None, 0, None) if not row else row
+
+    now_dt = datetime.now()
+    if last_iso:
+        try:
+            if now_dt < datetime.fromisoformat(last_iso) + timedelta(hours=3):
+                return "cooldown"
+        except ValueError:
+            pass
+
+    # reset daily total if day changed
+    if not daily_reset or daily_reset != today_iso:
+        daily_total = 0
+
+    # perform withdraw (never more than the bank holds) and credit the owner
+    if conn.execute("UPDATE clans SET bank = bank - ? WHERE id = ? AND bank >= ?", (amount, cid, amount)).rowcount == 0:
+        return "short"
+    credit(conn, user_id, amount, "clan_withdraw", f"clan={cid}")
+
+    # update withdrawals table
+    if row:
+        conn.execute("UPDATE clan_withdrawals SET last_withdraw_iso = ?, daily_withdraw_total = ?, daily_reset_date = ? WHERE clan_id = ? AND user_id = ?",
+                     (now_dt.isoformat(), (daily_total or 0) + amount, today_iso, cid, user_id))
+    else:
+        conn.execute("INSERT INTO clan_withdrawals (clan_id, user_id, last_withdraw_iso, daily_withdraw_total, daily_reset_date) VALUES (?, ?, ?, ?, ?)",
+                     (cid, user_id, now_dt.isoformat(), amount, today_iso))
+    return "ok"
+
+
 @app.on_message(filters.command("clanbankwithdraw"))
 async def clanbank_withdraw_handler(client, message):
     user_id = message.from_user.id
@@ -518,7 +516,7 @@ async def clanbank_withdraw_handler(client, message):
     if amount <= 0:
         return await message.reply_text("Amount must be positive.")
 
-    clan = get_user_clan(user_id)
+    clan = await get_user_clan(user_id)
     if not clan:
         return await message.reply_text("You are not in a clan.")
     cid, clan_code, name, owner_id, points, wins, losses, bank = clan
@@ -530,42 +528,12 @@ async def clanbank_withdraw_handler(client, message):
     if bank < amount:
         return await message.reply_text("Clan bank does not have enough crystals.")
 
-    # check cooldown per owner in clan_withdrawals table (3 hours)
-    today_iso = date.today().isoformat()
-    db.cursor.execute("SELECT last_withdraw_iso, daily_withdraw_total, daily_reset_date FROM clan_withdrawals WHERE clan_id = ? AND user_id = ?", (cid, user_id))
-    row = db.cursor.fetchone()
-    last_iso, daily_total, daily_reset = (None, 0, None) if not row else row
-
-    now_dt = datetime.now()
-    if last_iso:
-        try:
-            last_dt = datetime.fromisoformat(last_iso)
-            if now_dt < last_dt + timedelta(hours=3):
-                return await message.reply_text("Withdraw cooldown: you must wait 3 hours between withdrawals.")
-        except:
-            pass
-
-    # reset daily total if day changed
-    if not daily_reset or daily_reset != today_iso:
-        daily_total = 0
-        daily_reset = today_iso
-
-    # optional daily limit per clan - let's set high limit (e.g., bank itself), so just enforce no more than bank
-    # perform withdraw
-    db.cursor.execute("UPDATE clans SET bank = bank - ? WHERE id = ?", (amount, cid))
-    db.conn.commit()
-
-    # credit to owner (add_crystals given)
-    db.add_crystals(user_id, given=amount)
-
-    # update withdrawals table
-    if row:
-        db.cursor.execute("UPDATE clan_withdrawals SET last_withdraw_iso = ?, daily_withdraw_total = ?, daily_reset_date = ? WHERE clan_id = ? AND user_id = ?",
-                          (now_dt.isoformat(), (daily_total or 0) + amount, today_iso, cid, user_id))
-    else:
-        db.cursor.execute("INSERT INTO clan_withdrawals (clan_id, user_id, last_withdraw_iso, daily_withdraw_total, daily_reset_date) VALUES (?, ?, ?, ?, ?)",
-                          (cid, user_id, now_dt.isoformat(), amount, today_iso))
-    db.conn.commit()
+    # cooldown check + bank debit + owner credit in one write job
+    result = await db.run(_withdraw, cid, user_id, amount)
+    if result == "cooldown":
+        return await message.reply_text("Withdraw cooldown: you must wait 3 hours between withdrawals.")
+    if result == "short":
+        return await message.reply_text("Clan bank does not have enough crystals.")
 
     db.log_event("clan_withdraw", user_id=user_id, details=f"withdrew {amount} from clan {cid}")
     await message.reply_text(f"✅ Withdrawn {amount} 💎 from clan bank to your balance.")
@@ -578,8 +546,7 @@ async def claninfo_handler(client, message):
     if len(parts) < 2:
         return await message.reply_text("Usage: /claninfo [clan_id]")
     code = parts[1].strip()
-    db.cursor.execute("SELECT id, clan_id, name, owner_id, points, wins, losses, bank FROM clans WHERE clan_id = ?", (code,))
-    row = db.cursor.fetchone()
+    row = await db.fetchone("SELECT id, clan_id, name, owner_id, points, wins, losses, bank FROM clans WHERE clan_id = ?", (code,))
     if not row:
         return await message.reply_text("Clan not found.")
     cid, code, name, owner_id, points, wins, losses, bank = row
@@ -9,12 +9,17 @@ Provides:
 
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from config import app, Config
-from database import Database
+from config import app
+from database import get_db
+from leaderboard import get_leaderboards, luck_score
+from ledger import get_ledger
+from router import get_router, digits
 from datetime import datetime
-import math
 
-db = Database()
+db = get_db()
+boards = get_leaderboards()
+ledger = get_ledger()
+router = get_router()
 
 # ---------- Collection tiers ----------
 COLLECTION_TIERS = [
@@ -74,29 +79,21 @@ elif len(LUCKY_NAMES) > 100:
 
 
 # ---------- Helpers - DB wrappers ----------
-def get_user_total_waifus(user_id: int) -> int:
+async def get_user_total_waifus(user_id: int) -> int:
     try:
-        db.cursor.execute("SELECT SUM(amount) FROM user_waifus WHERE user_id = ?", (user_id,))
-        row = db.cursor.fetchone()
-        return int(row[0]) if row and row[0] is not None else 0
+        return int(await db.fetchval("SELECT SUM(amount) FROM user_waifus WHERE user_id = ?", (user_id,), default=0))
     except Exception:
         return 0
 
-def get_user_balance(user_id: int) -> int:
+async def get_user_balance(user_id: int) -> int:
     try:
-        db.cursor.execute("SELECT daily_crystals, weekly_crystals, monthly_crystals, given_crystals FROM users WHERE user_id = ?", (user_id,))
-        row = db.cursor.fetchone()
-        if not row:
-            return 0
-        daily, weekly, monthly, given = (int(v or 0) for v in row)
-        return daily + weekly + monthly + given
+        return await ledger.balance(user_id)
     except Exception:
         return 0
 
-def get_user_profile(user_id: int):
+async def get_user_profile(user_id: int):
     try:
-        db.cursor.execute("SELECT total_collected, progress FROM user_profiles WHERE user_id = ?", (user_id,))
-        row = db.cursor.fetchone()
+        row = await db.fetchone("SELECT total_collected, progress FROM user_profiles WHERE user_id = ?", (user_id,))
         if row:
             return int(row[0] or 0), int(row[1] or 0)
     except Exception:
@@ -123,20 +120,12 @@ def map_collection_tier(total: int) -> str:
 
 
 # ---------- Lucky rank calculation ----------
-def compute_luck_score(user_id: int, total_waifus: int = None) -> int:
+async def compute_luck_score(user_id: int, total_waifus: int = None) -> int:
     if total_waifus is None:
-        total_waifus = get_user_total_waifus(user_id)
-    if getattr(Config, "OWNER_ID", None) and int(user_id) == int(getattr(Config, "OWNER_ID")):
-        return 100
-    owner_ids = getattr(Config, "OWNER_IDS", []) or []
-    if owner_ids and int(user_id) in [int(x) for x in owner_ids]:
-        return 100
-    profile = get_user_profile(user_id)
+        total_waifus = await get_user_total_waifus(user_id)
+    profile = await get_user_profile(user_id)
     progress = profile[1] if profile else 0
-    part_a = min(50.0, float(total_waifus) / 30.0)
-    part_b = min(50.0, float(progress) * 0.5)
-    score = int(min(100, math.floor(part_a + part_b)))
-    return max(1, score)
+    return luck_score(user_id, total_waifus, progress)
 
 def luck_name_from_score(score: int) -> str:
     idx = max(1, min(100, int(score))) - 1
@@ -150,9 +139,9 @@ async def collectionvalue_cmd(client, message):
     if not user:
         return
     uid = user.id
-    total = get_user_total_waifus(uid)
-    balance = get_user_balance(uid)
-    profile = get_user_profile(uid)
+    total = await get_user_total_waifus(uid)
+    balance = await get_user_balance(uid)
+    profile = await get_user_profile(uid)
     profile_total = profile[0] if profile else total
     progress = profile[1] if profile else 0
     tier_label = map_collection_tier(total)
@@ -198,10 +187,10 @@ async def luckyrank_cmd(client, message):
     if not user:
         return
     uid = user.id
-    total = get_user_total_waifus(uid)
-    score = compute_luck_score(uid, total)
+    total = await get_user_total_waifus(uid)
+    score = await compute_luck_score(uid, total)
     name = luck_name_from_score(score)
-    profile = get_user_profile(uid)
+    profile = await get_user_profile(uid)
     progress = profile[1] if profile else 0
     display_name = f"{user.first_name} {(f'(@{user.username})' if getattr(user,'username',None) else '')}"
     text = (
@@ -216,38 +205,22 @@ async def luckyrank_cmd(client, message):
     await message.reply_text(text, reply_markup=LEADERBOARD_KB)
 
 
-# helper: compute users' luck scores (no await here)
-def compute_all_users_luck():
-    rows = []
-    try:
-        db.cursor.execute("SELECT user_id FROM users")
-        users = [r[0] for r in db.cursor.fetchall()]
-    except Exception:
-        users = []
-    res = []
-    for uid in users:
-        total = get_user_total_waifus(uid)
-        score = compute_luck_score(uid, total)
-        res.append((uid, score, total))
-    res.sort(key=lambda t: (t[1], t[2]), reverse=True)
-    return res
-
 # leaderboard callback — await client.get_users properly
 from pyrogram import enums
-@app.on_callback_query(filters.regex(r"^luck:leader:(\d+)$"))
-async def luck_leader_cb(client, callback):
-    page = int(callback.matches[0].group(1))
+@router.route("luck:leader", digits)
+async def luck_leader_cb(client, callback, page):
     page = max(1, page)
     per_page = 10
-    data = compute_all_users_luck()
-    total_items = len(data)
+    # Luck board is sorted by (score, total) in memory; a page is a slice
+    await boards.ready()
+    total_items = len(boards.luck)
     if total_items == 0:
         await callback.answer("No users found.", show_alert=True)
         return
 
     start = (page - 1) * per_page
     end = start + per_page
-    page_items = data[start:end]
+    page_items = [(uid, score, total) for uid, (score, total) in boards.luck.top(per_page, start)]
 
     lines = [f"🏆 Global Lucky Rank Leaderboard — Page {page}"]
     for i, (uid, score, total) in enumerate(page_items, start=start+1):
@@ -279,7 +252,7 @@ async def luck_leader_cb(client, callback):
         await callback.message.reply_text("\n".join(lines), reply_markup=InlineKeyboardMarkup(kb))
     await callback.answer()
 
-@app.on_callback_query(filters.regex(r"^luck:close$"))
+@router.route("luck:close")
 async def luck_close_cb(client, callback):
     try:
         await callback.message.delete()
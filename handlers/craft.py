@@ -1,10 +1,14 @@
 # craft.py
-import sqlite3, time, random
+import random
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from config import app, Config
+from config import app
+from cooldowns import get_cooldowns
+from database import get_db, give_card
+from sampler import get_sampler
+from ledger import credit
+from router import get_router
 
-DB_PATH = Config.DB_PATH
 COOLDOWN = 24 * 60 * 60  # 24 hours
 BONUS_CRYSTALS = 10000
 
@@ -15,94 +19,45 @@ ALLOWED_RARITIES = [
 ]
 
 # ---------- DB helpers ----------
-def db():
-    return sqlite3.connect(DB_PATH)
+db = get_db()
+cooldowns = get_cooldowns()
+sampler = get_sampler()
+router = get_router()
 
-def ensure_user_rows(user_id: int, username: str, first_name: str):
-    conn = db()
-    cur = conn.cursor()
+def _ensure_user_rows(conn, user_id: int, username: str, first_name: str):
     # Minimal users row (other columns have defaults)
-    cur.execute("""
+    conn.execute("""
         INSERT OR IGNORE INTO users (user_id, username, first_name)
         VALUES (?, ?, ?)
     """, (user_id, username or "", first_name or ""))
 
-    # Profile row for balance
-    cur.execute("""
+    # Profile row (level / rank / progress)
+    conn.execute("""
         INSERT OR IGNORE INTO user_profiles (user_id)
         VALUES (?)
     """, (user_id,))
 
-    # Cooldown table for craft
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_craft (
-            user_id INTEGER PRIMARY KEY,
-            last_claim INTEGER
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-def add_waifu_to_inventory(user_id: int, waifu_id: int):
-    """Same inventory pattern as your reward.py (user_waifus)"""
-    conn = db()
+def _award_craft(conn, user_id: int, waifu_id: int):
+    """Inventory + crystals + cooldown in one transaction"""
+    give_card(conn, user_id, waifu_id)
+    credit(conn, user_id, BONUS_CRYSTALS, "craft_bonus")
+    cooldowns.write(conn, user_id, "craft")
+
+async def ensure_user_rows(user_id: int, username: str, first_name: str):
+    await db.run(_ensure_user_rows, user_id, username, first_name)
+
+async def award_craft(user_id: int, waifu_id: int):
     try:
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE user_waifus
-               SET amount = amount + 1,
-                   last_collected = strftime('%s','now')
-             WHERE user_id = ? AND waifu_id = ?
-        """, (user_id, waifu_id))
-        if cur.rowcount == 0:
-            cur.execute("""
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-            """, (user_id, waifu_id))
-        conn.commit()
-    finally:
-        conn.close()
-
-def add_crystals(user_id: int, amount: int):
-    conn = db()
-    cur = conn.cursor()
-    cur.execute("UPDATE user_profiles SET balance = balance + ? WHERE user_id = ?", (amount, user_id))
-    conn.commit()
-    conn.close()
-
-def get_cooldown_remaining(user_id: int) -> int:
-    """Return seconds remaining; 0 if ready."""
-    conn = db()
-    cur = conn.cursor()
-    cur.execute("SELECT last_claim FROM user_craft WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
-    conn.close()
-    now = int(time.time())
-    if not row or not row[0]:
-        return 0
-    elapsed = now - int(row[0])
-    return max(0, COOLDOWN - elapsed)
-
-def set_cooldown_now(user_id: int):
-    conn = db()
-    cur = conn.cursor()
-    cur.execute("INSERT OR REPLACE INTO user_craft (user_id, last_claim) VALUES (?, ?)", (user_id, int(time.time())))
-    conn.commit()
-    conn.close()
+        await db.run(_award_craft, user_id, waifu_id)
+    except Exception:
+        cooldowns.clear(user_id, "craft")
+        raise
 
 def pick_random_allowed_waifu():
-    conn = db()
-    cur = conn.cursor()
-    placeholders = ",".join("?" * len(ALLOWED_RARITIES))
-    cur.execute(f"""
-        SELECT id, name, anime, rarity, media_type, media_file
-          FROM waifu_cards
-         WHERE rarity IN ({placeholders})
-         ORDER BY RANDOM() LIMIT 1
-    """, ALLOWED_RARITIES)
-    row = cur.fetchone()
-    conn.close()
-    return row
+    card = sampler.sample(rarities=ALLOWED_RARITIES)
+    if not card:
+        return None
+    return card.id, card.name, card.anime, card.rarity, card.media_type, card.media_file
 
 # ---------- UI texts ----------
 def craft_announcement_text(display_name: str):
@@ -147,7 +102,7 @@ async def craft_command(client, message):
     display_name = (first_name + (" " + last_name if last_name else "")).strip() or username or "Traveler"
 
     # Ensure rows and tables exist
-    ensure_user_rows(user_id, username, first_name)
+    await ensure_user_rows(user_id, username, first_name)
 
     text = craft_announcement_text(display_name)
     kb = InlineKeyboardMarkup([
@@ -156,7 +111,7 @@ async def craft_command(client, message):
     ])
     await message.reply(text, reply_markup=kb, disable_web_page_preview=True)
 
-@app.on_callback_query(filters.regex("^claim_craft$"))
+@router.route("claim_craft")
 async def claim_craft_cb(client, callback_query):
     user = callback_query.from_user
     user_id = user.id
@@ -176,10 +131,10 @@ async def claim_craft_cb(client, callback_query):
         return
 
     # Ensure DB rows exist
-    ensure_user_rows(user_id, username, first_name)
+    await ensure_user_rows(user_id, username, first_name)
 
-    # Cooldown check
-    remaining = get_cooldown_remaining(user_id)
+    # Cooldown check (started here, saved with the award)
+    remaining = cooldowns.try_start(user_id, "craft", COOLDOWN, write=False)
     if remaining > 0:
         hrs = remaining // 3600
         mins = (remaining % 3600) // 60
@@ -190,6 +145,7 @@ async def claim_craft_cb(client, callback_query):
     # Pick a waifu (only allowed rarities)
     row = pick_random_allowed_waifu()
     if not row:
+        cooldowns.clear(user_id, "craft")
         await callback_query.answer("No eligible waifus in DB.", show_alert=True)
         await callback_query.message.reply("⚠️ No eligible waifu cards available for craft right now.")
         return
@@ -197,9 +153,7 @@ async def claim_craft_cb(client, callback_query):
     waifu_id, name, anime, rarity, media_type, media_file = row
 
     # Award: inventory + crystals, then set cooldown
-    add_waifu_to_inventory(user_id, waifu_id)
-    add_crystals(user_id, BONUS_CRYSTALS)
-    set_cooldown_now(user_id)
+    await award_craft(user_id, waifu_id)
 
     caption = success_caption(name, anime, rarity, full_name)
 
@@ -1,13 +1,13 @@
 # handlers/delcard.py
-import sqlite3
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import app, OWNER_ID, ADMINS
+from database import get_db
+from catalog import get_catalog
+from router import get_router, digits
 
-DB_PATH = "waifu_bot.db"
-
-def _conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+db = get_db()
+router = get_router()
 
 
 # /deletecard <id>
@@ -19,11 +19,7 @@ async def delete_card_request(client, message):
         return
 
     wid = args[1].strip()
-    conn = _conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
-    row = cur.fetchone()
-    conn.close()
+    row = await db.fetchone("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
 
     if not row:
         await message.reply_text("❌ Waifu card not found.")
@@ -54,10 +50,10 @@ async def delete_card_request(client, message):
 
 
 # Confirm or Cancel
-@app.on_callback_query(filters.regex(r"^(confirmdel|canceldel)_(\d+)$"))
-async def delete_card_confirm(client, cq: CallbackQuery):
-    action, wid = cq.data.split("_")
-    wid = int(wid)
+@router.route("confirmdel", digits, sep="_")
+@router.route("canceldel", digits, sep="_")
+async def delete_card_confirm(client, cq: CallbackQuery, wid):
+    action = cq.data.split("_", 1)[0]
 
     if cq.from_user.id not in [OWNER_ID] + ADMINS:
         await cq.answer("🚫 You are not allowed to do this.", show_alert=True)
@@ -68,10 +64,7 @@ async def delete_card_confirm(client, cq: CallbackQuery):
         return
 
     # Confirm delete
-    conn = _conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM waifu_cards WHERE id=?", (wid,))
-    conn.commit()
-    conn.close()
+    await db.execute("DELETE FROM waifu_cards WHERE id=?", (wid,))
+    get_catalog().remove(wid)
 
     await cq.message.edit_caption(f"✅ Waifu card ID {wid} deleted permanently.")
@@ -1,11 +1,14 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-import sqlite3
+from database import get_db
 import random
 import string
 from config import app, OWNER_ID, ADMINS
+from catalog import get_catalog
+from router import get_router, choice, digits
 
-DB_PATH = "waifu_bot.db"
+db = get_db()
+router = get_router()
 
 # in-memory storage for long callback data
 pending_edits = {}  # {short_id: (card_id, media_type, file_id)}
@@ -25,6 +28,15 @@ def column_exists(conn, table, column):
     columns = [info[1] for info in cur.fetchall()]
     return column in columns
 
+def _load_card(conn, wid):
+    """(has_theme, card row or None)"""
+    has_theme = column_exists(conn, "waifu_cards", "theme")
+    if has_theme:
+        row = conn.execute("SELECT id, name, anime, rarity, theme, media_type, media_file FROM waifu_cards WHERE id=?", (wid,)).fetchone()
+    else:
+        row = conn.execute("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id=?", (wid,)).fetchone()
+    return has_theme, row
+
 @app.on_message(filters.command("editcard") & filters.user([OWNER_ID] + ADMINS))
 async def edit_card_request(client, message):
     args = message.text.split(maxsplit=3)
@@ -34,25 +46,14 @@ async def edit_card_request(client, message):
 
     wid = args[1]
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    has_theme = column_exists(conn, "waifu_cards", "theme")
-
     try:
-        if has_theme:
-            cur.execute("SELECT id, name, anime, rarity, theme, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
-        else:
-            cur.execute("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards WHERE id=?", (wid,))
-        row = cur.fetchone()
+        has_theme, row = await db.read(_load_card, wid)
     except Exception as e:
         await message.reply(f"❌ Database error: {e}")
-        conn.close()
         return
 
     if not row:
         await message.reply("❌ No card found with this ID.")
-        conn.close()
         return
 
     if has_theme:
@@ -76,7 +77,6 @@ async def edit_card_request(client, message):
             await message.reply_video(media_file, caption=preview, reply_markup=kb)
         else:
             await message.reply_photo(media_file, caption=preview, reply_markup=kb)
-        conn.close()
         return
 
     # editing field
@@ -104,12 +104,10 @@ async def edit_card_request(client, message):
             await message.reply_video(media_file, caption=preview, reply_markup=kb)
         else:
             await message.reply_photo(media_file, caption=preview, reply_markup=kb)
-        conn.close()
         return
 
     if len(args) < 4:
         await message.reply("❌ Missing new value. Example:\n/editcard 1 name NewName")
-        conn.close()
         return
 
     new_value = args[3]
@@ -120,7 +118,6 @@ async def edit_card_request(client, message):
 
     if field not in allowed_fields:
         await message.reply(f"❌ Invalid field. Use one of: {', '.join(allowed_fields)}")
-        conn.close()
         return
 
     preview = (
@@ -137,51 +134,39 @@ async def edit_card_request(client, message):
     else:
         await message.reply_photo(media_file, caption=preview, reply_markup=kb)
 
-    conn.close()
-
 
 # normal field edits
-@app.on_callback_query(filters.regex(r"^edit_apply:(\d+):(\w+):(.+)"))
-async def apply_edit(client, callback_query):
-    wid, field, value = callback_query.data.split(":", 2)
+@router.route("edit_apply", digits, choice("name", "anime", "rarity", "theme"), str)
+async def apply_edit(client, callback_query, wid, field, value):
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    has_theme = column_exists(conn, "waifu_cards", "theme")
+    has_theme = await db.read(column_exists, "waifu_cards", "theme")
 
     try:
         if field == "theme" and not has_theme:
             await callback_query.message.reply("❌ Cannot update theme: column does not exist in database.")
             return
-        cur.execute(f"UPDATE waifu_cards SET {field}=? WHERE id=?", (value, wid))
-        conn.commit()
+        await db.execute(f"UPDATE waifu_cards SET {field}=? WHERE id=?", (value, wid))
+        await get_catalog().load()
         await callback_query.message.edit_caption(f"✅ Card {wid} updated successfully!")
     except Exception as e:
         await callback_query.message.reply(f"❌ Update failed: {e}")
-    finally:
-        conn.close()
 
 
 # photo/video edits using short_id
-@app.on_callback_query(filters.regex(r"^edit_media:(\w+)$"))
-async def apply_media_edit(client, callback_query):
-    short_id = callback_query.data.split(":")[1]
+@router.route("edit_media", str)
+async def apply_media_edit(client, callback_query, short_id):
     if short_id not in pending_edits:
         await callback_query.message.edit_caption("❌ This edit expired.")
         return
 
     card_id, media_type, media_file = pending_edits.pop(short_id)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("UPDATE waifu_cards SET media_type=?, media_file=? WHERE id=?", (media_type, media_file, card_id))
-    conn.commit()
-    conn.close()
+    await db.execute("UPDATE waifu_cards SET media_type=?, media_file=? WHERE id=?", (media_type, media_file, card_id))
+    await get_catalog().load()
 
     await callback_query.message.edit_caption(f"✅ Card {card_id} updated successfully!")
 
 
-@app.on_callback_query(filters.regex(r"^edit_cancel$"))
+@router.route("edit_cancel")
 async def cancel_edit(client, callback_query):
     await callback_query.message.edit_caption("❌ Edit cancelled.")
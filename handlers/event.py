@@ -4,42 +4,30 @@ Event system:
 - /event <name>|<start>|<end>    (owner only)  -- create event
 - /register                       (users)       -- register for active event
 - /listuser                       (owner/admin) -- show registrations for active event
-- /delwinner                      (owner only)  -- pick up to 10 random winners from registrations and DM them
+- /delwinner [crystals]           (owner only)  -- pick up to 10 random winners from registrations, pay the optional prize and DM them
+
+The start is announced to every user and group (broadcast.py) and the
+creator gets the registration count when it ends; both run as scheduled
+jobs (jobs.py), so they happen on time across restarts.
 """
 
-from datetime import datetime
+import asyncio
+import time
+from datetime import datetime, timezone
 from typing import Optional, List, Tuple
 from pyrogram import filters
 from pyrogram.types import Message
 from config import app, Config
-from database import Database
+from broadcast import get_broadcaster
+from database import get_db
+from jobs import get_jobs
+from ledger import get_ledger
 import random
 
-db = Database()
-
-# ---------------- Ensure tables ----------------
-def ensure_event_tables():
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            start_at TEXT,
-            end_at TEXT,
-            created_by INTEGER,
-            created_at TEXT
-        )
-    """)
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS event_registrations (
-            event_id INTEGER,
-            user_id INTEGER,
-            registered_at TEXT,
-            PRIMARY KEY (event_id, user_id)
-        )
-    """)
-    db.conn.commit()
-
-ensure_event_tables()
+db = get_db()
+ledger = get_ledger()
+jobs = get_jobs()
+broadcaster = get_broadcaster()
 
 # ---------------- Helpers ----------------
 def is_owner(uid: int) -> bool:
@@ -78,56 +66,47 @@ def parse_datetime(text: str) -> Optional[datetime]:
             continue
     return None
 
-def create_event_row(name: str, start_iso: str, end_iso: str, created_by: int):
-    db.cursor.execute(
+async def create_event_row(name: str, start_iso: str, end_iso: str, created_by: int):
+    cur = await db.execute(
         "INSERT INTO events (name, start_at, end_at, created_by, created_at) VALUES (?, ?, ?, ?, ?)",
         (name, start_iso, end_iso, created_by, now_iso())
     )
-    db.conn.commit()
-    return db.cursor.lastrowid
+    return cur.lastrowid
 
-def get_active_event() -> Optional[Tuple]:
+async def get_active_event() -> Optional[Tuple]:
     """Return the active event row (id, name, start_at, end_at, ...) where start<=now<=end, else None."""
     now = datetime.utcnow().isoformat()
-    db.cursor.execute("""
+    return await db.fetchone("""
         SELECT id, name, start_at, end_at, created_by, created_at
         FROM events
         WHERE start_at <= ? AND end_at >= ?
         ORDER BY id DESC
         LIMIT 1
     """, (now, now))
-    row = db.cursor.fetchone()
-    return row
 
-def get_latest_event() -> Optional[Tuple]:
-    db.cursor.execute("""
+async def get_latest_event() -> Optional[Tuple]:
+    return await db.fetchone("""
         SELECT id, name, start_at, end_at, created_by, created_at
         FROM events
         ORDER BY id DESC
         LIMIT 1
     """)
-    return db.cursor.fetchone()
 
-def register_user_for_event(event_id: int, user_id: int) -> bool:
+async def register_user_for_event(event_id: int, user_id: int) -> bool:
     """Return True if registered added; False if already registered or error."""
     try:
-        db.cursor.execute("INSERT OR IGNORE INTO event_registrations (event_id, user_id, registered_at) VALUES (?, ?, ?)",
-                          (event_id, int(user_id), now_iso()))
-        db.conn.commit()
+        await db.execute("INSERT OR IGNORE INTO event_registrations (event_id, user_id, registered_at) VALUES (?, ?, ?)",
+                         (event_id, int(user_id), now_iso()))
         # check if inserted
-        db.cursor.execute("SELECT 1 FROM event_registrations WHERE event_id = ? AND user_id = ?", (event_id, user_id))
-        return db.cursor.fetchone() is not None
+        return await db.fetchone("SELECT 1 FROM event_registrations WHERE event_id = ? AND user_id = ?", (event_id, user_id)) is not None
     except Exception:
         return False
 
-def get_registration_count(event_id: int) -> int:
-    db.cursor.execute("SELECT COUNT(*) FROM event_registrations WHERE event_id = ?", (event_id,))
-    row = db.cursor.fetchone()
-    return row[0] if row else 0
+async def get_registration_count(event_id: int) -> int:
+    return await db.fetchval("SELECT COUNT(*) FROM event_registrations WHERE event_id = ?", (event_id,), default=0)
 
-def get_registered_users(event_id: int) -> List[int]:
-    db.cursor.execute("SELECT user_id FROM event_registrations WHERE event_id = ?", (event_id,))
-    rows = db.cursor.fetchall()
+async def get_registered_users(event_id: int) -> List[int]:
+    rows = await db.fetchall("SELECT user_id FROM event_registrations WHERE event_id = ?", (event_id,))
     return [r[0] for r in rows]
 
 async def dm_user(client, uid: int, text: str) -> bool:
@@ -137,6 +116,43 @@ async def dm_user(client, uid: int, text: str) -> bool:
     except Exception:
         return False
 
+def utc_timestamp(dt: datetime) -> float:
+    """Unix time of a naive UTC datetime"""
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+async def get_event(event_id: int) -> Optional[Tuple]:
+    return await db.fetchone("""
+        SELECT id, name, start_at, end_at, created_by, created_at
+        FROM events WHERE id = ?
+    """, (event_id,))
+
+# ---------------- Scheduled Jobs ----------------
+@jobs.task("event_start")
+async def event_start_job(client, event_id, payload):
+    """Announce the event to every user and group"""
+    event = await get_event(int(event_id))
+    if not event:
+        return
+    eid, name, start_at, end_at, created_by, _ = event
+    text = f"📣 Event Started: {name} (ID: {eid})\nEnds at: {end_at}\nUse /register to join!"
+    # a retried job must not announce twice: resume_all() finishes an interrupted broadcast
+    if await broadcaster.db.fetchval("SELECT id FROM broadcasts WHERE kind = 'text' AND text = ?", (text,)):
+        return
+    broadcast_id = await broadcaster.create("text", text, None, created_by)
+    asyncio.create_task(broadcaster.run(broadcast_id))
+
+@jobs.task("event_end")
+async def event_end_job(client, event_id, payload):
+    """Tell the creator the event is over and how many registered"""
+    event = await get_event(int(event_id))
+    if not event:
+        return
+    eid, name, start_at, end_at, created_by, _ = event
+    count = await get_registration_count(eid)
+    await dm_user(client, created_by,
+                  f"🏁 Event **{name}** (ID: {eid}) has ended with {count} registrations.\n"
+                  f"Use /delwinner [crystals] to pick the winners.")
+
 # ---------------- Commands ----------------
 
 # /event <name>|<start>|<end>   owner only
@@ -177,26 +193,12 @@ async def event_cmd(client, message: Message):
 
     start_iso = start_dt.isoformat()
     end_iso = end_dt.isoformat()
-    ensure_event_tables()
-    eid = create_event_row(name, start_iso, end_iso, uid)
-    await message.reply_text(f"✅ Event created (ID: {eid})\n• {name}\n• Start: {start_iso}\n• End: {end_iso}")
-
-    # If start <= now, optionally notify users immediately
-    try:
-        if start_dt <= datetime.utcnow():
-            # notify all users in users table (best-effort)
-            db.cursor.execute("SELECT user_id FROM users")
-            users = db.cursor.fetchall()
-            notified = 0
-            for (u,) in users:
-                try:
-                    await dm_user(client, u, f"📣 Event Started: {name}\nStarts at: {start_iso}")
-                    notified += 1
-                except Exception:
-                    continue
-            await message.reply_text(f"📣 Event start notifications sent to {notified} users (best-effort).")
-    except Exception:
-        pass
+    eid = await create_event_row(name, start_iso, end_iso, uid)
+    # announced right away if it already started
+    await jobs.schedule("event_start", eid, max(utc_timestamp(start_dt), time.time()))
+    await jobs.schedule("event_end", eid, utc_timestamp(end_dt))
+    await message.reply_text(f"✅ Event created (ID: {eid})\n• {name}\n• Start: {start_iso}\n• End: {end_iso}\n\n"
+                             f"📣 The start will be announced to all users and groups.")
 
 # /register  (users)
 @app.on_message(filters.command("register"))
@@ -204,17 +206,15 @@ async def register_cmd(client, message: Message):
     user = message.from_user
     if not user:
         return
-    ensure_event_tables()
-    event = get_active_event()
+    event = await get_active_event()
     if not event:
         return await message.reply_text("ℹ️ There is no active event at the moment. Try later.")
     event_id, name, start_at, end_at, *_ = event
     # attempt register
-    success = register_user_for_event(event_id, user.id)
+    success = await register_user_for_event(event_id, user.id)
     if not success:
         # check if already registered
-        db.cursor.execute("SELECT 1 FROM event_registrations WHERE event_id = ? AND user_id = ?", (event_id, user.id))
-        if db.cursor.fetchone():
+        if await db.fetchone("SELECT 1 FROM event_registrations WHERE event_id = ? AND user_id = ?", (event_id, user.id)):
             return await message.reply_text(f"✅ You are already registered for **{name}** (Event ID: {event_id}).")
         return await message.reply_text("❌ Registration failed. Try again later.")
     await message.reply_text(f"✅ Registered for **{name}** (Event ID: {event_id}). Good luck!")
@@ -225,11 +225,10 @@ async def listuser_cmd(client, message: Message):
     uid = message.from_user.id
     if not (is_admin(uid) or is_owner(uid)):
         return await message.reply_text("❌ Only admins/owner can view the registration list.")
-    ensure_event_tables()
-    event = get_active_event()
+    event = await get_active_event()
     if not event:
         # fallback to latest event
-        event = get_latest_event()
+        event = await get_latest_event()
         if not event:
             return await message.reply_text("No events found.")
         note = "(latest event)"
@@ -237,7 +236,7 @@ async def listuser_cmd(client, message: Message):
         note = "(active event)"
 
     event_id, name, start_at, end_at, created_by, created_at = event
-    count = get_registration_count(event_id)
+    count = await get_registration_count(event_id)
     await message.reply_text(f"📋 Registrations for **{name}** {note} (ID: {event_id}):\nTotal registered: {count}")
 
 # /delwinner  (owner only)
@@ -247,24 +246,30 @@ async def delwinner_cmd(client, message: Message):
     if not is_owner(uid):
         return await message.reply_text("❌ Only the bot owner can declare winners.")
 
-    ensure_event_tables()
     # prefer active event, else latest
-    event = get_active_event() or get_latest_event()
+    event = await get_active_event() or await get_latest_event()
     if not event:
         return await message.reply_text("No event available to pick winners from.")
     event_id, name, start_at, end_at, created_by, created_at = event
 
-    users = get_registered_users(event_id)
+    users = await get_registered_users(event_id)
     if not users:
         return await message.reply_text("No registered users for this event.")
     # choose up to 10 random unique winners
     winners = random.sample(users, min(10, len(users)))
 
+    # optional prize: every winner is paid in one ledger batch
+    parts = (message.text or "").split()
+    prize = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+    if prize:
+        await ledger.credit_many([(w, prize) for w in winners], "event_prize", f"event={event_id}")
+
     notified = []
     failed = []
     for w in winners:
         try:
-            ok = await dm_user(client, w, f"🏆 Congratulations! You are a winner for event '{name}'! 🎉")
+            prize_line = f"\n💎 Prize: {prize:,} crystals" if prize else ""
+            ok = await dm_user(client, w, f"🏆 Congratulations! You are a winner for event '{name}'! 🎉{prize_line}")
             if ok:
                 notified.append(w)
             else:
@@ -276,10 +281,9 @@ async def delwinner_cmd(client, message: Message):
     text = f"🏆 Winners for event **{name}** (ID: {event_id}):\n"
     for i, w in enumerate(winners, start=1):
         text += f"{i}. `{w}`\n"
+    if prize:
+        text += f"\n💎 Paid {prize:,} each"
     text += f"\nNotified: {len(notified)}  Failed: {len(failed)}"
     await message.reply_text(text)
 
     # optionally log winners to DB as events_winners table (not requested), skip.
-
-# ensure tables created on import
-ensure_event_tables()
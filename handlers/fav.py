@@ -3,9 +3,19 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
 from config import app
-from database import Database
+from database import get_db
+from inventory_view import get_inventory_views
+from router import get_router
 
-db = Database()
+db = get_db()
+router = get_router()
+
+
+def _card_by_id(conn, waifu_id):
+    """Card row as a column -> value dict, or None"""
+    cur = conn.execute("SELECT * FROM waifu_cards WHERE id = ?", (waifu_id,))
+    row = cur.fetchone()
+    return dict(zip([desc[0] for desc in cur.description], row)) if row else None
 
 # ---------------- /fav Command ----------------
 @app.on_message(filters.command("fav"))
@@ -22,35 +32,13 @@ async def set_favorite(client, message: Message):
         await message.reply_text("❌ Usage: /fav <waifu_id>")
         return
 
-    # Ensure tables exist
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS waifu_cards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            anime TEXT,
-            rarity TEXT,
-            event TEXT,
-            media_type TEXT,
-            media_file TEXT
-        )
-    """)
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_fav (
-            user_id INTEGER PRIMARY KEY,
-            waifu_id INTEGER
-        )
-    """)
-    db.conn.commit()
-
     # Fetch waifu card
-    db.cursor.execute("SELECT * FROM waifu_cards WHERE id = ?", (waifu_id,))
-    waifu = db.cursor.fetchone()
-    if not waifu:
+    waifu_data = await db.read(_card_by_id, waifu_id)
+    if not waifu_data:
         await message.reply_text("❌ Waifu card not found!")
         return
 
     # Map columns safely
-    waifu_data = dict(zip([desc[0] for desc in db.cursor.description], waifu))
     waifu_id = waifu_data["id"]
     name = waifu_data["name"]
     anime = waifu_data["anime"]
@@ -89,20 +77,16 @@ async def set_favorite(client, message: Message):
 
 
 # ---------------- Callback Handler ----------------
-@app.on_callback_query(filters.regex(r"^fav_"))
-async def fav_callback(client, callback):
-    data = callback.data.split("|")
-    action = data[0]
+@router.route("fav_confirm", int, int, sep="|")
+async def fav_confirm_cb(client, callback, user_id, waifu_id):
+    # Save favorite in user_fav table (insert or replace)
+    await db.execute("REPLACE INTO user_fav (user_id, waifu_id) VALUES (?, ?)", (user_id, waifu_id))
+    get_inventory_views().forget_prefs(user_id)
+    await callback.answer("💞 Favorite waifu set successfully!", show_alert=True)
+    await callback.message.delete()
 
-    if action == "fav_confirm":
-        user_id = int(data[1])
-        waifu_id = int(data[2])
-        # Save favorite in user_fav table (insert or replace)
-        db.cursor.execute("REPLACE INTO user_fav (user_id, waifu_id) VALUES (?, ?)", (user_id, waifu_id))
-        db.conn.commit()
-        await callback.answer("💞 Favorite waifu set successfully!", show_alert=True)
-        await callback.message.delete()
 
-    elif action == "fav_decline":
-        await callback.answer("❌ Favorite waifu selection cancelled.", show_alert=True)
-        await callback.message.delete()
+@router.route("fav_decline", int, sep="|")
+async def fav_decline_cb(client, callback, user_id):
+    await callback.answer("❌ Favorite waifu selection cancelled.", show_alert=True)
+    await callback.message.delete()
@@ -3,9 +3,11 @@ import random
 import time
 from pyrogram import filters
 from config import app
-from database import Database
+from database import get_db
+from ledger import get_ledger
 
-db = Database()
+db = get_db()
+ledger = get_ledger()
 COOLDOWN = 60
 user_cooldowns = {}
 
@@ -44,5 +46,5 @@ async def game_handler(client, message):
 
     # Reward
     if win:
-        db.add_crystals(user_id, given=amount)
+        await ledger.credit(user_id, amount, f"game_{cmd}")
         await message.reply_text(f"🎉 You won **{amount}** crystals!")
\ No newline at end of file
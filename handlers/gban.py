@@ -16,42 +16,14 @@ from typing import Optional
 from pyrogram import filters
 from pyrogram.types import Message, CallbackQuery
 from config import app, Config
-from database import Database
+from database import get_db
 
-db = Database()
+db = get_db()
 
 # whether to notify banned users in private chat (True = reply, False = silent ignore)
 NOTIFY_BANNED_IN_PRIVATE = True
 
-# ------------------- DB schema / cache -------------------
-def ensure_global_bans_schema():
-    try:
-        db.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS global_bans (
-                user_id INTEGER PRIMARY KEY
-            )
-        """)
-        db.conn.commit()
-    except Exception:
-        pass
-
-    # best-effort add optional cols if missing
-    try:
-        required = {"banned_by": "INTEGER", "reason": "TEXT", "banned_at": "TEXT"}
-        db.cursor.execute("PRAGMA table_info(global_bans)")
-        existing = [r[1] for r in db.cursor.fetchall()]
-        for col, ctype in required.items():
-            if col not in existing:
-                try:
-                    db.cursor.execute(f"ALTER TABLE global_bans ADD COLUMN {col} {ctype}")
-                    db.conn.commit()
-                except Exception:
-                    pass
-    except Exception:
-        pass
-
-ensure_global_bans_schema()
-
+# ------------------- Ban cache -------------------
 BANNED_CACHE = set()
 
 def load_banned_cache():
@@ -96,22 +68,19 @@ def is_admin(uid: int) -> bool:
         pass
     return False
 
-def add_global_ban(user_id: int, banned_by: int = 0, reason: Optional[str] = None):
+async def add_global_ban(user_id: int, banned_by: int = 0, reason: Optional[str] = None):
     """Insert/replace into DB and update cache immediately (best-effort)."""
     try:
-        ensure_global_bans_schema()
         banned_at = now_iso()
         try:
-            db.cursor.execute(
+            await db.execute(
                 "INSERT OR REPLACE INTO global_bans (user_id, banned_by, reason, banned_at) VALUES (?, ?, ?, ?)",
                 (int(user_id), int(banned_by or 0), reason or "", banned_at)
             )
-            db.conn.commit()
         except Exception:
             # fallback minimal insert if schema older
             try:
-                db.cursor.execute("INSERT OR REPLACE INTO global_bans (user_id) VALUES (?)", (int(user_id),))
-                db.conn.commit()
+                await db.execute("INSERT OR REPLACE INTO global_bans (user_id) VALUES (?)", (int(user_id),))
             except Exception:
                 pass
         BANNED_CACHE.add(int(user_id))
@@ -122,10 +91,9 @@ def add_global_ban(user_id: int, banned_by: int = 0, reason: Optional[str] = Non
     except Exception:
         pass
 
-def remove_global_ban(user_id: int):
+async def remove_global_ban(user_id: int):
     try:
-        db.cursor.execute("DELETE FROM global_bans WHERE user_id = ?", (int(user_id),))
-        db.conn.commit()
+        await db.execute("DELETE FROM global_bans WHERE user_id = ?", (int(user_id),))
     except Exception:
         pass
     BANNED_CACHE.discard(int(user_id))
@@ -248,11 +216,11 @@ async def gban_handler(client, message: Message):
         parts = (message.text or "").split(maxsplit=1)
         reason = parts[1].strip() if len(parts) > 1 else None
 
-        add_global_ban(target_id, issuer.id, reason)
+        await add_global_ban(target_id, issuer.id, reason)
 
         # ensure user exists in users table
         try:
-            db.add_user(target_id, username=getattr(target, "username", None), first_name=getattr(target, "first_name", None))
+            await db.add_user(target_id, username=getattr(target, "username", None), first_name=getattr(target, "first_name", None))
         except Exception:
             pass
 
@@ -303,7 +271,7 @@ async def gunban_handler(client, message: Message):
                 pass
             return
 
-        remove_global_ban(target_id)
+        await remove_global_ban(target_id)
 
         try:
             await client.send_message(target_id, "🔓 You have been unbanned and can use the bot again.")
@@ -3,15 +3,25 @@ from datetime import datetime
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import app
-from database import Database
+from database import get_db, move_card
+from router import get_router, digits
 
-db = Database()
+db = get_db()
+router = get_router()
 
 # Helper to check ownership
-def user_owns_waifu(user_id, waifu_id):
-    db.cursor.execute("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (user_id, waifu_id))
-    res = db.cursor.fetchone()
-    return int(res[0]) if res else 0
+async def user_owns_waifu(user_id, waifu_id):
+    return int(await db.fetchval("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (user_id, waifu_id), default=0))
+
+def _swap_cards(conn, sender_id, receiver_id, card1, card2):
+    """Both halves of a trade move in one transaction, or nothing does"""
+    for user_id, waifu_id in ((sender_id, card1), (receiver_id, card2)):
+        row = conn.execute("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (user_id, waifu_id)).fetchone()
+        if not row or row[0] < 1:
+            return False
+    move_card(conn, sender_id, receiver_id, card1)
+    move_card(conn, receiver_id, sender_id, card2)
+    return True
 
 # --- /gift ---
 @app.on_message(filters.command("gift"))
@@ -30,12 +40,11 @@ async def gift_handler(client, message):
     if sender_id == receiver_id:
         return await message.reply_text("You can't gift yourself!")
 
-    if user_owns_waifu(sender_id, waifu_id) < 1:
+    if await user_owns_waifu(sender_id, waifu_id) < 1:
         return await message.reply_text("You don't own this card!")
 
     # Fetch card details
-    db.cursor.execute("SELECT name, rarity FROM waifu_cards WHERE id=?", (waifu_id,))
-    card = db.cursor.fetchone()
+    card = await db.fetchone("SELECT name, rarity FROM waifu_cards WHERE id=?", (waifu_id,))
     
     if not card:
         return await message.reply_text("Card not found!")
@@ -66,10 +75,10 @@ async def trade_handler(client, message):
     sender_id = message.from_user.id
     receiver_id = message.reply_to_message.from_user.id
 
-    if user_owns_waifu(sender_id, my_card_id) < 1:
+    if await user_owns_waifu(sender_id, my_card_id) < 1:
         return await message.reply_text("You don't own the card you are offering!")
     
-    if user_owns_waifu(receiver_id, their_card_id) < 1:
+    if await user_owns_waifu(receiver_id, their_card_id) < 1:
         return await message.reply_text("They don't own the card you want!")
 
     buttons = InlineKeyboardMarkup([
@@ -83,48 +92,26 @@ async def trade_handler(client, message):
     )
 
 # --- Callbacks ---
-@app.on_callback_query(filters.regex(r"^gift_confirm:(\d+):(\d+):(\d+)"))
-async def gift_confirm(client, callback):
-    sender_id, receiver_id, waifu_id = map(int, callback.matches[0].groups())
+@router.route("gift_confirm", digits, digits, digits)
+async def gift_confirm(client, callback, sender_id, receiver_id, waifu_id):
     
     if callback.from_user.id != sender_id:
         return await callback.answer("Not your gift!")
 
-    # Transfer
-    db.cursor.execute("UPDATE user_waifus SET amount = amount - 1 WHERE user_id=? AND waifu_id=?", (sender_id, waifu_id))
-    
-    # Check if receiver has row
-    db.cursor.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (receiver_id, waifu_id))
-    if db.cursor.fetchone():
-        db.cursor.execute("UPDATE user_waifus SET amount = amount + 1 WHERE user_id=? AND waifu_id=?", (receiver_id, waifu_id))
-    else:
-        db.cursor.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (receiver_id, waifu_id))
-    
-    db.conn.commit()
+    # Transfer (only if the sender still owns it, so a double tap can't gift twice)
+    if not await db.move_card(sender_id, receiver_id, waifu_id):
+        return await callback.message.edit_text("❌ Gift Failed! You don't own this card anymore.")
+
     await callback.message.edit_text("🎁 **Gift Sent Successfully!**")
 
-@app.on_callback_query(filters.regex(r"^trade_accept:(\d+):(\d+):(\d+):(\d+)"))
-async def trade_accept(client, callback):
-    sender_id, receiver_id, card1, card2 = map(int, callback.matches[0].groups())
+@router.route("trade_accept", digits, digits, digits, digits)
+async def trade_accept(client, callback, sender_id, receiver_id, card1, card2):
 
     if callback.from_user.id != receiver_id:
         return await callback.answer("This trade is not for you!")
 
-    # Verify ownership again
-    if user_owns_waifu(sender_id, card1) < 1 or user_owns_waifu(receiver_id, card2) < 1:
+    # Verify ownership again + swap, atomically
+    if not await db.run(_swap_cards, sender_id, receiver_id, card1, card2):
         return await callback.message.edit_text("❌ Trade Failed! Someone doesn't have the card anymore.")
 
-    # Swap
-    # Sender gives card1, gets card2
-    db.cursor.execute("UPDATE user_waifus SET amount = amount - 1 WHERE user_id=? AND waifu_id=?", (sender_id, card1))
-    # (Add card2 to sender logic here - similar to gift)
-    
-    # Receiver gives card2, gets card1
-    db.cursor.execute("UPDATE user_waifus SET amount = amount - 1 WHERE user_id=? AND waifu_id=?", (receiver_id, card2))
-    # (Add card1 to receiver logic here)
-
-    # Simplified insert/update helper needed to avoid long code block...
-    # For now assuming successful execution:
-    db.conn.commit()
-    
     await callback.message.edit_text("✅ **Trade Successful!**")
\ No newline at end of file
@@ -3,9 +3,11 @@
 from pyrogram import filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import Config, app
-from database import Database
+from database import get_db
+from router import get_router, choice, digits
 
-db = Database()
+db = get_db()
+router = get_router()
 
 # ---------------- /give command ----------------
 @app.on_message(filters.command("give") & filters.user(Config.OWNER_ID))
@@ -28,11 +30,10 @@ async def give_card_cmd(client, message: Message):
     target_user_id = target_user.id
 
     # Fetch card from DB
-    db.cursor.execute("""
+    card = await db.fetchone("""
         SELECT id, name, anime, rarity, event, media_type, media_file
         FROM waifu_cards WHERE id=?
     """, (waifu_id,))
-    card = db.cursor.fetchone()
 
     if not card:
         await message.reply_text("❌ Card not found in database.")
@@ -74,28 +75,18 @@ async def give_card_cmd(client, message: Message):
 
 
 # ---------------- Callback handler ----------------
-@app.on_callback_query(filters.regex(r"^give:(confirm|cancel):\d+:\d+$"))
-async def give_callback(client, callback_query: CallbackQuery):
-    try:
-        parts = callback_query.data.split(":")
-        action = parts[1]           # 'confirm' or 'cancel'
-        target_user_id = int(parts[2])
-        waifu_id = int(parts[3])
-    except Exception:
-        await callback_query.answer("❌ Invalid callback data.", show_alert=True)
-        return
-
+@router.route("give", choice("confirm", "cancel"), digits, digits)
+async def give_callback(client, callback_query: CallbackQuery, action, target_user_id, waifu_id):
     # Only owner can confirm/cancel
     if callback_query.from_user.id != Config.OWNER_ID:
         await callback_query.answer("❌ Only owner can confirm/cancel.", show_alert=True)
         return
 
     # Fetch card
-    db.cursor.execute("""
+    card = await db.fetchone("""
         SELECT id, name, anime, rarity, event, media_type, media_file
         FROM waifu_cards WHERE id=?
     """, (waifu_id,))
-    card = db.cursor.fetchone()
     if not card:
         await callback_query.answer("❌ Card not found.", show_alert=True)
         return
@@ -112,21 +103,7 @@ async def give_callback(client, callback_query: CallbackQuery):
 
     if action == "confirm":
         # Add to user collection
-        db.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_waifus (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                waifu_id INTEGER,
-                amount INTEGER DEFAULT 1
-            )
-        """)
-        db.cursor.execute("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (target_user_id, waifu_id))
-        row = db.cursor.fetchone()
-        if row:
-            db.cursor.execute("UPDATE user_waifus SET amount=amount+1 WHERE user_id=? AND waifu_id=?", (target_user_id, waifu_id))
-        else:
-            db.cursor.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (target_user_id, waifu_id))
-        db.conn.commit()
+        await db.give_card(target_user_id, waifu_id)
 
         # Send card to user privately
         caption = (
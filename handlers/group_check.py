@@ -2,11 +2,11 @@
 
 from pyrogram import filters
 from config import Config, app
-from database import Database
+from database import get_db
 from datetime import datetime
 import os
 
-db = Database()
+db = get_db()
 
 # image used when logging a valid group
 GROUP_LOG_IMAGE = "photo_2025-08-22_11-52-42.jpg"
@@ -3,6 +3,9 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import app, Config
+from router import get_router, choice
+
+router = get_router()
 
 # Role check (owner > admin > user)
 def is_owner(user_id: int) -> bool:
@@ -113,6 +116,8 @@ OWNER_TEXT = (
     "💎 Economy\n"
     "/reset [user_id] – Reset user’s collection\n"
     "/paycrystals [user_id] [amount] – Add crystals\n"
+    "/bulk [crystals|cards|takecrystals|takecards] – Apply a CSV to many users\n"
+    "/ledgercheck [fix] – Check balances against the ledger\n"
     "/setmultiplier [x2/x3] [duration] – Double/Triple rewards\n\n"
     "🎟 Special\n"
     "/create [player_id] [limit] – Generate redeem code\n"
@@ -146,9 +151,8 @@ async def help_cmd(client, message):
 
 
 # Callback: role selection
-@app.on_callback_query(filters.regex(r"^help_role:(user|admin|owner)$"))
-async def help_role_callback(client, callback: CallbackQuery):
-    role = callback.data.split(":")[1]
+@router.route("help_role", choice("user", "admin", "owner"))
+async def help_role_callback(client, callback: CallbackQuery, role):
     user_id = callback.from_user.id
 
     # USER: always allowed
@@ -179,7 +183,7 @@ async def help_role_callback(client, callback: CallbackQuery):
 
 
 # Callback: back to main selector
-@app.on_callback_query(filters.regex(r"^help_back$"))
+@router.route("help_back")
 async def help_back_callback(client, callback: CallbackQuery):
     await callback.message.edit_text(
         "🌸 Collect Cricket Players – Command Guide 🌸\n✨ Your elegant player is here to guide you through your card-collecting journey!\n\nTap a button to view commands for that role.",
@@ -1,5 +1,4 @@
 # handlers/inline_gallery_scroll.py
-import sqlite3
 from pyrogram import filters
 from pyrogram.types import (
     InlineQuery,
@@ -8,37 +7,20 @@ from pyrogram.types import (
     InputTextMessageContent
 )
 from config import app
+from card_search import get_card_search
 
-DB_PATH = "waifu_bot.db"
+card_search = get_card_search()
 
-def _conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
-
-def fetch_waifu_cards(search: str = "", limit: int = 50, offset: int = 0):
-    conn = _conn()
-    cur = conn.cursor()
-    if search:
-        q = f"%{search.lower()}%"
-        cur.execute(
-            "SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards "
-            "WHERE LOWER(name) LIKE ? OR LOWER(anime) LIKE ? ORDER BY id ASC LIMIT ? OFFSET ?",
-            (q, q, limit, offset)
-        )
-    else:
-        cur.execute(
-            "SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards ORDER BY id ASC LIMIT ? OFFSET ?",
-            (limit, offset)
-        )
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+async def fetch_waifu_cards(search: str = "", limit: int = 50, cursor: str = ""):
+    # Ranked full-text matches (or every card by id); the cursor goes back as next_offset
+    cards, next_cursor = await card_search.search(search, limit=limit, cursor=cursor)
+    return [(c.id, c.name, c.anime, c.rarity, c.media_type, c.media_file) for c in cards], next_cursor
 
 @app.on_inline_query()
 async def inline_waifu_gallery(client, iq: InlineQuery):
     query = (iq.query or "").strip()
-    offset = int(iq.offset or 0)
     limit = 50
-    cards = fetch_waifu_cards(query, limit=limit, offset=offset)
+    cards, next_offset = await fetch_waifu_cards(query, limit=limit, cursor=iq.offset or "")
 
     if not cards:
         await iq.answer(
@@ -74,8 +56,6 @@ async def inline_waifu_gallery(client, iq: InlineQuery):
         except Exception as e:
             print(f"[inline_gallery_scroll] error creating result for {name}: {e}")
 
-    next_offset = str(offset + limit) if len(cards) == limit else ""
-
     await iq.answer(
         results,
         cache_time=30,
@@ -8,10 +8,14 @@ from pyrogram.types import (
     InputMediaVideo
 )
 from config import app
-from database import Database
+from database import get_db
+from inventory_view import get_inventory_views
+from router import get_router
 import urllib.parse
 
-db = Database()
+db = get_db()
+views = get_inventory_views()
+router = get_router()
 
 # ✅ Rarity Mappings
 RARITY_EMOJIS = {
@@ -38,34 +42,12 @@ def encode_cb(s: str) -> str:
 def decode_cb(s: str) -> str:
     return urllib.parse.unquote_plus(s)
 
-def get_user_settings(user_id: int):
-    try:
-        cur = db.cursor
-        cur.execute("SELECT rarity_filter, anime_filter FROM user_settings WHERE user_id = ?", (user_id,))
-        row = cur.fetchone()
-        if row:
-            return {"rarity": row[0], "anime": row[1]}
-    except:
-        pass
-    return {"rarity": None, "anime": None}
-
-def set_user_settings(user_id: int, rarity=None, anime=None):
-    try:
-        db.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_settings (
-                user_id INTEGER PRIMARY KEY,
-                rarity_filter TEXT DEFAULT NULL,
-                anime_filter TEXT DEFAULT NULL
-            )
-        """)
-        db.conn.commit()
-    except:
-        pass
-    db.cursor.execute(
+async def set_user_settings(user_id: int, rarity=None, anime=None):
+    await db.execute(
         "INSERT OR REPLACE INTO user_settings (user_id, rarity_filter, anime_filter) VALUES (?, ?, ?)",
         (user_id, rarity, anime),
     )
-    db.conn.commit()
+    views.forget_prefs(user_id)
 
 # ---------------- /inventory Command ----------------
 @app.on_message(filters.command("inventory"))
@@ -73,11 +55,10 @@ async def inventory_cmd(client, message):
     user_id = message.from_user.id
     
     # Check if user has a favorite set
-    db.cursor.execute("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
-    fav_row = db.cursor.fetchone()
+    prefs = await views.prefs(user_id)
 
     # Agar fav hai toh pehle Fav dikhao ('fav' mode), nahi toh normal inventory ('collection', page 0)
-    if fav_row:
+    if prefs.fav:
         await show_inventory_card(client, message.chat.id, user_id, mode="fav", page=0, is_new_message=True)
     else:
         await show_inventory_card(client, message.chat.id, user_id, mode="collection", page=0, is_new_message=True)
@@ -95,8 +76,7 @@ async def show_inventory_card(client, chat_id, user_id, mode="collection", page=
             JOIN user_waifus uw ON (uw.waifu_id = wc.id AND uw.user_id = uf.user_id)
             WHERE uf.user_id = ?
         """
-        db.cursor.execute(query, (user_id,))
-        card = db.cursor.fetchone()
+        card = await db.fetchone(query, (user_id,))
 
         if not card:
             # Agar fav set hai par card collection se delete ho gaya, toh normal inventory dikhao
@@ -125,22 +105,10 @@ async def show_inventory_card(client, chat_id, user_id, mode="collection", page=
 
     # --- MODE: COLLECTION (Normal Inventory) ---
     else:
-        # 1. Get Filters
-        settings = get_user_settings(user_id)
-        rarity_filter = settings.get("rarity")
-        where_clauses = ["uw.user_id = ?"]
-        params = [user_id]
-
-        if rarity_filter:
-            where_clauses.append("wc.rarity = ?")
-            params.append(rarity_filter)
-
-        where_sql = " AND ".join(where_clauses)
-
-        # 2. Count Total
-        count_query = f"SELECT COUNT(*) FROM user_waifus uw JOIN waifu_cards wc ON uw.waifu_id = wc.id WHERE {where_sql}"
-        db.cursor.execute(count_query, tuple(params))
-        total_cards = db.cursor.fetchone()[0] or 0
+        # 1. Filter + sorted snapshot (built once, then served from memory)
+        prefs = await views.prefs(user_id)
+        view = await views.view(user_id, prefs.rarity)
+        total_cards = len(view)
 
         if total_cards == 0:
             text = "🚫 **Inventory Empty!**\nCollect some players or check your filters."
@@ -152,21 +120,11 @@ async def show_inventory_card(client, chat_id, user_id, mode="collection", page=
         if page >= total_cards: page = 0
         if page < 0: page = total_cards - 1
 
-        # 3. Fetch Card
-        query = f"""
-            SELECT wc.id, wc.name, wc.anime, wc.rarity, wc.event, wc.media_type, wc.media_file, uw.amount
-            FROM user_waifus uw
-            JOIN waifu_cards wc ON uw.waifu_id = wc.id
-            WHERE {where_sql}
-            ORDER BY wc.rarity DESC, wc.id ASC
-            LIMIT 1 OFFSET ?
-        """
-        db.cursor.execute(query, tuple(params + [page]))
-        card = db.cursor.fetchone()
-
+        # 2. Card at this index
+        card, c_amount = view.page(page)
         if not card: return
 
-        c_id, c_name, c_anime, c_rarity, c_event, c_type, c_file, c_amount = card
+        c_id, c_name, c_anime, c_rarity, c_event, c_type, c_file = card[:7]
         c_emoji = RARITY_EMOJIS.get(c_rarity, "⚪")
         c_event = f"🎀 **Theme:** {c_event}\n" if c_event else ""
         
@@ -196,8 +154,7 @@ async def show_inventory_card(client, chat_id, user_id, mode="collection", page=
         ]
 
         # Check if Fav exists to show "Back to Fav" button
-        db.cursor.execute("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
-        if db.cursor.fetchone():
+        if prefs.fav:
             ctrl_row.insert(1, InlineKeyboardButton("👑 Fav", callback_data="inv_show_fav"))
 
         markup = InlineKeyboardMarkup([nav_row, ctrl_row])
@@ -225,25 +182,24 @@ async def show_inventory_card(client, chat_id, user_id, mode="collection", page=
 
 # ---------------- Callbacks ----------------
 
-@app.on_callback_query(filters.regex(r"^inv_pg:(-?\d+)"))
-async def inv_paginate(client, callback):
-    page = int(callback.matches[0].group(1))
+@router.route("inv_pg", int)
+async def inv_paginate(client, callback, page):
     await show_inventory_card(client, callback.message.chat.id, callback.from_user.id, "collection", page, False, callback.message)
 
-@app.on_callback_query(filters.regex(r"^inv_show_fav$"))
+@router.route("inv_show_fav")
 async def inv_fav_cb(client, callback):
     await show_inventory_card(client, callback.message.chat.id, callback.from_user.id, "fav", 0, False, callback.message)
 
-@app.on_callback_query(filters.regex(r"^inv_close$"))
+@router.route("inv_close")
 async def inv_close(client, callback):
     await callback.message.delete()
 
-@app.on_callback_query(filters.regex(r"^ignore$"))
+@router.route("ignore")
 async def inv_ignore(client, callback):
     await callback.answer(f"Current Page: {callback.data}")
 
 # ---------------- W-MODE (Filters) ----------------
-@app.on_callback_query(filters.regex(r"^wmode_menu$"))
+@router.route("wmode_menu")
 async def wmode_menu_cb(client, callback):
     kb = []
     row = []
@@ -265,15 +221,14 @@ async def wmode_menu_cb(client, callback):
     except:
         await callback.message.reply("⚙️ **Filter Settings**", reply_markup=InlineKeyboardMarkup(kb))
 
-@app.on_callback_query(filters.regex(r"^wmode_set:(.+)"))
-async def wmode_set(client, callback):
-    rarity = decode_cb(callback.matches[0].group(1))
-    set_user_settings(callback.from_user.id, rarity=rarity)
+@router.route("wmode_set", decode_cb)
+async def wmode_set(client, callback, rarity):
+    await set_user_settings(callback.from_user.id, rarity=rarity)
     await callback.answer(f"Filtered by: {rarity}")
     await show_inventory_card(client, callback.message.chat.id, callback.from_user.id, "collection", 0, False, callback.message)
 
-@app.on_callback_query(filters.regex(r"^wmode_clear$"))
+@router.route("wmode_clear")
 async def wmode_clear(client, callback):
-    set_user_settings(callback.from_user.id, rarity=None)
+    await set_user_settings(callback.from_user.id, rarity=None)
     await callback.answer("Filters cleared")
     await show_inventory_card(client, callback.message.chat.id, callback.from_user.id, "collection", 0, False, callback.message)
\ No newline at end of file
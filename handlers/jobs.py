@@ -0,0 +1,63 @@
+# handlers/jobs.py
+"""
+Admin view of the scheduled jobs (jobs.py).
+
+ - /jobs             pending jobs (soonest first), dead ones, counts per kind
+ - /jobs retry <id>  queue a dead job again, due now
+"""
+
+import time
+from pyrogram import filters
+from config import app, OWNER_ID, ADMINS
+from jobs import get_jobs
+
+jobs = get_jobs()
+
+
+def _when(run_at):
+    left = int(run_at - time.time())
+    if left <= 0:
+        return "due"
+    if left < 3600:
+        return f"in {left // 60}m"
+    if left < 86400:
+        return f"in {left // 3600}h {left % 3600 // 60}m"
+    return f"in {left // 86400}d {left % 86400 // 3600}h"
+
+
+async def render():
+    counts = await jobs.counts()
+    pending = await jobs.pending()
+    dead = await jobs.dead()
+
+    lines = ["⏰ Scheduled jobs", ""]
+    if not counts:
+        lines.append("No jobs scheduled.")
+    for (kind, status), n in sorted(counts.items()):
+        lines.append(f"{kind:<16}{status:<8}{n:>6}")
+    if pending:
+        lines += ["", "Next:"]
+        for job_id, kind, key, run_at, attempts, last_error in pending:
+            retry = f"  retry {attempts}: {last_error[:60]}" if attempts else ""
+            lines.append(f"#{job_id:<6}{kind}:{key:<10}{_when(run_at)}{retry}")
+    if dead:
+        lines += ["", "Dead (/jobs retry <id>):"]
+        for job_id, kind, key, run_at, attempts, last_error in dead:
+            lines.append(f"#{job_id:<6}{kind}:{key}  {attempts}x  {(last_error or '')[:60]}")
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+@app.on_message(filters.command("jobs") & filters.user([OWNER_ID] + ADMINS))
+async def jobs_cmd(client, message):
+    args = message.command[1:]
+
+    if args and args[0].lower() == "retry":
+        if len(args) < 2 or not args[1].isdigit():
+            return await message.reply_text("Usage: /jobs retry <id>")
+        if not await jobs.retry(int(args[1])):
+            return await message.reply_text(f"❌ No dead job #{args[1]}.")
+        return await message.reply_text(f"🔁 Job #{args[1]} queued again.")
+    if args:
+        return await message.reply_text("Usage: /jobs [retry <id>]")
+
+    await message.reply_text(await render())
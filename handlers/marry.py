@@ -1,59 +1,19 @@
 from pyrogram import filters
-from config import app, Config
-import sqlite3, random, time
-
-DB_PATH = Config.DB_PATH
+from config import app
+from cooldowns import get_cooldowns
+from sampler import get_sampler
+from database import get_db
+import random
+
+sampler = get_sampler()
+db = get_db()
+cooldowns = get_cooldowns()
 COOLDOWN = 120  # 2 minutes in seconds
 
-def add_waifu_to_inventory(user_id, waifu_id):
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            UPDATE user_waifus
-               SET amount = amount + 1,
-                   last_collected = strftime('%s','now')
-             WHERE user_id = ? AND waifu_id = ?
-        """, (user_id, waifu_id))
-
-        if cur.rowcount == 0:
-            cur.execute("""
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-            """, (user_id, waifu_id))
-
-        conn.commit()
-    finally:
-        conn.close()
-
-
 def can_marry(user_id: int):
-    """Check marry cooldown. Returns (True/False, wait_time_remaining)."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_marry (
-            user_id INTEGER PRIMARY KEY,
-            last_marry INTEGER
-        )
-    """)
-    conn.commit()
-
-    cur.execute("SELECT last_marry FROM user_marry WHERE user_id = ?", (user_id,))
-    row = cur.fetchone()
-
-    now = int(time.time())
-
-    if row:
-        last_time = row[0]
-        if now - last_time < COOLDOWN:
-            return False, COOLDOWN - (now - last_time)
-
-    # Update with new marry time
-    cur.execute("INSERT OR REPLACE INTO user_marry (user_id, last_marry) VALUES (?, ?)", (user_id, now))
-    conn.commit()
-    conn.close()
-    return True, 0
+    """Check marry cooldown and start it. Returns (True/False, wait_time_remaining)."""
+    wait = cooldowns.try_start(user_id, "marry", COOLDOWN)
+    return wait == 0, wait
 
 
 @app.on_message(filters.command("marry"))
@@ -68,29 +28,21 @@ async def marry_command(client, message):
         seconds = wait_time % 60
         return await message.reply(f"⏳ You need to wait {minutes}m {seconds}s before trying to marry again!")
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
     # Pick random waifu excluding Cinematic Legend videos
-    cur.execute("""
-        SELECT id, name, anime, rarity, media_type, media_file
-          FROM waifu_cards
-         WHERE NOT (rarity='Cinematic Legend' AND LOWER(media_type)='video')
-         ORDER BY RANDOM() LIMIT 1
-    """)
-    row = cur.fetchone()
-    conn.close()
+    card = sampler.sample(
+        predicate=lambda c: not (c.rarity == "Cinematic Legend" and (c.media_type or "").lower() == "video")
+    )
 
-    if not row:
+    if not card:
         return await message.reply("❌ No eligible waifus found for marriage.")
 
-    waifu_id, name, anime, rarity, media_type, media_file = row
+    waifu_id, name, anime, media_type, media_file = card.id, card.name, card.anime, card.media_type, card.media_file
 
     # 70% success, 30% reject
     success = random.choices([True, False], weights=[70, 30], k=1)[0]
 
     if success:
-        add_waifu_to_inventory(user_id, waifu_id)
+        await db.give_card(user_id, waifu_id)
 
         caption = (
             f"💍 {username} got a **YES** from **{name}** "
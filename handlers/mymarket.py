@@ -1,21 +1,26 @@
 # mymarket.py
 import random
 import sqlite3
-from datetime import datetime, timedelta
 from typing import Optional
 
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from database import Database
+from cooldowns import get_cooldowns
+from database import get_db, give_card
+from ledger import get_ledger, debit
+from router import get_router, digits
 from config import app  # your pyrogram client instance
 
 # ---------------- CONFIG ----------------
-db = Database()
+db = get_db()
+cooldowns = get_cooldowns()
+ledger = get_ledger()
+router = get_router()
 
 DEFAULT_PHOTO = "photo_2025-08-29_13-53-48.jpg"  # fallback image (keep this file in your bot folder)
 STORE_SIZE = 10
-STORE_REFRESH_COOLDOWN = timedelta(hours=24)
+STORE_REFRESH_COOLDOWN = 24 * 60 * 60  # seconds
 CURRENCY_SYMBOL = "💎"
 
 RARITY_EMOJIS = {
@@ -56,45 +61,22 @@ def rarity_emoji(rarity: str) -> str:
     return RARITY_EMOJIS.get(rarity, "❓")
 
 
-def get_user_balance(user_id: int) -> int:
-    """
-    Try to get balance via db.get_crystals (if present),
-    otherwise fallback to reading user_profiles.balance.
-    Returns integer (0 if not found).
-    """
-    # Prefer db.get_crystals if available
-    try:
-        maybe = db.get_crystals(user_id)
-        if maybe:
-            # many existing bots return a tuple like (daily, weekly, monthly, total, last_claim, given)
-            # but if format differs, try best-effort.
-            if isinstance(maybe, (list, tuple)) and len(maybe) >= 4:
-                return int(maybe[3] or 0)
-    except Exception:
-        pass
-
-    # Fallback raw SQL to user_profiles.balance
-    try:
-        cur = db.cursor
-        cur.execute("SELECT balance FROM user_profiles WHERE user_id = ?", (user_id,))
-        row = cur.fetchone()
-        if row:
-            return int(row[0] or 0)
-    except Exception:
-        pass
+def _purchase(conn, user_id: int, waifu_id: int, price: int) -> bool:
+    """Debit the price and hand over the card in one transaction"""
+    if debit(conn, user_id, price, "market_buy", f"waifu={waifu_id}") is None:
+        return False
+    give_card(conn, user_id, waifu_id)
+    return True
 
-    return 0
 
-
-def pick_store_items(limit: int = STORE_SIZE):
+async def pick_store_items(limit: int = STORE_SIZE):
     """
     Pull random rows from waifu_cards and return list of:
     (id, name, rarity, price, media_type, media_file_id, media_file)
     """
-    cur = db.cursor
-    all_rows = cur.execute(
+    all_rows = await db.fetchall(
         "SELECT id, name, rarity, media_type, media_file_id, media_file FROM waifu_cards"
-    ).fetchall()
+    )
     if not all_rows:
         return []
     sample = random.sample(all_rows, min(len(all_rows), limit))
@@ -125,18 +107,9 @@ async def cmd_mymarket(client, message):
     user_id = message.from_user.id
 
     # cooldown check (per-user store refresh)
-    can_refresh = True
-    try:
-        last_refresh = db.get_last_claim(user_id, "store_refresh")
-        if last_refresh:
-            last_time = datetime.fromisoformat(last_refresh)
-            if datetime.utcnow() - last_time < STORE_REFRESH_COOLDOWN:
-                can_refresh = False
-    except Exception:
-        # if any parsing error, allow refresh
-        can_refresh = True
+    can_refresh = cooldowns.remaining(user_id, "store_refresh") == 0
 
-    items = pick_store_items(STORE_SIZE)
+    items = await pick_store_items(STORE_SIZE)
     if not items:
         await message.reply_text("🛒 The store is currently empty.")
         return
@@ -159,21 +132,13 @@ async def cmd_mymarket(client, message):
 
 
 # ---------- refresh callback ----------
-@app.on_callback_query(filters.regex(r"^market_refresh$"))
+@router.route("market_refresh")
 async def cb_refresh_store(client, callback_query):
     user_id = callback_query.from_user.id
-    try:
-        last_refresh = db.get_last_claim(user_id, "store_refresh")
-        if last_refresh:
-            last_time = datetime.fromisoformat(last_refresh)
-            if datetime.utcnow() - last_time < STORE_REFRESH_COOLDOWN:
-                await callback_query.answer("❌ You can refresh the store only once every 24 hours.", show_alert=True)
-                return
-    except Exception:
-        pass
-
-    # update last refresh
-    db.update_last_claim(user_id, "store_refresh", datetime.utcnow().isoformat())
+    # check + start the refresh cooldown
+    if cooldowns.try_start(user_id, "store_refresh", STORE_REFRESH_COOLDOWN):
+        await callback_query.answer("❌ You can refresh the store only once every 24 hours.", show_alert=True)
+        return
 
     # remove old message and send new store
     try:
@@ -187,7 +152,7 @@ async def cb_refresh_store(client, callback_query):
 
 
 # ---------- market help ----------
-@app.on_callback_query(filters.regex(r"^market_help$"))
+@router.route("market_help")
 async def cb_market_help(client, callback_query):
     help_text = (
         "🛒 Buy Character from Store\n\n"
@@ -201,7 +166,7 @@ async def cb_market_help(client, callback_query):
 
 
 # ---------- buy by id prompt ----------
-@app.on_callback_query(filters.regex(r"^market_buy_by_id$"))
+@router.route("market_buy_by_id")
 async def cb_buy_by_id(client, callback_query):
     user_id = callback_query.from_user.id
     pending_buy[user_id] = True
@@ -240,14 +205,13 @@ async def show_preview_for_id(message, waifu_id: int):
     user_id = user.id
 
     # get user balance
-    balance = get_user_balance(user_id)
+    balance = await ledger.balance(user_id)
 
     # fetch waifu
-    cur = db.cursor
-    waifu = cur.execute(
+    waifu = await db.fetchone(
         "SELECT id, name, anime, rarity, media_type, media_file_id, media_file FROM waifu_cards WHERE id=?",
         (waifu_id,)
-    ).fetchone()
+    )
     if not waifu:
         await message.reply_text("❌ Waifu not found. Check the ID and try again.")
         return
@@ -293,38 +257,19 @@ async def show_preview_for_id(message, waifu_id: int):
 
 
 # ---------- Confirm / Decline callbacks ----------
-@app.on_callback_query(filters.regex(r"^market_confirm_(\d+)_(\d+)$"))
-async def cb_market_confirm(client, callback_query):
+@router.route("market_confirm", digits, digits, sep="_")
+async def cb_market_confirm(client, callback_query, waifu_id, price):
     user_id = callback_query.from_user.id
-    parts = callback_query.data.split("_")
-    waifu_id = int(parts[2])
-    price = int(parts[3])
-
-    balance = get_user_balance(user_id)
-    if balance < price:
-        await callback_query.answer("❌ Not enough balance.", show_alert=True)
-        return
 
-    # Prefer existing DB purchase function if it exists
+    # Balance check + debit + card in one transaction
     try:
-        success = db.purchase_waifu(user_id, waifu_id, price)
+        success = await db.run(_purchase, user_id, waifu_id, price)
     except Exception:
-        # fallback manual: deduct from user_profiles.balance and insert into user_waifus
-        success = False
-        try:
-            cur = db.cursor
-            # deduct balance (if table user_profiles.balance exists)
-            cur.execute("UPDATE user_profiles SET balance = balance - ? WHERE user_id = ?", (price, user_id))
-            # add to user_waifus (same pattern used elsewhere in your code)
-            cur.execute("""
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-                ON CONFLICT(user_id, waifu_id) DO UPDATE SET amount = amount + 1, last_collected = strftime('%s','now')
-            """, (user_id, waifu_id))
-            db.conn.commit()
-            success = True
-        except Exception:
-            success = False
+        success = None
+
+    if success is False:
+        await callback_query.answer("❌ Not enough balance.", show_alert=True)
+        return
 
     if success:
         await callback_query.message.reply_text(f"✅ Purchase successful! You bought waifu ID {waifu_id} for {price}{CURRENCY_SYMBOL}")
@@ -334,8 +279,8 @@ async def cb_market_confirm(client, callback_query):
         await callback_query.answer("❌ Purchase failed.", show_alert=True)
 
 
-@app.on_callback_query(filters.regex(r"^market_decline_(\d+)$"))
-async def cb_market_decline(client, callback_query):
+@router.route("market_decline", digits, sep="_")
+async def cb_market_decline(client, callback_query, waifu_id):
     await callback_query.message.reply_text("❌ Purchase cancelled.")
     await callback_query.answer("Purchase cancelled.")
 
@@ -22,13 +22,14 @@ Note:
 """
 
 import os
-import sqlite3
 import datetime
 from pyrogram import Client, filters
 from pyrogram.types import Message
 from pyrogram.handlers import MessageHandler
+from config import Config
+from database import Database, get_db
 
-DB_PATH = os.getenv("WAIFU_DB_PATH", "waifu_bot.db")
+DB_PATH = os.getenv("WAIFU_DB_PATH", Config.DB_PATH)
 BOT_TOKEN = os.getenv("BOT_TOKEN")  # optional; if not set, file is meant for import/integration
 
 # Do not raise on missing DB so integration won't crash at import time.
@@ -38,43 +39,30 @@ if not os.path.exists(DB_PATH):
 # Create a Client only if BOT_TOKEN is provided (standalone mode). Otherwise app is None (integration mode).
 app = Client("waifu_revealer", bot_token=BOT_TOKEN) if BOT_TOKEN else None
 
+# Shared pooled database unless an explicit WAIFU_DB_PATH points elsewhere
+db = get_db() if DB_PATH == Config.DB_PATH else Database(DB_PATH)
 
-def get_active_drop_for_message(chat_id: int, message_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
+
+async def get_active_drop_for_message(chat_id: int, message_id: int):
+    return await db.fetchone(
         "SELECT waifu_id, revealed, revealed_by, revealed_at FROM active_drops WHERE chat_id=? AND message_id=?",
         (chat_id, message_id),
     )
-    row = c.fetchone()
-    conn.close()
-    return row
 
 
-def fetch_waifu_info(waifu_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT name, anime, rarity FROM waifu_cards WHERE id=?", (waifu_id,))
-    row = c.fetchone()
+async def fetch_waifu_info(waifu_id: int):
+    row = await db.fetchone("SELECT name, anime, rarity FROM waifu_cards WHERE id=?", (waifu_id,))
     if row:
-        conn.close()
         return row
-    c.execute("SELECT name, anime, rarity FROM waifus WHERE id=?", (waifu_id,))
-    row = c.fetchone()
-    conn.close()
-    return row
+    return await db.fetchone("SELECT name, anime, rarity FROM waifus WHERE id=?", (waifu_id,))
 
 
-def mark_drop_revealed(chat_id: int, message_id: int, revealer_user_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+async def mark_drop_revealed(chat_id: int, message_id: int, revealer_user_id: int):
     now_iso = datetime.datetime.utcnow().isoformat()
-    c.execute(
+    await db.execute(
         "UPDATE active_drops SET revealed=1, revealed_by=?, revealed_at=? WHERE chat_id=? AND message_id=?",
         (revealer_user_id, now_iso, chat_id, message_id),
     )
-    conn.commit()
-    conn.close()
 
 
 async def reveal_on_reply(client: Client, message: Message):
@@ -98,7 +86,7 @@ async def reveal_on_reply(client: Client, message: Message):
     chat_id = replied.chat.id
     message_id = replied.message_id
 
-    active = get_active_drop_for_message(chat_id, message_id)
+    active = await get_active_drop_for_message(chat_id, message_id)
     if not active:
         return  # not a tracked drop
 
@@ -116,7 +104,7 @@ async def reveal_on_reply(client: Client, message: Message):
             pass
         return
 
-    info = fetch_waifu_info(waifu_id)
+    info = await fetch_waifu_info(waifu_id)
     if not info:
         await message.reply_text("⚠️ Could not find the waifu in the database.", quote=True)
         return
@@ -139,7 +127,7 @@ async def reveal_on_reply(client: Client, message: Message):
         await message.reply_text(reveal_text, parse_mode="markdown", quote=True)
 
     try:
-        mark_drop_revealed(chat_id, message_id, message.from_user.id if message.from_user else None)
+        await mark_drop_revealed(chat_id, message_id, message.from_user.id if message.from_user else None)
     except Exception as e:
         print("Failed to update active_drops:", e)
 
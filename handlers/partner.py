@@ -2,9 +2,10 @@
 from main import app
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from database import Database
+from database import get_db
+from inventory_view import get_inventory_views
 
-db = Database()
+db = get_db()
 
 
 def _choose_media_and_send(client, chat_id, waifu_row, caption):
@@ -63,11 +64,10 @@ async def partner_handler(client, message):
     chat_id = message.chat.id
 
     # ensure the user exists
-    db.add_user(user_id, message.from_user.username if message.from_user.username else None)
+    await db.add_user(user_id, message.from_user.username if message.from_user.username else None)
 
     # fetch favorite waifu id
-    db.cursor.execute("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
-    row = db.cursor.fetchone()
+    row = await db.fetchone("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
     if not row or not row[0]:
         await message.reply_text("💔 You don't have a partner set. Use your collection to set a favorite waifu first.")
         return
@@ -75,21 +75,18 @@ async def partner_handler(client, message):
     fav_id = row[0]
 
     # fetch full waifu details from waifu_cards
-    db.cursor.execute("""
+    waifu = await db.fetchone("""
         SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id
         FROM waifu_cards
         WHERE id = ?
     """, (fav_id,))
-    waifu = db.cursor.fetchone()
     if not waifu:
         # data inconsistency: favorite points to missing card
         await message.reply_text("⚠️ Your favorite waifu is set but the card data couldn't be found. Try /divorce to unset.")
         return
 
     # fetch how many the user owns of this waifu
-    db.cursor.execute("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (user_id, fav_id))
-    amt_row = db.cursor.fetchone()
-    owned = amt_row[0] if amt_row else 0
+    owned = await db.fetchval("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (user_id, fav_id), default=0)
 
     # build caption
     wid, name, anime, rarity, event = waifu[0], waifu[1], waifu[2], waifu[3], waifu[4]
@@ -119,15 +116,14 @@ async def divorce_handler(client, message):
     user_id = message.from_user.id
 
     # check if favorite exists
-    db.cursor.execute("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
-    row = db.cursor.fetchone()
+    row = await db.fetchone("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,))
     if not row or not row[0]:
         await message.reply_text("❌ You don't have a favorite waifu set.")
         return
 
     # remove favorite entry
-    db.cursor.execute("DELETE FROM user_fav WHERE user_id = ?", (user_id,))
-    db.conn.commit()
+    await db.execute("DELETE FROM user_fav WHERE user_id = ?", (user_id,))
+    get_inventory_views().forget_prefs(user_id)
 
     # log the removal
     try:
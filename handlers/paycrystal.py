@@ -1,8 +1,10 @@
 from pyrogram import filters
 from config import app, OWNER_ID
-from database import Database
+from database import get_db
+from ledger import get_ledger
 
-db = Database()
+db = get_db()
+ledger = get_ledger()
 
 @app.on_message(filters.command("paycrystal") & filters.user(OWNER_ID))
 async def pay_crystal(client, message):
@@ -17,5 +19,5 @@ async def pay_crystal(client, message):
         await message.reply_text("Reply to a user's message to give crystals.")
         return
 
-    db.add_crystals(target.id, given=amount)
+    await ledger.credit(target.id, amount, "owner_pay", f"by={message.from_user.id}")
     await message.reply_text(f"💎 Gave {amount} crystals to {target.first_name}.")
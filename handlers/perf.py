@@ -0,0 +1,55 @@
+# handlers/perf.py
+"""
+Owner-only handler timings (perf.py).
+
+ - /perf          slowest commands / buttons by total time, p50/p95/p99
+ - /perf export   write the Prometheus snapshot now and send it
+ - /perf reset    start counting from zero
+"""
+
+import time
+from pyrogram import filters
+from config import Config, app
+from perf import get_perf
+
+perf = get_perf()
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f}" if seconds >= 0.01 else f"{seconds * 1000:.1f}"
+
+
+def render(top=20):
+    rows = perf.table(top)
+    since = int(time.time() - perf.started_at)
+    lines = [f"⏱ Handler timings (last {since // 3600}h {since % 3600 // 60}m, ms)", ""]
+    if not rows:
+        lines.append("No updates handled yet.")
+    else:
+        lines.append(f"{'handler':<22}{'n':>6}{'p50':>6}{'p95':>6}{'p99':>6}{'db':>6}{'tg':>6}{'err':>5}")
+        for label, count, errors, p50, p95, p99, sqlite, telegram in rows:
+            lines.append(f"{label[:21]:<22}{count:>6}{_ms(p50):>6}{_ms(p95):>6}{_ms(p99):>6}"
+                         f"{_ms(sqlite):>6}{_ms(telegram):>6}{errors:>5}")
+
+    lag50, lag99 = perf.loop_lag.percentiles(0.5, 0.99)
+    lines += ["", f"loop lag p50 {_ms(lag50)} / p99 {_ms(lag99)}",
+              f"background db {perf.background.sqlite:.1f}s / tg {perf.background.telegram:.1f}s"]
+    return "```\n" + "\n".join(lines) + "\n```\np50-p99: last samples; db / tg: avg wait per update"
+
+
+@app.on_message(filters.command("perf") & filters.user(Config.OWNER_ID))
+async def perf_cmd(client, message):
+    action = message.command[1].lower() if len(message.command) > 1 else ""
+
+    if action == "reset":
+        perf.reset()
+        return await message.reply_text("🔄 Handler timings reset.")
+
+    if action == "export":
+        try:
+            path = perf.export_prometheus()
+        except OSError as e:
+            return await message.reply_text(f"❌ Could not write snapshot: {e}")
+        return await message.reply_document(path, caption=f"📈 Prometheus snapshot: `{path}`")
+
+    await message.reply_text(render())
@@ -1,13 +1,18 @@
 # handlers/profile.py
 
-import os
 from pyrogram import filters
 from pyrogram.types import Message
 from pyrogram.errors import RPCError
 from config import Config, app
-from database import Database
+from database import get_db
+from leaderboard import get_leaderboards
+from ledger import get_ledger
+from photo_cache import get_photo_cache
 
-db = Database("waifu_bot.db")  # <- make sure it reads the correct DB
+db = get_db()
+boards = get_leaderboards()
+ledger = get_ledger()
+photos = get_photo_cache()
 
 # ---------------- Updated Rarities ----------------
 RARITIES = [
@@ -20,13 +25,12 @@ RARITY_EMOJIS = [
     "⚡"
 ]
 
-# ---------------- Helper: Download profile photo ----------------
+# ---------------- Helper: Profile photo (cached on disk) ----------------
 async def get_user_profile_photo(client, user_id: int):
-    """Return a downloaded photo file path or None if no photo"""
+    """Return a local photo path or None if no photo; downloads only on a cache miss"""
     try:
         async for photo in client.get_chat_photos(user_id, limit=1):
-            file_path = await client.download_media(photo.file_id)
-            return file_path
+            return await photos.get(client, photo.file_id, photo.file_unique_id)
     except RPCError:
         return None
     return None
@@ -39,29 +43,26 @@ async def profile_cmd(client, message: Message):
     first_name = user.first_name or "Unknown"
 
     # ---------------- Fetch user profile ----------------
-    profile_data = db.cursor.execute(
+    profile_data = await db.fetchone(
         "SELECT level, rank, badge, total_collected, progress, balance FROM user_profiles WHERE user_id = ?",
         (user_id,)
-    ).fetchone()
+    )
 
     if profile_data:
         level, rank, badge, total_collected, progress, balance = profile_data
     else:
         level, rank, badge, total_collected, progress, balance = 1, "Newbie", "None", 0, 0, 0
 
-    # ---------------- Calculate rarity breakdown ----------------
-    rarities_count = {}
-    for rarity in RARITIES:
-        count = db.cursor.execute(
-            """
-            SELECT SUM(uw.amount)
-            FROM user_waifus uw
-            JOIN waifu_cards wc ON uw.waifu_id = wc.id
-            WHERE uw.user_id = ? AND wc.rarity = ?
-            """,
-            (user_id, rarity)
-        ).fetchone()[0]
-        rarities_count[rarity] = count or 0
+    # Cards owned comes from the collectors leaderboard (kept current in memory)
+    await boards.ready()
+    total_collected = boards.collectors.score(user_id)
+    balance = await ledger.balance(user_id)
+
+    # ---------------- Rarity breakdown (user_rarities, kept by triggers) ----------------
+    rarities_count = dict.fromkeys(RARITIES, 0)
+    for rarity, count in await db.fetchall("SELECT rarity, count FROM user_rarities WHERE user_id = ?", (user_id,)):
+        if rarity in rarities_count:
+            rarities_count[rarity] = count or 0
 
     # ---------------- Progress bar ----------------
     progress_bar_length = 10
@@ -95,10 +96,7 @@ async def profile_cmd(client, message: Message):
         profile_text += f"{emoji} {rar} → {rarities_count[rar]}\n"
 
     # ---------------- Global Rank (optional) ----------------
-    global_rank = db.cursor.execute(
-        "SELECT COUNT(*)+1 FROM user_profiles WHERE total_collected > ?",
-        (total_collected,)
-    ).fetchone()[0]
+    global_rank = boards.collectors.rank(user_id) or len(boards.collectors) + 1
     profile_text += f"""
 ╔═══❀•°❀°•❀═══╗
 🌍 Global Position → {global_rank}
@@ -114,9 +112,5 @@ Alisa is watching you grow~ 💕”
     # ---------------- Send profile ----------------
     if photo_path:
         await message.reply_photo(photo=photo_path, caption=profile_text)
-        try:
-            os.remove(photo_path)
-        except Exception:
-            pass
     else:
         await message.reply_text(profile_text)
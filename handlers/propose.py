@@ -1,10 +1,15 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, InputMediaVideo
 from pyrogram.errors import MessageNotModified
-import sqlite3, random, time
-from config import app, Config
+import random, time
+from config import app
+from sampler import get_sampler
+from database import get_db
+from router import get_router
 
-DB_PATH = Config.DB_PATH
+sampler = get_sampler()
+db = get_db()
+router = get_router()
 
 # cooldown tracking: {user_id: timestamp}
 propose_cooldowns = {}
@@ -50,17 +55,13 @@ async def propose_waifu(client, message):
     propose_cooldowns[user_id] = now
 
     # pick a random waifu
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, media_type, media_file FROM waifu_cards ORDER BY RANDOM() LIMIT 1")
-    row = cur.fetchone()
-    conn.close()
+    card = sampler.sample()
 
-    if not row:
+    if not card:
         await message.reply("❌ No waifu cards available in the database.")
         return
 
-    card_id, waifu_name, media_type, media_file = row
+    card_id, waifu_name, media_type, media_file = card.id, card.name, card.media_type, card.media_file
 
     short_id = gen_short_id()
     pending_proposals[short_id] = (user_id, card_id, waifu_name, media_type, media_file)
@@ -83,9 +84,8 @@ async def propose_waifu(client, message):
     else:
         await message.reply_photo(media_file, caption=caption, reply_markup=kb)
 
-@app.on_callback_query(filters.regex(r"^propose_accept:(\w+)$"))
-async def handle_accept(client, callback_query):
-    short_id = callback_query.data.split(":")[1]
+@router.route("propose_accept", str)
+async def handle_accept(client, callback_query, short_id):
     data = pending_proposals.pop(short_id, None)
     if not data:
         await callback_query.answer("❌ This proposal expired.", show_alert=True)
@@ -106,35 +106,8 @@ async def handle_accept(client, callback_query):
         await finalize_proposal(callback_query, text, media_type, media_file)
         return
 
-    # Accepted: add to user_waifus WITHOUT schema changes (manual upsert)
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        cur = conn.cursor()
-
-        # Try to increment existing
-        cur.execute(
-            """
-            UPDATE user_waifus
-               SET amount = amount + 1,
-                   last_collected = strftime('%s','now')
-             WHERE user_id = ? AND waifu_id = ?
-            """,
-            (user_id, card_id),
-        )
-
-        if cur.rowcount == 0:
-            # No existing row: insert new
-            cur.execute(
-                """
-                INSERT INTO user_waifus (user_id, waifu_id, amount, last_collected)
-                VALUES (?, ?, 1, strftime('%s','now'))
-                """,
-                (user_id, card_id),
-            )
-
-        conn.commit()
-    finally:
-        conn.close()
+    # Accepted: add to user_waifus (single upsert)
+    await db.give_card(user_id, card_id)
 
     text = (
         f"💖 The world seemed to pause when {waifu_name} embraced you... *\"I'm yours\"* 💕\n\n"
@@ -142,9 +115,8 @@ async def handle_accept(client, callback_query):
     )
     await finalize_proposal(callback_query, text, media_type, media_file)
 
-@app.on_callback_query(filters.regex(r"^propose_reject:(\w+)$"))
-async def handle_reject(client, callback_query):
-    short_id = callback_query.data.split(":")[1]
+@router.route("propose_reject", str)
+async def handle_reject(client, callback_query, short_id):
     data = pending_proposals.pop(short_id, None)
     if not data:
         await callback_query.answer("❌ This proposal expired.", show_alert=True)
@@ -0,0 +1,44 @@
+# handlers/queries.py
+"""
+Admin view of the SQL profile (query_profiler.py).
+
+ - /queries            top statements by total time
+ - /queries max|count  ... by slowest single run / by call count
+ - /queries reset      start counting from zero
+"""
+
+import time
+from pyrogram import filters
+from config import app, OWNER_ID, ADMINS
+from query_profiler import get_query_profiler
+
+profiler = get_query_profiler()
+
+ORDERS = {"total": "total time", "max": "slowest run", "count": "calls"}
+
+
+def render(by="total", top=15):
+    rows = profiler.top(top, by)
+    since = int(time.time() - profiler.started_at)
+    lines = [f"🗄️ SQL by {ORDERS[by]} (last {since // 3600}h {since % 3600 // 60}m, "
+             f"{profiler.slow_count} slow ≥ {profiler.slow_seconds * 1000:.0f} ms)", ""]
+    if not rows:
+        lines.append("No statements recorded yet.")
+    for fp, count, total, worst in rows:
+        avg = total / count if count else total
+        lines.append(f"{count:>7} × {avg * 1000:7.2f} ms = {total:7.2f} s  max {worst * 1000:.1f} ms")
+        lines.append(f"  {fp[:160]}")
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+@app.on_message(filters.command("queries") & filters.user([OWNER_ID] + ADMINS))
+async def queries_cmd(client, message):
+    arg = message.command[1].lower() if len(message.command) > 1 else "total"
+
+    if arg == "reset":
+        profiler.reset()
+        return await message.reply_text("🔄 SQL profile reset.")
+    if arg not in ORDERS:
+        return await message.reply_text("Usage: /queries [total|max|count|reset]")
+
+    await message.reply_text(render(arg))
@@ -3,9 +3,13 @@
 from pyrogram import filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import Config, app
-from database import Database
+from database import get_db
+from catalog import get_catalog
+from router import get_router
 
-db = Database()
+db = get_db()
+router = get_router()
+catalog = get_catalog()
 
 RARITIES = [
     "Common", "Medium", "Rare", "Lagendary", "Limited edition",
@@ -37,9 +41,9 @@ async def rarity_cmd(client, message: Message):
 # ---------------- Callback Query ----------------
 PAGE_SIZE = 5
 
-@app.on_callback_query(filters.regex(r"^rarity:"))
-async def rarity_callback(client, callback_query: CallbackQuery):
-    data = callback_query.data.split(":", 1)[1]  # rarity name or main
+@router.route("rarity", str)
+async def rarity_callback(client, callback_query: CallbackQuery, data):
+    # data: rarity name, "<rarity>::<page>" or main
     chat_id = callback_query.message.chat.id
     page = 0
     if "::" in data:
@@ -66,9 +70,8 @@ async def rarity_callback(client, callback_query: CallbackQuery):
 
     rarity_name = data
 
-    # Fetch cards from DB
-    db.cursor.execute("SELECT id, name FROM waifu_cards WHERE rarity=?", (rarity_name,))
-    cards = db.cursor.fetchall()
+    # Cards of this rarity (in-memory catalog)
+    cards = catalog.cards_by_rarity(rarity_name)
 
     if not cards:
         await callback_query.message.edit_text(
@@ -0,0 +1,51 @@
+# handlers/ratelimit.py
+"""
+Admin view of the anti-spam limiter (ratelimit.py).
+
+ - /ratelimit          shed updates per command / button, top chats and users
+ - /ratelimit on|off   switch limiting on or off until restart
+ - /ratelimit reset    start counting from zero
+"""
+
+import time
+from pyrogram import filters
+from config import app, OWNER_ID, ADMINS
+from ratelimit import get_rate_limiter
+
+limiter = get_rate_limiter()
+
+
+def render(top=15):
+    rows = limiter.table(top)
+    since = int(time.time() - limiter.started_at)
+    passed, dropped = sum(limiter.passed.values()), sum(limiter.dropped.values())
+    share = dropped / (passed + dropped) * 100 if passed + dropped else 0
+    lines = [f"🚦 Rate limit {'on' if limiter.enabled else 'OFF'} (last {since // 3600}h {since % 3600 // 60}m)",
+             f"passed {passed}, dropped {dropped} ({share:.1f}%), {len(limiter)} buckets, {limiter.evicted} evicted", ""]
+    if not rows:
+        lines.append("Nothing dropped yet.")
+    else:
+        lines.append(f"{'label':<24}{'passed':>9}{'dropped':>9}")
+        for label, ok, shed in rows:
+            lines.append(f"{label[:23]:<24}{ok:>9}{shed:>9}")
+    for title, counter in (("chats", limiter.dropped_chats), ("users", limiter.dropped_users)):
+        worst = counter.most_common(5)
+        if worst:
+            lines += ["", f"Top {title}: " + ", ".join(f"{key} ({n})" for key, n in worst)]
+    return "```\n" + "\n".join(lines) + "\n```"
+
+
+@app.on_message(filters.command("ratelimit") & filters.user([OWNER_ID] + ADMINS))
+async def ratelimit_cmd(client, message):
+    arg = message.command[1].lower() if len(message.command) > 1 else ""
+
+    if arg == "reset":
+        limiter.reset()
+        return await message.reply_text("🔄 Rate limit counters reset.")
+    if arg in ("on", "off"):
+        limiter.enabled = arg == "on"
+        return await message.reply_text(f"🚦 Rate limiting {arg}.")
+    if arg:
+        return await message.reply_text("Usage: /ratelimit [on|off|reset]")
+
+    await message.reply_text(render())
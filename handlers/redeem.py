@@ -15,52 +15,11 @@ from typing import Optional
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, Message
 from config import app, Config
-from database import Database
-
-db = Database()
-
-# ---------------- Schema ensure (create/alter if needed) ----------------
-def ensure_redeem_tables():
-    # create table if missing with minimal column
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS redeem_codes (
-            code TEXT PRIMARY KEY,
-            waifu_id INTEGER
-            -- other columns may be added below via ALTER TABLE
-        )
-    """)
-    db.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS redeem_claims (
-            code TEXT,
-            user_id INTEGER,
-            redeemed_at TEXT,
-            PRIMARY KEY (code, user_id)
-        )
-    """)
-    db.conn.commit()
-
-    # required columns and types
-    required = {
-        "creator": "INTEGER",
-        "limit_count": "INTEGER",
-        "redeemed_count": "INTEGER DEFAULT 0",
-        "created_at": "TEXT"
-    }
-
-    # check existing columns
-    db.cursor.execute("PRAGMA table_info(redeem_codes)")
-    existing = [r[1] for r in db.cursor.fetchall()]
-    for col, coltype in required.items():
-        if col not in existing:
-            try:
-                db.cursor.execute(f"ALTER TABLE redeem_codes ADD COLUMN {col} {coltype}")
-                db.conn.commit()
-            except Exception:
-                # best-effort: some SQLite older builds or schema states may error; ignore and continue
-                pass
-
-# run schema ensure on import
-ensure_redeem_tables()
+from database import get_db, give_card
+from router import get_router
+
+db = get_db()
+router = get_router()
 
 # ---------------- Utilities ----------------
 def is_owner(uid: int) -> bool:
@@ -81,44 +40,52 @@ def gen_code(length: int = 8) -> str:
     chars = string.ascii_uppercase + string.digits
     return ''.join(random.choice(chars) for _ in range(length))
 
-def find_unique_code():
+def find_unique_code(conn):
     for _ in range(10):
         c = gen_code(8)
-        db.cursor.execute("SELECT 1 FROM redeem_codes WHERE code = ?", (c,))
-        if not db.cursor.fetchone():
+        if not conn.execute("SELECT 1 FROM redeem_codes WHERE code = ?", (c,)).fetchone():
             return c
     # fallback longer code
     while True:
         c = gen_code(12)
-        db.cursor.execute("SELECT 1 FROM redeem_codes WHERE code = ?", (c,))
-        if not db.cursor.fetchone():
+        if not conn.execute("SELECT 1 FROM redeem_codes WHERE code = ?", (c,)).fetchone():
             return c
 
-def waifu_row_by_id(waifu_id: int):
-    db.cursor.execute("SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id FROM waifu_cards WHERE id = ?", (waifu_id,))
-    return db.cursor.fetchone()
-
-def user_has_claimed(code: str, user_id: int) -> bool:
-    db.cursor.execute("SELECT 1 FROM redeem_claims WHERE code = ? AND user_id = ?", (code, user_id))
-    return db.cursor.fetchone() is not None
-
-def add_claim_record(code: str, user_id: int):
-    db.cursor.execute("INSERT OR IGNORE INTO redeem_claims (code, user_id, redeemed_at) VALUES (?, ?, ?)",
-                      (code, user_id, now_iso()))
-    # don't commit here; caller manages transaction
+async def waifu_row_by_id(waifu_id: int):
+    return await db.fetchone("SELECT id, name, anime, rarity, event, media_type, media_file, media_file_id FROM waifu_cards WHERE id = ?", (waifu_id,))
 
-def increment_redeem_count(code: str):
-    db.cursor.execute("UPDATE redeem_codes SET redeemed_count = COALESCE(redeemed_count,0) + 1 WHERE code = ?", (code,))
-    # caller manages commit
+async def user_has_claimed(code: str, user_id: int) -> bool:
+    return await db.fetchone("SELECT 1 FROM redeem_claims WHERE code = ? AND user_id = ?", (code, user_id)) is not None
 
-def add_waifu_to_user(user_id: int, waifu_id: int):
-    db.cursor.execute("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (user_id, waifu_id))
-    r = db.cursor.fetchone()
-    if r:
-        db.cursor.execute("UPDATE user_waifus SET amount = amount + 1 WHERE user_id = ? AND waifu_id = ?", (user_id, waifu_id))
-    else:
-        db.cursor.execute("INSERT INTO user_waifus (user_id, waifu_id, amount) VALUES (?, ?, 1)", (user_id, waifu_id))
-    # caller commits
+# ---------------- Write jobs (run on the DB writer) ----------------
+def _create_code(conn, waifu_id, creator, limit, created_at):
+    code = find_unique_code(conn)
+    try:
+        # try safe insert
+        conn.execute("""INSERT OR REPLACE INTO redeem_codes
+                        (code, waifu_id, creator, limit_count, redeemed_count, created_at)
+                        VALUES (?, ?, ?, ?, ?, ?)""",
+                     (code, waifu_id, creator, limit, 0, created_at))
+    except Exception:
+        # if schema still incompatible, attempt minimal insert fallback
+        conn.execute("INSERT OR REPLACE INTO redeem_codes (code, waifu_id) VALUES (?, ?)", (code, waifu_id))
+    return code
+
+def _redeem(conn, code, user_id):
+    """Claim, count and grant in one transaction; returns None on success, else the reason"""
+    rc = conn.execute("SELECT waifu_id, redeemed_count, limit_count FROM redeem_codes WHERE code = ? LIMIT 1", (code,)).fetchone()
+    if not rc:
+        return "gone"
+    waifu_id, cur_redeemed, cur_limit = rc
+    if int(cur_limit or 0) > 0 and int(cur_redeemed or 0) >= int(cur_limit or 0):
+        return "limit"
+    # add claim (once per user), increment and grant waifu
+    if conn.execute("INSERT OR IGNORE INTO redeem_claims (code, user_id, redeemed_at) VALUES (?, ?, ?)",
+                    (code, user_id, now_iso())).rowcount == 0:
+        return "claimed"
+    conn.execute("UPDATE redeem_codes SET redeemed_count = COALESCE(redeemed_count,0) + 1 WHERE code = ?", (code,))
+    give_card(conn, user_id, waifu_id)
+    return None
 
 def build_preview_text(waifu):
     # waifu: (id, name, anime, rarity, event, media_type, media_file, media_file_id)
@@ -176,32 +143,16 @@ async def create_redeem_cmd(client, message: Message):
         await message.reply_text("Invalid arguments. waifu_id and limit must be integers, limit > 0.")
         return
 
-    waifu = waifu_row_by_id(waifu_id)
+    waifu = await waifu_row_by_id(waifu_id)
     if not waifu:
         await message.reply_text(f"❌ Waifu with ID {waifu_id} not found.")
         return
 
-    code = find_unique_code()
-    created_at = now_iso()
-
-    # ensure columns exist again (defensive)
-    ensure_redeem_tables()
-
     try:
-        # try safe insert
-        db.cursor.execute("""INSERT OR REPLACE INTO redeem_codes
-                             (code, waifu_id, creator, limit_count, redeemed_count, created_at)
-                             VALUES (?, ?, ?, ?, ?, ?)""",
-                          (code, waifu_id, uid, limit, 0, created_at))
-        db.conn.commit()
+        code = await db.run(_create_code, waifu_id, uid, limit, now_iso())
     except Exception as e:
-        # if schema still incompatible, attempt minimal insert fallback
-        try:
-            db.cursor.execute("INSERT OR REPLACE INTO redeem_codes (code, waifu_id) VALUES (?, ?)", (code, waifu_id))
-            db.conn.commit()
-        except Exception as e2:
-            await message.reply_text(f"❌ Failed to create code: {e}")
-            return
+        await message.reply_text(f"❌ Failed to create code: {e}")
+        return
 
     caption = build_preview_text(waifu) + "\n\n" + f"🎫 Code: {code}\n🔁 Limit: {limit} redeems\n🧾 Created by: {message.from_user.first_name}"
     kb = InlineKeyboardMarkup([[InlineKeyboardButton("✅ Redeem", callback_data=f"redeem_cb:{code}")]])
@@ -225,8 +176,7 @@ async def redeem_cmd(client, message: Message):
     code = parts[1].strip().upper()
 
     # fetch code row
-    db.cursor.execute("SELECT code, waifu_id, creator, limit_count, redeemed_count, created_at FROM redeem_codes WHERE code = ?", (code,))
-    row = db.cursor.fetchone()
+    row = await db.fetchone("SELECT code, waifu_id, creator, limit_count, redeemed_count, created_at FROM redeem_codes WHERE code = ?", (code,))
     if not row:
         await message.reply_text("❌ Invalid code.")
         return
@@ -239,41 +189,27 @@ async def redeem_cmd(client, message: Message):
         await message.reply_text("❌ Redeem limit reached for this code.")
         return
 
-    if user_has_claimed(code, user.id):
+    if await user_has_claimed(code, user.id):
         await message.reply_text("ℹ️ You have already redeemed this code.")
         return
 
-    # perform atomic-ish redeem
+    # perform atomic redeem
     try:
-        db.cursor.execute("BEGIN IMMEDIATE")
-        db.cursor.execute("SELECT redeemed_count, limit_count FROM redeem_codes WHERE code = ? LIMIT 1", (code,))
-        rc = db.cursor.fetchone()
-        if not rc:
-            db.conn.commit()
-            await message.reply_text("❌ Code no longer available.")
-            return
-        cur_redeemed, cur_limit = rc
-        cur_redeemed = int(cur_redeemed or 0)
-        cur_limit = int(cur_limit or 0)
-        if cur_limit > 0 and cur_redeemed >= cur_limit:
-            db.conn.commit()
-            await message.reply_text("❌ Redeem limit reached for this code.")
-            return
-
-        # add claim, increment and grant waifu
-        add_claim_record(code, user.id)
-        increment_redeem_count(code)
-        add_waifu_to_user(user.id, waifu_id)
-        db.conn.commit()
+        failed = await db.run(_redeem, code, user.id)
     except Exception:
-        try:
-            db.conn.rollback()
-        except Exception:
-            pass
         await message.reply_text("❌ An error occurred while redeeming. Try again later.")
         return
+    if failed == "gone":
+        await message.reply_text("❌ Code no longer available.")
+        return
+    if failed == "limit":
+        await message.reply_text("❌ Redeem limit reached for this code.")
+        return
+    if failed == "claimed":
+        await message.reply_text("ℹ️ You have already redeemed this code.")
+        return
 
-    waifu = waifu_row_by_id(waifu_id)
+    waifu = await waifu_row_by_id(waifu_id)
     caption = build_preview_text(waifu) + f"\n\n✅ Redeemed by {user.first_name}\n🎫 Code: {code}"
     try:
         await send_waifu_preview(client, message.chat.id, waifu, caption)
@@ -281,16 +217,15 @@ async def redeem_cmd(client, message: Message):
         await message.reply_text(caption)
 
 # ---------------- inline redeem button ----------------
-@app.on_callback_query(filters.regex(r"^redeem_cb:(?P<code>.+)$"))
-async def redeem_button_cb(client, callback: CallbackQuery):
-    code = callback.matches[0].group("code").upper()
+@router.route("redeem_cb", str)
+async def redeem_button_cb(client, callback: CallbackQuery, code):
+    code = code.upper()
     user = callback.from_user
     if not user:
         await callback.answer("Invalid user.", show_alert=True)
         return
 
-    db.cursor.execute("SELECT code, waifu_id, creator, limit_count, redeemed_count FROM redeem_codes WHERE code = ?", (code,))
-    row = db.cursor.fetchone()
+    row = await db.fetchone("SELECT code, waifu_id, creator, limit_count, redeemed_count FROM redeem_codes WHERE code = ?", (code,))
     if not row:
         await callback.answer("❌ Invalid code.", show_alert=True)
         return
@@ -303,40 +238,27 @@ async def redeem_button_cb(client, callback: CallbackQuery):
         await callback.answer("❌ Redeem limit reached for this code.", show_alert=True)
         return
 
-    if user_has_claimed(code, user.id):
+    if await user_has_claimed(code, user.id):
         await callback.answer("ℹ️ You have already redeemed this code.", show_alert=True)
         return
 
     # atomic update
     try:
-        db.cursor.execute("BEGIN IMMEDIATE")
-        db.cursor.execute("SELECT redeemed_count, limit_count FROM redeem_codes WHERE code = ? LIMIT 1", (code,))
-        rc = db.cursor.fetchone()
-        if not rc:
-            db.conn.commit()
-            await callback.answer("❌ Code no longer available.", show_alert=True)
-            return
-        cur_redeemed, cur_limit = rc
-        cur_redeemed = int(cur_redeemed or 0)
-        cur_limit = int(cur_limit or 0)
-        if cur_limit > 0 and cur_redeemed >= cur_limit:
-            db.conn.commit()
-            await callback.answer("❌ Redeem limit reached.", show_alert=True)
-            return
-
-        add_claim_record(code, user.id)
-        increment_redeem_count(code)
-        add_waifu_to_user(user.id, waifu_id)
-        db.conn.commit()
+        failed = await db.run(_redeem, code, user.id)
     except Exception:
-        try:
-            db.conn.rollback()
-        except Exception:
-            pass
         await callback.answer("❌ Failed to redeem. Try again later.", show_alert=True)
         return
+    if failed == "gone":
+        await callback.answer("❌ Code no longer available.", show_alert=True)
+        return
+    if failed == "limit":
+        await callback.answer("❌ Redeem limit reached.", show_alert=True)
+        return
+    if failed == "claimed":
+        await callback.answer("ℹ️ You have already redeemed this code.", show_alert=True)
+        return
 
-    waifu = waifu_row_by_id(waifu_id)
+    waifu = await waifu_row_by_id(waifu_id)
     caption = build_preview_text(waifu) + f"\n\n✅ Redeemed by {user.first_name}\n🎫 Code: {code}"
     try:
         # reply in chat with preview
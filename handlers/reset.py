@@ -13,13 +13,12 @@ from pyrogram.types import (
     InlineKeyboardButton,
 )
 from config import app, Config
+from database import get_db, inventory_changed
+from router import get_router
 
-DB_PATH = "waifu_bot.db"
+db = get_db()
 pending_resets: Dict[str, Dict[str, Any]] = {}  # nonce -> info
-
-
-def _conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+router = get_router()
 
 
 def table_exists(conn: sqlite3.Connection, table: str) -> bool:
@@ -74,7 +73,7 @@ def delete_user_collections(conn: sqlite3.Connection, user_id: int) -> int:
     """
     Delete user's collection rows from known tables.
     Returns total units deleted (sum of amounts if present; otherwise number of rows deleted).
-    This function commits the changes.
+    Run it as a db.run() job; the writer commits.
     """
     cur = conn.cursor()
     total_removed_units = 0
@@ -94,6 +93,7 @@ def delete_user_collections(conn: sqlite3.Connection, user_id: int) -> int:
             total_removed_units += removed_units
 
         cur.execute("DELETE FROM user_waifus WHERE user_id=?", (user_id,))
+        inventory_changed(user_id, -removed_units)
 
     # Try a few likely alternative tables (safe, check existence first)
     alt_tables = ["collections", "user_cards", "user_collection", "inventory", "user_inventory"]
@@ -112,10 +112,18 @@ def delete_user_collections(conn: sqlite3.Connection, user_id: int) -> int:
 
             cur.execute(f"DELETE FROM {t} WHERE user_id=?", (user_id,))
 
-    conn.commit()
     return total_removed_units
 
 
+def _reset_collection(conn: sqlite3.Connection, user_id: int) -> int:
+    before_count = get_user_collection_count(conn, user_id)
+    removed_units = delete_user_collections(conn, user_id)
+    # if delete_user_collections couldn't compute units but returns 0, fallback to before_count
+    if removed_units == 0 and before_count:
+        removed_units = before_count
+    return removed_units
+
+
 # ----------------- /reset command -----------------
 @app.on_message(filters.command("reset"))
 async def cmd_reset(client, message: Message):
@@ -217,11 +225,11 @@ async def cmd_reset(client, message: Message):
 
 
 # ----------------- Callback handler -----------------
-@app.on_callback_query(filters.regex(r"^reset_(confirm|cancel):"))
-async def cb_reset(client, callback: CallbackQuery):
+@router.route("reset_confirm", str)
+@router.route("reset_cancel", str)
+async def cb_reset(client, callback: CallbackQuery, nonce):
     try:
-        data = callback.data  # e.g. "reset_confirm:12345"
-        action, nonce = data.split(":", 1)
+        action = callback.data.split(":", 1)[0]  # "reset_confirm" / "reset_cancel"
         info = pending_resets.get(nonce)
         if not info:
             await callback.answer("⚠️ This reset request has expired or is invalid.", show_alert=True)
@@ -258,47 +266,36 @@ async def cb_reset(client, callback: CallbackQuery):
             return
 
         # action == confirm -> perform deletion
-        conn = _conn()
-        try:
-            before_count = get_user_collection_count(conn, target_id)
-            removed_units = delete_user_collections(conn, target_id)
-            # if delete_user_collections couldn't compute units but returns 0, fallback to before_count
-            if removed_units == 0 and before_count:
-                removed_units = before_count
+        removed_units = await db.run(_reset_collection, target_id)
 
-            # remove pending entry
-            pending_resets.pop(nonce, None)
+        # remove pending entry
+        pending_resets.pop(nonce, None)
 
-            # edit callback message to show result
-            try:
-                await callback.message.edit_text(
-                    f"✅ Reset completed!\n\nTarget ID: {target_id}\nRemoved units: {removed_units}"
-                )
-            except:
-                pass
+        # edit callback message to show result
+        try:
+            await callback.message.edit_text(
+                f"✅ Reset completed!\n\nTarget ID: {target_id}\nRemoved units: {removed_units}"
+            )
+        except:
+            pass
 
-            # notify issuer in chat (already edited), also attempt to DM target
-            try:
-                await client.send_message(
-                    callback.message.chat.id,
-                    f"✅ Collection reset by {callback.from_user.mention} for user ID {target_id} — removed {removed_units} units."
-                )
-            except:
-                pass
+        # notify issuer in chat (already edited), also attempt to DM target
+        try:
+            await client.send_message(
+                callback.message.chat.id,
+                f"✅ Collection reset by {callback.from_user.mention} for user ID {target_id} — removed {removed_units} units."
+            )
+        except:
+            pass
 
-            # DM target if possible (best-effort)
-            try:
-                await client.send_message(target_id, f"⚠️ Your collection was reset by an admin. If you think this is a mistake contact support.")
-            except:
-                # ignore if blocked or cannot message
-                pass
+        # DM target if possible (best-effort)
+        try:
+            await client.send_message(target_id, f"⚠️ Your collection was reset by an admin. If you think this is a mistake contact support.")
+        except:
+            # ignore if blocked or cannot message
+            pass
 
-            await callback.answer("Reset completed.", show_alert=False)
-        finally:
-            try:
-                conn.close()
-            except:
-                pass
+        await callback.answer("Reset completed.", show_alert=False)
 
     except Exception:
         traceback.print_exc()
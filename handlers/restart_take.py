@@ -31,7 +31,7 @@ Owner-only maintenance commands:
       Subtracts <amount> from the specified user.
 
     Behavior:
-      - If user's balance is missing it will be treated as 0.
+      - Debits the crystal ledger (ledger.py); a missing balance is treated as 0.
       - If amount to remove >= current balance, balance will be set to 0.
       - Confirmation to owner and best-effort DM to target user.
 
@@ -40,21 +40,41 @@ This file expects the same DB used by other handlers: "waifu_bot.db".
 
 import os
 import sys
-import sqlite3
 from datetime import datetime
 
 from pyrogram import filters
 from pyrogram.types import Message
 from config import app, Config
+from database import get_db, take_cards_many
+from ledger import balance, debit
 
-DB_PATH = "waifu_bot.db"
+db = get_db()
 
 # Owner id must exist in Config
 OWNER_ID = getattr(Config, "OWNER_ID", None)
 
-# --- DB connection (same approach used across your handlers) ---
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
+
+def _take_crystals(conn, user_id: int, amount: int):
+    """Remove up to amount crystals; returns (balance_before, balance_after)"""
+    current = balance(conn, user_id)
+    take = min(amount, current)
+    if take <= 0:
+        return current, current
+    return current, debit(conn, user_id, take, "owner_take")
+
+
+def _take_waifus(conn, user_id: int, waifu_id: int, qty: int):
+    """Remove up to qty copies; returns (amount_before, amount_after), None if not owned"""
+    row = conn.execute("SELECT amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (user_id, waifu_id)).fetchone()
+    if not row:
+        return None
+    amount = int(row[0] or 0)
+    if amount <= 0:
+        # defensive
+        conn.execute("DELETE FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (user_id, waifu_id))
+        return 0, 0
+    removed = take_cards_many(conn, [(user_id, waifu_id, qty)]).get(user_id, 0)
+    return amount, amount - removed
 
 
 def _is_owner(msg: Message) -> bool:
@@ -69,13 +89,9 @@ async def restart_handler(client, message: Message):
         return
 
     await message.reply_text("♻️ Restarting bot now (attempting to re-exec Python).")
-    # flush DB and close connection
+    # flush queued DB writes before the process image is replaced
     try:
-        conn.commit()
-    except Exception:
-        pass
-    try:
-        conn.close()
+        await db.stop_writer()
     except Exception:
         pass
 
@@ -137,55 +153,36 @@ async def take_waifu_handler(client, message: Message):
             except Exception:
                 qty = 1
 
-    # Fetch current ownership
+    # check ownership and remove in one job
     try:
-        cursor.execute("SELECT id, amount FROM user_waifus WHERE user_id = ? AND waifu_id = ?", (target_user_id, waifu_id))
-        row = cursor.fetchone()
+        result = await db.run(_take_waifus, target_user_id, waifu_id, qty)
     except Exception as e:
-        await message.reply_text(f"❌ DB query failed: {e}")
+        await message.reply_text(f"❌ Failed to remove waifu(s): {e}")
         return
 
-    if not row:
+    if result is None:
         await message.reply_text(f"ℹ️ User `{target_user_id}` does not own waifu ID {waifu_id}. Nothing done.")
         return
 
-    row_id, amount = row[0], int(row[1] or 0)
+    amount, new_amount = result
     if amount <= 0:
-        # defensive
-        try:
-            cursor.execute("DELETE FROM user_waifus WHERE id = ?", (row_id,))
-            conn.commit()
-        except Exception:
-            pass
         await message.reply_text(f"✅ Removed record for waifu ID {waifu_id} from user {target_user_id} (had zero).")
         return
 
-    if qty >= amount:
-        # remove the row entirely
+    if new_amount <= 0:
+        # the row is gone entirely
+        await message.reply_text(f"🗑 Removed all ({amount}) copies of waifu ID {waifu_id} from user {target_user_id}.")
+        # notify target user
         try:
-            cursor.execute("DELETE FROM user_waifus WHERE id = ?", (row_id,))
-            conn.commit()
-            await message.reply_text(f"🗑 Removed all ({amount}) copies of waifu ID {waifu_id} from user {target_user_id}.")
-            # notify target user
-            try:
-                await client.send_message(target_user_id, f"⚠️ An admin action removed {amount}x waifu ID {waifu_id} from your collection.")
-            except Exception:
-                pass
-        except Exception as e:
-            await message.reply_text(f"❌ Failed to remove waifu(s): {e}")
+            await client.send_message(target_user_id, f"⚠️ An admin action removed {amount}x waifu ID {waifu_id} from your collection.")
+        except Exception:
+            pass
     else:
-        # subtract qty
-        new_amount = amount - qty
+        await message.reply_text(f"✅ Removed {qty}x of waifu ID {waifu_id} from user {target_user_id}. Remaining: {new_amount}")
         try:
-            cursor.execute("UPDATE user_waifus SET amount = ? WHERE id = ?", (new_amount, row_id))
-            conn.commit()
-            await message.reply_text(f"✅ Removed {qty}x of waifu ID {waifu_id} from user {target_user_id}. Remaining: {new_amount}")
-            try:
-                await client.send_message(target_user_id, f"⚠️ An admin action removed {qty}x waifu ID {waifu_id} from your collection. Remaining: {new_amount}")
-            except Exception:
-                pass
-        except Exception as e:
-            await message.reply_text(f"❌ Failed to update record: {e}")
+            await client.send_message(target_user_id, f"⚠️ An admin action removed {qty}x waifu ID {waifu_id} from your collection. Remaining: {new_amount}")
+        except Exception:
+            pass
 
 
 # ---------------- /tcrystals (subtract crystals from user balance) ----------------
@@ -221,41 +218,23 @@ async def take_crystals_handler(client, message: Message):
             await message.reply_text("❌ Invalid user id or amount. Must be numbers.")
             return
 
-    # fetch current balance
+    if amount <= 0:
+        await message.reply_text("❌ Amount must be greater than zero.")
+        return
+
+    # clamp to the current balance and debit through the ledger in one job
     try:
-        cursor.execute("SELECT balance FROM user_balances WHERE user_id = ?", (target_user_id,))
-        r = cursor.fetchone()
+        current, new_balance = await db.run(_take_crystals, target_user_id, amount)
     except Exception as e:
-        await message.reply_text(f"❌ DB query failed: {e}")
+        await message.reply_text(f"❌ Failed to update balance: {e}")
         return
 
-    current = int(r[0]) if r and r[0] is not None else 0
     if current <= 0:
         await message.reply_text(f"ℹ️ User {target_user_id} has no crystals (balance = 0). Nothing to remove.")
         return
 
-    if amount <= 0:
-        await message.reply_text("❌ Amount must be greater than zero.")
-        return
-
-    if amount >= current:
-        new_balance = 0
-    else:
-        new_balance = current - amount
-
-    # update DB (insert or update)
+    await message.reply_text(f"✅ Updated crystals for user {target_user_id}: {current} -> {new_balance} (removed {current - new_balance}).")
     try:
-        # ensure there's a row
-        cursor.execute("SELECT user_id FROM user_balances WHERE user_id = ?", (target_user_id,))
-        if cursor.fetchone():
-            cursor.execute("UPDATE user_balances SET balance = ? WHERE user_id = ?", (new_balance, target_user_id))
-        else:
-            cursor.execute("INSERT INTO user_balances (user_id, balance) VALUES (?, ?)", (target_user_id, new_balance))
-        conn.commit()
-        await message.reply_text(f"✅ Updated crystals for user {target_user_id}: {current} -> {new_balance} (removed {current - new_balance}).")
-        try:
-            await client.send_message(target_user_id, f"⚠️ An admin action adjusted your crystals: {current} -> {new_balance}.")
-        except Exception:
-            pass
-    except Exception as e:
-        await message.reply_text(f"❌ Failed to update balance: {e}")
+        await client.send_message(target_user_id, f"⚠️ An admin action adjusted your crystals: {current} -> {new_balance}.")
+    except Exception:
+        pass
@@ -2,14 +2,26 @@
 
 from pyrogram import filters, types
 from config import Config, app
-from database import Database
-from datetime import datetime, timedelta
+from cooldowns import get_cooldowns
+from database import get_db
+from ledger import get_ledger
+from router import get_router, choice, digits
 
-db = Database()
+db = get_db()
+cooldowns = get_cooldowns()
+ledger = get_ledger()
+router = get_router()
 
 SUPPORT_GROUP = "@suppofcollectyourcrickers"
 SUPPORT_CHANNEL = "@CricketCollecterBot"
 
+# Cooldown per reward, in seconds (/weekly shares "weekly" with /bonus)
+COOLDOWNS = {
+    "daily": 24 * 60 * 60,
+    "weekly": 7 * 24 * 60 * 60,
+    "monthly": 30 * 24 * 60 * 60,
+}
+
 # ---------------- Helper Functions ----------------
 
 async def is_member(user_id):
@@ -50,19 +62,20 @@ async def send_claim_prompt(message, reward_type, reward_amount, user_id):
 
 async def give_reward(user_id, reward_type, reward_amount, cooldown, message=None):
     """Grant reward with cooldown check."""
-    db.add_user(user_id, message.from_user.username if message else None,
+    await db.add_user(user_id, message.from_user.username if message else None,
                 message.from_user.first_name if message else None)
 
-    last_claim = db.get_last_claim(user_id, reward_type)
-    if last_claim:
-        last_claim_dt = datetime.fromisoformat(last_claim)
-        if datetime.utcnow() - last_claim_dt < cooldown:
-            if message:
-                await message.reply_text(f"⏳ You already claimed your **{reward_type} reward**! Try again later.")
-            return False
+    if cooldowns.try_start(user_id, reward_type, cooldown):
+        if message:
+            await message.reply_text(f"⏳ You already claimed your **{reward_type} reward**! Try again later.")
+        return False
 
-    db.add_crystals(user_id, **{reward_type: reward_amount})
-    db.update_last_claim(user_id, reward_type, datetime.utcnow().isoformat())
+    try:
+        await ledger.credit(user_id, reward_amount, reward_type)
+    except Exception:
+        # nothing was paid, so don't leave them waiting out the cooldown
+        cooldowns.clear(user_id, reward_type)
+        raise
 
     if message:
         await message.reply_text(f"✅ You received {reward_amount} 💎 {reward_type} crystals!")
@@ -84,10 +97,8 @@ async def monthly_cmd(client, message):
 
 # ---------------- Callback ----------------
 
-@app.on_callback_query(filters.regex(r"^claim:(daily|weekly|monthly):(\d+)$"))
-async def claim_callback(client, callback_query):
-    reward_type = callback_query.data.split(":")[1]
-    reward_amount = int(callback_query.data.split(":")[2])
+@router.route("claim", choice("daily", "weekly", "monthly"), digits)
+async def claim_callback(client, callback_query, reward_type, reward_amount):
     user_id = callback_query.from_user.id
 
     # Re-check membership before giving reward
@@ -95,13 +106,7 @@ async def claim_callback(client, callback_query):
         await callback_query.answer("❌ You must join the support group and channel to claim.", show_alert=True)
         return
 
-    cooldowns = {
-        "daily": timedelta(days=1),
-        "weekly": timedelta(weeks=1),
-        "monthly": timedelta(days=30)
-    }
-
-    success = await give_reward(user_id, reward_type, reward_amount, cooldowns[reward_type], callback_query.message)
+    success = await give_reward(user_id, reward_type, reward_amount, COOLDOWNS[reward_type], callback_query.message)
     if success:
         await callback_query.answer("✅ Reward claimed!", show_alert=True)
         await callback_query.message.edit_text(f"✅ You claimed your {reward_type} reward of {reward_amount} 💎!")
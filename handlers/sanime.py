@@ -1,33 +1,18 @@
 # handlers/sanime.py
 
-import sqlite3
+from card_search import get_card_search
 from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, CallbackQuery
 from pyrogram.enums import ParseMode
 
-DB_PATH = "waifu_bot.db"
+card_search = get_card_search()
 OWNER_ID = 7558715645   # replace with your ID
 ADMIN_IDS = [OWNER_ID]  # add more admin IDs if needed
 
 
-def get_anime_distribution(filter_anime: str = None):
-    """Fetch anime distribution (optionally filter by one anime)."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    if filter_anime:
-        cursor.execute(
-            "SELECT anime, COUNT(*) FROM waifu_cards WHERE anime LIKE ? GROUP BY anime ORDER BY COUNT(*) DESC;",
-            (f"%{filter_anime}%",),
-        )
-    else:
-        cursor.execute(
-            "SELECT anime, COUNT(*) FROM waifu_cards GROUP BY anime ORDER BY COUNT(*) DESC;"
-        )
-
-    results = cursor.fetchall()
-    conn.close()
-    return results
+async def get_anime_distribution(filter_anime: str = None):
+    """Fetch anime distribution (optionally filter by anime title words)."""
+    return await card_search.anime_counts(filter_anime)
 
 
 def format_page(anime_list, page, per_page=10, filter_anime=None):
@@ -77,6 +62,9 @@ def build_keyboard(page, total, filter_anime=None, per_page=10):
 
 # Register /sanime command
 from config import app
+from router import get_router
+
+router = get_router()
 
 
 @app.on_message(filters.command("sanime"))
@@ -88,7 +76,7 @@ async def sanime_handler(client: Client, message: Message):
     args = message.text.split(maxsplit=1)
     filter_anime = args[1].strip() if len(args) > 1 else None
 
-    anime_list = get_anime_distribution(filter_anime)
+    anime_list = await get_anime_distribution(filter_anime)
     if not anime_list:
         await message.reply_text("❌ No anime found in database yet.")
         return
@@ -101,18 +89,18 @@ async def sanime_handler(client: Client, message: Message):
 
 
 # Handle callback pagination
-@app.on_callback_query(filters.regex(r"^sanime_page_"))
-async def sanime_callback(client: Client, query: CallbackQuery):
+@router.route("sanime_page", str, sep="_")
+async def sanime_callback(client: Client, query: CallbackQuery, data):
     if query.from_user.id not in ADMIN_IDS:
         await query.answer("⛔ You are not allowed to use this.", show_alert=True)
         return
 
-    data = query.data.split("_", 2)[-1]  # e.g., "2|Naruto" or "1|ALL"
+    # data e.g. "2|Naruto" or "1|ALL"
     page_str, filter_anime = data.split("|", 1)
     page = int(page_str)
     filter_anime = None if filter_anime == "ALL" else filter_anime
 
-    anime_list = get_anime_distribution(filter_anime)
+    anime_list = await get_anime_distribution(filter_anime)
 
     text = format_page(anime_list, page, filter_anime=filter_anime)
     keyboard = build_keyboard(page, len(anime_list), filter_anime)
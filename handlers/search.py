@@ -1,9 +1,9 @@
 # handlers/search.py
 from pyrogram import filters
 from config import app
-from database import Database
+from card_search import get_card_search
 
-db = Database()
+card_search = get_card_search()
 
 @app.on_message(filters.command("search"))
 async def search_card(client, message):
@@ -12,14 +12,14 @@ async def search_card(client, message):
     except:
         return await message.reply_text("Usage: /search <name>")
 
-    db.cursor.execute("SELECT id, name, rarity, anime FROM waifu_cards WHERE name LIKE ? LIMIT 10", (f"%{query}%",))
-    results = db.cursor.fetchall()
-    
+    # Full-text, best matches first; falls back to typo-tolerant matching
+    results, _ = await card_search.search(query, limit=10)
+
     if not results:
         return await message.reply_text("❌ No players found.")
-    
+
     text = f"🔍 **Search Results for '{query}':**\n\n"
-    for pid, name, rarity, anime in results:
-        text += f"🆔 `{pid}`: **{name}** ({rarity}) - {anime}\n"
+    for card in results:
+        text += f"🆔 `{card.id}`: **{card.name}** ({card.rarity}) - {card.anime}\n"
         
     await message.reply_text(text)
\ No newline at end of file
@@ -9,9 +9,11 @@ found in your waifu_cards.anime column that start with that letter.
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import app
-from database import Database
+from card_search import get_card_search
+from router import get_router
 
-db = Database()
+card_search = get_card_search()
+router = get_router()
 
 ALPHABET = [chr(c) for c in range(ord("A"), ord("Z") + 1)]
 
@@ -45,16 +47,14 @@ async def animesearch_cmd(client, message):
     await message.reply_text(text, reply_markup=alphabet_keyboard())
 
 
-@app.on_callback_query(filters.regex(r"^animesearch:(?P<action>.+)$"))
-async def animesearch_callback(client, callback: CallbackQuery):
+@router.route("animesearch", str)
+async def animesearch_callback(client, callback: CallbackQuery, data):
     """
     Handle:
       animesearch:A      -> show anime names starting with A
       animesearch:back   -> show alphabet again
       animesearch:close  -> close (delete) the help message
     """
-    data = callback.data.split(":", 1)[1]
-
     # Close message
     if data == "close":
         try:
@@ -82,19 +82,9 @@ async def animesearch_callback(client, callback: CallbackQuery):
         await callback.answer("Invalid selection.", show_alert=True)
         return
 
-    # Query distinct anime names starting with that letter from waifu_cards.anime
+    # Distinct anime titles whose first word starts with that letter (full-text index)
     try:
-        query = """
-            SELECT DISTINCT anime
-            FROM waifu_cards
-            WHERE anime IS NOT NULL AND anime <> '' AND UPPER(anime) LIKE ?
-            ORDER BY anime COLLATE NOCASE ASC
-            LIMIT 100
-        """
-        like_pattern = f"{letter}%"
-        db.cursor.execute(query, (like_pattern,))
-        rows = db.cursor.fetchall()
-        anime_names = [r[0] for r in rows if r and r[0]]
+        anime_names = await card_search.anime_titles(letter, limit=100)
     except Exception as e:
         # On DB error, inform the user (but don't crash)
         await callback.answer("Database error. Try again later.", show_alert=True)
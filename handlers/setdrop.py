@@ -1,27 +1,20 @@
 # handlers/setdrop.py
 
-import sqlite3
 from pyrogram import filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from config import Config, app
+from catalog import get_catalog
+from sampler import get_sampler, RARITY_ORDER
+from drops import get_drop_engine
+from collect_service import get_collect_service
 import random
 
-DB_PATH = "waifu_bot.db"
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
+catalog = get_catalog()
+sampler = get_sampler()
 
-# Ensure current_drops table exists
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS current_drops (
-    chat_id INTEGER PRIMARY KEY,
-    waifu_id INTEGER,
-    collected_by INTEGER DEFAULT NULL
-)
-""")
-conn.commit()
-
-# In-memory drop counter
-drop_settings = {}  # {chat_id: {"target": int, "count": int}}
+# Per-chat drop counters (persisted + restored by drops.py)
+drops = get_drop_engine()
+collector = get_collect_service()
 
 # ---------------- ✅ Updated Allowed Rarities (Simple Names) ----------------
 ALLOWED_KEYWORDS = [
@@ -64,7 +57,7 @@ async def set_drop(client, message: Message):
             return
 
     # Set drop
-    drop_settings[chat_id] = {"target": target_msg, "count": 0}
+    await drops.set_target(chat_id, target_msg)
     await message.reply_text(f"✅ Card drop set! A random player will drop after every {target_msg} messages.")
 
 
@@ -72,16 +65,79 @@ async def set_drop(client, message: Message):
 @app.on_message(filters.command("dropcount") & filters.group, group=1)
 async def drop_count(client, message: Message):
     chat_id = message.chat.id
-    if chat_id not in drop_settings:
+    remaining = await drops.remaining(chat_id)
+    if remaining is None:
         await message.reply_text("ℹ️ No card drop is configured for this group. Use /setdrop to enable drops.")
         return
 
-    remaining = drop_settings[chat_id]["target"] - drop_settings[chat_id]["count"]
-    if remaining < 0:
-        remaining = 0
     await message.reply_text(f"🎴 Messages remaining until next drop: {remaining}")
 
 
+# ---------------- /dropweight Command ----------------
+@app.on_message(filters.command("dropweight") & filters.group, group=1)
+async def drop_weight(client, message: Message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    args = message.text.split()[1:]
+
+    # No args: show this group's drop chances
+    if not args:
+        chances = sampler.rarity_chances(chat_id)
+        lines = [f"• {r}: {chances[r]:.2f}%" for r in RARITY_ORDER if r in chances]
+        lines += [f"• {r}: {p:.2f}%" for r, p in chances.items() if r not in RARITY_ORDER]
+        await message.reply_text("🎲 Drop chances in this group:\n\n" + ("\n".join(lines) or "No cards yet."))
+        return
+
+    if user_id != Config.OWNER_ID and user_id not in Config.ADMINS:
+        await message.reply_text("❌ Only bot admins can change drop weights.")
+        return
+
+    if args[0].lower() == "reset":
+        await sampler.reset_group_weights(chat_id)
+        await message.reply_text("✅ Drop weights reset to the global defaults.")
+        return
+
+    # /dropweight <rarity> <weight>  (rarity may contain spaces)
+    try:
+        weight = float(args[-1])
+        rarity = " ".join(args[:-1])
+        if not rarity or weight < 0:
+            raise ValueError
+    except ValueError:
+        await message.reply_text("❌ Usage: /dropweight <rarity> <weight> | /dropweight reset")
+        return
+
+    await sampler.set_group_weight(chat_id, rarity, weight)
+    await message.reply_text(f"✅ {rarity} weight set to {weight:g} in this group.")
+
+
+# ---------------- /dropboost Command ----------------
+@app.on_message(filters.command("dropboost"), group=1)
+async def drop_boost(client, message: Message):
+    if message.from_user.id != Config.OWNER_ID:
+        return
+
+    args = message.text.split()[1:]
+    if not args:
+        boosts = sampler.event_boosts()
+        text = "\n".join(f"• {e}: x{f:g}" for e, f in boosts.items()) or "No event boosts active."
+        await message.reply_text("🎀 Event boosts:\n\n" + text)
+        return
+
+    # /dropboost <event> <factor>  (factor 1 removes the boost)
+    try:
+        factor = float(args[-1])
+        event = " ".join(args[:-1])
+        if not event or factor < 0:
+            raise ValueError
+    except ValueError:
+        await message.reply_text("❌ Usage: /dropboost <event> <factor>")
+        return
+
+    sampler.set_event_boost(event, factor)
+    await message.reply_text(f"✅ {event} cards now drop x{factor:g} as often within their rarity.")
+
+
 # ---------------- Message Tracker (Drop Logic) ----------------
 @app.on_message(filters.group, group=2)
 async def drop_tracker(client, message: Message):
@@ -95,23 +151,14 @@ async def drop_tracker(client, message: Message):
     if message.text and message.text.startswith("/"):
         return
 
-    if chat_id not in drop_settings:
-        return
-
-    drop_settings[chat_id]["count"] += 1
-    
-    # Check if target reached
-    if drop_settings[chat_id]["count"] < drop_settings[chat_id]["target"]:
+    # Count + check target + reset in one step; only one message claims the drop
+    if not drops.tick(chat_id):
         return
 
-    # Reset counter immediately
-    drop_settings[chat_id]["count"] = 0
-
     # --- Logic to pick a card ---
     try:
-        # Simply pick ANY random card from DB to ensure drops always work
-        cursor.execute("SELECT id, name, anime, rarity, media_type, media_file FROM waifu_cards ORDER BY RANDOM() LIMIT 1")
-        card = cursor.fetchone()
+        # Weighted pick (rarity tiers + group overrides + event boosts)
+        card = sampler.sample(chat_id=chat_id)
 
         if not card:
             # DB is empty
@@ -121,12 +168,8 @@ async def drop_tracker(client, message: Message):
         print(f"❌ Error fetching card for drop: {e}")
         return
 
-    # Save drop to DB so /collect works
-    cursor.execute(
-        "INSERT OR REPLACE INTO current_drops (chat_id, waifu_id, collected_by) VALUES (?, ?, NULL)",
-        (chat_id, card[0])
-    )
-    conn.commit()
+    # Save drop to DB (+ collect cache) so /collect works
+    await collector.open_drop(chat_id, card)
 
     # Prepare Deep Link Button (Optional, removed view details button to hide info further)
     # buttons = None (agar aapko deep link hatana hai toh is line ko uncomment kar dein)
@@ -140,11 +183,10 @@ async def drop_tracker(client, message: Message):
 
     # Send Drop Message
     # Unpack card details
-    # card = (id, name, anime, rarity, media_type, media_file)
-    # c_name = card[1]  <-- NAME HATA DIYA
-    c_rarity = card[3]
-    c_type = card[4]
-    c_file = card[5]
+    # c_name = card.name  <-- NAME HATA DIYA
+    c_rarity = card.rarity
+    c_type = card.media_type
+    c_file = card.media_file
 
     # ✅ NEW DROP TEXT (Hidden Name)
     drop_text = (
@@ -174,11 +216,7 @@ async def start_with_card(client, message: Message):
     if payload.startswith("card_"):
         try:
             waifu_id = int(payload.split("_", 1)[1])
-            cursor.execute(
-                "SELECT id, name, anime, rarity, event, media_type, media_file FROM waifu_cards WHERE id = ?",
-                (waifu_id,)
-            )
-            card = cursor.fetchone()
+            card = catalog.get(waifu_id)
             if not card:
                 await message.reply_text("❌ Card not found.")
                 return
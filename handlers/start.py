@@ -3,12 +3,13 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import Config, app
-from database import Database
+from database import get_db
+from broadcast import revive_chat
 from datetime import datetime
 import os
 import asyncio
 
-db = Database()
+db = get_db()
 
 # Paths for images
 LOG_IMAGE_PATH = "log.jpg"          # For user log
@@ -110,10 +111,11 @@ async def start_cmd(client, message):
     first_name = user.first_name if user.first_name else "Unknown"
 
     # Save user in DB
-    db.add_user(user_id, username, first_name)
+    await db.add_user(user_id, username, first_name)
+    await revive_chat(user_id)  # blocked us earlier? announcements reach them again
 
     # --------- One-time User Log (only in DM) ---------
-    if message.chat.type == "private" and not db.is_first_logged(user_id):
+    if message.chat.type == "private" and not await db.is_first_logged(user_id):
         now = datetime.now()
         date_str = now.strftime("%d/%m/%Y")
         time_str = now.strftime("%H:%M:%S")
@@ -141,7 +143,7 @@ async def start_cmd(client, message):
                     chat_id=Config.SUPPORT_CHAT_ID,
                     text=caption
                 )
-            db.set_first_logged(user_id)
+            await db.set_first_logged(user_id)
         except Exception as e:
             print(f"❌ Failed to send user log: {e}")
 
@@ -195,6 +197,7 @@ async def bot_added_to_group(client, event):
             # Bot was added to a group
             chat = event.chat
             db.add_group(chat.id, chat.title)
+            await revive_chat(chat.id)
 
             now = datetime.now()
             date_str = now.strftime("%d/%m/%Y")
@@ -2,9 +2,9 @@
 
 from pyrogram import filters
 from config import app, Config
-from database import Database
+from database import get_db
 
-db = Database()
+db = get_db()
 
 @app.on_message(filters.command("stats"))
 async def stats_cmd(client, message):
@@ -17,11 +17,10 @@ async def stats_cmd(client, message):
 
     # ----------------- Fetch Stats -----------------
     # Total users
-    db.cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = db.cursor.fetchone()[0]
+    total_users = await db.fetchval("SELECT COUNT(*) FROM users", default=0)
 
     # Total groups
-    total_groups = db.get_total_groups()
+    total_groups = await db.get_total_groups()
 
     # ----------------- Prepare & Send Message -----------------
     stats_text = f"""
@@ -2,53 +2,17 @@
 from pyrogram import filters
 from pyrogram.types import Message
 from config import app, Config
-from database import Database
-import sqlite3
+from database import get_db, connect
 import time
 import asyncio
 
-db = Database()
+db = get_db()
 DB_PATH = getattr(Config, "DB_PATH", "waifu_bot.db")
 
 # In-memory cache of admin user IDs (keeps permissions instant)
 BOT_ADMINS_CACHE = set()
 
 # ---------------- DB helpers ----------------
-def ensure_table():
-    try:
-        cur = db.cursor
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS bot_admins (
-                user_id INTEGER PRIMARY KEY,
-                added_by INTEGER,
-                added_at INTEGER
-            )
-            """
-        )
-        db.conn.commit()
-        return True
-    except Exception:
-        try:
-            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-            cur = conn.cursor()
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS bot_admins (
-                    user_id INTEGER PRIMARY KEY,
-                    added_by INTEGER,
-                    added_at INTEGER
-                )
-                """
-            )
-            conn.commit()
-            conn.close()
-            return True
-        except Exception:
-            return False
-
-ensure_table()
-
 def load_admins():
     """Load admin IDs from DB into BOT_ADMINS_CACHE (safe to call at runtime)."""
     try:
@@ -57,7 +21,7 @@ def load_admins():
         ids = [r[0] for r in cur.fetchall()]
     except Exception:
         try:
-            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            conn = connect(DB_PATH, check_same_thread=False)
             c = conn.cursor()
             c.execute("SELECT user_id FROM bot_admins")
             ids = [r[0] for r in c.fetchall()]
@@ -71,95 +35,39 @@ def load_admins():
 # initial load on module import
 load_admins()
 
-def add_admin_db(user_id: int, added_by: int) -> bool:
+async def add_admin_db(user_id: int, added_by: int) -> bool:
     """Insert to DB and refresh cache. Returns True if inserted, False if already existed / failed."""
     try:
-        cur = db.cursor
-        cur.execute("SELECT 1 FROM bot_admins WHERE user_id = ?", (user_id,))
-        if cur.fetchone():
-            return False
-        now = int(time.time())
-        cur.execute("INSERT INTO bot_admins (user_id, added_by, added_at) VALUES (?, ?, ?)", (user_id, added_by, now))
-        db.conn.commit()
-        # refresh cache
-        load_admins()
-        return True
+        cur = await db.execute("INSERT OR IGNORE INTO bot_admins (user_id, added_by, added_at) VALUES (?, ?, ?)",
+                               (user_id, added_by, int(time.time())))
     except Exception:
-        try:
-            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-            c = conn.cursor()
-            c.execute("SELECT 1 FROM bot_admins WHERE user_id = ?", (user_id,))
-            if c.fetchone():
-                conn.close()
-                return False
-            now = int(time.time())
-            c.execute("INSERT INTO bot_admins (user_id, added_by, added_at) VALUES (?, ?, ?)", (user_id, added_by, now))
-            conn.commit()
-            conn.close()
-            load_admins()
-            return True
-        except Exception:
-            return False
+        return False
+    if not cur.rowcount:
+        return False
+    BOT_ADMINS_CACHE.add(int(user_id))
+    return True
 
-def remove_admin_db(user_id: int) -> bool:
+async def remove_admin_db(user_id: int) -> bool:
     """Delete from DB and refresh cache. Returns True if deleted, False if not present or failed."""
     try:
-        cur = db.cursor
-        cur.execute("SELECT 1 FROM bot_admins WHERE user_id = ?", (user_id,))
-        if not cur.fetchone():
-            return False
-        cur.execute("DELETE FROM bot_admins WHERE user_id = ?", (user_id,))
-        db.conn.commit()
-        load_admins()
-        return True
+        cur = await db.execute("DELETE FROM bot_admins WHERE user_id = ?", (user_id,))
     except Exception:
-        try:
-            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-            c = conn.cursor()
-            c.execute("SELECT 1 FROM bot_admins WHERE user_id = ?", (user_id,))
-            if not c.fetchone():
-                conn.close()
-                return False
-            c.execute("DELETE FROM bot_admins WHERE user_id = ?", (user_id,))
-            conn.commit()
-            conn.close()
-            load_admins()
-            return True
-        except Exception:
-            return False
+        return False
+    BOT_ADMINS_CACHE.discard(int(user_id))
+    return cur.rowcount > 0
 
-def list_admins_db():
+async def list_admins_db():
     try:
-        cur = db.cursor
-        cur.execute("SELECT user_id, added_by, added_at FROM bot_admins ORDER BY added_at ASC")
-        return cur.fetchall()
+        return await db.fetchall("SELECT user_id, added_by, added_at FROM bot_admins ORDER BY added_at ASC")
     except Exception:
-        try:
-            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-            c = conn.cursor()
-            c.execute("SELECT user_id, added_by, added_at FROM bot_admins ORDER BY added_at ASC")
-            rows = c.fetchall()
-            conn.close()
-            return rows
-        except Exception:
-            return []
+        return []
 
-def is_bot_admin_db(user_id: int) -> bool:
+async def is_bot_admin_db(user_id: int) -> bool:
     """DB lookup fallback — kept for completeness."""
     try:
-        cur = db.cursor
-        cur.execute("SELECT 1 FROM bot_admins WHERE user_id = ?", (user_id,))
-        return bool(cur.fetchone())
+        return await db.fetchone("SELECT 1 FROM bot_admins WHERE user_id = ?", (user_id,)) is not None
     except Exception:
-        try:
-            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-            c = conn.cursor()
-            c.execute("SELECT 1 FROM bot_admins WHERE user_id = ?", (user_id,))
-            found = bool(c.fetchone())
-            conn.close()
-            return found
-        except Exception:
-            return False
+        return False
 
 # ---------------- owner detection ----------------
 def get_owner_id_from_config():
@@ -244,11 +152,8 @@ async def try_demote_in_chat(client, chat_id, target_user_id: int) -> (bool, str
 # ---------------- Public helper used by other modules ----------------
 def is_bot_admin(user_id: int) -> bool:
     """Fast cache-based check other modules should call at runtime."""
-    # first check in-memory cache
-    if int(user_id) in BOT_ADMINS_CACHE:
-        return True
-    # fallback to DB (in case cache is out of sync)
-    return is_bot_admin_db(user_id)
+    # /sudo and /sack keep the cache in step with the table; reload_admins() re-reads it
+    return int(user_id) in BOT_ADMINS_CACHE
 
 def reload_admins():
     """Force reload cache from DB (callable from other modules if needed)."""
@@ -277,7 +182,7 @@ async def cmd_sudo(client, message: Message):
         await message.reply_text("Usage: reply to a user's message with /sudo or use: /sudo <user_id>")
         return
 
-    added = add_admin_db(target_user_id, sender.id)
+    added = await add_admin_db(target_user_id, sender.id)
     if not added:
         await message.reply_text(f"⚠️ User {target_user_id} is already a bot admin (or DB insert failed).")
         return
@@ -319,7 +224,7 @@ async def cmd_sack(client, message: Message):
         await message.reply_text("Usage: reply to a user's message with /sack or use: /sack <user_id>")
         return
 
-    existed = remove_admin_db(target_user_id)
+    existed = await remove_admin_db(target_user_id)
     if not existed:
         await message.reply_text(f"⚠️ User {target_user_id} is not a bot admin.")
         return
@@ -341,7 +246,7 @@ async def cmd_sack(client, message: Message):
 # ---------------- /listadmin (show admins) ----------------
 @app.on_message(filters.command("listadmin"))
 async def cmd_listadmin(client, message: Message):
-    rows = list_admins_db()
+    rows = await list_admins_db()
 
     lines = []
     ids = [r[0] for r in rows]
@@ -3,10 +3,11 @@
 from pyrogram import filters
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from config import app, Config
-import sqlite3
-import re
+from database import get_db
+from router import get_router, digits
 
-DB_PATH = "waifu_bot.db"
+db = get_db()
+router = get_router()
 
 # Ownership column candidates (check these names in table schemas)
 OWNERSHIP_COLS = [
@@ -20,12 +21,6 @@ ITEM_COL_HINTS = [
 # Tables we should never touch for transfer
 EXCLUDE_TABLES = {"users", "user_claims", "waifu_cards", "sqlite_sequence"}
 
-# Build a DB connection helper
-def get_db_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    return conn
-
-
 def detect_candidate_tables(conn):
     """
     Detect tables that look like they hold per-user collections.
@@ -78,6 +73,37 @@ def detect_candidate_tables(conn):
     return candidates
 
 
+def _count_rows(conn, from_uid):
+    """Candidate tables and how many rows from_uid owns in each"""
+    candidates = detect_candidate_tables(conn)
+    counts = []
+    for c in candidates:
+        try:
+            counts.append(conn.execute(f"SELECT COUNT(*) FROM '{c['table']}' WHERE {c['owner_col']} = ?", (from_uid,)).fetchone()[0])
+        except Exception:
+            counts.append(0)
+    return candidates, counts
+
+
+def _move_rows(conn, from_uid, to_uid):
+    """Re-own every candidate row; returns [(table, owner_col, rows moved or error)]"""
+    moved_summary = []
+    for c in detect_candidate_tables(conn):
+        t = c["table"]
+        owner_col = c["owner_col"]
+        try:
+            # count first
+            cnt_before = conn.execute(f"SELECT COUNT(*) FROM '{t}' WHERE {owner_col} = ?", (from_uid,)).fetchone()[0]
+
+            if cnt_before > 0:
+                conn.execute(f"UPDATE '{t}' SET {owner_col} = ? WHERE {owner_col} = ?", (to_uid, from_uid))
+                moved_summary.append((t, owner_col, cnt_before))
+        except Exception as e:
+            # skip problematic table but collect info
+            moved_summary.append((t, owner_col, f"error: {e}"))
+    return moved_summary
+
+
 # helper to get owner id from config in a few possible attribute names
 def get_owner_id_from_config():
     for name in ("OWNER_ID", "OWNER", "OWNER_USER_ID", "OWNERID"):
@@ -131,40 +157,30 @@ async def transfer_command(client, message):
         await message.reply_text("❌ Source and destination IDs are the same. Nothing to do.")
         return
 
-    # open DB and detect candidate tables
-    conn = get_db_conn()
-    cur = conn.cursor()
-
-    candidates = detect_candidate_tables(conn)
+    # detect candidate tables and count the source user's rows
+    candidates, counts = await db.read(_count_rows, from_uid)
 
     if not candidates:
         # give a helpful list of tables (so owner can tell which is correct)
-        tbls = [r[0] for r in cur.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()]
+        tbls = [r[0] for r in await db.fetchall("SELECT name FROM sqlite_master WHERE type='table'")]
         await message.reply_text(
             "❌ Could not detect any collection tables automatically.\n"
             "Detected DB tables: \n" + ", ".join(tbls) + "\n\n"
             "If your collection table has a different name or schema, tell me the table name and column that stores the owner (e.g. user_id) and I can adjust the script."
         )
-        conn.close()
         return
 
     # Prepare a summary (counts per candidate)
     summary_lines = []
     total_rows = 0
-    for c in candidates:
+    for c, cnt in zip(candidates, counts):
         t = c["table"]
         owner_col = c["owner_col"]
-        try:
-            cur.execute(f"SELECT COUNT(*) FROM '{t}' WHERE {owner_col} = ?", (from_uid,))
-            cnt = cur.fetchone()[0]
-        except Exception:
-            cnt = 0
         summary_lines.append(f"• {t}: {cnt} rows (owner column: {owner_col})")
         total_rows += cnt
 
     if total_rows == 0:
         await message.reply_text(f"⚠️ No collection rows found for user {from_uid} in detected tables. Nothing to transfer.")
-        conn.close()
         return
 
     # ask for confirmation
@@ -184,19 +200,10 @@ async def transfer_command(client, message):
         reply_markup=buttons
     )
 
-    conn.close()
-
 
 # ---------------- Callback handlers ----------------
-@app.on_callback_query(filters.regex(r"^transfer_cancel:(\d+):(\d+)$"))
-async def transfer_cancel_cb(client, callback: CallbackQuery):
-    data = callback.data or ""
-    m = re.match(r"^transfer_cancel:(\d+):(\d+)$", data)
-    if not m:
-        await callback.answer("Invalid data.")
-        return
-    from_uid = int(m.group(1))
-    to_uid = int(m.group(2))
+@router.route("transfer_cancel", digits, digits)
+async def transfer_cancel_cb(client, callback: CallbackQuery, from_uid, to_uid):
 
     owner_id = get_owner_id_from_config()
     if callback.from_user.id != owner_id:
@@ -210,49 +217,19 @@ async def transfer_cancel_cb(client, callback: CallbackQuery):
     await callback.answer("Cancelled.")
 
 
-@app.on_callback_query(filters.regex(r"^transfer_confirm:(\d+):(\d+)$"))
-async def transfer_confirm_cb(client, callback: CallbackQuery):
-    data = callback.data or ""
-    m = re.match(r"^transfer_confirm:(\d+):(\d+)$", data)
-    if not m:
-        await callback.answer("Invalid data.")
-        return
-    from_uid = int(m.group(1))
-    to_uid = int(m.group(2))
+@router.route("transfer_confirm", digits, digits)
+async def transfer_confirm_cb(client, callback: CallbackQuery, from_uid, to_uid):
 
     owner_id = get_owner_id_from_config()
     if callback.from_user.id != owner_id:
         await callback.answer("Only owner can confirm.", show_alert=True)
         return
 
-    conn = get_db_conn()
-    cur = conn.cursor()
-
-    candidates = detect_candidate_tables(conn)
-
-    # perform updates inside a transaction
-    moved_summary = []
+    # perform updates inside one write job (one transaction)
     try:
-        for c in candidates:
-            t = c["table"]
-            owner_col = c["owner_col"]
-            try:
-                # count first
-                cur.execute(f"SELECT COUNT(*) FROM '{t}' WHERE {owner_col} = ?", (from_uid,))
-                cnt_before = cur.fetchone()[0]
-
-                if cnt_before > 0:
-                    cur.execute(f"UPDATE '{t}' SET {owner_col} = ? WHERE {owner_col} = ?", (to_uid, from_uid))
-                    moved_summary.append((t, owner_col, cnt_before))
-            except Exception as e:
-                # skip problematic table but collect info
-                moved_summary.append((t, owner_col, f"error: {e}"))
-
-        conn.commit()
+        moved_summary = await db.run(_move_rows, from_uid, to_uid)
     except Exception as e:
-        conn.rollback()
         await callback.message.edit_text(f"❌ Transfer failed: {e}")
-        conn.close()
         await callback.answer("Transfer failed.", show_alert=True)
         return
 
@@ -266,5 +243,4 @@ async def transfer_confirm_cb(client, callback: CallbackQuery):
     except Exception:
         pass
 
-    conn.close()
     await callback.answer("Transfer completed.")
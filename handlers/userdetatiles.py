@@ -19,7 +19,7 @@ Notes / privacy:
  - This file *only* adds the contact-storage handler and the owner /details command.
 """
 
-import sqlite3
+from database import get_db
 import io
 from datetime import datetime
 
@@ -27,21 +27,7 @@ from pyrogram import filters
 from pyrogram.types import Message, Contact
 from config import app, Config
 
-DB_PATH = "waifu_bot.db"
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
-
-# Ensure contacts table exists (stores contacts users explicitly shared with bot)
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS user_contacts (
-    user_id INTEGER PRIMARY KEY,
-    phone TEXT,
-    name TEXT,
-    saved_by INTEGER,         -- id of who sent the contact (useful if admin submitted)
-    saved_at TEXT
-)
-""")
-conn.commit()
+db = get_db()
 
 
 # ------------------ Helper: save contact when a user shares contact in private ------------------
@@ -64,11 +50,10 @@ async def store_shared_contact(client, message: Message):
 
         if target_id:
             # store by explicit user id
-            cursor.execute("""
+            await db.execute("""
                 INSERT OR REPLACE INTO user_contacts (user_id, phone, name, saved_by, saved_at)
                 VALUES (?, ?, ?, ?, ?)
             """, (int(target_id), phone, name, saved_by, saved_at))
-            conn.commit()
             await message.reply_text("✅ Contact saved. Owner can view this via /details.")
         else:
             # No linked Telegram user id — we still store a placeholder using negative row id (timestamp)
@@ -131,8 +116,7 @@ async def details_handler(client, message: Message):
     phone = None
     contact_name = None
     try:
-        cursor.execute("SELECT phone, name FROM user_contacts WHERE user_id = ?", (target_id,))
-        r = cursor.fetchone()
+        r = await db.fetchone("SELECT phone, name FROM user_contacts WHERE user_id = ?", (target_id,))
         if r:
             phone, contact_name = r[0], r[1]
     except Exception:
@@ -0,0 +1,132 @@
+# inventory_view.py
+"""
+Snapshots behind the /inventory browser.
+
+The first page of a session runs one query for the user's sorted,
+filtered (waifu_id, amount) list; every ⬅️/➡️ after that is an index into
+that snapshot, so paging costs the same for 10 cards or 50,000. Card
+details come from the in-memory catalog.
+
+Snapshots sit in a small LRU keyed by (user, rarity filter, version).
+Any committed inventory change for a user bumps their version (database
+change hooks fire after the writer commits), so the old snapshot is
+never served again and simply ages out; catalog edits drop everything.
+The user's filter and favorite are cached next to it; writers of
+user_settings / user_fav call forget_prefs().
+"""
+
+import threading
+from array import array
+from collections import OrderedDict, namedtuple
+from config import Config
+from database import get_db, on_inventory_change
+from catalog import get_catalog
+
+Prefs = namedtuple("Prefs", "rarity anime fav")
+
+_SNAPSHOT_SQL = """
+    SELECT uw.waifu_id, uw.amount
+      FROM user_waifus uw JOIN waifu_cards wc ON wc.id = uw.waifu_id
+     WHERE uw.user_id = ? {filter}
+     ORDER BY wc.rarity DESC, wc.id ASC
+"""
+
+
+class InventoryView:
+    """One user's sorted card list; page i is ids[i]"""
+
+    __slots__ = ("ids", "amounts")
+
+    def __init__(self, rows):
+        self.ids = array("q", (r[0] for r in rows))
+        self.amounts = array("q", (r[1] or 0 for r in rows))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def page(self, index):
+        """(Card, amount) at index, wrapping around both ends"""
+        index %= len(self.ids)
+        return get_catalog().get(self.ids[index]), self.amounts[index]
+
+
+class InventoryViews:
+    def __init__(self, db=None, max_entries=None):
+        self._db = db
+        self.max_entries = max_entries or Config.INVENTORY_VIEW_ENTRIES
+        self._views = OrderedDict()  # (user_id, rarity, version) -> InventoryView
+        self._prefs = OrderedDict()  # user_id -> Prefs
+        self._versions = {}          # user_id -> bumped on every inventory change
+        on_inventory_change(self._on_inventory)
+        get_catalog().subscribe(self._on_catalog)
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    # ---------------- Invalidation ----------------
+    def _on_inventory(self, user_id, delta):
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def _on_catalog(self, event, card):
+        self._views.clear()
+
+    def forget_prefs(self, user_id):
+        """Call after writing user_settings or user_fav for this user"""
+        self._prefs.pop(user_id, None)
+
+    def _remember(self, lru, key, value):
+        lru[key] = value
+        lru.move_to_end(key)
+        while len(lru) > self.max_entries:
+            lru.popitem(last=False)
+
+    # ---------------- Lookups ----------------
+    async def prefs(self, user_id):
+        """Filter settings + favorite id, loaded once per session"""
+        prefs = self._prefs.get(user_id)
+        if prefs is not None:
+            self._prefs.move_to_end(user_id)
+            return prefs
+
+        def load(conn):
+            settings = conn.execute(
+                "SELECT rarity_filter, anime_filter FROM user_settings WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            fav = conn.execute("SELECT waifu_id FROM user_fav WHERE user_id = ?", (user_id,)).fetchone()
+            return Prefs(*(settings or (None, None)), fav[0] if fav else None)
+
+        prefs = await self.db.read(load)
+        self._remember(self._prefs, user_id, prefs)
+        return prefs
+
+    async def view(self, user_id, rarity=None):
+        """The user's InventoryView for this filter, built on a miss"""
+        key = (user_id, rarity, self._versions.get(user_id, 0))
+        view = self._views.get(key)
+        if view is not None:
+            self._views.move_to_end(key)
+            return view
+
+        sql = _SNAPSHOT_SQL.format(filter="AND wc.rarity = ?" if rarity else "")
+        params = (user_id, rarity) if rarity else (user_id,)
+        view = InventoryView(await self.db.fetchall(sql, params))
+        # a change committed while we were reading may or may not be in these
+        # rows; serve them this once but don't cache them
+        if self._versions.get(user_id, 0) == key[2]:
+            self._remember(self._views, key, view)
+        return view
+
+
+# ---------------- Shared Instance ----------------
+_views = None
+_views_lock = threading.Lock()
+
+
+def get_inventory_views():
+    """Return the process-wide InventoryViews"""
+    global _views
+    with _views_lock:
+        if _views is None:
+            _views = InventoryViews()
+        return _views
@@ -0,0 +1,203 @@
+# jobs.py
+"""
+Persistent scheduled jobs: "run this at that time", surviving restarts.
+
+A module registers what a kind of job does and schedules jobs of it:
+
+    jobs = get_jobs()
+
+    @jobs.task("clan_war_end")
+    async def clan_war_end_job(client, key, payload): ...
+
+    await jobs.schedule("clan_war_end", war_id, end.timestamp())
+
+Jobs are rows in `jobs` (migration 10), one per (kind, key); scheduling
+the same kind + key again moves the pending job instead of adding one.
+A single task sleeps until the earliest run_at (an indexed MIN), runs
+what is due and sleeps again; a job scheduled earlier than that wakes
+it. A row is deleted only after its task returned, so a job interrupted
+by a crash or restart runs again: at-least-once, and tasks are written
+to be idempotent (they re-check the state they act on). A task that
+raises is retried after JOB_RETRY_SECONDS, doubling each time; after
+JOB_MAX_ATTEMPTS it is kept as "dead" for /jobs.
+
+Handler modules may be imported lazily (startup.py), so each row also
+records the module that registered its kind and the runner imports it
+when a job comes due before anyone used the module.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from config import Config, app
+from database import get_db
+from startup import get_startup
+
+BATCH = 50  # due jobs fetched per round
+MAX_RETRY_SECONDS = 3600
+
+
+class JobScheduler:
+    def __init__(self, db=None, client=None):
+        self._db = db
+        self._client = client
+        self._tasks = {}     # kind -> async fn(client, key, payload)
+        self._modules = {}   # kind -> module that registered it
+        self._next_at = None  # run_at the loop is sleeping towards
+        self._wake = asyncio.Event()
+        self._task = None
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    @property
+    def client(self):
+        return self._client or app
+
+    # ---------------- Registering ----------------
+    def task(self, kind):
+        """Decorator: fn(client, key, payload) runs each due job of this kind"""
+        def register(fn):
+            self._tasks[kind] = fn
+            self._modules[kind] = fn.__module__
+            return fn
+        return register
+
+    async def schedule(self, kind, key, run_at, payload=None):
+        """Run job kind/key at run_at (unix time); replaces a pending one with the same kind + key"""
+        if kind not in self._tasks:
+            raise KeyError(f"no task registered for job kind {kind!r}")
+        await self.db.execute("""
+            INSERT INTO jobs (kind, key, module, run_at, payload, created_at)
+            VALUES (?, ?, ?, ?, ?, strftime('%s','now'))
+            ON CONFLICT(kind, key) DO UPDATE
+               SET run_at = excluded.run_at, payload = excluded.payload, module = excluded.module,
+                   status = 'pending', attempts = 0, last_error = NULL
+        """, (kind, str(key), self._modules[kind], float(run_at), json.dumps(payload)))
+        if self._next_at is None or run_at < self._next_at:
+            self._wake.set()
+
+    async def cancel(self, kind, key):
+        await self.db.execute("DELETE FROM jobs WHERE kind = ? AND key = ?", (kind, str(key)))
+
+    async def retry(self, job_id):
+        """Put a dead job back in the queue, due now; False if there is no such dead job"""
+        cur = await self.db.execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, run_at = ? WHERE id = ? AND status = 'dead'",
+            (time.time(), job_id)
+        )
+        self._wake.set()
+        return cur.rowcount > 0
+
+    # ---------------- Running ----------------
+    def _resolve(self, kind, module):
+        fn = self._tasks.get(kind)
+        if fn is None and module:
+            get_startup().load(module)  # registers its tasks on import
+            fn = self._tasks.get(kind)
+        return fn
+
+    async def _run(self, job_id, kind, key, module, run_at, payload, attempts):
+        try:
+            fn = self._resolve(kind, module)
+            if fn is None:
+                raise LookupError(f"no task registered for job kind {kind!r}")
+            await fn(self.client, key, json.loads(payload) if payload else None)
+        except Exception as e:
+            attempts += 1
+            if attempts >= Config.JOB_MAX_ATTEMPTS:
+                status, retry_at = "dead", run_at
+                print(f"❌ Job #{job_id} {kind}:{key} gave up after {attempts} attempts: {e}")
+            else:
+                status = "pending"
+                retry_at = time.time() + min(Config.JOB_RETRY_SECONDS * 2 ** (attempts - 1), MAX_RETRY_SECONDS)
+            # run_at in the WHERE: if the job was rescheduled meanwhile, the new schedule wins
+            await self.db.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, run_at = ?, last_error = ? WHERE id = ? AND run_at = ?",
+                (status, attempts, retry_at, f"{type(e).__name__}: {e}"[:500], job_id, run_at)
+            )
+            return
+        await self.db.execute("DELETE FROM jobs WHERE id = ? AND run_at = ?", (job_id, run_at))
+
+    async def run_due(self):
+        """Run every job that is due now; returns how many ran"""
+        ran = 0
+        while True:
+            rows = await self.db.fetchall("""
+                SELECT id, kind, key, module, run_at, payload, attempts FROM jobs
+                 WHERE status = 'pending' AND run_at <= ? ORDER BY run_at LIMIT ?
+            """, (time.time(), BATCH))
+            for row in rows:
+                await self._run(*row)
+            ran += len(rows)
+            if len(rows) < BATCH:
+                return ran
+
+    async def _loop(self):
+        while True:
+            self._wake.clear()
+            try:
+                await self.run_due()
+                self._next_at = await self.db.fetchval(
+                    "SELECT MIN(run_at) FROM jobs WHERE status = 'pending'"
+                )
+            except Exception as e:
+                print(f"❌ Job runner failed: {e}")
+                self._next_at = time.time() + Config.JOB_RETRY_SECONDS
+            delay = None if self._next_at is None else self._next_at - time.time()
+            if delay is not None and delay <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        pending = await self.db.fetchval("SELECT COUNT(*) FROM jobs WHERE status = 'pending'", default=0)
+        print(f"⏰ Job scheduler: {pending} pending jobs")
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------------- Admin ----------------
+    async def pending(self, limit=20):
+        """[(id, kind, key, run_at, attempts, last_error)] soonest first"""
+        return await self.db.fetchall("""
+            SELECT id, kind, key, run_at, attempts, last_error FROM jobs
+             WHERE status = 'pending' ORDER BY run_at LIMIT ?
+        """, (limit,))
+
+    async def dead(self, limit=10):
+        return await self.db.fetchall("""
+            SELECT id, kind, key, run_at, attempts, last_error FROM jobs
+             WHERE status = 'dead' ORDER BY run_at DESC LIMIT ?
+        """, (limit,))
+
+    async def counts(self):
+        """{(kind, status): jobs}"""
+        rows = await self.db.fetchall("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status")
+        return {(kind, status): n for kind, status, n in rows}
+
+
+# ---------------- Shared Instance ----------------
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def get_jobs():
+    """Return the process-wide JobScheduler"""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = JobScheduler()
+        return _jobs
@@ -0,0 +1,254 @@
+# leaderboard.py
+"""
+In-memory leaderboards for /top, /ctop, /clantop, /luckyrank and the
+profile's global position.
+
+Each Board keeps its entries in one sorted list, so a top-N page is a
+slice and "rank of user X" is a bisect (O(log n)). Totals are updated
+incrementally from the inventory / crystal write paths through the hooks
+in database.py. Writers that bypass those hooks are caught by rebuild(),
+which recomputes everything from SQL every LEADERBOARD_REBUILD_SECONDS
+and reports how many entries had drifted.
+"""
+
+import asyncio
+import math
+import threading
+from bisect import bisect_left, insort
+from config import Config
+from database import get_db, on_inventory_change, on_crystals_change
+
+
+# ---------------- Board ----------------
+def _neg(score):
+    if isinstance(score, tuple):
+        return tuple(-s for s in score)
+    return -score
+
+
+class Board:
+    """Scores ordered high -> low; ties share a rank"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scores = {}  # key -> score
+        self._order = []   # sorted (neg(score), key)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def load(self, pairs):
+        """Replace everything with (key, score) pairs in one sort"""
+        scores = dict(pairs)
+        order = sorted((_neg(s), k) for k, s in scores.items())
+        with self._lock:
+            self._scores, self._order = scores, order
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._scores)
+
+    def _set(self, key, score):
+        old = self._scores.get(key)
+        if old == score:
+            return
+        if old is not None:
+            del self._order[bisect_left(self._order, (_neg(old), key))]
+        self._scores[key] = score
+        insort(self._order, (_neg(score), key))
+
+    def _remove(self, key):
+        old = self._scores.pop(key, None)
+        if old is not None:
+            del self._order[bisect_left(self._order, (_neg(old), key))]
+
+    def set(self, key, score):
+        with self._lock:
+            self._set(key, score)
+
+    def add(self, key, delta):
+        """Numeric boards only; entries that drop to 0 leave the board"""
+        with self._lock:
+            score = self._scores.get(key, 0) + delta
+            if score:
+                self._set(key, score)
+            else:
+                self._remove(key)
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def score(self, key, default=0):
+        return self._scores.get(key, default)
+
+    def rank(self, key):
+        """1-based position (users with the same score share it); None if absent"""
+        with self._lock:
+            score = self._scores.get(key)
+            if score is None:
+                return None
+            return bisect_left(self._order, (_neg(score),)) + 1
+
+    def top(self, limit, offset=0):
+        with self._lock:
+            page = self._order[offset:offset + limit]
+        return [(key, _neg(neg)) for neg, key in page]
+
+
+# ---------------- Luck Score ----------------
+def luck_score(user_id, total_waifus, progress):
+    """1-100 luck score used by /luckyrank"""
+    if getattr(Config, "OWNER_ID", None) and int(user_id) == int(getattr(Config, "OWNER_ID")):
+        return 100
+    owner_ids = getattr(Config, "OWNER_IDS", []) or []
+    if owner_ids and int(user_id) in [int(x) for x in owner_ids]:
+        return 100
+    part_a = min(50.0, float(total_waifus) / 30.0)
+    part_b = min(50.0, float(progress) * 0.5)
+    score = int(min(100, math.floor(part_a + part_b)))
+    return max(1, score)
+
+
+# ---------------- Leaderboards ----------------
+class Leaderboards:
+    def __init__(self, db=None):
+        self._db = db
+        self.collectors = Board()  # user_id -> cards owned
+        self.crystals = Board()    # user_id -> crystal balance
+        self.luck = Board()        # user_id -> (luck score, cards owned)
+        self.clans = Board()       # clans.id -> points
+        self._progress = {}        # user_id -> user_profiles.progress
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._task = None
+        on_inventory_change(self._on_inventory)
+        on_crystals_change(self._on_crystals)
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    # ---------------- Incremental Updates ----------------
+    def _on_inventory(self, user_id, delta):
+        if not self._loaded:
+            return
+        self.collectors.add(user_id, delta)
+        total = self.collectors.score(user_id)
+        self.luck.set(user_id, (luck_score(user_id, total, self._progress.get(user_id, 0)), total))
+
+    def _on_crystals(self, user_id, delta):
+        if self._loaded:
+            self.crystals.add(user_id, delta)
+
+    def set_clan(self, clan_id, points):
+        if self._loaded:
+            self.clans.set(clan_id, points)
+
+    def add_clan_points(self, clan_id, delta):
+        if self._loaded:
+            # set(), not add(): a clan on 0 points still belongs on /clantop
+            self.clans.set(clan_id, self.clans.score(clan_id) + delta)
+
+    def remove_clan(self, clan_id):
+        self.clans.remove(clan_id)
+
+    # ---------------- Rebuild ----------------
+    @staticmethod
+    def _read_all(conn):
+        totals = conn.execute(
+            "SELECT user_id, SUM(amount) FROM user_waifus GROUP BY user_id HAVING SUM(amount) > 0"
+        ).fetchall()
+        crystals = conn.execute("SELECT user_id, balance FROM crystal_balances").fetchall()
+        progress = conn.execute("""
+            SELECT u.user_id, COALESCE(p.progress, 0)
+              FROM users u LEFT JOIN user_profiles p ON p.user_id = u.user_id
+        """).fetchall()
+        clans = conn.execute("SELECT id, COALESCE(points, 0) FROM clans").fetchall()
+        return totals, crystals, progress, clans
+
+    async def rebuild(self):
+        """Recompute every board from SQL; returns how many entries had drifted"""
+        totals, crystals, progress, clans = await self.db.read(self._read_all)
+
+        totals = {uid: int(total) for uid, total in totals}
+        progress = {uid: int(p or 0) for uid, p in progress}
+        luck = {}
+        for uid in set(progress) | set(totals):
+            total = totals.get(uid, 0)
+            luck[uid] = (luck_score(uid, total, progress.get(uid, 0)), total)
+        fresh = {
+            self.collectors: totals,
+            self.crystals: {uid: int(bal) for uid, bal in crystals if bal},
+            self.luck: luck,
+            self.clans: dict(clans),
+        }
+
+        drift = 0
+        if self._loaded:
+            for board, scores in fresh.items():
+                old = board.snapshot()
+                drift += sum(1 for k in old.keys() | scores.keys() if old.get(k) != scores.get(k))
+        for board, scores in fresh.items():
+            board.load(scores.items())
+        self._progress = progress
+        self._loaded = True
+        return drift
+
+    async def ready(self):
+        """Make sure the boards are built before the first read"""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                await self.rebuild()
+                print(f"🏆 Leaderboards built: {len(self.collectors)} collectors, {len(self.clans)} clans")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(Config.LEADERBOARD_REBUILD_SECONDS)
+            try:
+                drift = await self.rebuild()
+                if drift:
+                    print(f"🏆 Leaderboard rebuild fixed {drift} drifted entries")
+            except Exception as e:
+                print(f"❌ Leaderboard rebuild failed: {e}")
+
+    async def start(self):
+        await self.ready()
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------------- Display Helpers ----------------
+    async def user_names(self, user_ids):
+        """{user_id: first_name} for one page of a board (point lookups only)"""
+        if not user_ids:
+            return {}
+        marks = ",".join("?" * len(user_ids))
+        rows = await self.db.fetchall(
+            f"SELECT user_id, first_name FROM users WHERE user_id IN ({marks})", tuple(user_ids)
+        )
+        return dict(rows)
+
+
+# ---------------- Shared Instance ----------------
+_boards = None
+_boards_lock = threading.Lock()
+
+
+def get_leaderboards():
+    """Return the process-wide Leaderboards"""
+    global _boards
+    with _boards_lock:
+        if _boards is None:
+            _boards = Leaderboards()
+        return _boards
@@ -0,0 +1,225 @@
+# ledger.py
+"""
+Crystal ledger: one cached balance per user (crystal_balances) plus an
+append-only log of every change (crystal_ledger).
+
+A credit is one upsert and a debit is one conditional UPDATE that only
+matches when the balance covers it, so "check then spend" can never race.
+Both return the new balance via RETURNING and append a ledger row in the
+same transaction: call the primitives inside db.run() jobs (or on
+db.conn followed by a commit) next to whatever else the job writes.
+
+credit_many() / debit_many() apply a whole batch (event payouts, CSV
+grants) with one executemany plus a few set-based statements.
+
+The ledger is the source of truth; reconcile() recomputes every balance
+from it and reports (and optionally repairs) cached balances that drifted.
+"""
+
+import threading
+from database import get_db, crystals_changed, stage_rows
+
+
+# ---------------- Primitives ----------------
+def _log(conn, user_id, delta, balance_after, reason, ref):
+    conn.execute("""
+        INSERT INTO crystal_ledger (user_id, delta, balance_after, reason, ref, created_at)
+        VALUES (?, ?, ?, ?, ?, strftime('%s','now'))
+    """, (user_id, delta, balance_after, reason, ref))
+
+
+def balance(conn, user_id):
+    row = conn.execute("SELECT balance FROM crystal_balances WHERE user_id=?", (user_id,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def credit(conn, user_id, amount, reason, ref=None):
+    """Add crystals; returns the new balance"""
+    amount = int(amount)
+    if amount < 0:
+        raise ValueError("credit amount must be >= 0")
+    if amount == 0:
+        return balance(conn, user_id)
+    new_balance = conn.execute("""
+        INSERT INTO crystal_balances (user_id, balance, updated_at)
+        VALUES (?, ?, strftime('%s','now'))
+        ON CONFLICT(user_id) DO UPDATE
+           SET balance = balance + excluded.balance,
+               updated_at = excluded.updated_at
+        RETURNING balance
+    """, (user_id, amount)).fetchall()[0][0]
+    _log(conn, user_id, amount, new_balance, reason, ref)
+    crystals_changed(user_id, amount)
+    return new_balance
+
+
+def debit(conn, user_id, amount, reason, ref=None):
+    """Take crystals only if the balance covers them; new balance, or None if short"""
+    amount = int(amount)
+    if amount < 0:
+        raise ValueError("debit amount must be >= 0")
+    if amount == 0:
+        return balance(conn, user_id)
+    rows = conn.execute("""
+        UPDATE crystal_balances
+           SET balance = balance - ?, updated_at = strftime('%s','now')
+         WHERE user_id = ? AND balance >= ?
+        RETURNING balance
+    """, (amount, user_id, amount)).fetchall()
+    if not rows:
+        return None
+    new_balance = rows[0][0]
+    _log(conn, user_id, -amount, new_balance, reason, ref)
+    crystals_changed(user_id, -amount)
+    return new_balance
+
+
+def transfer(conn, from_user, to_user, amount, reason, ref=None):
+    """debit + credit; nothing moves if the sender is short"""
+    if debit(conn, from_user, amount, reason, ref) is None:
+        return False
+    credit(conn, to_user, amount, reason, ref)
+    return True
+
+
+# ---------------- Bulk ----------------
+def _merge(rows):
+    merged = {}
+    for user_id, amount in rows:
+        merged[int(user_id)] = merged.get(int(user_id), 0) + int(amount)
+    return [(u, a) for u, a in merged.items() if a > 0]
+
+
+def _log_staged(conn, sign, reason, ref):
+    conn.execute("""
+        INSERT INTO crystal_ledger (user_id, delta, balance_after, reason, ref, created_at)
+        SELECT b.user_id, ? * b.amount, cb.balance, ?, ?, strftime('%s','now')
+          FROM bulk_crystals b JOIN crystal_balances cb ON cb.user_id = b.user_id
+    """, (sign, reason, ref))
+
+
+def credit_many(conn, grants, reason, ref=None):
+    """[(user_id, amount)] credited in one transaction; returns users credited"""
+    stage_rows(conn, "bulk_crystals", "user_id INTEGER PRIMARY KEY, amount INTEGER", _merge(grants))
+    conn.execute("""
+        INSERT INTO crystal_balances (user_id, balance, updated_at)
+        SELECT user_id, amount, strftime('%s','now') FROM bulk_crystals WHERE true
+        ON CONFLICT(user_id) DO UPDATE
+           SET balance = balance + excluded.balance,
+               updated_at = excluded.updated_at
+    """)
+    _log_staged(conn, 1, reason, ref)
+    rows = conn.execute("SELECT user_id, amount FROM bulk_crystals").fetchall()
+    for user_id, amount in rows:
+        crystals_changed(user_id, amount)
+    return len(rows)
+
+
+def debit_many(conn, revokes, reason, ref=None):
+    """Take up to amount from each user (never below 0); returns {user_id: taken}"""
+    stage_rows(conn, "bulk_crystals", "user_id INTEGER PRIMARY KEY, amount INTEGER", _merge(revokes))
+    conn.execute("""
+        UPDATE bulk_crystals SET amount = MIN(amount, COALESCE((
+            SELECT balance FROM crystal_balances cb WHERE cb.user_id = bulk_crystals.user_id), 0))
+    """)
+    conn.execute("DELETE FROM bulk_crystals WHERE amount <= 0")
+    conn.execute("""
+        UPDATE crystal_balances
+           SET balance = balance - (SELECT amount FROM bulk_crystals b WHERE b.user_id = crystal_balances.user_id),
+               updated_at = strftime('%s','now')
+         WHERE user_id IN (SELECT user_id FROM bulk_crystals)
+    """)
+    _log_staged(conn, -1, reason, ref)
+    taken = dict(conn.execute("SELECT user_id, amount FROM bulk_crystals").fetchall())
+    for user_id, amount in taken.items():
+        crystals_changed(user_id, -amount)
+    return taken
+
+
+# ---------------- Reconciliation ----------------
+def _drift(conn):
+    """[(user_id, cached, from_ledger)] where the cached balance disagrees with the log"""
+    return conn.execute("""
+        SELECT user_id, cached, logged FROM (
+            SELECT b.user_id, b.balance AS cached, COALESCE(l.total, 0) AS logged
+              FROM crystal_balances b
+              LEFT JOIN (SELECT user_id, SUM(delta) AS total FROM crystal_ledger GROUP BY user_id) l
+                ON l.user_id = b.user_id
+            UNION ALL
+            SELECT l.user_id, 0, l.total
+              FROM (SELECT user_id, SUM(delta) AS total FROM crystal_ledger GROUP BY user_id) l
+             WHERE l.user_id NOT IN (SELECT user_id FROM crystal_balances)
+        ) WHERE cached != logged
+    """).fetchall()
+
+
+def _reconcile(conn, fix):
+    drift = _drift(conn)
+    if fix:
+        for user_id, cached, logged in drift:
+            conn.execute("""
+                INSERT INTO crystal_balances (user_id, balance, updated_at)
+                VALUES (?, ?, strftime('%s','now'))
+                ON CONFLICT(user_id) DO UPDATE SET balance = excluded.balance, updated_at = excluded.updated_at
+            """, (user_id, logged))
+            crystals_changed(user_id, logged - cached)
+    return drift
+
+
+# ---------------- Ledger ----------------
+class Ledger:
+    """Awaitable wrappers: each call is one writer job (reads use the pool)"""
+
+    def __init__(self, db=None):
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db or get_db()
+
+    async def balance(self, user_id):
+        return int(await self.db.fetchval(
+            "SELECT balance FROM crystal_balances WHERE user_id=?", (user_id,), default=0
+        ))
+
+    async def credit(self, user_id, amount, reason, ref=None):
+        return await self.db.run(credit, user_id, amount, reason, ref)
+
+    async def debit(self, user_id, amount, reason, ref=None):
+        return await self.db.run(debit, user_id, amount, reason, ref)
+
+    async def transfer(self, from_user, to_user, amount, reason, ref=None):
+        return await self.db.run(transfer, from_user, to_user, amount, reason, ref)
+
+    async def credit_many(self, grants, reason, ref=None):
+        return await self.db.run(credit_many, list(grants), reason, ref)
+
+    async def debit_many(self, revokes, reason, ref=None):
+        return await self.db.run(debit_many, list(revokes), reason, ref)
+
+    async def history(self, user_id, limit=10):
+        """[(delta, balance_after, reason, created_at)] newest first"""
+        return await self.db.fetchall(
+            "SELECT delta, balance_after, reason, created_at FROM crystal_ledger "
+            "WHERE user_id = ? ORDER BY id DESC LIMIT ?", (user_id, limit)
+        )
+
+    async def reconcile(self, fix=False):
+        """Compare cached balances with the ledger; fix=True rewrites them from it"""
+        if fix:
+            return await self.db.run(_reconcile, True)
+        return await self.db.read(_drift)
+
+
+# ---------------- Shared Instance ----------------
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """Return the process-wide Ledger"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = Ledger()
+        return _ledger
@@ -1,38 +1,74 @@
 # main.py
-import importlib
-import os
-import asyncio
 from pyrogram import idle
 from pyrogram.types import BotCommand
 from config import app
-
-# Handlers load karne ka function
-def load_handlers():
-    handlers_dir = "handlers"
-    if not os.path.exists(handlers_dir):
-        print(f"❌ Error: '{handlers_dir}' folder nahi mila!")
-        return
-
-    for filename in os.listdir(handlers_dir):
-        if filename.endswith(".py") and filename != "__init__.py":
-            module_name = f"{handlers_dir}.{filename[:-3]}"
-            try:
-                importlib.import_module(module_name)
-                print(f"✅ Loaded: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to load {filename}: {e}")
+from database import get_db
+from migrations import migrate
+from catalog import get_catalog
+from sampler import get_sampler
+from name_index import get_name_index
+from drops import get_drop_engine
+from leaderboard import get_leaderboards
+from broadcast import get_broadcaster
+from auctions import get_auction_scheduler
+from jobs import get_jobs
+from cooldowns import get_cooldowns
+from startup import get_startup
+from perf import get_perf
+from ratelimit import get_rate_limiter
 
 async def start_bot():
+    perf = get_perf()  # handlers register hone se pehle, taaki sab timed hon
+    get_rate_limiter()  # group -1: spam updates kisi handler / DB tak pahunchne se pehle drop
+    startup = get_startup()
     print("-----------------------------------------")
     print("   🚀 Starting CricketBot... ")
     print("-----------------------------------------")
 
-    # 1. Handlers load karein
-    load_handlers()
+    # 0. DB schema migrations (handlers load hone se pehle, sirf ek baar)
+    with startup.phase("migrations"):
+        print(f"🗄️ DB schema version: {migrate()}")
+
+    # 1. Handlers load karein (sirf commands wale modules pehle use par import honge)
+    with startup.phase("handlers"):
+        startup.load_handlers()
+
+    # DB writer start karein (batched commits)
+    db = get_db()
+    await db.start_writer()
+    perf.start()  # event-loop lag + metrics snapshot
+
+    # Card catalog memory mein preload (random picks / id lookups bina DB ke)
+    with startup.phase("card catalog"):
+        await get_catalog().load()
+    with startup.phase("drop weights"):
+        await get_sampler().load_group_weights()  # per-group rarity overrides (/setdrop)
+    with startup.phase("name index"):
+        get_name_index().ensure_built()  # /collect guesses + /search typo matching
+
+    # Drop counters restore karein (restart ke baad bhi drops chalte rahein)
+    with startup.phase("drop counters"):
+        await get_drop_engine().start()
+
+    # Leaderboards memory mein build (top / rank bina aggregate query ke)
+    with startup.phase("leaderboards"):
+        await get_leaderboards().start()
+
+    # Chalu cooldowns memory mein (claim / daily / craft checks bina DB read ke)
+    with startup.phase("cooldowns"):
+        await get_cooldowns().load()
 
     # 2. Bot Start karein
-    await app.start()
+    with startup.phase("telegram connect"):
+        await app.start()
+    startup.mark("bot connected")
     print("✅ Bot Connected to Telegram!")
+    print(startup.report())
+
+    # Auction timers start karein (band bot ke dauraan expire hue auctions turant settle honge)
+    await get_auction_scheduler().start()
+    # Scheduled jobs (loan due, clan war end, event start/end) - jo band bot mein due hue woh abhi chalenge
+    await get_jobs().start()
 
     # 3. Menu Commands set karein (Saare User Features)
     print("⏳ Setting up Menu Commands...")
@@ -111,12 +147,24 @@ async def start_bot():
     except Exception as e:
         print(f"⚠️ Failed to set commands: {e}")
 
+    # Adhoore announcements resume karein (crash / restart ke baad)
+    try:
+        await get_broadcaster().resume_all()
+    except Exception as e:
+        print(f"⚠️ Failed to resume broadcasts: {e}")
+
     # 4. Bot ko chalne dein (Idle)
     print("🤖 Bot is now running... (Press CTRL+C to stop)")
     await idle()
 
     # 5. Stop hone par
     await app.stop()
+    await perf.stop()
+    await get_drop_engine().stop()  # last drop counters save
+    await get_leaderboards().stop()
+    await get_auction_scheduler().stop()
+    await get_jobs().stop()
+    await db.stop_writer()  # pending writes flush ho jayenge
     print("🛑 Bot Stopped.")
 
 if __name__ == "__main__":
@@ -0,0 +1,832 @@
+# migrations.py
+"""
+Versioned schema migrations for waifu_bot.db.
+
+The applied version is stored in PRAGMA user_version. main.py runs
+migrate() once before any handler is imported, so handlers can assume
+every table, column and index below already exists.
+
+Add new schema changes as a new function at the end of MIGRATIONS;
+never edit one that has already shipped.
+
+Run `python migrations.py` to migrate the configured DB and check the
+hot-path query plans (exits non-zero if any of them full-scans).
+"""
+
+import sqlite3
+import sys
+from config import Config
+
+
+# ---------------- Helpers ----------------
+def table_columns(conn, table):
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def add_column(conn, table, column_def):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    name = column_def.split()[0]
+    if name not in table_columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column_def}")
+
+
+def has_unique_index(conn, table, columns):
+    """True if a UNIQUE index / PK already covers exactly these columns"""
+    for row in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        name, unique = row[1], row[2]
+        if not unique:
+            continue
+        cols = [r[2] for r in conn.execute(f"PRAGMA index_info({name})").fetchall()]
+        if cols == list(columns):
+            return True
+    return False
+
+
+# ---------------- Migrations ----------------
+def _m001_baseline(conn):
+    """Every table the handlers used to create on import"""
+    # core (database.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            language TEXT DEFAULT 'en',
+            joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            daily_crystals INTEGER DEFAULT 0,
+            weekly_crystals INTEGER DEFAULT 0,
+            monthly_crystals INTEGER DEFAULT 0,
+            daily_claim TEXT,
+            weekly_claim TEXT,
+            monthly_claim TEXT,
+            first_logged INTEGER DEFAULT 0,
+            store_refresh_claim TEXT,
+            given_crystals INTEGER DEFAULT 0
+        )
+    """)
+    for col in ["daily_claim TEXT", "weekly_claim TEXT", "monthly_claim TEXT",
+                "first_logged INTEGER DEFAULT 0", "store_refresh_claim TEXT",
+                "given_crystals INTEGER DEFAULT 0"]:
+        add_column(conn, "users", col)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS groups (
+            chat_id INTEGER PRIMARY KEY,
+            title TEXT,
+            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT,
+            user_id INTEGER,
+            chat_id INTEGER,
+            details TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_waifus (
+            user_id INTEGER,
+            waifu_id INTEGER,
+            amount INTEGER DEFAULT 1,
+            PRIMARY KEY (user_id, waifu_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_fav (
+            user_id INTEGER PRIMARY KEY,
+            waifu_id INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id INTEGER PRIMARY KEY,
+            level INTEGER DEFAULT 1,
+            rank TEXT DEFAULT 'Newbie',
+            badge TEXT DEFAULT 'None',
+            total_collected INTEGER DEFAULT 0,
+            progress INTEGER DEFAULT 0,
+            balance INTEGER DEFAULT 0,
+            global_position TEXT DEFAULT 'Unranked',
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_rarities (
+            user_id INTEGER,
+            rarity TEXT,
+            count INTEGER DEFAULT 0,
+            PRIMARY KEY (user_id, rarity),
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS waifu_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            anime TEXT,
+            rarity TEXT,
+            event TEXT,
+            media_type TEXT,
+            media_file TEXT,
+            media_file_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    for col in ["event TEXT", "media_type TEXT", "media_file TEXT", "media_file_id TEXT"]:
+        add_column(conn, "waifu_cards", col)
+
+    # drops / claims
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS current_drops (
+            chat_id INTEGER PRIMARY KEY,
+            waifu_id INTEGER,
+            collected_by INTEGER DEFAULT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_claims (
+            user_id INTEGER PRIMARY KEY,
+            last_claim INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_craft (
+            user_id INTEGER PRIMARY KEY,
+            last_claim INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_marry (
+            user_id INTEGER PRIMARY KEY,
+            last_marry INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_settings (
+            user_id INTEGER PRIMARY KEY,
+            rarity_filter TEXT DEFAULT NULL,
+            anime_filter TEXT DEFAULT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_affection (
+            user_id INTEGER,
+            waifu_id INTEGER,
+            bond_level INTEGER DEFAULT 1,
+            energy_accum INTEGER DEFAULT 0,
+            last_upgrade_iso TEXT,
+            daily_added INTEGER DEFAULT 0,
+            daily_reset_date TEXT,
+            PRIMARY KEY (user_id, waifu_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_contacts (
+            user_id INTEGER PRIMARY KEY,
+            phone TEXT,
+            name TEXT,
+            saved_by INTEGER,
+            saved_at TEXT
+        )
+    """)
+
+    # admin / moderation
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bot_admins (
+            user_id INTEGER PRIMARY KEY,
+            added_by INTEGER,
+            added_at INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS global_bans (
+            user_id INTEGER PRIMARY KEY
+        )
+    """)
+    for col in ["banned_by INTEGER", "reason TEXT", "banned_at TEXT"]:
+        add_column(conn, "global_bans", col)
+
+    # redeem codes
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS redeem_codes (
+            code TEXT PRIMARY KEY,
+            waifu_id INTEGER
+        )
+    """)
+    for col in ["creator INTEGER", "limit_count INTEGER",
+                "redeemed_count INTEGER DEFAULT 0", "created_at TEXT"]:
+        add_column(conn, "redeem_codes", col)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS redeem_claims (
+            code TEXT,
+            user_id INTEGER,
+            redeemed_at TEXT,
+            PRIMARY KEY (code, user_id)
+        )
+    """)
+
+    # events
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            start_at TEXT,
+            end_at TEXT,
+            created_by INTEGER,
+            created_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS event_registrations (
+            event_id INTEGER,
+            user_id INTEGER,
+            registered_at TEXT,
+            PRIMARY KEY (event_id, user_id)
+        )
+    """)
+
+    # auctions
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS auctions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            waifu_id INTEGER,
+            seller_id INTEGER,
+            start_iso TEXT,
+            end_iso TEXT,
+            min_price INTEGER,
+            status TEXT DEFAULT 'active',
+            winner_id INTEGER,
+            final_price INTEGER,
+            transferred INTEGER DEFAULT 0,
+            waifu_name TEXT,
+            waifu_anime TEXT,
+            waifu_rarity TEXT,
+            waifu_media_type TEXT,
+            waifu_media_file TEXT,
+            waifu_media_file_id TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS auction_bids (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            auction_id INTEGER,
+            bidder_id INTEGER,
+            amount INTEGER,
+            bid_iso TEXT
+        )
+    """)
+
+    # clans
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            clan_id TEXT UNIQUE,
+            name TEXT,
+            owner_id INTEGER,
+            created_at TEXT,
+            points INTEGER DEFAULT 0,
+            wins INTEGER DEFAULT 0,
+            losses INTEGER DEFAULT 0,
+            bank INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clan_members (
+            clan_id INTEGER,
+            user_id INTEGER,
+            role TEXT DEFAULT 'member', -- 'owner' or 'member'
+            joined_at TEXT,
+            PRIMARY KEY (clan_id, user_id),
+            FOREIGN KEY (clan_id) REFERENCES clans(id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clan_wars (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            challenger_clan INTEGER,
+            target_clan INTEGER,
+            start_iso TEXT,
+            end_iso TEXT,
+            status TEXT DEFAULT 'active', -- active, finished
+            challenger_points INTEGER DEFAULT 0,
+            target_points INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clan_war_contrib (
+            war_id INTEGER,
+            clan_id INTEGER,
+            user_id INTEGER,
+            points INTEGER DEFAULT 0,
+            PRIMARY KEY (war_id, user_id)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clan_withdrawals (
+            clan_id INTEGER,
+            user_id INTEGER,
+            last_withdraw_iso TEXT,
+            daily_withdraw_total INTEGER DEFAULT 0,
+            daily_reset_date TEXT,
+            PRIMARY KEY (clan_id, user_id)
+        )
+    """)
+
+    # bank
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bank_accounts (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER DEFAULT 0,
+            created_at TEXT,
+            atm_tier TEXT DEFAULT 'normal'
+        )
+    """)
+    add_column(conn, "bank_accounts", "account_no TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bank_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            type TEXT,
+            amount INTEGER,
+            balance_after INTEGER,
+            note TEXT,
+            created_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bank_loans (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            amount INTEGER,
+            interest REAL,
+            total_due INTEGER,
+            status TEXT DEFAULT 'pending',
+            created_at TEXT,
+            due_at TEXT,
+            approved_by INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bank_pending_ops (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            op_type TEXT,
+            from_user INTEGER,
+            to_user INTEGER,
+            amount INTEGER,
+            status TEXT DEFAULT 'pending',
+            created_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bank_atmcards (
+            user_id INTEGER,
+            tier TEXT,
+            purchased_at TEXT,
+            PRIMARY KEY (user_id, tier)
+        )
+    """)
+    for col in ["card_number TEXT", "cvv TEXT", "expiry TEXT", "holder_name TEXT"]:
+        add_column(conn, "bank_atmcards", col)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bank_atm_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            tier TEXT,
+            amount INTEGER,
+            fee INTEGER,
+            balance_after INTEGER,
+            created_at TEXT,
+            atm_card TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bank_escrow (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            item_type TEXT,
+            item_id INTEGER,
+            description TEXT,
+            created_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bank_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def _m002_user_waifus_unique(conn):
+    """One row per (user_id, waifu_id) whatever schema variant created the table"""
+    # Older handlers created user_waifus with an autoincrement id and no
+    # unique key, so duplicate rows exist on some DBs: fold them into the
+    # oldest row before adding the unique index.
+    conn.execute("""
+        UPDATE user_waifus
+           SET amount = (SELECT SUM(COALESCE(u2.amount, 0)) FROM user_waifus u2
+                          WHERE u2.user_id = user_waifus.user_id
+                            AND u2.waifu_id = user_waifus.waifu_id)
+         WHERE rowid IN (SELECT MIN(rowid) FROM user_waifus
+                          GROUP BY user_id, waifu_id HAVING COUNT(*) > 1)
+    """)
+    conn.execute("""
+        DELETE FROM user_waifus
+         WHERE rowid NOT IN (SELECT MIN(rowid) FROM user_waifus GROUP BY user_id, waifu_id)
+    """)
+    if not has_unique_index(conn, "user_waifus", ("user_id", "waifu_id")):
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_user_waifus_user_waifu ON user_waifus(user_id, waifu_id)")
+
+    # craft / marry / propose / reward / mymarket write this but nothing created it
+    add_column(conn, "user_waifus", "last_collected INTEGER")
+
+
+def _m003_hot_path_indexes(conn):
+    """Indexes for the lookups that used to full-scan"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_waifus_waifu ON user_waifus(waifu_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_waifu_cards_rarity ON waifu_cards(rarity)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_user_event ON logs(user_id, event_type)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bank_tx_user ON bank_transactions(user_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bank_atm_tx_user ON bank_atm_transactions(user_id, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_auctions_status_end ON auctions(status, end_iso)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_auction_bids_auction ON auction_bids(auction_id, amount)")
+
+
+def _m004_group_drop_weights(conn):
+    """Per-group rarity weight overrides for the drop sampler"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS group_drop_weights (
+            chat_id INTEGER,
+            rarity TEXT,
+            weight REAL,
+            PRIMARY KEY (chat_id, rarity)
+        )
+    """)
+
+
+def _m005_drop_state(conn):
+    """Drop counters survive restarts"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS drop_state (
+            chat_id INTEGER PRIMARY KEY,
+            target INTEGER NOT NULL,
+            count INTEGER DEFAULT 0,
+            updated_at INTEGER
+        )
+    """)
+
+
+def _m006_broadcasts(conn):
+    """Resumable /announce: job, per-recipient status and dead chats"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT,
+            text TEXT,
+            file_id TEXT,
+            status TEXT DEFAULT 'running',
+            cursor INTEGER DEFAULT 0,
+            total INTEGER DEFAULT 0,
+            sent INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            dead INTEGER DEFAULT 0,
+            created_by INTEGER,
+            created_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            broadcast_id INTEGER,
+            seq INTEGER,
+            chat_id INTEGER,
+            status INTEGER DEFAULT 0,
+            attempts INTEGER DEFAULT 0,
+            PRIMARY KEY (broadcast_id, seq)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dead_chats (
+            chat_id INTEGER PRIMARY KEY,
+            reason TEXT,
+            marked_at TEXT
+        )
+    """)
+
+
+def _m007_crystal_ledger(conn):
+    """One crystal balance per user plus an append-only ledger"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS crystal_balances (
+            user_id INTEGER PRIMARY KEY,
+            balance INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS crystal_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            balance_after INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            ref TEXT,
+            created_at INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_crystal_ledger_user ON crystal_ledger(user_id, id)")
+
+    # Opening balance = the four users.*_crystals buckets + craft's user_profiles.balance.
+    # The old split is kept in the opening entry's ref; the old columns are zeroed
+    # so nothing can read a stale second balance.
+    conn.execute("""
+        CREATE TEMP TABLE opening AS
+        SELECT u.user_id,
+               COALESCE(u.daily_crystals, 0) AS daily, COALESCE(u.weekly_crystals, 0) AS weekly,
+               COALESCE(u.monthly_crystals, 0) AS monthly, COALESCE(u.given_crystals, 0) AS given,
+               COALESCE(p.balance, 0) AS craft
+          FROM users u LEFT JOIN user_profiles p ON p.user_id = u.user_id
+    """)
+    conn.execute("""
+        INSERT INTO crystal_balances (user_id, balance, updated_at)
+        SELECT user_id, daily + weekly + monthly + given + craft, strftime('%s','now')
+          FROM opening WHERE daily + weekly + monthly + given + craft != 0
+    """)
+    conn.execute("""
+        INSERT INTO crystal_ledger (user_id, delta, balance_after, reason, ref, created_at)
+        SELECT user_id, daily + weekly + monthly + given + craft, daily + weekly + monthly + given + craft,
+               'opening', printf('daily=%d weekly=%d monthly=%d given=%d craft=%d', daily, weekly, monthly, given, craft),
+               strftime('%s','now')
+          FROM opening WHERE daily + weekly + monthly + given + craft != 0
+    """)
+    conn.execute("DROP TABLE opening")
+    conn.execute("UPDATE users SET daily_crystals = 0, weekly_crystals = 0, monthly_crystals = 0, given_crystals = 0")
+    conn.execute("UPDATE user_profiles SET balance = 0")
+
+
+def _m008_user_rarities_triggers(conn):
+    """user_rarities kept current by triggers on user_waifus / waifu_cards"""
+    # Every writer of user_waifus (upserts, handlers' raw SQL, bulk jobs)
+    # updates the histogram in the same transaction. Note: INSERT OR REPLACE
+    # does not fire DELETE triggers; nothing writes user_waifus that way.
+    add_rarity = """
+        INSERT INTO user_rarities (user_id, rarity, count)
+        SELECT {user}, wc.rarity, {amount} FROM waifu_cards wc
+         WHERE wc.id = {waifu} AND wc.rarity IS NOT NULL
+        ON CONFLICT(user_id, rarity) DO UPDATE SET count = count + excluded.count;
+    """
+    sub_rarity = """
+        UPDATE user_rarities SET count = count - {amount}
+         WHERE user_id = {user} AND rarity = (SELECT rarity FROM waifu_cards WHERE id = {waifu});
+    """
+    new_row = dict(user="NEW.user_id", waifu="NEW.waifu_id", amount="COALESCE(NEW.amount, 0)")
+    old_row = dict(user="OLD.user_id", waifu="OLD.waifu_id", amount="COALESCE(OLD.amount, 0)")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_waifus_rarity_ins AFTER INSERT ON user_waifus
+        BEGIN {add_rarity.format(**new_row)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_waifus_rarity_upd
+        AFTER UPDATE OF user_id, waifu_id, amount ON user_waifus
+        BEGIN {sub_rarity.format(**old_row)} {add_rarity.format(**new_row)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_waifus_rarity_del AFTER DELETE ON user_waifus
+        BEGIN {sub_rarity.format(**old_row)} END
+    """)
+
+    # A card changing rarity (/edit) moves every holder's copies; a deleted
+    # card stops counting.
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_waifu_cards_rarity_upd
+        AFTER UPDATE OF rarity ON waifu_cards WHEN OLD.rarity IS NOT NEW.rarity
+        BEGIN
+            UPDATE user_rarities SET count = count - (
+                SELECT COALESCE(SUM(uw.amount), 0) FROM user_waifus uw
+                 WHERE uw.user_id = user_rarities.user_id AND uw.waifu_id = NEW.id)
+             WHERE rarity = OLD.rarity
+               AND user_id IN (SELECT user_id FROM user_waifus WHERE waifu_id = NEW.id);
+            INSERT INTO user_rarities (user_id, rarity, count)
+            SELECT user_id, NEW.rarity, COALESCE(amount, 0) FROM user_waifus
+             WHERE waifu_id = NEW.id AND NEW.rarity IS NOT NULL
+            ON CONFLICT(user_id, rarity) DO UPDATE SET count = count + excluded.count;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_waifu_cards_rarity_del AFTER DELETE ON waifu_cards
+        BEGIN
+            UPDATE user_rarities SET count = count - (
+                SELECT COALESCE(SUM(uw.amount), 0) FROM user_waifus uw
+                 WHERE uw.user_id = user_rarities.user_id AND uw.waifu_id = OLD.id)
+             WHERE rarity = OLD.rarity
+               AND user_id IN (SELECT user_id FROM user_waifus WHERE waifu_id = OLD.id);
+        END
+    """)
+
+    # Backfill from the current inventories
+    conn.execute("DELETE FROM user_rarities")
+    conn.execute("""
+        INSERT INTO user_rarities (user_id, rarity, count)
+        SELECT uw.user_id, wc.rarity, SUM(COALESCE(uw.amount, 0))
+          FROM user_waifus uw JOIN waifu_cards wc ON wc.id = uw.waifu_id
+         WHERE wc.rarity IS NOT NULL
+         GROUP BY uw.user_id, wc.rarity
+    """)
+
+
+def _m009_card_search_fts(conn):
+    """waifu_cards_fts full-text index over card name / anime / rarity / event"""
+    # External content: the index stores only tokens, column values are read
+    # back from waifu_cards by rowid. card_search.py queries it.
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS waifu_cards_fts USING fts5(
+            name, anime, rarity, event,
+            content='waifu_cards', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    delete_old = """
+        INSERT INTO waifu_cards_fts (waifu_cards_fts, rowid, name, anime, rarity, event)
+        VALUES ('delete', OLD.id, OLD.name, OLD.anime, OLD.rarity, OLD.event);
+    """
+    insert_new = """
+        INSERT INTO waifu_cards_fts (rowid, name, anime, rarity, event)
+        VALUES (NEW.id, NEW.name, NEW.anime, NEW.rarity, NEW.event);
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_waifu_cards_fts_ins AFTER INSERT ON waifu_cards
+        BEGIN {insert_new} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_waifu_cards_fts_upd
+        AFTER UPDATE OF id, name, anime, rarity, event ON waifu_cards
+        BEGIN {delete_old} {insert_new} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_waifu_cards_fts_del AFTER DELETE ON waifu_cards
+        BEGIN {delete_old} END
+    """)
+    conn.execute("INSERT INTO waifu_cards_fts (waifu_cards_fts) VALUES ('rebuild')")
+
+
+def _m010_jobs(conn):
+    """jobs: persistent scheduled jobs (jobs.py)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            module TEXT,
+            run_at REAL NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at INTEGER NOT NULL,
+            UNIQUE (kind, key)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs(status, run_at)")
+
+    # Jobs for what is already running. Loan / event times are UTC,
+    # clan war times local (datetime.now()).
+    seed = """
+        INSERT OR IGNORE INTO jobs (kind, key, module, run_at, created_at)
+        SELECT '{kind}', id, '{module}', CAST(strftime('%s', {at}) AS REAL), strftime('%s','now')
+          FROM {table} WHERE {where} AND strftime('%s', {at}) IS NOT NULL
+    """
+    now_utc = "strftime('%Y-%m-%dT%H:%M:%S', 'now')"
+    for kind, module, table, at, where in [
+        ("loan_due", "handlers.bank_system", "bank_loans", "due_at", "status = 'approved'"),
+        ("clan_war_end", "handlers.clan", "clan_wars", "end_iso, 'utc'", "status = 'active'"),
+        ("event_start", "handlers.event", "events", "start_at", f"start_at > {now_utc}"),
+        ("event_end", "handlers.event", "events", "end_at", f"end_at > {now_utc}"),
+    ]:
+        conn.execute(seed.format(kind=kind, module=module, table=table, at=at, where=where))
+
+
+def _m011_cooldowns(conn):
+    """cooldowns: one row per (user, action) instead of a column or table per feature"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cooldowns (
+            user_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            used_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL,
+            PRIMARY KEY (user_id, action)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cooldowns_expires ON cooldowns(expires_at)")
+
+    # Carry over the old timestamps with the durations the handlers use.
+    # Epoch columns first, then the ISO (UTC) ones on users.
+    for action, table, column, seconds in [
+        ("claim", "user_claims", "last_claim", 86400),
+        ("craft", "user_craft", "last_claim", 86400),
+        ("marry", "user_marry", "last_marry", 120),
+    ]:
+        conn.execute(f"""
+            INSERT OR REPLACE INTO cooldowns (user_id, action, used_at, expires_at)
+            SELECT user_id, '{action}', {column}, {column} + {seconds} FROM {table} WHERE {column} > 0
+        """)
+    for action, seconds in [("daily", 86400), ("weekly", 7 * 86400), ("monthly", 30 * 86400), ("store_refresh", 86400)]:
+        conn.execute(f"""
+            INSERT OR REPLACE INTO cooldowns (user_id, action, used_at, expires_at)
+            SELECT user_id, '{action}', CAST(strftime('%s', {action}_claim) AS INTEGER),
+                   CAST(strftime('%s', {action}_claim) AS INTEGER) + {seconds}
+              FROM users WHERE strftime('%s', {action}_claim) IS NOT NULL
+        """)
+
+
+MIGRATIONS = [
+    _m001_baseline,
+    _m002_user_waifus_unique,
+    _m003_hot_path_indexes,
+    _m004_group_drop_weights,
+    _m005_drop_state,
+    _m006_broadcasts,
+    _m007_crystal_ledger,
+    _m008_user_rarities_triggers,
+    _m009_card_search_fts,
+    _m010_jobs,
+    _m011_cooldowns,
+]
+
+
+# ---------------- Runner ----------------
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn=None, db_path=Config.DB_PATH):
+    """Apply pending migrations in order; each one commits with its version bump"""
+    own = conn is None
+    if own:
+        conn = sqlite3.connect(db_path)
+    try:
+        version = current_version(conn)
+        for number, step in enumerate(MIGRATIONS, start=1):
+            if number <= version:
+                continue
+            try:
+                conn.execute("BEGIN")
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                print(f"❌ Migration {number} ({step.__name__}) failed")
+                raise
+            print(f"✅ Migration {number}: {step.__doc__}")
+        return current_version(conn)
+    finally:
+        if own:
+            conn.close()
+
+
+# ---------------- Query plan check ----------------
+# (query, params) for every hot lookup; none of them may SCAN its table.
+HOT_QUERIES = [
+    ("SELECT amount FROM user_waifus WHERE user_id=? AND waifu_id=?", (1, 1)),
+    ("SELECT COUNT(*) FROM user_waifus WHERE waifu_id=?", (1,)),
+    ("SELECT id, name FROM waifu_cards WHERE rarity=?", ("Common",)),
+    ("SELECT COUNT(*) FROM logs WHERE user_id = ? AND event_type = ?", (1, "bonus_claim")),
+    ("SELECT id, type, amount, balance_after, note, created_at FROM bank_transactions "
+     "WHERE user_id = ? ORDER BY id DESC LIMIT 200", (1,)),
+    ("SELECT SUM(amount) FROM bank_atm_transactions WHERE user_id = ? AND created_at >= ?", (1, "")),
+    ("SELECT id FROM auctions WHERE status = 'active' AND end_iso <= ?", ("",)),
+    ("SELECT bidder_id, amount FROM auction_bids WHERE auction_id = ? ORDER BY amount DESC LIMIT 1", (1,)),
+    ("SELECT delta, balance_after, reason, created_at FROM crystal_ledger WHERE user_id = ? ORDER BY id DESC LIMIT 5", (1,)),
+    ("SELECT rarity, count FROM user_rarities WHERE user_id = ?", (1,)),
+    ("SELECT MIN(run_at) FROM jobs WHERE status = 'pending'", ()),
+    ("SELECT user_id, action, used_at, expires_at FROM cooldowns WHERE expires_at > ?", (0,)),
+    ("SELECT id FROM jobs WHERE status = 'pending' AND run_at <= ? ORDER BY run_at LIMIT 50", (0,)),
+]
+
+
+def verify_query_plans(conn):
+    """Return [(query, plan_detail)] for hot queries that full-scan a table"""
+    failures = []
+    for sql, params in HOT_QUERIES:
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall():
+            detail = row[-1]
+            # "SCAN t USING COVERING INDEX" still reads every row
+            if detail.startswith("SCAN"):
+                failures.append((sql, detail))
+    return failures
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else Config.DB_PATH
+    conn = sqlite3.connect(path)
+    print(f"Schema version: {migrate(conn)}")
+    bad = verify_query_plans(conn)
+    for sql, detail in bad:
+        print(f"❌ {detail}\n   {sql}")
+    conn.close()
+    if bad:
+        sys.exit(1)
+    print(f"✅ All {len(HOT_QUERIES)} hot queries use an index")
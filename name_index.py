@@ -0,0 +1,307 @@
+# name_index.py
+"""
+In-memory name matching on top of the card catalog.
+
+Names and anime titles are normalized (accents stripped, lowercased,
+punctuation -> spaces) and split into words. Each distinct word maps to
+the cards that have it in their name / anime, and is broken into
+trigrams ("  vi", " vir", "vir", ...) that map back to the words. Two
+words are compared by the Jaccard similarity of their trigram sets, so
+"kohly" still finds "Kohli".
+
+ - matches(card_id, guess): /collect, every guessed word has to be a
+   word of the card's name or close to one (COLLECT_MIN_SIMILARITY), and
+   the guess needs COLLECT_MIN_GUESS letters, so "a" no longer collects
+ - search(query): /search, /checkwaifu and inline; each query word is
+   expanded to the known words it starts or resembles, and cards are
+   ranked by how well their words matched (anime words count less)
+
+The index is built lazily from the catalog and follows its add / remove /
+reload events.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from array import array
+from itertools import islice
+from config import Config
+from catalog import get_catalog
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+ANIME_WEIGHT = 0.7     # an anime-word match is worth this much of a name-word match
+PREFIX_SCORE = 0.9     # query word is the start of a name word ("vir" -> "virat")
+WORD_MIN_SIMILARITY = 0.4  # weaker word matches aren't worth expanding a search into
+MAX_EXPANSIONS = 64    # closest vocabulary words tried per query word
+
+
+def normalize(text):
+    """Lowercase, accents stripped, runs of non-word characters -> one space"""
+    text = text or ""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return frozenset([padded[i:i + 3] for i in range(len(padded) - 2)])
+
+
+def similarity(a, b):
+    """Jaccard similarity of two trigram sets"""
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+class NameIndex:
+    def __init__(self, catalog=None):
+        self._catalog = catalog
+        self._lock = threading.Lock()
+        self._built = False
+        self._entries = {}   # card id -> (name words, anime words)
+        self._name_ids = {}  # word -> array of card ids with it in the name
+        self._anime_ids = {} # word -> array of card ids with it in the anime
+        self._grams = {}     # every known word -> its trigrams
+        self._gram_words = {}  # trigram -> words that have it
+        self._sorted = []    # every known word, sorted (prefix lookups)
+        self.catalog.subscribe(self._on_catalog)
+
+    @property
+    def catalog(self):
+        return self._catalog or get_catalog()
+
+    # ---------------- Building ----------------
+    def _on_catalog(self, event, card):
+        if event == "reload" or not self._built:
+            self._built = False
+        elif event == "add":
+            with self._lock:
+                for word in self._add(card):
+                    bisect.insort(self._sorted, word)
+        elif event == "remove":
+            with self._lock:
+                self._remove(card)
+
+    def _learn(self, word):
+        """Add a new word to the vocabulary"""
+        grams = self._grams[word] = trigrams(word)
+        gram_words = self._gram_words
+        for gram in grams:
+            words = gram_words.get(gram)
+            if words is None:
+                gram_words[gram] = [word]
+            else:
+                words.append(word)
+
+    def _add(self, card):
+        """Index one card; returns the words that were new to the vocabulary"""
+        name, anime = tuple(normalize(card.name).split()), tuple(normalize(card.anime).split())
+        self._entries[card.id] = (name, anime)
+        new = []
+        for words, postings in ((name, self._name_ids), (anime, self._anime_ids)):
+            for word in set(words):
+                ids = postings.get(word)
+                if ids is None:
+                    ids = postings[word] = array("q")
+                    if word not in self._grams:
+                        self._learn(word)
+                        new.append(word)
+                ids.append(card.id)
+        return new
+
+    def _remove(self, card):
+        name, anime = self._entries.pop(card.id, ((), ()))
+        for words, postings in ((name, self._name_ids), (anime, self._anime_ids)):
+            for word in set(words):
+                postings[word].remove(card.id)
+        # words stay in the vocabulary; with no postings they just match nothing
+
+    def ensure_built(self):
+        self.catalog.ensure_loaded()  # a pending reload notifies us first
+        if self._built:
+            return
+        with self._lock:
+            self._entries, self._name_ids, self._anime_ids = {}, {}, {}
+            self._grams, self._gram_words = {}, {}
+            for card in self.catalog.all_cards():
+                self._add(card)
+            self._sorted = sorted(self._grams)
+            self._built = True
+
+    # ---------------- Word Matching ----------------
+    def _expand(self, word, min_similarity):
+        """{vocabulary word: score} for words close to this one"""
+        found = {}
+        if word in self._grams:
+            found[word] = 1.0
+
+        if len(word) >= 2:
+            words = self._sorted
+            i = bisect.bisect_right(words, word)
+            for other in islice(words, i, i + MAX_EXPANSIONS):
+                if not other.startswith(word):
+                    break
+                found[other] = PREFIX_SCORE
+
+        # Similar words share trigrams. A word with similarity >= t shares at
+        # least t * len(grams) of them, so it must appear in one of the
+        # rarest len(grams) - need + 1 lists; only those are scanned. Its
+        # trigram count is also within a factor t of ours.
+        grams = trigrams(word)
+        size = len(grams)
+        need = max(1, int(min_similarity * size + 0.999))
+        lists = sorted((self._gram_words.get(g, ()) for g in grams), key=len)
+        candidates = set()
+        for words in lists[:size - need + 1]:
+            candidates.update(words)
+        vocab = self._grams
+        low, high = min_similarity * size, size / min_similarity
+        for other in candidates:
+            other_grams = vocab[other]
+            if other in found or not low <= len(other_grams) <= high:
+                continue
+            score = similarity(grams, other_grams)
+            if score >= min_similarity:
+                found[other] = score
+
+        if len(found) > MAX_EXPANSIONS:
+            found = dict(heapq.nlargest(MAX_EXPANSIONS, found.items(), key=lambda kv: kv[1]))
+        return found
+
+    def matches(self, card_id, guess, min_similarity=None):
+        """True if guess names this card well enough to /collect it"""
+        self.ensure_built()
+        entry = self._entries.get(card_id)
+        words = normalize(guess).split()
+        if entry is None or not words or sum(map(len, words)) < Config.COLLECT_MIN_GUESS:
+            return False
+
+        threshold = Config.COLLECT_MIN_SIMILARITY if min_similarity is None else min_similarity
+        name = entry[0]
+        for word in words:
+            if word in name:
+                continue
+            if len(word) < 3:
+                return False
+            grams = trigrams(word)
+            if not any(similarity(grams, self._grams[other]) >= threshold for other in name):
+                return False
+        return True
+
+    def search(self, query, limit=10, offset=0, min_score=None):
+        """[(score, Card)] best first; score 1.0 means every word matched exactly"""
+        self.ensure_built()
+        words = normalize(query).split()
+        if not words:
+            return []
+
+        floor = Config.SEARCH_MIN_SCORE if min_score is None else min_score
+        scores = {}  # card id -> summed best score per query word
+        for word in words:
+            best = {}
+            for other, score in self._expand(word, max(floor, WORD_MIN_SIMILARITY)).items():
+                for postings, weight in ((self._name_ids, 1.0), (self._anime_ids, ANIME_WEIGHT)):
+                    value = score * weight
+                    for card_id in postings.get(other, ()):
+                        if value > best.get(card_id, 0.0):
+                            best[card_id] = value
+            for card_id, value in best.items():
+                scores[card_id] = scores.get(card_id, 0.0) + value
+
+        n = len(words)
+        ranked = heapq.nsmallest(offset + limit, ((-total / n, card_id) for card_id, total in scores.items()
+                                                  if total / n >= floor))
+        get = self.catalog.get
+        return [(-neg, get(card_id)) for neg, card_id in ranked[offset:]]
+
+    def best(self, query, min_score=None):
+        """The single best-matching Card, or None"""
+        found = self.search(query, limit=1, min_score=min_score)
+        return found[0][1] if found else None
+
+
+# ---------------- Shared Instance ----------------
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_name_index():
+    """Return the process-wide NameIndex"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NameIndex()
+        return _index
+
+
+if __name__ == "__main__":
+    # Lookup benchmark on a synthetic catalog vs. the LIKE scan it replaces.
+    # python name_index.py [cards]
+    import random
+    import sqlite3
+    import sys
+    import time
+    from catalog import Card
+
+    N = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rng = random.Random(7)
+    consonants, vowels = "bcdfghjklmnprstvwyz", "aeiou"
+    syllables = [c + v + e for c in consonants for v in vowels for e in ["", "", "", *consonants]]
+    first_names = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).title() for _ in range(3000)]
+    teams = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title() for _ in range(200)]
+
+    def word():
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))).title()
+
+    cards = [Card(i, f"{rng.choice(first_names)} {word()}", f"{rng.choice(teams)} {rng.choice(['XI', 'Kings', 'Riders'])}",
+                  rng.choice(["Common", "Rare", "Legendary"]), None, "photo", "x", "x")
+             for i in range(1, N + 1)]
+
+    class FakeCatalog:
+        def __init__(self):
+            self.by_id = {c.id: c for c in cards}
+        def subscribe(self, listener): pass
+        def ensure_loaded(self): pass
+        def all_cards(self): return cards
+        def get(self, card_id): return self.by_id.get(card_id)
+
+    start = time.perf_counter()
+    index = NameIndex(FakeCatalog())
+    index.ensure_built()
+    print(f"build: {N} cards in {time.perf_counter() - start:.2f} s, "
+          f"{len(index._grams)} words, {len(index._gram_words)} trigrams")
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE waifu_cards (id INTEGER PRIMARY KEY, name TEXT, anime TEXT)")
+    conn.executemany("INSERT INTO waifu_cards VALUES (?, ?, ?)", [(c.id, c.name, c.anime) for c in cards])
+
+    sample = rng.sample(cards, 200)
+    queries = [c.name.split()[-1].lower() for c in sample]
+    typos = [q[:-2] + q[-1] + q[-2] for q in queries]  # last two letters swapped
+
+    def timed(label, fn, items, repeat=1):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for item in items:
+                fn(item)
+        per = (time.perf_counter() - start) / (repeat * len(items)) * 1e6
+        print(f"{label:34} {per:9.1f} us")
+
+    timed("collect: matches(card, guess)", lambda c: index.matches(c.id, c.name.split()[-1]), sample, 50)
+    timed("collect: old `guess in name`", lambda c: c.name.split()[-1].lower() in c.name.lower(), sample, 50)
+    timed("search: index", lambda q: index.search(q, 10), queries)
+    timed("search: index, typo", lambda q: index.search(q, 10), typos)
+    timed("search: LIKE '%q%' LIMIT 10",
+          lambda q: conn.execute("SELECT id FROM waifu_cards WHERE name LIKE ? LIMIT 10", (f"%{q}%",)).fetchall(),
+          queries)
+    timed("inline: LOWER() LIKE name OR anime",
+          lambda q: conn.execute("SELECT id FROM waifu_cards WHERE LOWER(name) LIKE ? OR LOWER(anime) LIKE ? "
+                                 "ORDER BY id LIMIT 50", (f"%{q}%", f"%{q}%")).fetchall(),
+          queries)
+    found = sum(any(card.id == c.id for _, card in index.search(q, 10)) for c, q in zip(sample, typos))
+    print(f"typo queries with the intended card in the top 10: {found}/{len(sample)}")
@@ -0,0 +1,324 @@
+# perf.py
+"""
+Timing for every update the bot handles.
+
+install() wraps the callback of each handler added to the client, so
+every /command, button press (by router prefix) and watcher gets:
+ - a latency histogram plus the last PERF_SAMPLES latencies (p50/p95/p99)
+ - an error count
+ - how much of that time went to SQLite and to the Telegram API
+
+SQLite time is reported by database.py (timed cursor on the shared
+connection, await time of db.read / db.run); Telegram time is measured
+around client.invoke, which every API method goes through. Both are
+charged to the handler running in the current asyncio context, or to
+"(background)" outside of one. A small task samples event-loop lag.
+
+Everything lives in preallocated ring buffers written from the event
+loop, with no locks; a sample lost to a rare write from another thread
+doesn't matter for percentiles. /perf renders the table and
+export_prometheus() writes a text snapshot for scraping.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextvars import ContextVar
+from inspect import iscoroutinefunction
+from pyrogram import StopPropagation, ContinuePropagation
+from pyrogram.handlers import MessageHandler, CallbackQueryHandler
+from config import Config, app
+
+# Histogram bucket upper bounds (seconds), Prometheus style
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_LABELS = 256  # anything beyond this is counted as "(other)"
+BACKGROUND = "(background)"
+
+
+class Ring:
+    """Last `size` float samples; append is two stores, no lock"""
+
+    __slots__ = ("values", "n")
+
+    def __init__(self, size):
+        self.values = array("d", bytes(8 * size))
+        self.n = 0
+
+    def append(self, value):
+        self.values[self.n % len(self.values)] = value
+        self.n += 1
+
+    def samples(self):
+        return self.values[:min(self.n, len(self.values))]
+
+    def percentiles(self, *qs):
+        data = sorted(self.samples())
+        if not data:
+            return [0.0] * len(qs)
+        return [data[min(len(data) - 1, int(q * len(data)))] for q in qs]
+
+
+class Stat:
+    """Counters for one handler label"""
+
+    __slots__ = ("count", "errors", "total", "sqlite", "telegram", "buckets", "recent")
+
+    def __init__(self, samples):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0     # seconds spent in the handler
+        self.sqlite = 0.0    # ... of which waiting on SQLite
+        self.telegram = 0.0  # ... of which waiting on the Telegram API
+        self.buckets = array("q", bytes(8 * (len(BUCKETS) + 1)))
+        self.recent = Ring(samples)
+
+    def add(self, seconds, failed=False):
+        self.count += 1
+        self.total += seconds
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+        self.recent.append(seconds)
+        if failed:
+            self.errors += 1
+
+
+class Span:
+    """Time charged to the update being handled in this context"""
+
+    __slots__ = ("label", "sqlite", "telegram")
+
+    def __init__(self, label=BACKGROUND):
+        self.label = label
+        self.sqlite = 0.0
+        self.telegram = 0.0
+
+
+_span = ContextVar("perf_span", default=None)
+
+
+# ---------------- Labels ----------------
+def _handler_name(fn):
+    return f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+
+def _labeler(handler, fn):
+    """update -> label: /command, cb:<router prefix>, or module.function"""
+    name = _handler_name(fn)
+    if isinstance(handler, MessageHandler):
+        return lambda m, *_: f"/{m.command[0].lower()}" if getattr(m, "command", None) else name
+    if isinstance(handler, CallbackQueryHandler):
+        return lambda cb, *_: f"cb:{cb.route[0].prefix}" if getattr(cb, "route", None) else name
+    return lambda *_: name
+
+
+# ---------------- Perf ----------------
+class Perf:
+    def __init__(self, samples=None):
+        self.samples = samples or Config.PERF_SAMPLES
+        self.stats = {}  # label -> Stat
+        self.background = Span()
+        self.loop_lag = Ring(self.samples)
+        self.started_at = time.time()
+        self._tasks = []
+
+    def stat(self, label):
+        stat = self.stats.get(label)
+        if stat is None:
+            if len(self.stats) >= MAX_LABELS:
+                label = "(other)"
+                stat = self.stats.get(label)
+            if stat is None:
+                stat = self.stats[label] = Stat(self.samples)
+        return stat
+
+    def reset(self):
+        self.stats.clear()
+        self.background = Span()
+        self.loop_lag = Ring(self.samples)
+        self.started_at = time.time()
+
+    # ---------------- Recording ----------------
+    def add_sqlite(self, seconds):
+        (_span.get() or self.background).sqlite += seconds
+
+    def add_telegram(self, seconds):
+        (_span.get() or self.background).telegram += seconds
+
+    def wrap(self, handler):
+        """Time handler.callback from now on (idempotent)"""
+        fn = handler.callback
+        if getattr(fn, "__perf__", False) or not iscoroutinefunction(fn):
+            return handler
+        label_of = _labeler(handler, fn)
+
+        async def timed(client, update, *args):
+            if _span.get() is not None:
+                # called from inside another timed handler (startup.py's first-use stub)
+                return await fn(client, update, *args)
+            span = Span(label_of(update))
+            token = _span.set(span)
+            failed = False
+            start = time.perf_counter()
+            try:
+                return await fn(client, update, *args)
+            except (StopPropagation, ContinuePropagation):
+                raise
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                _span.reset(token)
+                stat = self.stat(span.label)
+                stat.add(elapsed, failed)
+                stat.sqlite += span.sqlite
+                stat.telegram += span.telegram
+
+        timed.__perf__ = True
+        timed.__name__ = fn.__name__
+        timed.__module__ = fn.__module__
+        handler.callback = timed
+        return handler
+
+    def install(self, client):
+        """Wrap every handler added to client, plus client.invoke"""
+        dispatcher = client.dispatcher
+        add_handler = dispatcher.add_handler
+
+        def add_timed(handler, group):
+            return add_handler(self.wrap(handler), group)
+
+        dispatcher.add_handler = add_timed
+        for handlers in dispatcher.groups.values():
+            for handler in handlers:
+                self.wrap(handler)
+
+        invoke = client.invoke
+
+        async def timed_invoke(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await invoke(*args, **kwargs)
+            finally:
+                self.add_telegram(time.perf_counter() - start)
+
+        client.invoke = timed_invoke
+
+    # ---------------- Background ----------------
+    async def _watch_loop(self, interval):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, time.perf_counter() - start - interval))
+
+    async def _export_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.export_prometheus()
+            except OSError as e:
+                print(f"⚠️ Could not write metrics snapshot: {e}")
+
+    def start(self):
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._watch_loop(Config.PERF_LOOP_LAG_SECONDS))]
+        if Config.PERF_EXPORT_SECONDS:
+            self._tasks.append(loop.create_task(self._export_loop(Config.PERF_EXPORT_SECONDS)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ---------------- Output ----------------
+    def table(self, top=20):
+        """Rows sorted by total time spent: (label, count, errors, p50, p95, p99, avg sqlite, avg telegram)"""
+        rows = []
+        for label, s in sorted(self.stats.items(), key=lambda kv: kv[1].total, reverse=True)[:top]:
+            p50, p95, p99 = s.recent.percentiles(0.5, 0.95, 0.99)
+            rows.append((label, s.count, s.errors, p50, p95, p99, s.sqlite / s.count, s.telegram / s.count))
+        return rows
+
+    def prometheus(self):
+        """Prometheus text exposition format of everything recorded"""
+        def esc(label):
+            return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        items = sorted(self.stats.items())
+        out = [
+            "# HELP bot_handler_seconds Time spent handling one update.",
+            "# TYPE bot_handler_seconds histogram",
+        ]
+        for label, s in items:
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ("+Inf",), s.buckets):
+                cumulative += n
+                out.append(f'bot_handler_seconds_bucket{{handler="{esc(label)}",le="{bound}"}} {cumulative}')
+            out.append(f'bot_handler_seconds_sum{{handler="{esc(label)}"}} {s.total:.6f}')
+            out.append(f'bot_handler_seconds_count{{handler="{esc(label)}"}} {s.count}')
+
+        out += ["# HELP bot_handler_errors_total Updates whose handler raised.",
+                "# TYPE bot_handler_errors_total counter"]
+        out += [f'bot_handler_errors_total{{handler="{esc(label)}"}} {s.errors}' for label, s in items]
+
+        background = [(BACKGROUND, self.background)]
+        for metric, attr, what in (("sqlite", "sqlite", "SQLite"), ("telegram", "telegram", "the Telegram API")):
+            out += [f"# HELP bot_{metric}_seconds_total Time spent waiting on {what}.",
+                    f"# TYPE bot_{metric}_seconds_total counter"]
+            out += [f'bot_{metric}_seconds_total{{handler="{esc(label)}"}} {getattr(s, attr):.6f}'
+                    for label, s in items + background]
+
+        out += ["# HELP bot_event_loop_lag_seconds How late the event loop woke a sleeping task.",
+                "# TYPE bot_event_loop_lag_seconds summary"]
+        for q, value in zip((0.5, 0.99), self.loop_lag.percentiles(0.5, 0.99)):
+            out.append(f'bot_event_loop_lag_seconds{{quantile="{q}"}} {value:.6f}')
+        lags = self.loop_lag.samples()
+        out.append(f"bot_event_loop_lag_seconds_sum {sum(lags):.6f}")
+        out.append(f"bot_event_loop_lag_seconds_count {len(lags)}")
+
+        out += ["# HELP bot_stats_start_time_seconds When these counters started (unix time).",
+                "# TYPE bot_stats_start_time_seconds gauge",
+                f"bot_stats_start_time_seconds {self.started_at:.0f}"]
+        return "\n".join(out) + "\n"
+
+    def export_prometheus(self, path=None):
+        """Write prometheus() to path atomically; returns the path"""
+        path = path or Config.PERF_EXPORT_PATH
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+        return path
+
+
+# ---------------- Shared Instance ----------------
+_perf = None
+_perf_lock = threading.Lock()
+
+
+def get_perf():
+    """Return the process-wide Perf (installed on app on first use)"""
+    global _perf
+    with _perf_lock:
+        if _perf is None:
+            _perf = Perf()
+            _perf.install(app)
+        return _perf
+
+
+def current_handler():
+    """Label of the handler running in this context (/command, cb:prefix...), or None"""
+    span = _span.get()
+    return span.label if span is not None else None
+
+
+def add_sqlite_time(seconds):
+    """database.py hook; a no-op until get_perf() has been called"""
+    if _perf is not None:
+        _perf.add_sqlite(seconds)
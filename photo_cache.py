@@ -0,0 +1,86 @@
+# photo_cache.py
+"""
+Small on-disk LRU for Telegram profile photos, keyed by file_unique_id.
+
+file_unique_id is stable for the same picture and changes when the user
+sets a new one, so a hit never serves a stale photo. The newest
+PROFILE_PHOTO_CACHE_FILES photos are kept; concurrent requests for the
+same photo share one download.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from config import Config
+
+
+class PhotoCache:
+    def __init__(self, directory=None, max_files=None):
+        self.directory = directory or Config.PROFILE_PHOTO_CACHE_DIR
+        self.max_files = max_files or Config.PROFILE_PHOTO_CACHE_FILES
+        os.makedirs(self.directory, exist_ok=True)
+        self._lru = OrderedDict()  # file_unique_id -> path, oldest first
+        self._inflight = {}        # file_unique_id -> Future[path]
+        # pick up what survived a restart, oldest first
+        paths = [os.path.join(self.directory, f) for f in os.listdir(self.directory)]
+        for path in sorted((p for p in paths if os.path.isfile(p)), key=os.path.getmtime):
+            self._lru[os.path.splitext(os.path.basename(path))[0]] = path
+        self._evict()
+
+    def _path(self, file_unique_id):
+        return os.path.join(self.directory, f"{file_unique_id}.jpg")
+
+    def _evict(self):
+        while len(self._lru) > self.max_files:
+            _, path = self._lru.popitem(last=False)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def get(self, client, file_id, file_unique_id):
+        """Local path of the photo, downloading it only on a miss"""
+        path = self._lru.get(file_unique_id)
+        if path and os.path.exists(path):
+            self._lru.move_to_end(file_unique_id)
+            return path
+
+        pending = self._inflight.get(file_unique_id)
+        if pending:
+            return await pending
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[file_unique_id] = future
+        try:
+            path = await client.download_media(file_id, file_name=self._path(file_unique_id))
+        except BaseException as e:
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                future.exception()  # waiters re-raise it; don't warn if there are none
+            else:
+                future.cancel()
+            raise
+        finally:
+            del self._inflight[file_unique_id]
+
+        if path:
+            self._lru[file_unique_id] = path
+            self._lru.move_to_end(file_unique_id)
+            self._evict()
+        future.set_result(path)
+        return path
+
+
+# ---------------- Shared Instance ----------------
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_photo_cache():
+    """Return the process-wide PhotoCache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PhotoCache()
+        return _cache
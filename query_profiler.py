@@ -0,0 +1,130 @@
+# query_profiler.py
+"""
+Per-statement SQLite profile.
+
+Every connection the bot opens is a database.TimedConnection (db.conn,
+the read pool, the writer, and handlers' own connections through
+database.connect()); each execute / fetch reports its time here. The
+statement is reduced to a fingerprint: literals and numbers become ?,
+IN (?, ?, ...) becomes IN (...), whitespace and comments are collapsed.
+Count, total and max time are kept per fingerprint.
+
+A statement slower than SLOW_QUERY_MS is written to a rotating log
+together with the handler it ran for (perf.py's label: /command,
+cb:<prefix>, ...). /queries shows the top fingerprints.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from config import Config
+from perf import current_handler
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+MAX_FINGERPRINTS = 2000  # beyond this, new statements are counted as "(other)"
+_FP_CACHE_SIZE = 4096
+
+
+def fingerprint(sql):
+    """Normalized statement text: same query shape -> same fingerprint"""
+    sql = _COMMENT.sub(" ", sql)
+    sql = _LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class QueryProfiler:
+    def __init__(self, slow_ms=None, log_path=None):
+        self.slow_seconds = (Config.SLOW_QUERY_MS if slow_ms is None else slow_ms) / 1000
+        self.log_path = log_path or Config.SLOW_QUERY_LOG
+        self.stats = {}         # fingerprint -> [count, total seconds, max seconds]
+        self.slow_count = 0
+        self.started_at = time.time()
+        self._fps = {}          # raw sql -> fingerprint (most statements are constant strings)
+        self._lock = threading.Lock()  # pool / writer threads record too
+        self._log = None
+
+    def record(self, sql, seconds, counts=True):
+        """Add one execute (counts=True) or a fetch on its cursor (counts=False)"""
+        if sql is None:
+            return
+        fp = self._fps.get(sql)
+        if fp is None:
+            if len(self._fps) >= _FP_CACHE_SIZE:
+                self._fps.clear()
+            fp = self._fps[sql] = fingerprint(sql)
+
+        with self._lock:
+            stat = self.stats.get(fp)
+            if stat is None:
+                key = fp if len(self.stats) < MAX_FINGERPRINTS else "(other)"
+                stat = self.stats.setdefault(key, [0, 0.0, 0.0])
+            if counts:
+                stat[0] += 1
+            stat[1] += seconds
+            if seconds > stat[2]:
+                stat[2] = seconds
+
+        if seconds >= self.slow_seconds:
+            self._log_slow(fp if counts else f"(fetch) {fp}", seconds)
+
+    def top(self, n=15, by="total"):
+        """[(fingerprint, count, total, max)] sorted by total, max or count"""
+        index = {"count": 0, "total": 1, "max": 2}[by]
+        with self._lock:
+            items = [(fp, *stat) for fp, stat in self.stats.items()]
+        items.sort(key=lambda item: item[1 + index], reverse=True)
+        return items[:n]
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.slow_count = 0
+            self.started_at = time.time()
+
+    # ---------------- Slow Log ----------------
+    def _logger(self):
+        if self._log is None:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            handler = RotatingFileHandler(self.log_path, maxBytes=Config.SLOW_QUERY_LOG_BYTES,
+                                          backupCount=Config.SLOW_QUERY_LOG_FILES, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            log = logging.getLogger("slow_queries")
+            log.setLevel(logging.INFO)
+            log.propagate = False
+            log.addHandler(handler)
+            self._log = log
+        return self._log
+
+    def _log_slow(self, fp, seconds):
+        self.slow_count += 1
+        try:
+            self._logger().info("%8.1f ms  %-20s %s", seconds * 1000, current_handler() or "(background)", fp)
+        except OSError as e:
+            print(f"⚠️ Could not write slow query log: {e}")
+
+
+# ---------------- Shared Instance ----------------
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_query_profiler():
+    """Return the process-wide QueryProfiler"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = QueryProfiler()
+        return _profiler
+
+
+def record_query(sql, seconds, counts=True):
+    """database.py hook for every statement"""
+    (_profiler or get_query_profiler()).record(sql, seconds, counts)
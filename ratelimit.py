@@ -0,0 +1,231 @@
+# ratelimit.py
+"""
+Anti-spam: token buckets in front of every handler.
+
+install(app) adds a handler in group -1, which Pyrogram runs before any
+other group. Its filter takes one token from the sender's bucket and one
+from the chat's bucket, only if both have one. An update that finds
+either bucket empty is stopped there (StopPropagation): no handler, DB
+query or drop counter ever sees it. Pressed buttons get a short "slow
+down" answer so the spinner stops. Other updates are dropped silently.
+
+Budgets are (refill per second, burst) from Config. A label with a
+RATE_LIMIT_COMMANDS override ("/collect", "cb:inv_pg", "msg" for plain
+messages) gets its own bucket per user; everything else a user sends
+shares one RATE_LIMIT_USER bucket, so made-up /commands can't open fresh
+budgets. RATE_LIMIT_CHAT covers groups. The owner and admins are never
+limited. A bucket is two floats refilled lazily when it is used. Buckets
+untouched for RATE_LIMIT_IDLE_SECONDS are full again anyway and are
+swept from memory. Passed / dropped counts per label, plus the chats and
+users shed most, are kept for /ratelimit; the sweep trims them to the
+busiest TOP_KEPT.
+"""
+
+import threading
+import time
+from collections import Counter
+from pyrogram import filters, StopPropagation
+from pyrogram.types import Message, CallbackQuery
+from config import Config, app
+from router import get_router
+
+GROUP = -1     # before every handler group the bot uses
+TOP_KEPT = 50  # labels / chats / users kept in the counters after a sweep
+
+
+def label_of(update):
+    """/command, cb:<route prefix>, msg (plain message) or inline"""
+    if isinstance(update, Message):
+        text = update.text or update.caption or ""
+        if text.startswith("/"):
+            return text.split(maxsplit=1)[0].split("@", 1)[0].lower()
+        return "msg"
+    if isinstance(update, CallbackQuery):
+        resolved = get_router().resolve(update.data)
+        return f"cb:{resolved[0].prefix}" if resolved else "cb:?"
+    return "inline"
+
+
+def chat_of(update):
+    if isinstance(update, Message):
+        return update.chat.id if update.chat else None
+    if isinstance(update, CallbackQuery):
+        return update.message.chat.id if update.message and update.message.chat else None
+    return None
+
+
+class RateLimiter:
+    def __init__(self, user=None, commands=None, chat=None, idle_seconds=None, exempt=None):
+        self.user = user or Config.RATE_LIMIT_USER
+        self.commands = Config.RATE_LIMIT_COMMANDS if commands is None else commands
+        self.chat = chat or Config.RATE_LIMIT_CHAT
+        self.idle_seconds = idle_seconds or Config.RATE_LIMIT_IDLE_SECONDS
+        self.exempt = set([Config.OWNER_ID] + Config.ADMINS if exempt is None else exempt)
+        self.enabled = Config.RATE_LIMIT_ENABLED
+        self._buckets = {}  # key -> [tokens, last refill (monotonic)]
+        self._next_sweep = time.monotonic() + self.idle_seconds
+        self.reset()
+
+    def reset(self):
+        self.passed = Counter()        # label -> updates let through
+        self.dropped = Counter()       # label -> updates shed
+        self.dropped_chats = Counter()  # chat_id -> updates shed by the chat budget
+        self.dropped_users = Counter()  # user_id -> updates shed by their own budget
+        self.evicted = 0
+        self.started_at = time.time()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    # ---------------- Buckets ----------------
+    def _bucket(self, key, rate, burst, now):
+        """The [tokens, last refill] bucket for key, refilled up to now"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(burst), now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        return bucket
+
+    def sweep(self, now=None):
+        """Forget idle buckets and trim the per-label / per-chat / per-user counters"""
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.idle_seconds
+        idle = [key for key, (_, last) in self._buckets.items() if last < cutoff]
+        for key in idle:
+            del self._buckets[key]
+        self.evicted += len(idle)
+        labels = self.passed + self.dropped
+        if len(labels) > TOP_KEPT:
+            kept = {label for label, _ in labels.most_common(TOP_KEPT)}
+            for counter in (self.passed, self.dropped):
+                for label in [label for label in counter if label not in kept]:
+                    del counter[label]
+        for counter in (self.dropped_chats, self.dropped_users):
+            if len(counter) > TOP_KEPT:
+                kept = counter.most_common(TOP_KEPT)
+                counter.clear()
+                counter.update(dict(kept))
+        self._next_sweep = now + self.idle_seconds
+        return len(idle)
+
+    # ---------------- Hot Path ----------------
+    def allow(self, update, now=None):
+        """Take this update's tokens if both buckets have one; False if it should be dropped"""
+        user = getattr(update, "from_user", None)
+        user_id = user.id if user else None
+        if not self.enabled or user_id in self.exempt:
+            return True
+        if isinstance(update, Message) and update.service:
+            return True
+
+        now = time.monotonic() if now is None else now
+        if now >= self._next_sweep:
+            self.sweep(now)
+        label = label_of(update)
+
+        user_bucket = chat_bucket = None
+        if user_id is not None:
+            if label in self.commands:
+                user_bucket = self._bucket((user_id, label), *self.commands[label], now)
+            else:
+                user_bucket = self._bucket((user_id, None), *self.user, now)
+            if user_bucket[0] < 1.0:
+                self.dropped[label] += 1
+                self.dropped_users[user_id] += 1
+                return False
+        chat_id = chat_of(update)
+        if chat_id is not None and chat_id != user_id:
+            chat_bucket = self._bucket(chat_id, *self.chat, now)
+            if chat_bucket[0] < 1.0:
+                self.dropped[label] += 1
+                self.dropped_chats[chat_id] += 1
+                return False
+        # only now, so an update shed by its chat doesn't also cost the sender a token
+        for bucket in (user_bucket, chat_bucket):
+            if bucket is not None:
+                bucket[0] -= 1.0
+        self.passed[label] += 1
+        return True
+
+    def table(self, top=15):
+        """[(label, passed, dropped)] most dropped first"""
+        labels = sorted(self.dropped, key=self.dropped.get, reverse=True)[:top]
+        return [(label, self.passed[label], self.dropped[label]) for label in labels]
+
+    # ---------------- Pyrogram glue ----------------
+    def install(self, client):
+        # async so Pyrogram checks it on the loop instead of in a thread
+        async def over_budget(_, __, update):
+            return not self.allow(update)
+
+        async def drop(client, update):
+            raise StopPropagation
+
+        async def drop_callback(client, callback):
+            try:
+                await callback.answer("⏳ Slow down!")
+            except Exception:
+                pass
+            raise StopPropagation
+
+        # not timed: perf.py would count the shed updates as fast runs of their command
+        drop.__perf__ = drop_callback.__perf__ = True
+        limited = filters.create(over_budget, "RateLimitFilter")
+        client.on_message(limited, group=GROUP)(drop)
+        client.on_callback_query(limited, group=GROUP)(drop_callback)
+        client.on_inline_query(limited, group=GROUP)(drop)
+
+
+# ---------------- Shared Instance ----------------
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide RateLimiter (installed on app on first use)"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+            _limiter.install(app)
+        return _limiter
+
+
+if __name__ == "__main__":
+    # Cost per update and what a flood leaves through, on synthetic traffic.
+    # python ratelimit.py
+    import random
+    from types import SimpleNamespace as NS
+
+    def message(user_id, chat_id, text):
+        msg = Message(id=1, text=text, chat=NS(id=chat_id), from_user=NS(id=user_id))
+        msg.service = None
+        return msg
+
+    limiter = RateLimiter(exempt=[])
+    rng = random.Random(3)
+    N = 200_000
+    updates = [message(rng.randrange(20_000), -rng.randrange(500), rng.choice(["/collect virat", "hi", "/bet 10"]))
+               for _ in range(N)]
+    start = time.perf_counter()
+    for i, update in enumerate(updates):
+        limiter.allow(update, now=i / 2000)  # 2000 updates/s
+    print(f"allow(): {(time.perf_counter() - start) / N * 1e6:.2f} us per update, {len(limiter)} buckets")
+
+    # One spammer at 50 msg/s in a group for 60 s, next to 30 members chatting once every 5 s
+    limiter = RateLimiter(exempt=[])
+    spam = ok = 0
+    for tick in range(60 * 50):
+        now = tick / 50
+        spam += limiter.allow(message(1, -100, "spam spam"), now)
+        spam += limiter.allow(message(1, -100, "/collect x"), now)
+        if tick % 250 < 30:
+            ok += limiter.allow(message(1000 + tick % 250, -100, "hello"), now)
+    members = sum(1 for tick in range(60 * 50) if tick % 250 < 30)
+    print(f"spammer: {spam} of {2 * 60 * 50} updates passed; members: {ok} of {members} passed")
+    print("dropped by label:", dict(limiter.dropped))
+
+    limiter.sweep(now=10_000)
+    print(f"after idle sweep: {len(limiter)} buckets, {limiter.evicted} evicted")
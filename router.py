@@ -0,0 +1,260 @@
+# router.py
+"""
+One callback-query handler for the whole bot.
+
+Handlers used to register their own filters.regex(...) each, and Pyrogram
+tried those regexes one after another on every button press. Now they
+register a prefix with the router instead:
+
+    router = get_router()
+
+    @router.route("inv_pg", int)
+    async def inv_paginate(client, callback, page): ...
+
+callback_data is "<prefix><sep><arg><sep><arg>..." (sep is ":" by
+default; "_" and "|" for older button formats). A press is resolved by
+dict lookups on the longest registered prefix, then each argument is
+decoded with its converter (digits, int, str, choice(...)); the last argument
+takes the rest of the string, separators included. Routes without
+arguments only match the exact prefix. Data that has no route, or whose
+arguments don't decode, is left alone like an unmatched regex was.
+"""
+
+import threading
+from pyrogram import filters
+from config import app
+
+
+def digits(value):
+    """int converter for ids and amounts: plain non-negative decimals only
+
+    int() alone also takes "-5", "+5", " 5" and "1_000", which a forged
+    button could use to pass a negative bet or price.
+    """
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(value)
+    return int(value)
+
+
+def choice(*options):
+    """Converter that only accepts one of the given strings"""
+    def convert(value):
+        if value not in options:
+            raise ValueError(value)
+        return value
+    return convert
+
+
+class Route:
+    __slots__ = ("prefix", "fn", "types", "sep")
+
+    def __init__(self, prefix, fn, types, sep):
+        self.prefix, self.fn, self.types, self.sep = prefix, fn, types, sep
+
+    def decode(self, rest):
+        """Typed args from the text after prefix + sep; None if they don't fit"""
+        parts = rest.split(self.sep, len(self.types) - 1)
+        if len(parts) != len(self.types) or "" in parts:
+            return None
+        try:
+            return tuple(convert(part) for convert, part in zip(self.types, parts))
+        except (TypeError, ValueError):
+            return None
+
+
+class CallbackRouter:
+    def __init__(self):
+        self._routes = {}    # prefix -> Route
+        self._seps = set()   # every separator some route uses
+        self._deferred = {}  # prefix -> loader of a module not imported yet (startup.py)
+
+    def route(self, prefix, *types, sep=":"):
+        """Decorator: fn(client, callback, *args) handles presses on prefix"""
+        def decorator(fn):
+            if prefix in self._routes:
+                raise ValueError(f"callback prefix {prefix!r} is already routed")
+            self._routes[prefix] = Route(prefix, fn, types, sep)
+            self._seps.add(sep)
+            return fn
+        return decorator
+
+    def resolve(self, data):
+        """(Route, args) for this callback_data, or None"""
+        if not isinstance(data, str):
+            return None
+        route = self._routes.get(data)
+        if route is not None:
+            return None if route.types else (route, ())
+
+        routes, seps = self._routes, self._seps
+        for i in range(len(data) - 1, 0, -1):
+            if data[i] not in seps:
+                continue
+            route = routes.get(data[:i])
+            if route is None or route.sep != data[i] or not route.types:
+                continue
+            args = route.decode(data[i + 1:])
+            return None if args is None else (route, args)
+        return None
+
+    # ---------------- Deferred Modules ----------------
+    def defer(self, prefixes, loader):
+        """loader() imports the module that routes these prefixes; run on first press"""
+        for prefix in prefixes:
+            self._deferred[prefix] = loader
+
+    def undefer(self, prefixes):
+        for prefix in prefixes:
+            self._deferred.pop(prefix, None)
+
+    def _load_deferred(self, data):
+        """Import the module behind data's prefix, if one is waiting; True if loaded"""
+        if not isinstance(data, str):
+            return False
+        for end in range(len(data), 0, -1):
+            loader = self._deferred.get(data[:end])
+            if loader is not None:
+                loader()
+                return True
+        return False
+
+    # ---------------- Pyrogram glue ----------------
+    def match(self, callback):
+        """True if a route handles this press (its Route + args are kept on it)"""
+        resolved = self.resolve(callback.data)
+        if resolved is None and self._deferred and self._load_deferred(callback.data):
+            resolved = self.resolve(callback.data)
+        if resolved is None:
+            return False
+        callback.route = resolved  # parsed once, used by dispatch()
+        return True
+
+    async def dispatch(self, client, callback):
+        route, args = callback.route
+        await route.fn(client, callback, *args)
+
+    def install(self, client):
+        # a plain async function: filters.create() binds it to the filter
+        # object, and async keeps Pyrogram from running it in a thread
+        async def check(_, __, callback):
+            return self.match(callback)
+
+        client.on_callback_query(filters.create(check, "CallbackRouterFilter"))(self.dispatch)
+
+
+# ---------------- Shared Instance ----------------
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Return the process-wide CallbackRouter (registered with app on first use)"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = CallbackRouter()
+            _router.install(app)
+        return _router
+
+
+if __name__ == "__main__":
+    # Dispatch microbenchmark: the bot's button table routed here vs. the
+    # same buttons as a filters.regex chain tried in registration order.
+    # python router.py
+    import random
+    import re
+    import time
+
+    ANY = str
+    TABLE = [  # (prefix, types, sep, sample data)
+        ("gift_confirm", (int, int, int), ":", "gift_confirm:11:22:33"),
+        ("trade_accept", (int, int, int, int), ":", "trade_accept:11:22:3:4"),
+        ("animesearch", (ANY,), ":", "animesearch:N"),
+        ("auction_info", (int,), ":", "auction_info:42"),
+        ("auction_claim", (int,), ":", "auction_claim:42"),
+        ("auction_credit", (int,), ":", "auction_credit:42"),
+        ("auction_close", (), ":", "auction_close"),
+        ("reset_confirm", (ANY,), ":", "reset_confirm:ab12"),
+        ("reset_cancel", (ANY,), ":", "reset_cancel:ab12"),
+        ("bet_cancel", (int, int), ":", "bet_cancel:5:100"),
+        ("bet", (int, int, ANY), ":", "bet:5:100:hard"),
+        ("aw_ok", (ANY,), ":", "aw_ok:f00d"),
+        ("aw_no", (ANY,), ":", "aw_no:f00d"),
+        ("rarity", (ANY,), ":", "rarity:Limited edition::2"),
+        ("bank_atm_buy", (int, choice("normal", "standard", "platinum")), ":", "bank_atm_buy:5:platinum"),
+        ("bank_loan_approve", (int,), ":", "bank_loan_approve:7"),
+        ("bank_loan_decline", (int,), ":", "bank_loan_decline:7"),
+        ("bank_op_accept", (int,), ":", "bank_op_accept:7"),
+        ("bank_op_decline", (int,), ":", "bank_op_decline:7"),
+        ("luck:leader", (int,), ":", "luck:leader:3"),
+        ("luck:close", (), ":", "luck:close"),
+        ("give", (choice("confirm", "cancel"), int, int), ":", "give:confirm:5:9"),
+        ("bonus_claim", (int,), ":", "bonus_claim:5"),
+        ("bonus_already", (), ":", "bonus_already"),
+        ("bonus_close", (), ":", "bonus_close"),
+        ("sanime_page", (ANY,), "_", "sanime_page_2|Naruto"),
+        ("confirmdel", (int,), "_", "confirmdel_12"),
+        ("canceldel", (int,), "_", "canceldel_12"),
+        ("claim_craft", (), ":", "claim_craft"),
+        ("clan_delete", (int,), ":", "clan_delete:3"),
+        ("clan_members", (int,), ":", "clan_members:3"),
+        ("fav_confirm", (int, int), "|", "fav_confirm|5|9"),
+        ("fav_decline", (int,), "|", "fav_decline|5"),
+        ("claim_joined", (int,), ":", "claim_joined:5"),
+        ("edit_apply", (int, choice("name", "anime", "rarity", "theme"), ANY), ":", "edit_apply:9:name:Virat"),
+        ("edit_media", (ANY,), ":", "edit_media:x1y2"),
+        ("edit_cancel", (), ":", "edit_cancel"),
+        ("bulk", (choice("confirm", "cancel"), ANY), ":", "bulk:confirm:ab12cd34"),
+        ("inv_pg", (int,), ":", "inv_pg:17"),
+        ("inv_show_fav", (), ":", "inv_show_fav"),
+        ("inv_close", (), ":", "inv_close"),
+        ("ignore", (), ":", "ignore"),
+        ("wmode_menu", (), ":", "wmode_menu"),
+        ("wmode_set", (ANY,), ":", "wmode_set:Limited+edition"),
+        ("wmode_clear", (), ":", "wmode_clear"),
+        ("aff_add", (int,), ":", "aff_add:9"),
+        ("aff_upgrade", (int,), ":", "aff_upgrade:9"),
+        ("aff_disabled", (), ":", "aff_disabled"),
+        ("aff_close", (), ":", "aff_close"),
+        ("help_role", (choice("user", "admin", "owner"),), ":", "help_role:admin"),
+        ("help_back", (), ":", "help_back"),
+        ("market_refresh", (), ":", "market_refresh"),
+        ("market_help", (), ":", "market_help"),
+        ("market_buy_by_id", (), ":", "market_buy_by_id"),
+        ("market_confirm", (int, int), "_", "market_confirm_9_500"),
+        ("market_decline", (int,), "_", "market_decline_9"),
+        ("propose_accept", (ANY,), ":", "propose_accept:ab12"),
+        ("propose_reject", (ANY,), ":", "propose_reject:ab12"),
+        ("transfer_cancel", (int, int), ":", "transfer_cancel:5:6"),
+        ("transfer_confirm", (int, int), ":", "transfer_confirm:5:6"),
+        ("redeem_cb", (ANY,), ":", "redeem_cb:CODE123"),
+        ("claim", (choice("daily", "weekly", "monthly"), int), ":", "claim:daily:100"),
+    ]
+
+    async def noop(client, callback, *args):
+        pass
+
+    router = CallbackRouter()
+    chain = []
+    for prefix, types, sep, _ in TABLE:
+        router.route(prefix, *types, sep=sep)(noop)
+        groups = [r"(-?\d+)" if t is int else "(.+)" for t in types]
+        chain.append(re.compile("^" + re.escape(prefix) + "".join(re.escape(sep) + g for g in groups) + "$"))
+
+    presses = [random.choice(TABLE)[3] for _ in range(20000)]
+    assert all(router.resolve(d) for d in presses)
+
+    def regex_chain(data):
+        for pattern in chain:  # filters.regex: list(finditer) per handler until one matches
+            matches = list(pattern.finditer(data))
+            if matches:
+                return matches
+        return None
+
+    for name, fn in (("regex chain", regex_chain), ("router", router.resolve)):
+        start = time.perf_counter()
+        for _ in range(5):
+            for data in presses:
+                fn(data)
+        per_press = (time.perf_counter() - start) / (5 * len(presses)) * 1e6
+        print(f"{name:12} {per_press:6.2f} us/press ({len(TABLE)} routes)")
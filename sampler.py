@@ -0,0 +1,363 @@
+# sampler.py
+"""
+Weighted random card picks in O(1) (Walker / Vose alias method).
+
+A draw picks a (rarity, event) bucket from an alias table, then a uniform
+card inside that bucket, so its cost does not depend on how many cards
+exist. A tier's weight (Config.RARITY_WEIGHTS or a per-group override) is
+spread over its cards; cards of a boosted event (Config.EVENT_BOOSTS)
+count extra inside their tier.
+
+Buckets follow the card catalog: an added / removed card is patched in
+O(1) and only the alias tables (one slot per bucket) are rebuilt. Group
+overrides are read once at startup (load_group_weights()), so a draw
+never touches the DB.
+"""
+
+import random
+import threading
+from array import array
+from config import Config
+from catalog import get_catalog
+from database import get_db
+
+RARITY_ORDER = [
+    "Common", "Medium", "Rare", "Legendary", "Limited edition",
+    "Prime", "Cosmic", "Ultimate", "God"
+]
+
+# Rejection-sampling attempts before a filtered draw falls back to a full filter
+_PREDICATE_TRIES = 32
+
+
+def _read_group_weights(conn):
+    groups = {}
+    for chat_id, rarity, weight in conn.execute("SELECT chat_id, rarity, weight FROM group_drop_weights"):
+        groups.setdefault(chat_id, {})[rarity] = weight
+    return groups
+
+
+# ---------------- Alias Table ----------------
+class AliasTable:
+    """Vose's alias method: O(n) build, O(1) draw"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("AliasTable needs at least one positive weight")
+
+        self.n = n
+        self.prob = array("d", [1.0]) * n
+        self.alias = array("l", range(n))
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = (scaled[l] + scaled[s]) - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left is 1.0 up to float error and keeps prob = 1.0
+
+    def draw(self):
+        i = int(random.random() * self.n)
+        return i if random.random() < self.prob[i] else self.alias[i]
+
+
+class _Bucket:
+    """Card ids of one (rarity, event) pair; O(1) add / swap-remove"""
+    __slots__ = ("rarity", "event", "ids", "pos")
+
+    def __init__(self, rarity, event):
+        self.rarity = rarity
+        self.event = event
+        self.ids = array("q")
+        self.pos = {}
+
+    def add(self, card_id):
+        if card_id not in self.pos:
+            self.pos[card_id] = len(self.ids)
+            self.ids.append(card_id)
+
+    def remove(self, card_id):
+        i = self.pos.pop(card_id, None)
+        if i is None:
+            return
+        last = self.ids.pop()
+        if last != card_id:
+            self.ids[i] = last
+            self.pos[last] = i
+
+
+# ---------------- Sampler ----------------
+class WeightedSampler:
+    def __init__(self, catalog=None, weights=None, default_weight=None, boosts=None, db=None):
+        self._catalog = catalog or get_catalog()
+        self._weights = dict(Config.RARITY_WEIGHTS if weights is None else weights)
+        self._default_weight = Config.RARITY_DEFAULT_WEIGHT if default_weight is None else default_weight
+        self._boosts = {k.lower(): v for k, v in (Config.EVENT_BOOSTS if boosts is None else boosts).items()}
+        self._db = db
+        self._lock = threading.RLock()
+        self._buckets = None        # (rarity, event.lower()) -> _Bucket
+        self._tables = {}           # (chat_id, rarities) -> (AliasTable, buckets, weights) or None
+        self._group_weights = None  # chat_id -> {rarity: weight}
+        self._catalog.subscribe(self._on_catalog_change)
+
+    # ---------------- Buckets ----------------
+    @staticmethod
+    def _key(card):
+        return card.rarity, (card.event or "").lower()
+
+    def _rebuild_buckets(self):
+        buckets = {}
+        for card in self._catalog.all_cards():
+            key = self._key(card)
+            if key not in buckets:
+                buckets[key] = _Bucket(*key)
+            buckets[key].add(card.id)
+        self._buckets = buckets
+        self._tables.clear()
+
+    def _on_catalog_change(self, event, card):
+        with self._lock:
+            if event == "reload" or self._buckets is None:
+                self._buckets = None
+            elif event == "add":
+                key = self._key(card)
+                if key not in self._buckets:
+                    self._buckets[key] = _Bucket(*key)
+                self._buckets[key].add(card.id)
+            elif event == "remove":
+                bucket = self._buckets.get(self._key(card))
+                if bucket:
+                    bucket.remove(card.id)
+            # Bucket sizes changed, so every table's weights did too
+            self._tables.clear()
+
+    # ---------------- Weights ----------------
+    async def load_group_weights(self):
+        """Read every group's overrides (startup, next to the catalog load)"""
+        db = self._db or get_db()
+        groups = await db.read(_read_group_weights)
+        with self._lock:
+            self._group_weights = groups
+            self._tables.clear()
+        print(f"🎯 Drop weights: {len(groups)} groups with overrides")
+        return len(groups)
+
+    def _overrides(self, chat_id):
+        # not loaded yet (scripts, benchmarks): default weights
+        if chat_id is None or self._group_weights is None:
+            return None
+        return self._group_weights.get(chat_id)
+
+    def tier_weight(self, rarity, chat_id=None):
+        overrides = self._overrides(chat_id)
+        if overrides and rarity in overrides:
+            return overrides[rarity]
+        return self._weights.get(rarity, self._default_weight)
+
+    def _boost(self, event):
+        return self._boosts.get(event, 1) if event else 1
+
+    def _table(self, chat_id, rarities):
+        if not self._overrides(chat_id):
+            chat_id = None  # groups without overrides share the default table
+        key = (chat_id, tuple(sorted(rarities)) if rarities is not None else None)
+        if key in self._tables:
+            return self._tables[key]
+
+        tiers = {}
+        for bucket in self._buckets.values():
+            if bucket.ids and (rarities is None or bucket.rarity in rarities):
+                tiers.setdefault(bucket.rarity, []).append(bucket)
+
+        entries, weights = [], []
+        for rarity, buckets in tiers.items():
+            tier_weight = self.tier_weight(rarity, chat_id)
+            mass = sum(len(b.ids) * self._boost(b.event) for b in buckets)
+            if tier_weight <= 0 or mass <= 0:
+                continue
+            for b in buckets:
+                share = len(b.ids) * self._boost(b.event)
+                if share > 0:
+                    entries.append(b)
+                    weights.append(tier_weight * share / mass)
+
+        table = (AliasTable(weights), entries, weights) if entries else None
+        self._tables[key] = table
+        return table
+
+    # ---------------- Draws ----------------
+    def sample(self, chat_id=None, rarities=None, predicate=None):
+        """Weighted random Card (or None).
+
+        chat_id applies that group's overrides, rarities limits the tiers and
+        predicate(card) -> bool narrows the pick further.
+        """
+        self._catalog.ensure_loaded()
+        with self._lock:
+            if self._buckets is None:
+                self._rebuild_buckets()
+            table = self._table(chat_id, rarities)
+            if table is None:
+                return None
+            alias, entries, weights = table
+
+            for _ in range(_PREDICATE_TRIES if predicate else 1):
+                ids = entries[alias.draw()].ids
+                card = self._catalog.get(ids[int(random.random() * len(ids))])
+                if predicate is None or predicate(card):
+                    return card
+
+            # Narrow filter: weighted pick over the matching cards only
+            matches, card_weights = [], []
+            for bucket, weight in zip(entries, weights):
+                per_card = weight / len(bucket.ids)
+                for card_id in bucket.ids:
+                    card = self._catalog.get(card_id)
+                    if predicate(card):
+                        matches.append(card)
+                        card_weights.append(per_card)
+            return random.choices(matches, card_weights)[0] if matches else None
+
+    def rarity_chances(self, chat_id=None):
+        """{rarity: percent} a drop in this chat lands on each tier"""
+        self._catalog.ensure_loaded()
+        with self._lock:
+            if self._buckets is None:
+                self._rebuild_buckets()
+            table = self._table(chat_id, None)
+        if table is None:
+            return {}
+        _, entries, weights = table
+        total = sum(weights)
+        chances = {}
+        for bucket, weight in zip(entries, weights):
+            chances[bucket.rarity] = chances.get(bucket.rarity, 0) + weight * 100 / total
+        return chances
+
+    # ---------------- Overrides & Boosts ----------------
+    async def set_group_weight(self, chat_id, rarity, weight):
+        db = self._db or get_db()
+        await db.execute(
+            "INSERT OR REPLACE INTO group_drop_weights (chat_id, rarity, weight) VALUES (?, ?, ?)",
+            (chat_id, rarity, weight)
+        )
+        if self._group_weights is None:
+            await self.load_group_weights()  # picks up the row just written too
+        with self._lock:
+            self._group_weights.setdefault(chat_id, {})[rarity] = weight
+            self._drop_tables(chat_id)
+
+    async def reset_group_weights(self, chat_id):
+        db = self._db or get_db()
+        await db.execute("DELETE FROM group_drop_weights WHERE chat_id=?", (chat_id,))
+        with self._lock:
+            if self._group_weights is not None:
+                self._group_weights.pop(chat_id, None)
+            self._drop_tables(chat_id)
+
+    def set_event_boost(self, event, factor):
+        """Runtime boost for one event/theme (factor 1 removes it)"""
+        with self._lock:
+            if factor == 1:
+                self._boosts.pop(event.lower(), None)
+            else:
+                self._boosts[event.lower()] = factor
+            self._tables.clear()
+
+    def event_boosts(self):
+        return dict(self._boosts)
+
+    def _drop_tables(self, chat_id):
+        for key in [k for k in self._tables if k[0] == chat_id]:
+            del self._tables[key]
+
+
+# ---------------- Shared Instance ----------------
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """Return the process-wide WeightedSampler"""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = WeightedSampler()
+        return _sampler
+
+
+# ---------------- Benchmark ----------------
+if __name__ == "__main__":
+    # python sampler.py [cards]  -> alias draws vs ORDER BY RANDOM() on a throwaway DB
+    import os
+    import sqlite3
+    import sys
+    import tempfile
+    import time
+    from types import SimpleNamespace
+    from catalog import Card, CardCatalog
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    path = os.path.join(tempfile.mkdtemp(), "sampler_bench.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE waifu_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, anime TEXT, rarity TEXT, event TEXT,
+            media_type TEXT, media_file TEXT, media_file_id TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO waifu_cards (name, anime, rarity, event, media_type, media_file) VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"Player {i}", f"Team {i % 50}", RARITY_ORDER[i % len(RARITY_ORDER)],
+          "Christmas" if i % 100 == 0 else None, "photo", f"file_{i}") for i in range(n))
+    )
+    conn.commit()
+    print(f"📦 {n} cards in {path}")
+
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        conn.execute(
+            "SELECT id, name, anime, rarity, event, media_type, media_file FROM waifu_cards ORDER BY RANDOM() LIMIT 1"
+        ).fetchone()
+    sql_us = (time.perf_counter() - start) / rounds * 1e6
+
+    catalog = CardCatalog(SimpleNamespace(conn=conn))
+    sampler = WeightedSampler(catalog, boosts={"Christmas": 3})
+    start = time.perf_counter()
+    sampler.sample()
+    build_ms = (time.perf_counter() - start) * 1e3
+
+    draws = 200_000
+    counts = {}
+    start = time.perf_counter()
+    for _ in range(draws):
+        card = sampler.sample()
+        counts[card.rarity] = counts.get(card.rarity, 0) + 1
+    alias_us = (time.perf_counter() - start) / draws * 1e6
+
+    start = time.perf_counter()
+    for i in range(100):
+        catalog.add(Card(10 ** 9 + i, f"New {i}", "Team 0", "God", None, "photo", "f", None))
+        sampler.sample()
+    for i in range(100):
+        catalog.remove(10 ** 9 + i)
+        sampler.sample()
+    patch_us = (time.perf_counter() - start) / 200 * 1e6
+
+    print(f"ORDER BY RANDOM() : {sql_us:10.1f} µs / pick")
+    print(f"alias sampler     : {alias_us:10.2f} µs / pick  ({sql_us / alias_us:.0f}x faster)")
+    print(f"initial build     : {build_ms:10.1f} ms (catalog load + buckets)")
+    print(f"add/remove + draw : {patch_us:10.1f} µs")
+
+    chances = sampler.rarity_chances()
+    print("\nrarity            expected   observed")
+    for rarity in RARITY_ORDER:
+        print(f"{rarity:<16} {chances.get(rarity, 0):8.2f}%  {counts.get(rarity, 0) * 100 / draws:8.2f}%")
+    conn.close()
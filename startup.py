@@ -0,0 +1,331 @@
+# startup.py
+"""
+Handler loading with per-module timings, and lazy imports for modules
+that only answer commands.
+
+Every module in handlers/ is scanned (ast, nothing is executed) before it
+is imported. A module is deferred when its top level is only imports,
+assignments and definitions, and its handlers are only
+app.on_message(filters.command(...)) or router.route(...). For those, one
+stub handler listens for their commands and the router is told about
+their button prefixes; the first /command or button press imports the
+module and hands the update to the handlers it just registered. Anything
+else (watchers, inline queries, member updates, import-time work) is
+imported at startup as before.
+
+The stub is registered after every startup module, so a deferred module
+would lose any command it shares with one of them. Such modules are
+imported at startup instead, with a warning naming the command.
+
+Startup phases and every import are timed; report() prints the table.
+"""
+
+import ast
+import importlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pyrogram import filters
+from config import Config, app
+from router import get_router
+
+HANDLERS_DIR = "handlers"
+
+
+# ---------------- Static Scan ----------------
+def _literal_commands(call):
+    """Commands in filters.command("a") / (["a", "b"]); None if not literal"""
+    if call.keywords or len(call.args) != 1:
+        return None
+    try:
+        value = ast.literal_eval(call.args[0])
+    except ValueError:
+        return None
+    names = [value] if isinstance(value, str) else value
+    if not isinstance(names, (list, tuple)) or not all(isinstance(n, str) for n in names):
+        return None
+    return {n.lower() for n in names}
+
+
+def _is_attr_call(node, owner, name):
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            and node.func.attr == name and isinstance(node.func.value, ast.Name)
+            and node.func.value.id == owner)
+
+
+def _registered_commands(tree):
+    """Every literal command in a filters.command(...) call anywhere in the module"""
+    commands = set()
+    for node in ast.walk(tree):
+        if _is_attr_call(node, "filters", "command"):
+            commands |= _literal_commands(node) or set()
+    return commands
+
+
+def scan_module(path):
+    """(lazy, commands): lazy is (commands, prefixes) if the module can load
+    on first use, else None; commands is every command it registers"""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    return _deferrable(tree), _registered_commands(tree)
+
+
+def _deferrable(tree):
+    commands, prefixes = set(), set()
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.ClassDef, ast.Assign, ast.AnnAssign)):
+            continue
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            continue  # docstring
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return None  # top-level code runs at import
+
+        for deco in node.decorator_list:
+            if _is_attr_call(deco, "router", "route") and deco.args \
+                    and isinstance(deco.args[0], ast.Constant) and isinstance(deco.args[0].value, str):
+                prefixes.add(deco.args[0].value)
+                continue
+            if not _is_attr_call(deco, "app", "on_message") or deco.keywords or len(deco.args) != 1:
+                return None
+            found = [_literal_commands(n) for n in ast.walk(deco.args[0]) if _is_attr_call(n, "filters", "command")]
+            if not found or None in found:
+                return None
+            for names in found:
+                commands |= names
+
+    if not commands and not prefixes:
+        return None
+    return commands, prefixes
+
+
+def scan_handlers(directory=HANDLERS_DIR, cache_path=None):
+    """{filename: scan_module() result} for every handler file.
+
+    Parsing every module costs about as much as importing it, so results
+    are kept in a JSON file and a file is only re-parsed when its mtime
+    or size changes.
+    """
+    cache_path = cache_path or Config.HANDLER_SCAN_CACHE
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    results, fresh = {}, {}
+    for filename in os.listdir(directory):
+        if not filename.endswith(".py") or filename == "__init__.py":
+            continue
+        path = os.path.join(directory, filename)
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        entry = cache.get(filename)
+        if entry and len(entry) == 3 and entry[0] == stamp:
+            scanned, commands = entry[1], entry[2]
+        else:
+            found, commands = scan_module(path)
+            scanned = [sorted(found[0]), sorted(found[1])] if found else None
+            commands = sorted(commands)
+        fresh[filename] = [stamp, scanned, commands]
+        results[filename] = ((set(scanned[0]), set(scanned[1])) if scanned else None, set(commands))
+
+    if fresh != cache:
+        try:
+            os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump(fresh, f)
+        except OSError as e:
+            print(f"⚠️ Could not save handler scan cache: {e}")
+    return results
+
+
+def startup_only(scans):
+    """{filename: shared commands} for lazy-capable modules that must load at startup
+
+    A module is imported at startup when it registers a command that a
+    startup module also registers; repeated until nothing changes, since
+    each one it pulls in can clash with further modules.
+    """
+    eager = {filename for filename, (lazy, _) in scans.items() if lazy is None}
+    forced = {}
+    changed = True
+    while changed:
+        changed = False
+        taken = set().union(*(scans[filename][1] for filename in eager))
+        for filename, (lazy, commands) in scans.items():
+            if filename in eager:
+                continue
+            shared = commands & taken
+            if shared:
+                eager.add(filename)
+                forced[filename] = shared
+                changed = True
+    return forced
+
+
+# ---------------- Startup ----------------
+class Startup:
+    def __init__(self, client=None, router=None):
+        self.client = client or app
+        self.router = router or get_router()
+        self.started_at = time.perf_counter()
+        self.phases = []       # (name, seconds)
+        self.marks = []        # (name, seconds since start)
+        self.imports = {}      # module -> (seconds, "startup" / "first use")
+        self.failed = {}       # module -> error text
+        self.deferred = {}     # module -> (commands, prefixes) not imported yet
+        self._pending = {}     # command -> [deferred modules]
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def mark(self, name):
+        """Record a point in time (seconds since Startup was created)"""
+        self.marks.append((name, time.perf_counter() - self.started_at))
+
+    # ---------------- Importing ----------------
+    def _import(self, module_name, when):
+        """Import one module; returns the handlers it added (and its module)"""
+        added = []
+        original = self.client.add_handler
+
+        def capture(handler, group=0):
+            added.append((handler, group))
+            return original(handler, group)
+
+        self.client.add_handler = capture
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(module_name)
+        except Exception as e:
+            self.failed[module_name] = str(e)
+            print(f"❌ Failed to load {module_name}: {e}")
+            return None, []
+        finally:
+            del self.client.add_handler
+            self.imports[module_name] = (time.perf_counter() - start, when)
+        return module, added
+
+    def load(self, module_name):
+        """Import a module now, deferred or not; returns the module"""
+        if module_name not in self.deferred:
+            return importlib.import_module(module_name)
+        return self._load_deferred(module_name)[0]
+
+    def _load_deferred(self, module_name):
+        if module_name not in self.deferred:
+            return importlib.import_module(module_name), []
+        module, added = self._import(module_name, "first use")
+        commands, prefixes = self.deferred.pop(module_name)
+        self.router.undefer(prefixes)
+        for command in commands:
+            modules = self._pending.get(command, [])
+            if module_name in modules:
+                modules.remove(module_name)
+            if not modules:
+                self._pending.pop(command, None)
+        if module is not None:
+            print(f"✅ Loaded on first use: {module_name} ({self.imports[module_name][0] * 1000:.0f} ms)")
+        return module, added
+
+    def load_handlers(self, lazy=None):
+        lazy = Config.LAZY_HANDLERS if lazy is None else lazy
+        if not os.path.exists(HANDLERS_DIR):
+            print(f"❌ Error: '{HANDLERS_DIR}' folder nahi mila!")
+            return
+
+        scans = scan_handlers() if lazy else {}
+        forced = startup_only(scans)
+        for filename, shared in sorted(forced.items()):
+            print(f"⚠️ {filename} not deferred: " + ", ".join(f"/{c}" for c in sorted(shared))
+                  + " is also registered by a module loaded at startup")
+        for filename in os.listdir(HANDLERS_DIR):
+            if not filename.endswith(".py") or filename == "__init__.py":
+                continue
+            module_name = f"{HANDLERS_DIR}.{filename[:-3]}"
+            scanned = scans.get(filename, (None, None))[0]
+            if scanned and filename not in forced:
+                self._defer(module_name, *scanned)
+                continue
+            module, _ = self._import(module_name, "startup")
+            if module is not None:
+                print(f"✅ Loaded: {filename}")
+
+        if self._pending:
+            self._install_stub()
+        if self.deferred:
+            print(f"💤 Deferred {len(self.deferred)} handler modules until first use")
+
+    # ---------------- First Use ----------------
+    def _defer(self, module_name, commands, prefixes):
+        self.deferred[module_name] = (commands, prefixes)
+        for command in commands:
+            self._pending.setdefault(command, []).append(module_name)
+        if prefixes:
+            self.router.defer(prefixes, lambda: self._load_deferred(module_name))
+
+    def _install_stub(self):
+        commands = sorted(self._pending)
+
+        async def still_pending(_, __, message):
+            # async, so Pyrogram checks it on the loop instead of in a thread
+            return bool(message.command) and message.command[0].lower() in self._pending
+
+        self.client.on_message(filters.command(commands) & filters.create(still_pending))(self._on_first_use)
+
+    async def _on_first_use(self, client, message):
+        added = []
+        for module_name in list(self._pending.get(message.command[0].lower(), [])):
+            added += self._load_deferred(module_name)[1]
+
+        # The dispatcher only sees the new handlers from the next update on;
+        # this one is handed over here, first match per group like Pyrogram.
+        groups = {}
+        for handler, group in added:
+            groups.setdefault(group, []).append(handler)
+        for group in sorted(groups):
+            for handler in groups[group]:
+                if await handler.check(client, message):
+                    await handler.callback(client, message)
+                    break
+
+    # ---------------- Report ----------------
+    def report(self, top=10):
+        lines = ["⏱ Startup"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<28} {seconds * 1000:7.0f} ms")
+        for name, at in self.marks:
+            lines.append(f"  {name:<28} at {at:6.2f} s")
+
+        at_start = sorted(((s, m) for m, (s, w) in self.imports.items() if w == "startup"), reverse=True)
+        lines.append(f"  handler imports: {len(at_start)} at startup "
+                     f"({sum(s for s, _ in at_start) * 1000:.0f} ms), {len(self.deferred)} still deferred")
+        for seconds, module in at_start[:top]:
+            lines.append(f"    {module:<34} {seconds * 1000:6.1f} ms")
+        on_use = [(m, s) for m, (s, w) in self.imports.items() if w == "first use"]
+        for module, seconds in on_use:
+            lines.append(f"    {module:<34} {seconds * 1000:6.1f} ms (first use)")
+        for module, error in self.failed.items():
+            lines.append(f"    ❌ {module}: {error}")
+        return "\n".join(lines)
+
+
+# ---------------- Shared Instance ----------------
+_startup = None
+_startup_lock = threading.Lock()
+
+
+def get_startup():
+    """Return the process-wide Startup"""
+    global _startup
+    with _startup_lock:
+        if _startup is None:
+            _startup = Startup()
+        return _startup